@@ -0,0 +1,296 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from benchmarks.tree_generator import (
+    add_tree_spec_arguments,
+    generate_tree,
+    get_tree_spec,
+)
+from src.application.generate_podcast_feed_usecase import GeneratePodcastFeedUseCase
+from src.config import CompletionConfig, MonitorConfig
+from src.dependency_resolver import create_completion_detector, create_observer
+from src.domain.models import PodcastUpdatedEvent, ValidUrl
+from src.infra.file_changed_handler import FileChangedEventHandler
+from src.infra.file_changed_monitor import FileChangedMonitor
+from src.infra.file_parser import PodcastFileNameParser
+from src.infra.file_reader import PodcastFileService
+from src.infra.repository import FileSystemPodcastRepository
+from src.infra.rss_feed_adapter import RssFeedAdapter, UrlGenerator
+
+# Benchmarks of the feed-service against a synthetic recording tree. Results are written as JSON to compare across commits:
+# python -m benchmarks.run_benchmarks --podcasts 100 --episodes-per-podcast 500 --output results.json
+
+
+def _measure(function: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    durations: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "min_seconds": min(durations),
+        "median_seconds": statistics.median(durations),
+        "max_seconds": max(durations),
+    }
+
+
+def _create_usecase(root: Path):
+    repo = FileSystemPodcastRepository(
+        root, PodcastFileNameParser(), PodcastFileService(root)
+    )
+    generator = RssFeedAdapter(UrlGenerator(ValidUrl("https://podcasts.example.com/")))
+    return repo, generator, GeneratePodcastFeedUseCase(repo, generator)
+
+
+def benchmark_feed_generation(root: Path, repeat: int) -> dict[str, Any]:
+    repo, generator, usecase = _create_usecase(root)
+    results: dict[str, Any] = {}
+
+    results["repository_get_all"] = _measure(lambda: list(repo.get_all()), repeat)
+
+    largest = max(repo.get_all(), key=len)
+    results["rss_generate_feed"] = {
+        "episodes": len(largest),
+        **_measure(lambda: generator.generate_feed(largest), repeat),
+    }
+
+    # First run writes all feeds, later runs find them unchanged
+    results["generate_feeds_initial"] = _measure(usecase.generate_feeds, 1)
+    results["generate_feeds_unchanged"] = _measure(usecase.generate_feeds, repeat)
+    return results
+
+
+# Measures the monitor as run by the service, i.e. FileChangedMonitor with the file changed handler (debounce and completion detection).
+# Each sample simulates a recording: A file is written to in 'write_count' chunks 'write_interval' seconds apart and is expected to be published once, after the last write
+def benchmark_monitor(
+    root: Path,
+    monitor_config: MonitorConfig,
+    completion_config: CompletionConfig,
+    idle_seconds: float,
+    latency_samples: int,
+    write_count: int,
+    write_interval: float,
+) -> dict[str, Any]:
+    events: dict[Path, float] = {}
+    publishes: dict[Path, list[float]] = {}
+    event_received = threading.Condition()
+
+    def on_change(file_path: Path) -> None:
+        with event_received:
+            events.setdefault(file_path, time.perf_counter())
+            event_received.notify_all()
+
+    def on_publish(event: PodcastUpdatedEvent) -> None:
+        with event_received:
+            publishes.setdefault(event.episode_id, []).append(time.perf_counter())
+            event_received.notify_all()
+
+    handler = FileChangedEventHandler(
+        completion_config.debounce_time,
+        callback=on_publish,
+        completion_detector=create_completion_detector(completion_config),
+    )
+    handler.add_change_listener(on_change)
+    monitor = FileChangedMonitor(root, handler, create_observer(monitor_config))
+    monitor_thread = threading.Thread(target=monitor.start, name="monitor")
+    monitor_thread.start()
+    results: dict[str, Any] = {}
+    try:
+        # Initial snapshot is taken when the emitter thread starts
+        time.sleep(1)
+
+        cpu_start = time.process_time()
+        time.sleep(idle_seconds)
+        results["idle_cpu_percent"] = (
+            100 * (time.process_time() - cpu_start) / idle_seconds
+        )
+
+        podcast_dirs = sorted(p for p in root.iterdir() if p.is_dir())
+        rng = random.Random(0)
+        event_latencies: list[float] = []
+        publish_latencies: list[float] = []
+        premature_publishes = 0
+        created_files: list[Path] = []
+        # Longest a complete file may take to be published
+        publish_timeout = completion_config.debounce_time.total_seconds() + 60
+        for i in range(latency_samples):
+            # Random delay, so the samples are spread across the poll interval
+            time.sleep(rng.uniform(0, 1))
+            file_path = podcast_dirs[i % len(podcast_dirs)] / f"{uuid.uuid4()}.mp3"
+            created_at = time.perf_counter()
+            # Files are removed at the end. A polling observer would otherwise report a new file reusing the inode as a move of the removed file
+            created_files.append(file_path)
+            for chunk in range(write_count):
+                if chunk > 0:
+                    time.sleep(write_interval)
+                with open(file_path, "ab") as f:
+                    f.write(os.urandom(16 * 1024))
+            last_write_at = time.perf_counter()
+
+            event_at = _wait_for_event(events, event_received, file_path, timeout=120)
+            if event_at is not None:
+                event_latencies.append(event_at - created_at)
+            published_at = _wait_for_publish(
+                publishes, event_received, file_path, last_write_at, publish_timeout
+            )
+            if published_at is not None:
+                publish_latencies.append(published_at - last_write_at)
+            with event_received:
+                premature_publishes += sum(
+                    1 for t in publishes.get(file_path, []) if t < last_write_at
+                )
+
+        for file_path in created_files:
+            file_path.unlink()
+
+        results["event_latency"] = {
+            "samples": len(event_latencies),
+            "missed": latency_samples - len(event_latencies),
+            "median_seconds": (
+                statistics.median(event_latencies) if event_latencies else None
+            ),
+            "max_seconds": max(event_latencies) if event_latencies else None,
+        }
+        # Time from the last write until the file is published as complete
+        results["publish_latency"] = {
+            "samples": len(publish_latencies),
+            "missed": latency_samples - len(publish_latencies),
+            "median_seconds": (
+                statistics.median(publish_latencies) if publish_latencies else None
+            ),
+            "max_seconds": max(publish_latencies) if publish_latencies else None,
+            # Published while still being written
+            "premature_publishes": premature_publishes,
+        }
+    finally:
+        monitor.stop()
+        monitor_thread.join()
+    return results
+
+
+def _wait_for_event(
+    events: dict[Path, float],
+    event_received: threading.Condition,
+    file_path: Path,
+    timeout: float,
+) -> Optional[float]:
+    with event_received:
+        event_received.wait_for(lambda: file_path in events, timeout=timeout)
+        return events.get(file_path)
+
+
+# Returns the time of the first publish of the file after the given time
+def _wait_for_publish(
+    publishes: dict[Path, list[float]],
+    event_received: threading.Condition,
+    file_path: Path,
+    after: float,
+    timeout: float,
+) -> Optional[float]:
+    def get_publish() -> Optional[float]:
+        return next((t for t in publishes.get(file_path, []) if t >= after), None)
+
+    with event_received:
+        event_received.wait_for(lambda: get_publish() is not None, timeout=timeout)
+        return get_publish()
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_args() -> dict[str, Any]:
+    ap = argparse.ArgumentParser(description="Runs the feed-service benchmarks")
+    add_tree_spec_arguments(ap)
+    ap.add_argument("--repeat", type=int, default=5, help="Runs per benchmark")
+    ap.add_argument(
+        "--idle-seconds", type=float, default=10, help="Idle CPU measurement window"
+    )
+    ap.add_argument("--latency-samples", type=int, default=5)
+    ap.add_argument(
+        "--write-count", type=int, default=5, help="Writes per simulated recording"
+    )
+    ap.add_argument(
+        "--write-interval",
+        type=float,
+        default=1,
+        help="Seconds between the writes of a simulated recording",
+    )
+    ap.add_argument(
+        "--tree-dir",
+        type=Path,
+        default=None,
+        help="Use (or generate) the tree in this directory instead of a temp directory",
+    )
+    ap.add_argument("--skip-monitor", action="store_true")
+    ap.add_argument("--output", type=Path, default=None, help="Defaults to stdout")
+    return vars(ap.parse_args())
+
+
+def main(args: dict[str, Any]) -> dict[str, Any]:
+    spec = get_tree_spec(args)
+    with tempfile.TemporaryDirectory(prefix="feed-service-benchmark-") as temp_dir:
+        root: Path = args["tree_dir"] or Path(temp_dir)
+        if not any(root.glob("*/metadata.yml")):
+            start = time.perf_counter()
+            generate_tree(root, spec)
+            print(
+                f"Tree generated in {time.perf_counter() - start:.1f} seconds",
+                file=sys.stderr,
+            )
+
+        results: dict[str, Any] = {
+            "commit": _get_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tree": asdict(spec),
+            "results": benchmark_feed_generation(root, args["repeat"]),
+        }
+
+        if not args["skip_monitor"]:
+            monitor_configs = {
+                "polling": MonitorConfig(),
+                "adaptive_polling": MonitorConfig(adaptive_polling=True),
+            }
+            for name, monitor_config in monitor_configs.items():
+                print(f"Benchmarking monitor: {name}", file=sys.stderr)
+                results["results"][f"monitor_{name}"] = benchmark_monitor(
+                    root,
+                    monitor_config,
+                    CompletionConfig(),
+                    args["idle_seconds"],
+                    args["latency_samples"],
+                    args["write_count"],
+                    args["write_interval"],
+                )
+    return results
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    output = json.dumps(main(args), indent=2)
+    if args["output"] is not None:
+        args["output"].write_text(output + "\n")
+    else:
+        print(output)
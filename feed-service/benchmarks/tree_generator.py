@@ -0,0 +1,103 @@
+import argparse
+import os
+import random
+import uuid
+from dataclasses import dataclass, fields
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+# Non-episode files found next to recordings (ignored by the feed-service, but listed/stat'ed by it)
+_NOISE_FILE_NAMES = ("cover.jpg", "notes.txt", "playlist.m3u", ".DS_Store")
+
+
+@dataclass(frozen=True)
+class TreeSpec:
+    podcasts: int = 10
+    episodes_per_podcast: int = 100
+    file_size_bytes: int = 50 * 1024 * 1024
+    # Sizes are spread uniformly within +-jitter
+    file_size_jitter: float = 0.2
+    # Share of episodes stored as .mp4 instead of .mp3
+    mp4_ratio: float = 0.1
+    # Non-episode files per podcast directory
+    noise_files_per_podcast: int = 2
+    # Depth of a chain of nested directories (with noise files) in each podcast directory
+    nested_noise_depth: int = 0
+    seed: int = 0
+
+
+# Generates a recording tree as written by the recording-service:
+# <root>/<podcast>/metadata.yml and <root>/<podcast>/<date>--<start>-<end>--<title>--<uuid>.<ext>
+# Episode files are sparse, i.e. their size does not take up disk space
+def generate_tree(root: Path, spec: TreeSpec) -> None:
+    rng = random.Random(spec.seed)
+    root.mkdir(parents=True, exist_ok=True)
+    first_date = date(2020, 1, 1)
+
+    for podcast_index in range(spec.podcasts):
+        podcast_id = f"podcast-{podcast_index:05d}"
+        podcast_dir = root / podcast_id
+        podcast_dir.mkdir(exist_ok=True)
+        with open(podcast_dir / "metadata.yml", "w") as f:
+            yaml.dump(
+                {
+                    "title": podcast_id,
+                    "description": f"Synthetic podcast {podcast_index}",
+                },
+                f,
+            )
+
+        start_hour = rng.randrange(0, 23)
+        for episode_index in range(spec.episodes_per_podcast):
+            episode_date = first_date + timedelta(days=episode_index)
+            extension = "mp4" if rng.random() < spec.mp4_ratio else "mp3"
+            episode_uuid = uuid.UUID(int=rng.getrandbits(128), version=4)
+            file_name = f"{episode_date.isoformat()}--{start_hour:02d}00-{start_hour + 1:02d}00--{podcast_id}--{episode_uuid}.{extension}"
+            size = int(
+                spec.file_size_bytes
+                * (1 + rng.uniform(-spec.file_size_jitter, spec.file_size_jitter))
+            )
+            with open(podcast_dir / file_name, "wb") as f:
+                f.truncate(max(size, 1))
+
+        for noise_index in range(spec.noise_files_per_podcast):
+            noise_name = _NOISE_FILE_NAMES[noise_index % len(_NOISE_FILE_NAMES)]
+            (podcast_dir / f"{noise_index}-{noise_name}").write_bytes(b"noise")
+
+        nested_dir = podcast_dir
+        for depth in range(spec.nested_noise_depth):
+            nested_dir = nested_dir / f"nested-{depth}"
+            nested_dir.mkdir(exist_ok=True)
+            (nested_dir / "notes.txt").write_bytes(b"noise")
+
+
+# Adds an option per TreeSpec field, e.g. '--episodes-per-podcast'
+def add_tree_spec_arguments(ap: argparse.ArgumentParser) -> None:
+    default = TreeSpec()
+    for spec_field in fields(TreeSpec):
+        value: Any = getattr(default, spec_field.name)
+        value_type = float if isinstance(value, float) else int
+        ap.add_argument(
+            f"--{spec_field.name.replace('_', '-')}", type=value_type, default=value
+        )
+
+
+def get_tree_spec(args: dict[str, Any]) -> TreeSpec:
+    return TreeSpec(**{f.name: args[f.name] for f in fields(TreeSpec)})
+
+
+def _parse_args() -> tuple[Path, TreeSpec]:
+    ap = argparse.ArgumentParser(description="Generates a synthetic recording tree")
+    ap.add_argument("root", type=Path, help="Directory to generate the tree in")
+    add_tree_spec_arguments(ap)
+    args = vars(ap.parse_args())
+    return args["root"], get_tree_spec(args)
+
+
+if __name__ == "__main__":
+    root, spec = _parse_args()
+    generate_tree(root, spec)
+    print(f"Generated {spec.podcasts} podcast(s) in {os.path.abspath(root)}")
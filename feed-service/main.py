@@ -1,4 +1,7 @@
 import logging
+import signal
+from types import FrameType
+from typing import Optional
 
 from src import config, dependency_resolver, utils
 from src.config import AppConfig
@@ -9,20 +12,52 @@ logger = logging.getLogger(__name__)
 def main(app_config: AppConfig):
     deps = dependency_resolver.resolve(app_config)
     dependency_resolver.run_startup_checks(deps)
+    # Toggle profiling without restart: kill -USR1 <pid>
+    if hasattr(signal, "SIGUSR1"):
+
+        def toggle_profiling(signal_number: int, frame: Optional[FrameType]):
+            deps.profiler.toggle()
+
+        signal.signal(signal.SIGUSR1, toggle_profiling)
     if app_config.should_update_feeds_on_startup:
         logger.info("Updating podcast feeds on startup")
         deps.usecase.generate_feeds()
 
+    if deps.retention_worker is not None:
+        deps.retention_worker.start()
+    if deps.http_server is not None:
+        deps.http_server.start()
+    if deps.metrics_server is not None:
+        deps.metrics_server.start()
+    if deps.metrics_logger is not None:
+        deps.metrics_logger.start()
     deps.directory_monitor.start()
 
 
+# Logs the episodes that would be removed by the retention limits, without removing anything
+def report_retention(app_config: AppConfig):
+    deps = dependency_resolver.resolve(app_config)
+    removals = deps.retention_service.create_report()
+    for removal in removals:
+        logger.info(
+            f"Would remove '{removal.podcast_id}/{removal.episode.file_name}' ({removal.episode.file_size_bytes} bytes): {removal.reason}"
+        )
+    total_bytes = sum(removal.episode.file_size_bytes for removal in removals)
+    logger.info(
+        f"Retention report: {len(removals)} episode(s) ({total_bytes} bytes) would be removed"
+    )
+
+
 if __name__ == "__main__":
     # utils.setup_logging()
     utils.setup_logging(logging.DEBUG)
     try:
-        config_file_path = utils.get_config_path_from_args()
-        app_config = config.YamlConfigParser().parse(config_file_path)
-        main(app_config)
+        args = utils.get_args()
+        app_config = config.YamlConfigParser().parse(args["config"])
+        if args["retention_report"]:
+            report_retention(app_config)
+        else:
+            main(app_config)
     except KeyboardInterrupt:
         pass
     except Exception as e:
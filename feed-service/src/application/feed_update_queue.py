@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from src.metrics import FeedMetrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingUpdate:
+    is_running: bool = False
+    # Set if an update was requested while the feed was being generated -> generate once more afterwards
+    is_dirty: bool = False
+    # Monotonic time of the earliest change not yet covered by a started update
+    changed_at: Optional[float] = None
+
+
+# Work queue for feed updates keyed by podcast id:
+# - Requests for a podcast that is already queued are coalesced into the queued update
+# - Only one update per podcast runs at a time. A request arriving while the update is running marks it dirty, causing exactly one rerun
+# - Updates of different podcasts run in parallel on a pool of worker threads
+class FeedUpdateQueue:
+    def __init__(
+        self,
+        update_feed: Callable[[str], Any],
+        max_parallel_updates: int = 4,
+        metrics: Optional[FeedMetrics] = None,
+    ) -> None:
+        super().__init__()
+        self._update_feed = update_feed
+        self._metrics = metrics
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_parallel_updates, thread_name_prefix="feed-update"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[str, _PendingUpdate] = {}  # Podcast id -> pending update
+
+    # Requests an update of the feed for the given podcast. 'changed_at' is the monotonic time of the change requiring the update (for metrics)
+    def submit(self, podcast_id: str, changed_at: Optional[float] = None) -> None:
+        with self._lock:
+            pending = self._pending.get(podcast_id)
+            if pending is None:
+                pending = self._pending[podcast_id] = _PendingUpdate()
+                self._executor.submit(self._run, podcast_id)
+            elif pending.is_running:
+                logger.debug(
+                    f"Feed update for podcast '{podcast_id}' in progress, will rerun once done"
+                )
+                pending.is_dirty = True
+            else:
+                logger.debug(
+                    f"Feed update for podcast '{podcast_id}' already queued, request coalesced"
+                )
+
+            if changed_at is not None and (
+                pending.changed_at is None or changed_at < pending.changed_at
+            ):
+                pending.changed_at = changed_at
+
+    # Number of podcasts with a queued or running update
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # Waits for queued updates to finish and stops the worker threads
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _run(self, podcast_id: str) -> None:
+        while True:
+            with self._lock:
+                pending = self._pending[podcast_id]
+                pending.is_running = True
+                pending.is_dirty = False
+                changed_at, pending.changed_at = pending.changed_at, None
+
+            try:
+                self._update_feed(podcast_id)
+                if changed_at is not None and self._metrics is not None:
+                    self._metrics.event_to_publish_seconds.observe(
+                        time.monotonic() - changed_at
+                    )
+            except Exception as e:
+                logger.exception(
+                    f"Failed to update feed for podcast '{podcast_id}': {e}"
+                )
+
+            with self._lock:
+                if not pending.is_dirty:
+                    del self._pending[podcast_id]
+                    return
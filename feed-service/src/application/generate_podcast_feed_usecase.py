@@ -1,20 +1,36 @@
 import logging
+import time
 from pathlib import Path
+from typing import Optional
 
-from src.domain.models import Podcast
+from src.application.retention_service import EpisodeRetentionService
+from src.domain.models import FeedPage, Podcast
 from src.infra.repository import FileSystemPodcastRepository
 from src.infra.rss_feed_adapter import RssFeedAdapter
+from src.metrics import FeedMetrics
+from src.profiling import Profiler
 
 logger = logging.getLogger(__name__)
 
 
 class GeneratePodcastFeedUseCase:
     def __init__(
-        self, repo: FileSystemPodcastRepository, generator: RssFeedAdapter
+        self,
+        repo: FileSystemPodcastRepository,
+        generator: RssFeedAdapter,
+        page_size: Optional[int] = None,  # If set, feeds are paged (RFC 5005)
+        # If set, episodes exceeding the retention limits are removed before generating the feed
+        retention: Optional[EpisodeRetentionService] = None,
+        profiler: Optional[Profiler] = None,
+        metrics: Optional[FeedMetrics] = None,
     ) -> None:
         super().__init__()
         self._repo = repo
         self.generator = generator
+        self._page_size = page_size
+        self._retention = retention
+        self._profiler = profiler
+        self._metrics = metrics
 
     # Generates podcast feed .rss files for ALL podcasts located in the given base directory
     def generate_feeds(self) -> list[Path]:
@@ -23,7 +39,8 @@ class GeneratePodcastFeedUseCase:
         feed_paths: list[Path] = []
 
         # Get podcast feed for all podcasts
-        for podcast in self._repo.get_all():
+        for podcast_id in self._repo.get_ids():
+            podcast = self._load_podcast(podcast_id)
             feed_path = self._generate_and_save_feed(podcast)
             feed_paths.append(feed_path)
 
@@ -33,14 +50,126 @@ class GeneratePodcastFeedUseCase:
     # Generates podcast feed .rss file for the podcast located in the given directory
     def generate_feed(self, podcast_id: str) -> Path:
         logger.info(f"Updating podcast feed for podcast '{podcast_id}'")
-        podcast = self._repo.get(podcast_id)
+        podcast = self._load_podcast(podcast_id)
         feed_path = self._generate_and_save_feed(podcast)
         return feed_path
 
+    # Returns the (current page of the) feed for the podcast without saving it.
+    # Episodes exceeding the retention limits are left out but not removed, i.e. the feed is the same as saved on the next feed update
+    def render_feed(self, podcast_id: str) -> bytes:
+        podcast = self._load_podcast(podcast_id)
+        if self._retention is not None:
+            retained = self._retention.get_retained(podcast)
+        else:
+            retained = podcast
+        if self._page_size is not None:
+            pending_removed_count = len(podcast) - len(retained)
+            page = self._get_feed_pages(retained, pending_removed_count)[-1]
+            return self._render(retained, page)
+        return self._render(retained)
+
+    def _load_podcast(self, podcast_id: str) -> Podcast:
+        start = time.perf_counter()
+        podcast = self._repo.get(podcast_id)
+        if self._metrics is not None:
+            self._metrics.scan_seconds.observe(time.perf_counter() - start)
+        return podcast
+
+    # 'pending_removed_count' is the number of episodes left out that retention has not removed yet
+    def _get_feed_pages(
+        self, podcast: Podcast, pending_removed_count: int = 0
+    ) -> list[FeedPage]:
+        assert self._page_size is not None
+        # Episodes removed by retention do not shift the archive pages
+        removed_count = self._repo.get_archive_removed_count(podcast.title)
+        return podcast.get_feed_pages(
+            self._page_size, removed_count + pending_removed_count
+        )
+
+    def _render(self, podcast: Podcast, page: Optional[FeedPage] = None) -> bytes:
+        start = time.perf_counter()
+        feed = self.generator.generate_feed(podcast, page)
+        if self._metrics is not None:
+            self._metrics.render_seconds.observe(
+                time.perf_counter() - start, podcast.file_name
+            )
+            if page is None or page.archive_index is None:
+                self._metrics.feed_size_bytes.set(len(feed), podcast.file_name)
+        return feed
+
     def _generate_and_save_feed(self, podcast: Podcast):
+        start = time.perf_counter()
+        if self._profiler is None:
+            feed_path = self._apply_retention_and_save_feed(podcast)
+        else:
+            with self._profiler.profile(f"feed-{podcast.file_name}"):
+                feed_path = self._apply_retention_and_save_feed(podcast)
+        if self._metrics is not None:
+            self._metrics.update_seconds.observe(
+                time.perf_counter() - start, podcast.file_name
+            )
+        return feed_path
+
+    def _apply_retention_and_save_feed(self, podcast: Podcast):
+        if self._retention is not None:
+            podcast = self._retention.apply(podcast)
+
         logger.info(f"Generating podcast feed for podcast '{podcast.title}'")
-        feed = self.generator.generate_feed(podcast)
+        if self._page_size is not None:
+            return self._generate_and_save_paged_feed(podcast)
+
+        feed = self._render(podcast)
         # Save podcast feed to file
         feed_file_path = self._repo.save_feed(feed, podcast.title)
         logger.info(f"Podcast feed generated: '{feed_file_path}'")
         return feed_file_path
+
+    # Saves missing archive pages and the current feed page. Existing archive pages are never regenerated, unless archived episodes were removed other than by retention
+    def _generate_and_save_paged_feed(self, podcast: Podcast):
+        pages = self._get_feed_pages(podcast)
+        *archive_pages, current_page = pages
+        if self._has_stale_archive_pages(podcast, pages):
+            logger.warning(
+                f"Archived episode(s) of podcast '{podcast.title}' were removed other than by retention, regenerating all archive pages"
+            )
+            self._repo.remove_archive_feeds(podcast.title)
+
+        for page in archive_pages:
+            assert page.archive_index is not None
+            if self._repo.has_archive_feed(podcast.title, page.archive_index):
+                continue
+            archive_feed = self._render(podcast, page)
+            archive_path = self._repo.save_archive_feed(
+                archive_feed, podcast.title, page.archive_index
+            )
+            logger.info(f"Podcast feed archive page generated: '{archive_path}'")
+        if archive_pages:
+            assert self._page_size is not None
+            newest_page = archive_pages[-1]
+            assert newest_page.archive_index is not None
+            self._repo.save_last_archived_episode(
+                podcast.title,
+                newest_page.archive_index * self._page_size,
+                newest_page.episodes[-1].file_name,
+            )
+
+        feed = self._render(podcast, current_page)
+        feed_file_path = self._repo.save_feed(feed, podcast.title)
+        logger.info(
+            f"Podcast feed generated with {len(current_page.episodes)} of {len(podcast)} episode(s): '{feed_file_path}'"
+        )
+        return feed_file_path
+
+    # Whether the saved archive pages no longer match the episodes, e.g. as an episode was deleted manually. Positions of the episodes after a removed episode shift, so the newest archived episode is no longer at its saved position
+    def _has_stale_archive_pages(self, podcast: Podcast, pages: list[FeedPage]) -> bool:
+        last_archived = self._repo.get_last_archived_episode(podcast.title)
+        if last_archived is None:
+            return False
+        position, file_name = last_archived
+        # The pages hold all episodes (oldest first), starting after the removed ones
+        episodes = [episode for page in pages for episode in page.episodes]
+        index = position - self._repo.get_archive_removed_count(podcast.title) - 1
+        if index < 0:
+            # All archived episodes were removed by retention
+            return False
+        return index >= len(episodes) or episodes[index].file_name != file_name
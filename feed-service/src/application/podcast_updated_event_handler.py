@@ -1,17 +1,18 @@
 import logging
 
-from src.application.generate_podcast_feed_usecase import GeneratePodcastFeedUseCase
+from src.application.feed_update_queue import FeedUpdateQueue
 from src.domain.models import PodcastUpdatedEvent
 
 logger = logging.getLogger(__name__)
 
 
+# Queues a feed update for the podcast of the changed episode. Updates for the same podcast are coalesced by the queue
 class PodcastUpdatedEventHandler:
-    def __init__(self, usecase: GeneratePodcastFeedUseCase) -> None:
+    def __init__(self, update_queue: FeedUpdateQueue) -> None:
         super().__init__()
-        self.usecase = usecase
+        self.update_queue = update_queue
 
     def handle(self, event: PodcastUpdatedEvent):
         logger.debug(f"Podcast updated event received for podcast '{event.episode_id}'")
         podcast_id = event.episode_id.parent.name
-        self.usecase.generate_feed(podcast_id)
+        self.update_queue.submit(podcast_id, changed_at=event.changed_at)
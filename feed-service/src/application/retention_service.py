@@ -0,0 +1,276 @@
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from src.application.feed_update_queue import FeedUpdateQueue
+from src.domain.models import Podcast, PodcastEpisode, RetentionPolicy
+from src.infra.repository import FileSystemPodcastRepository
+
+logger = logging.getLogger(__name__)
+
+
+# An episode to be removed by the retention policy
+@dataclass(frozen=True)
+class EpisodeRemoval:
+    podcast_id: str
+    episode: PodcastEpisode
+    reason: str
+
+
+# Episode as accounted for in the total storage budget
+@dataclass(frozen=True)
+class _EpisodeUsage:
+    sort_key: tuple[datetime, str]
+    file_name: str
+    size_bytes: int
+
+
+# Decides which episodes to remove based on the retention limits and removes them:
+# - Per podcast limits (max episodes, max age, max bytes) from the config, overridden by the podcast metadata
+# - A total storage budget for all podcasts, removing the oldest episodes across all podcasts first
+# The storage used by each podcast is cached when the podcast is checked, i.e. the total is based on the last check of each podcast and podcasts never checked are not accounted for.
+class EpisodeRetentionService:
+    def __init__(
+        self,
+        repo: FileSystemPodcastRepository,
+        default_policy: RetentionPolicy,
+        max_total_bytes: Optional[int] = None,
+        archive_dir: Optional[Path] = None,  # Removed episodes are deleted if None
+        dry_run: bool = False,
+        page_size: Optional[int] = None,  # Page size of paged feeds, if paged
+    ) -> None:
+        super().__init__()
+        self._repo = repo
+        self._default_policy = default_policy
+        self._max_total_bytes = max_total_bytes
+        self._archive_dir = archive_dir
+        self._dry_run = dry_run
+        self._page_size = page_size
+        self._lock = threading.Lock()
+        # Podcast id -> episodes kept after applying the podcast limits, newest first
+        self._usage: dict[str, list[_EpisodeUsage]] = {}
+
+    @property
+    def is_dry_run(self) -> bool:
+        return self._dry_run
+
+    # Returns the episodes of the podcast to be removed, oldest first
+    def get_removals(self, podcast: Podcast) -> list[EpisodeRemoval]:
+        expired, kept = self._update_usage(podcast)
+        with self._lock:
+            over_budget = self._get_over_budget_file_names().get(
+                podcast.file_name, set()
+            )
+        return self._create_removals(podcast, expired, kept, over_budget)
+
+    # Applies the podcast limits and caches the storage used by the kept episodes. Returns the expired episodes (oldest first) and the kept episodes (newest first)
+    def _update_usage(
+        self, podcast: Podcast
+    ) -> tuple[list[tuple[PodcastEpisode, str]], list[PodcastEpisode]]:
+        policy = self._default_policy.override_with(podcast.retention_policy)
+        expired = policy.get_expired_episodes(
+            podcast.episodes, datetime.now(timezone.utc)
+        )
+        expired_file_names = {episode.file_name for episode, _ in expired}
+
+        kept = sorted(
+            (e for e in podcast.episodes if e.file_name not in expired_file_names),
+            key=lambda e: (e.date, e.file_name),
+            reverse=True,
+        )
+        with self._lock:
+            self._usage[podcast.file_name] = [
+                _EpisodeUsage((e.date, e.file_name), e.file_name, e.file_size_bytes)
+                for e in kept
+            ]
+        return expired, kept
+
+    def _create_removals(
+        self,
+        podcast: Podcast,
+        expired: list[tuple[PodcastEpisode, str]],
+        kept: list[PodcastEpisode],
+        over_budget: set[str],
+    ) -> list[EpisodeRemoval]:
+        removals = [
+            EpisodeRemoval(podcast.file_name, episode, reason)
+            for episode, reason in expired
+        ]
+        removals.extend(
+            EpisodeRemoval(
+                podcast.file_name,
+                episode,
+                f"exceeds total budget of {self._max_total_bytes} bytes",
+            )
+            for episode in reversed(kept)
+            if episode.file_name in over_budget
+        )
+        return removals
+
+    # Returns the podcast as 'apply' leaves it, without removing anything (e.g. to render the feed on request)
+    def get_retained(self, podcast: Podcast) -> Podcast:
+        if self._dry_run:
+            return podcast
+        return self._without_removals(podcast, self.get_removals(podcast))
+
+    # Removes the episodes exceeding the retention limits. Returns the podcast with the remaining episodes.
+    # In dry run mode, removals are only logged and the podcast is returned unchanged
+    def apply(self, podcast: Podcast) -> Podcast:
+        removals = self.get_removals(podcast)
+        if not removals:
+            return podcast
+
+        if self._dry_run:
+            for removal in removals:
+                logger.info(
+                    f"[Dry run] Would remove episode '{removal.episode.file_name}' of podcast '{podcast.file_name}': {removal.reason}"
+                )
+            return podcast
+
+        logger.info(
+            f"Removing {len(removals)} episode(s) of podcast '{podcast.file_name}' exceeding the retention limits"
+        )
+        self._repo.remove_episodes(
+            podcast, [removal.episode for removal in removals], self._archive_dir
+        )
+        if self._page_size is not None:
+            self._remove_archive_pages(podcast, len(removals), self._page_size)
+
+        return self._without_removals(podcast, removals)
+
+    def _without_removals(
+        self, podcast: Podcast, removals: list[EpisodeRemoval]
+    ) -> Podcast:
+        if not removals:
+            return podcast
+        removed_file_names = {removal.episode.file_name for removal in removals}
+        return replace(
+            podcast,
+            episodes=[
+                e for e in podcast.episodes if e.file_name not in removed_file_names
+            ],
+        )
+
+    # Returns the episodes to be removed for all podcasts without removing anything
+    def create_report(self) -> list[EpisodeRemoval]:
+        # Account for all podcasts first, so the total budget is based on the current usage
+        usages = [
+            (podcast, *self._update_usage(podcast)) for podcast in self._repo.get_all()
+        ]
+        with self._lock:
+            over_budget = self._get_over_budget_file_names()
+
+        removals: list[EpisodeRemoval] = []
+        for podcast, expired, kept in usages:
+            removals.extend(
+                self._create_removals(
+                    podcast, expired, kept, over_budget.get(podcast.file_name, set())
+                )
+            )
+        return removals
+
+    # Removes the archive pages whose episodes are (partially) removed. The removed episodes are always the oldest ones (see RetentionPolicy.get_expired_episodes), i.e. the other pages keep their indices and are left untouched.
+    # The oldest remaining page is regenerated with the remaining episodes on the next feed update (see Podcast.get_feed_pages)
+    def _remove_archive_pages(
+        self, podcast: Podcast, removal_count: int, page_size: int
+    ) -> None:
+        removed_count = (
+            self._repo.get_archive_removed_count(podcast.title) + removal_count
+        )
+        self._repo.save_archive_removed_count(podcast.title, removed_count)
+        # The pages holding no episodes anymore and the page holding the oldest remaining episode, which also no longer links to a previous page
+        self._repo.remove_archive_feeds(
+            podcast.title, max_index=removed_count // page_size + 1
+        )
+
+    # Drops the cached usage of podcasts that no longer exist
+    def retain_podcasts(self, podcast_ids: list[str]) -> None:
+        with self._lock:
+            for podcast_id in set(self._usage) - set(podcast_ids):
+                del self._usage[podcast_id]
+
+    # Returns the file names of episodes exceeding the total budget by podcast id. Each podcast keeps its newest episode
+    def _get_over_budget_file_names(self) -> dict[str, set[str]]:
+        over_budget: dict[str, set[str]] = {}
+        if self._max_total_bytes is None:
+            return over_budget
+
+        all_usage = [
+            (usage.sort_key, i == 0, usage, usage_podcast_id)
+            for usage_podcast_id, usages in self._usage.items()
+            for i, usage in enumerate(usages)
+        ]
+        all_usage.sort(key=lambda item: item[0], reverse=True)
+
+        total_bytes = 0
+        for _, is_newest, usage, usage_podcast_id in all_usage:
+            total_bytes += usage.size_bytes
+            if total_bytes > self._max_total_bytes and not is_newest:
+                over_budget.setdefault(usage_podcast_id, set()).add(usage.file_name)
+        return over_budget
+
+
+# Checks one podcast at a time (round robin) in the background and queues a feed update for podcasts with episodes to remove.
+# The episodes are removed as part of the feed update, so the feed is regenerated in the same pass
+class RetentionWorker:
+    def __init__(
+        self,
+        repo: FileSystemPodcastRepository,
+        retention_service: EpisodeRetentionService,
+        update_queue: FeedUpdateQueue,
+        check_interval: float,  # Seconds between checking two podcasts
+    ) -> None:
+        super().__init__()
+        self._repo = repo
+        self._retention_service = retention_service
+        self._update_queue = update_queue
+        self._check_interval = check_interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        logger.info(
+            f"Starting retention worker (checking a podcast every {self._check_interval} seconds)"
+        )
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        podcast_ids: deque[str] = deque()
+        while not self._stop_event.wait(self._check_interval):
+            try:
+                if not podcast_ids:
+                    # Start a new round
+                    ids = self._repo.get_ids()
+                    self._retention_service.retain_podcasts(ids)
+                    podcast_ids.extend(ids)
+                    if not podcast_ids:
+                        continue
+
+                self._check(podcast_ids.popleft())
+            except Exception as e:
+                logger.exception(f"Retention check failed: {e}")
+
+    def _check(self, podcast_id: str) -> None:
+        podcast = self._repo.get(podcast_id)
+        removals = self._retention_service.get_removals(podcast)
+        if not removals:
+            return
+
+        logger.debug(
+            f"{len(removals)} episode(s) of podcast '{podcast_id}' exceed the retention limits"
+        )
+        if self._retention_service.is_dry_run:
+            # Only log, no need to update the feed
+            self._retention_service.apply(podcast)
+        else:
+            self._update_queue.submit(podcast_id)
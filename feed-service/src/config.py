@@ -1,13 +1,14 @@
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import yaml
 
 import src.utils as utils
-from src.domain.models import ValidUrl
+from src.domain.models import RetentionPolicy, ValidUrl
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +17,145 @@ class ConfigError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class MonitorConfig:
+    # Whether to poll directories with recent writes more often than inactive directories (e.g. for NFS/SMB mounts)
+    adaptive_polling: bool = False
+    hot_poll_interval: timedelta = timedelta(seconds=1)
+    cold_poll_interval: timedelta = timedelta(minutes=1)
+    # How long a directory is considered hot after the last detected change
+    hot_period: timedelta = timedelta(minutes=10)
+    max_stats_per_second: int = 1000
+
+    def __post_init__(self):
+        if self.max_stats_per_second <= 0:
+            raise ValueError("Max stats per second must be positive")
+        if self.hot_poll_interval > self.cold_poll_interval:
+            raise ValueError(
+                "Hot poll interval cannot be longer than cold poll interval"
+            )
+
+
+@dataclass(frozen=True)
+class CompletionConfig:
+    # A file change is published when the file has not changed for this long, regardless of the completion checks below
+    debounce_time: timedelta = timedelta(minutes=5)
+    # Whether to publish as soon as a file is detected to be complete (instead of always waiting for the debounce time)
+    detect_completion: bool = True
+    # Bounds of the adaptive window a file must be unchanged for to be considered complete
+    min_stable_time: timedelta = timedelta(seconds=5)
+    max_stable_time: timedelta = timedelta(minutes=2)
+    # Consider a file complete once no process has it open for writing (requires the recorder to run in the same PID namespace, i.e. not in another container)
+    check_open_handles: bool = False
+    # Shorten the window if the file ends with a complete audio frame
+    check_audio_trailer: bool = True
+
+    def __post_init__(self):
+        if self.min_stable_time > self.max_stable_time:
+            raise ValueError("Min stable time cannot be longer than max stable time")
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    # Whether to remove episodes exceeding the retention limits
+    enabled: bool = False
+    # Limits applied to all podcasts. Overridden per podcast by the 'retention' section of its metadata.yml
+    default_policy: RetentionPolicy = field(default_factory=RetentionPolicy)
+    # Max total size of the episodes of all podcasts. The oldest episodes across all podcasts are removed first
+    max_total_bytes: Optional[int] = None
+    # Directory removed episodes are moved to. Episodes are deleted if not set
+    archive_dir: Optional[Path] = None
+    # Only log the episodes that would be removed
+    dry_run: bool = False
+    # Time between checking two podcasts. Podcasts are checked one at a time in turn
+    check_interval: timedelta = timedelta(seconds=30)
+
+    def __post_init__(self):
+        if self.max_total_bytes is not None and self.max_total_bytes <= 0:
+            raise ValueError("Max total bytes must be positive")
+        if self.check_interval <= timedelta(0):
+            raise ValueError("Check interval must be positive")
+
+
+@dataclass(frozen=True)
+class HttpServerConfig:
+    # Whether to serve feeds and episodes with the built-in HTTP server (instead of a separate web server)
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    port: int = 8080
+    # Connections above this limit are rejected
+    max_connections: int = 1024
+    # Idle keep-alive connections are closed after this time
+    keep_alive_timeout: timedelta = timedelta(seconds=15)
+    # Render feed.rss on request (cached until the podcast changes) instead of serving the feed file, which is only updated once a changed file is complete
+    render_feeds_on_demand: bool = False
+    # Memory limit of the cache of rendered feeds
+    render_cache_max_bytes: int = 64 * 1024 * 1024
+
+    def __post_init__(self):
+        if not 0 < self.port < 65536:
+            raise ValueError(f"Invalid port: {self.port}")
+        if self.max_connections <= 0:
+            raise ValueError("Max connections must be positive")
+        if self.render_cache_max_bytes <= 0:
+            raise ValueError("Render cache max bytes must be positive")
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    # Whether to profile feed updates from startup. Can be toggled at runtime by sending SIGUSR1 to the process
+    enabled: bool = False
+    output_dir: Path = Path("profiles")
+    # Number of profiled runs to keep in the output directory
+    max_runs: int = 50
+
+    def __post_init__(self):
+        if self.max_runs <= 0:
+            raise ValueError("Max runs must be positive")
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    # Whether to serve metrics in the Prometheus text format on http://<host>:<port>/metrics
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9103
+    # Interval of logging a summary of the metrics as a JSON line. Not logged if not set
+    log_interval: Optional[timedelta] = None
+
+    def __post_init__(self):
+        if not 0 < self.port < 65536:
+            raise ValueError(f"Invalid port: {self.port}")
+        if self.log_interval is not None and self.log_interval <= timedelta(0):
+            raise ValueError("Log interval must be positive")
+
+
 @dataclass(frozen=True)
 class AppConfig:
     base_dir: Path
     base_url: ValidUrl
     should_update_feeds_on_startup: bool = False
+    max_parallel_feed_updates: int = 4
+    # If set, feeds only contain the newest episodes and older episodes are moved to archive pages of this size (RFC 5005)
+    feed_page_size: Optional[int] = None
+    monitor: MonitorConfig = field(default_factory=MonitorConfig)
+    completion: CompletionConfig = field(default_factory=CompletionConfig)
+    retention: RetentionConfig = field(default_factory=RetentionConfig)
+    http_server: HttpServerConfig = field(default_factory=HttpServerConfig)
+    profiling: ProfilingConfig = field(default_factory=ProfilingConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+
+    def __post_init__(self):
+        if self.max_parallel_feed_updates <= 0:
+            raise ValueError("Max parallel feed updates must be positive")
+        if self.feed_page_size is not None and self.feed_page_size <= 0:
+            raise ValueError("Feed page size must be positive")
+        # Any directory in the base directory is considered a podcast
+        archive_dir = self.retention.archive_dir
+        if archive_dir is not None and archive_dir.is_relative_to(self.base_dir):
+            raise ValueError(
+                "Retention archive directory cannot be inside the base directory"
+            )
 
 
 class YamlConfigParser:
@@ -60,7 +195,149 @@ class YamlConfigParser:
             should_update_feeds_on_startup = data.get(
                 "should_update_feeds_on_startup", False
             )
+            max_parallel_feed_updates = int(data.get("max_parallel_feed_updates", 4))
+            feed_page_size = self._parse_optional_int(data, "feed_page_size")
+            monitor = self._parse_monitor(data.get("monitor", {}))
+            completion = self._parse_completion(data.get("completion", {}))
+            retention = self._parse_retention(data.get("retention", {}))
+            http_server = self._parse_http_server(data.get("http_server", {}))
+            profiling = self._parse_profiling(data.get("profiling", {}))
+            metrics = self._parse_metrics(data.get("metrics", {}))
+
+            # Validated on construction (see __post_init__)
+            return AppConfig(
+                base_dir,
+                base_url,
+                should_update_feeds_on_startup,
+                max_parallel_feed_updates,
+                feed_page_size,
+                monitor,
+                completion,
+                retention,
+                http_server,
+                profiling,
+                metrics,
+            )
         except KeyError as e:
             raise ConfigError(f"Missing key: {e}") from e
+        except (ValueError, TypeError) as e:
+            raise ConfigError(f"Invalid value: {e}") from e
+
+    # Parses the optional monitor section. Missing keys fall back to defaults
+    def _parse_monitor(self, data: dict[str, Any]) -> MonitorConfig:
+        default = MonitorConfig()
+        return MonitorConfig(
+            adaptive_polling=data.get("adaptive_polling", default.adaptive_polling),
+            hot_poll_interval=self._parse_seconds(
+                data, "hot_poll_interval_seconds", default.hot_poll_interval
+            ),
+            cold_poll_interval=self._parse_seconds(
+                data, "cold_poll_interval_seconds", default.cold_poll_interval
+            ),
+            hot_period=self._parse_seconds(
+                data, "hot_period_seconds", default.hot_period
+            ),
+            max_stats_per_second=int(
+                data.get("max_stats_per_second", default.max_stats_per_second)
+            ),
+        )
+
+    # Parses the optional completion section. Missing keys fall back to defaults
+    def _parse_completion(self, data: dict[str, Any]) -> CompletionConfig:
+        default = CompletionConfig()
+        return CompletionConfig(
+            debounce_time=self._parse_seconds(
+                data, "debounce_seconds", default.debounce_time
+            ),
+            detect_completion=data.get("detect_completion", default.detect_completion),
+            min_stable_time=self._parse_seconds(
+                data, "min_stable_seconds", default.min_stable_time
+            ),
+            max_stable_time=self._parse_seconds(
+                data, "max_stable_seconds", default.max_stable_time
+            ),
+            check_open_handles=data.get(
+                "check_open_handles", default.check_open_handles
+            ),
+            check_audio_trailer=data.get(
+                "check_audio_trailer", default.check_audio_trailer
+            ),
+        )
+
+    # Parses the optional retention section. Missing keys fall back to defaults
+    def _parse_retention(self, data: dict[str, Any]) -> RetentionConfig:
+        default = RetentionConfig()
+        max_age_days = data.get("max_age_days", None)
+        archive_dir = data.get("archive_dir", None)
+        return RetentionConfig(
+            enabled=data.get("enabled", default.enabled),
+            default_policy=RetentionPolicy(
+                max_episodes=self._parse_optional_int(data, "max_episodes"),
+                max_age=(
+                    timedelta(days=float(max_age_days))
+                    if max_age_days is not None
+                    else None
+                ),
+                max_bytes=self._parse_optional_int(data, "max_bytes"),
+            ),
+            max_total_bytes=self._parse_optional_int(data, "max_total_bytes"),
+            archive_dir=Path(archive_dir).resolve() if archive_dir else None,
+            dry_run=data.get("dry_run", default.dry_run),
+            check_interval=self._parse_seconds(
+                data, "check_interval_seconds", default.check_interval
+            ),
+        )
+
+    # Parses the optional http_server section. Missing keys fall back to defaults
+    def _parse_http_server(self, data: dict[str, Any]) -> HttpServerConfig:
+        default = HttpServerConfig()
+        return HttpServerConfig(
+            enabled=data.get("enabled", default.enabled),
+            host=data.get("host", default.host),
+            port=int(data.get("port", default.port)),
+            max_connections=int(data.get("max_connections", default.max_connections)),
+            keep_alive_timeout=self._parse_seconds(
+                data, "keep_alive_timeout_seconds", default.keep_alive_timeout
+            ),
+            render_feeds_on_demand=data.get(
+                "render_feeds_on_demand", default.render_feeds_on_demand
+            ),
+            render_cache_max_bytes=int(
+                data.get("render_cache_max_bytes", default.render_cache_max_bytes)
+            ),
+        )
+
+    # Parses the optional profiling section. Missing keys fall back to defaults
+    def _parse_profiling(self, data: dict[str, Any]) -> ProfilingConfig:
+        default = ProfilingConfig()
+        return ProfilingConfig(
+            enabled=data.get("enabled", default.enabled),
+            output_dir=Path(data.get("output_dir", default.output_dir)).resolve(),
+            max_runs=int(data.get("max_runs", default.max_runs)),
+        )
+
+    # Parses the optional metrics section. Missing keys fall back to defaults
+    def _parse_metrics(self, data: dict[str, Any]) -> MetricsConfig:
+        default = MetricsConfig()
+        log_interval_seconds = self._parse_optional_int(data, "log_interval_seconds")
+        return MetricsConfig(
+            enabled=data.get("enabled", default.enabled),
+            host=data.get("host", default.host),
+            port=int(data.get("port", default.port)),
+            log_interval=(
+                timedelta(seconds=log_interval_seconds)
+                if log_interval_seconds is not None
+                else None
+            ),
+        )
+
+    def _parse_optional_int(self, data: dict[str, Any], key: str) -> Optional[int]:
+        value = data.get(key, None)
+        return int(value) if value is not None else None
 
-        return AppConfig(base_dir, base_url, should_update_feeds_on_startup)
+    def _parse_seconds(
+        self, data: dict[str, Any], key: str, default: timedelta
+    ) -> timedelta:
+        if key not in data:
+            return default
+        return timedelta(seconds=float(data[key]))
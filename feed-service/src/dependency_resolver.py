@@ -1,16 +1,31 @@
 import logging
-from datetime import timedelta
-from typing import NamedTuple
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
 
+from src.application.feed_update_queue import FeedUpdateQueue
 from src.application.generate_podcast_feed_usecase import GeneratePodcastFeedUseCase
 from src.application.podcast_updated_event_handler import PodcastUpdatedEventHandler
-from src.config import AppConfig
+from src.application.retention_service import EpisodeRetentionService, RetentionWorker
+from src.config import (
+    AppConfig,
+    CompletionConfig,
+    HttpServerConfig,
+    MetricsConfig,
+    MonitorConfig,
+    RetentionConfig,
+)
+from src.infra.adaptive_polling_observer import AdaptivePollingObserver
+from src.infra.completion_detector import FileCompletionDetector
+from src.infra.feed_render_cache import FeedRenderCache
 from src.infra.file_changed_handler import FileChangedEventHandler
-from src.infra.file_changed_monitor import FileChangedMonitor
+from src.infra.file_changed_monitor import FileChangedMonitor, TimedPollingObserver
 from src.infra.file_parser import PodcastFileNameParser
 from src.infra.file_reader import PodcastFileService
+from src.infra.http_server import PodcastHttpServer
 from src.infra.repository import FileSystemPodcastRepository
 from src.infra.rss_feed_adapter import RssFeedAdapter, UrlGenerator
+from src.metrics import FeedMetrics, MetricsLogger, MetricsServer
+from src.profiling import Profiler
 
 logger = logging.getLogger(__name__)
 
@@ -19,16 +34,25 @@ class Dependencies(NamedTuple):
     repo: FileSystemPodcastRepository
     generator: RssFeedAdapter
     usecase: GeneratePodcastFeedUseCase
+    feed_update_queue: FeedUpdateQueue
     file_service: PodcastFileService
     feed_updated_handler: PodcastUpdatedEventHandler
     file_changed_handler: FileChangedEventHandler
     directory_monitor: FileChangedMonitor
+    retention_service: EpisodeRetentionService
+    retention_worker: Optional[RetentionWorker]  # None if retention is disabled
+    http_server: Optional[PodcastHttpServer]  # None if the HTTP server is disabled
+    profiler: Profiler
+    metrics: FeedMetrics
+    metrics_server: Optional[MetricsServer]  # None if the metrics endpoint is disabled
+    metrics_logger: Optional[MetricsLogger]  # None if metrics are not logged
 
 
 # Resolve deps
 def resolve(app_config: AppConfig):
     parser = PodcastFileNameParser()
-    file_service = PodcastFileService(app_config.base_dir)
+    metrics = FeedMetrics()
+    file_service = PodcastFileService(app_config.base_dir, metrics)
 
     repo = FileSystemPodcastRepository(
         app_config.base_dir,
@@ -39,26 +63,175 @@ def resolve(app_config: AppConfig):
     url_generator = UrlGenerator(app_config.base_url)
     rss_generator = RssFeedAdapter(url_generator)
 
-    usecase = GeneratePodcastFeedUseCase(repo, rss_generator)
-    feed_updated_handler = PodcastUpdatedEventHandler(usecase)
+    retention_service = _create_retention_service(
+        repo, app_config.retention, page_size=app_config.feed_page_size
+    )
+    profiler = Profiler(
+        app_config.profiling.output_dir,
+        app_config.profiling.max_runs,
+        enabled=app_config.profiling.enabled,
+    )
+    usecase = GeneratePodcastFeedUseCase(
+        repo,
+        rss_generator,
+        page_size=app_config.feed_page_size,
+        retention=retention_service if app_config.retention.enabled else None,
+        profiler=profiler,
+        metrics=metrics,
+    )
+    feed_update_queue = FeedUpdateQueue(
+        usecase.generate_feed, app_config.max_parallel_feed_updates, metrics
+    )
+    retention_worker = (
+        RetentionWorker(
+            repo,
+            retention_service,
+            feed_update_queue,
+            app_config.retention.check_interval.total_seconds(),
+        )
+        if app_config.retention.enabled
+        else None
+    )
+    feed_updated_handler = PodcastUpdatedEventHandler(feed_update_queue)
 
-    # On a file change in the feed storage, require 5 minutes without further change to the file before triggering the callback that updates the corresponding podcast feed. This ensures that the podcast feed is not updated before a recording is finished.
-    debounce_time = timedelta(minutes=5)  # TODO: From config
+    # On a file change in the feed storage, wait until the file is complete (or no further changes for the debounce time) before triggering the callback that updates the corresponding podcast feed. This ensures that the podcast feed is not updated before a recording is finished.
     file_changed_handler = FileChangedEventHandler(
-        debounce_time,
+        app_config.completion.debounce_time,
         callback=lambda podcast_update_event: feed_updated_handler.handle(
             podcast_update_event
         ),
+        completion_detector=create_completion_detector(app_config.completion),
+        metrics=metrics,
+    )
+    metrics.set_pending_sources(
+        lambda: file_changed_handler.pending_count,
+        lambda: feed_update_queue.pending_count,
+    )
+    directory_monitor = FileChangedMonitor(
+        app_config.base_dir,
+        file_changed_handler,
+        create_observer(app_config.monitor, metrics),
     )
-    directory_monitor = FileChangedMonitor(app_config.base_dir, file_changed_handler)
     return Dependencies(
         repo,
         rss_generator,
         usecase,
+        feed_update_queue,
         file_service,
         feed_updated_handler,
         file_changed_handler,
         directory_monitor,
+        retention_service,
+        retention_worker,
+        _create_http_server(
+            app_config.http_server,
+            app_config,
+            repo,
+            usecase,
+            file_changed_handler,
+        ),
+        profiler,
+        metrics,
+        _create_metrics_server(app_config.metrics, metrics),
+        (
+            MetricsLogger(metrics, app_config.metrics.log_interval.total_seconds())
+            if app_config.metrics.log_interval is not None
+            else None
+        ),
+    )
+
+
+def _create_metrics_server(metrics_config: MetricsConfig, metrics: FeedMetrics):
+    if not metrics_config.enabled:
+        return None
+    return MetricsServer(metrics, metrics_config.host, metrics_config.port)
+
+
+def _create_http_server(
+    http_server_config: HttpServerConfig,
+    app_config: AppConfig,
+    repo: FileSystemPodcastRepository,
+    usecase: GeneratePodcastFeedUseCase,
+    file_changed_handler: FileChangedEventHandler,
+):
+    if not http_server_config.enabled:
+        return None
+
+    feed_cache = None
+    if http_server_config.render_feeds_on_demand:
+        feed_cache = FeedRenderCache(
+            repo,
+            usecase.render_feed,
+            max_bytes=http_server_config.render_cache_max_bytes,
+            max_parallel_renders=app_config.max_parallel_feed_updates,
+        )
+        # Invalidate on any change of a file in the podcast directory, without waiting for the file to be complete
+        file_changed_handler.add_change_listener(
+            lambda file_path: feed_cache.invalidate(file_path.parent.name)
+        )
+
+    return PodcastHttpServer(
+        app_config.base_dir,
+        host=http_server_config.host,
+        port=http_server_config.port,
+        max_connections=http_server_config.max_connections,
+        keep_alive_timeout=http_server_config.keep_alive_timeout,
+        # Serve the files at the URLs used in the feeds
+        url_path_prefix=urlsplit(app_config.base_url).path,
+        feed_cache=feed_cache,
+    )
+
+
+def _create_retention_service(
+    repo: FileSystemPodcastRepository,
+    retention_config: RetentionConfig,
+    page_size: Optional[int],
+):
+    if retention_config.archive_dir is not None:
+        logger.info(
+            f"Episodes removed by retention are moved to: {retention_config.archive_dir}"
+        )
+    return EpisodeRetentionService(
+        repo,
+        retention_config.default_policy,
+        max_total_bytes=retention_config.max_total_bytes,
+        archive_dir=retention_config.archive_dir,
+        dry_run=retention_config.dry_run,
+        page_size=page_size,
+    )
+
+
+# Returns the completion detector for the file changed handler. None -> changes are published after the debounce time
+def create_completion_detector(completion_config: CompletionConfig):
+    if not completion_config.detect_completion:
+        return None
+
+    return FileCompletionDetector(
+        fallback_time=completion_config.debounce_time,
+        min_stable_time=completion_config.min_stable_time,
+        max_stable_time=completion_config.max_stable_time,
+        check_open_handles=completion_config.check_open_handles,
+        check_audio_trailer=completion_config.check_audio_trailer,
+    )
+
+
+# Returns the observer to use for the directory monitor. None -> default polling observer
+def create_observer(
+    monitor_config: MonitorConfig, metrics: Optional[FeedMetrics] = None
+):
+    on_poll = metrics.poll_seconds.observe if metrics is not None else None
+    if not monitor_config.adaptive_polling:
+        return TimedPollingObserver(on_poll) if on_poll is not None else None
+
+    logger.info(
+        f"Using adaptive polling (hot: {monitor_config.hot_poll_interval}, cold: {monitor_config.cold_poll_interval}, max {monitor_config.max_stats_per_second} stats/sec)"
+    )
+    return AdaptivePollingObserver(
+        hot_interval=monitor_config.hot_poll_interval,
+        cold_interval=monitor_config.cold_poll_interval,
+        hot_period=monitor_config.hot_period,
+        max_stats_per_second=monitor_config.max_stats_per_second,
+        on_poll=on_poll,
     )
 
 
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
@@ -11,6 +11,8 @@ from typing_extensions import override
 @dataclass(frozen=True)
 class PodcastUpdatedEvent:
     episode_id: Path
+    # Monotonic time of the first change of the episode file that led to this event
+    changed_at: Optional[float] = None
 
 
 class ValidUrl(str):
@@ -38,6 +40,82 @@ class PodcastEpisode:
             raise ValueError(f"File size cannot be 0 or negative")
 
 
+# A page of a paged podcast feed (RFC 5005): Either the current (subscription) feed or an immutable archive page
+@dataclass(frozen=True)
+class FeedPage:
+    episodes: list[PodcastEpisode]
+    # Index of the archive page (starting from 1, oldest first). None for the current feed
+    archive_index: Optional[int] = None
+    # Index of the previous (older) archive page. None if there is none
+    prev_archive_index: Optional[int] = None
+
+    @property
+    def is_archive(self) -> bool:
+        return self.archive_index is not None
+
+
+# Limits for the episodes kept of a podcast. Limits that are not set are not applied
+@dataclass(frozen=True)
+class RetentionPolicy:
+    max_episodes: Optional[int] = None
+    max_age: Optional[timedelta] = None
+    max_bytes: Optional[int] = None  # Max total size of the episode files
+
+    def __post_init__(self):
+        if self.max_episodes is not None and self.max_episodes <= 0:
+            raise ValueError("Max episodes must be positive")
+        if self.max_age is not None and self.max_age <= timedelta(0):
+            raise ValueError("Max age must be positive")
+        if self.max_bytes is not None and self.max_bytes <= 0:
+            raise ValueError("Max bytes must be positive")
+
+    @property
+    def has_limits(self) -> bool:
+        return any(
+            limit is not None
+            for limit in (self.max_episodes, self.max_age, self.max_bytes)
+        )
+
+    # Returns a policy where the limits set in the given policy take precedence over the limits of this policy
+    def override_with(self, other: Optional["RetentionPolicy"]) -> "RetentionPolicy":
+        if other is None:
+            return self
+        return RetentionPolicy(
+            max_episodes=other.max_episodes or self.max_episodes,
+            max_age=other.max_age or self.max_age,
+            max_bytes=other.max_bytes or self.max_bytes,
+        )
+
+    # Returns the episodes exceeding any of the limits (oldest first) together with the reason.
+    # The newest episode is always kept, as it might still be recording
+    def get_expired_episodes(
+        self, episodes: list[PodcastEpisode], now: datetime
+    ) -> list[tuple[PodcastEpisode, str]]:
+        newest_first = sorted(
+            episodes, key=lambda e: (e.date, e.file_name), reverse=True
+        )
+        expired: list[tuple[PodcastEpisode, str]] = []
+        total_bytes = 0
+        # All limits grow monotonically from newest to oldest, i.e. the expired episodes are always the oldest ones
+        for count, episode in enumerate(newest_first, start=1):
+            total_bytes += episode.file_size_bytes
+            if count == 1:
+                continue
+
+            if self.max_episodes is not None and count > self.max_episodes:
+                reason = f"exceeds max {self.max_episodes} episode(s)"
+            elif self.max_age is not None and now - episode.date > self.max_age:
+                reason = f"older than {self.max_age.days} day(s)"
+            elif self.max_bytes is not None and total_bytes > self.max_bytes:
+                reason = f"exceeds max {self.max_bytes} bytes"
+            else:
+                continue
+            expired.append((episode, reason))
+
+        expired.reverse()
+        return expired
+
+
 @dataclass(frozen=True)
 class Podcast:
     title: str
@@ -47,6 +125,8 @@ class Podcast:
     # Optional
     description: Optional[str] = None
     image_url: Optional[ValidUrl] = None
+    # Overrides the default retention limits for this podcast
+    retention_policy: Optional[RetentionPolicy] = None
 
     def __len__(self):
         return len(self.episodes)
@@ -55,6 +135,63 @@ class Podcast:
         if not self.title:
             raise ValueError(f"Title cannot be empty")
 
+    # Splits the episodes into archive pages of exactly 'page_size' episodes (oldest first) and a current page (last in list).
+    # The current page holds the newest 'page_size' to 2*'page_size'-1 episodes, so archive pages never change once full.
+    # 'removed_count' is the number of (oldest) episodes removed from the feed so far, e.g. by retention. Pages are anchored to the position of the episodes since the first episode, i.e. the archive pages keep their indices when old episodes are removed. Only the oldest page may then hold less than 'page_size' episodes
+    def get_feed_pages(self, page_size: int, removed_count: int = 0) -> list[FeedPage]:
+        if page_size <= 0:
+            raise ValueError("Page size must be positive")
+        if removed_count < 0:
+            raise ValueError("Removed count cannot be negative")
+
+        # File names start with date and start time
+        episodes = sorted(self.episodes, key=lambda e: (e.date, e.file_name))
+        # Positions are counted from the first episode ever, i.e. including the removed ones
+        total_count = removed_count + len(episodes)
+        archive_page_count = max(total_count // page_size - 1, 0)
+        first_index = removed_count // page_size + 1
+
+        pages: list[FeedPage] = []
+        for index in range(first_index, archive_page_count + 1):
+            start = max((index - 1) * page_size - removed_count, 0)
+            pages.append(
+                FeedPage(
+                    episodes=episodes[start : index * page_size - removed_count],
+                    archive_index=index,
+                    prev_archive_index=index - 1 if index > first_index else None,
+                )
+            )
+
+        pages.append(
+            FeedPage(
+                episodes=episodes[
+                    max(archive_page_count * page_size - removed_count, 0) :
+                ],
+                prev_archive_index=(
+                    archive_page_count if archive_page_count >= first_index else None
+                ),
+            )
+        )
+        return pages
+
+
+# Optional 'retention' section of the metadata file
+class RetentionMetadata(BaseModel):
+    max_episodes: Optional[int] = None
+    max_age_days: Optional[float] = None
+    max_bytes: Optional[int] = None
+
+    def to_policy(self) -> RetentionPolicy:
+        return RetentionPolicy(
+            max_episodes=self.max_episodes,
+            max_age=(
+                timedelta(days=self.max_age_days)
+                if self.max_age_days is not None
+                else None
+            ),
+            max_bytes=self.max_bytes,
+        )
+
 
 # XXX: Currently DTO for infra. Use in Podcast model?
 class PodcastMetadata(BaseModel):
@@ -63,6 +200,7 @@ class PodcastMetadata(BaseModel):
     # Optional
     description: Optional[str] = None
     image_url: Optional[ValidUrl] = None
+    retention: Optional[RetentionMetadata] = None
 
     @validator("image_url", pre=True)
     def validate_image_url(cls, value: str) -> ValidUrl:
@@ -0,0 +1,325 @@
+import heapq
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Optional
+
+from typing_extensions import override
+from watchdog.events import (
+    DirCreatedEvent,
+    DirDeletedEvent,
+    DirModifiedEvent,
+    FileCreatedEvent,
+    FileDeletedEvent,
+    FileModifiedEvent,
+    FileSystemEvent,
+)
+from watchdog.observers.api import BaseObserver, EventEmitter
+
+logger = logging.getLogger(__name__)
+
+
+# Snapshot of a single directory entry as seen on the last poll
+@dataclass(frozen=True)
+class _EntrySnapshot:
+    is_dir: bool
+    size: int
+    mtime_ns: int
+
+
+@dataclass
+class _DirectoryState:
+    # Entry name -> snapshot of the entry
+    entries: dict[str, _EntrySnapshot]
+    mtime_ns: int = 0  # Last known mtime of the directory itself
+    last_activity: float = 0.0  # Monotonic time of the last detected change
+    next_poll: float = 0.0  # Monotonic time when the directory is due for polling
+
+
+# Emitter that polls each directory of the watched tree separately and adapts the poll interval per directory:
+# - Hot directories (changed within 'hot_period') are polled every 'hot_interval'
+# - Cold directories are polled every 'cold_interval', or immediately when the parent directory notices that their mtime changed (i.e. an entry was added, removed or renamed)
+# The number of stat calls is limited to 'max_stats_per_second' to cap the metadata traffic on shared storage.
+# The watched root directory is always polled at the hot interval, as that is where new directories and mtime changes of the directories below are detected.
+class AdaptivePollingEmitter(EventEmitter):
+    def __init__(
+        self,
+        event_queue: Any,
+        watch: Any,
+        timeout: float,
+        hot_interval: timedelta,
+        cold_interval: timedelta,
+        hot_period: timedelta,
+        max_stats_per_second: int,
+        on_poll: Optional[Callable[[float], None]] = None,  # Gets the poll duration
+    ) -> None:
+        super().__init__(event_queue, watch, timeout)  # type: ignore
+        self._root: str = os.fspath(watch.path)
+        self._hot_interval = hot_interval.total_seconds()
+        self._cold_interval = cold_interval.total_seconds()
+        self._hot_period = hot_period.total_seconds()
+        self._max_stats_per_second = max_stats_per_second
+        self._on_poll = on_poll
+
+        self._directories: dict[str, _DirectoryState] = {}  # Directory path -> state
+        # Min-heap of (next poll time, directory path). Entries not matching the current state are stale and skipped
+        self._poll_queue: list[tuple[float, str]] = []
+
+        # Token bucket limiting the number of stat calls. Allows a burst of up to one second worth of stats
+        self._stat_tokens = float(max_stats_per_second)
+        self._last_refill = time.monotonic()
+
+    @override
+    # Take initial snapshot of the whole tree without emitting any events
+    def on_thread_start(self) -> None:
+        start = time.monotonic()
+        self._discover(self._root, emit_events=False)
+        logger.debug(
+            f"Initial snapshot of {len(self._directories)} directories taken in {time.monotonic() - start:.3f} seconds"
+        )
+
+    @override
+    def queue_events(self, timeout: float) -> None:
+        now = time.monotonic()
+        wait_time = min(timeout, self._get_time_until_next_poll(now))
+        if self.stopped_event.wait(max(wait_time, 0.0)):
+            return
+
+        # Poll all due directories as long as the stat budget allows
+        poll_start = time.perf_counter()
+        polled_count = 0
+        while self._poll_queue and self.should_keep_running():
+            now = time.monotonic()
+            next_poll, path = self._poll_queue[0]
+            if next_poll > now:
+                break
+
+            state = self._directories.get(path)
+            # Skip stale queue entries (directory removed or rescheduled)
+            if state is None or state.next_poll != next_poll:
+                heapq.heappop(self._poll_queue)
+                continue
+
+            # Wait for the bucket to refill. A directory larger than the bucket is polled once the bucket is full
+            cost = min(len(state.entries) + 1, self._max_stats_per_second)
+            if not self._try_consume_stats(cost, now):
+                break
+
+            heapq.heappop(self._poll_queue)
+            self._poll_directory(path, state)
+            polled_count += 1
+
+        if polled_count and self._on_poll is not None:
+            self._on_poll(time.perf_counter() - poll_start)
+
+    # Seconds until the next directory is due (or until the stat budget allows polling it)
+    def _get_time_until_next_poll(self, now: float) -> float:
+        while self._poll_queue:
+            next_poll, path = self._poll_queue[0]
+            state = self._directories.get(path)
+            if state is None or state.next_poll != next_poll:
+                heapq.heappop(self._poll_queue)
+                continue
+
+            cost = min(len(state.entries) + 1, self._max_stats_per_second)
+            self._refill_stats(now)
+            missing_tokens = max(cost - self._stat_tokens, 0)
+            return max(next_poll - now, missing_tokens / self._max_stats_per_second)
+
+        return self._cold_interval
+
+    def _refill_stats(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._stat_tokens = min(
+            self._stat_tokens + elapsed * self._max_stats_per_second,
+            float(self._max_stats_per_second),
+        )
+
+    def _try_consume_stats(self, cost: int, now: float) -> bool:
+        self._refill_stats(now)
+        if self._stat_tokens < cost:
+            return False
+        self._stat_tokens -= cost
+        return True
+
+    # Waits until the bucket has a token left, for stats whose cost is only known afterwards (see _discover). Returns False if the emitter was stopped meanwhile
+    def _wait_for_stats(self) -> bool:
+        while True:
+            self._refill_stats(time.monotonic())
+            missing_tokens = 1 - self._stat_tokens
+            if missing_tokens <= 0:
+                return True
+            if self.stopped_event.wait(missing_tokens / self._max_stats_per_second):
+                return False
+
+    # Rescans a single directory and emits events for any changes since last poll
+    def _poll_directory(self, path: str, state: _DirectoryState) -> None:
+        new_entries = self._scan(path)
+        if new_entries is None:
+            # Directory no longer exists
+            self._remove_directory(path, emit_events=True)
+            return
+
+        now = time.monotonic()
+        has_changes = False
+
+        for name, old_entry in state.entries.items():
+            if name not in new_entries:
+                has_changes = True
+                self._on_entry_deleted(os.path.join(path, name), old_entry)
+
+        for name, new_entry in new_entries.items():
+            entry_path = os.path.join(path, name)
+            old_entry = state.entries.get(name)
+
+            if old_entry is None or old_entry.is_dir != new_entry.is_dir:
+                has_changes = True
+                if old_entry is not None:
+                    self._on_entry_deleted(entry_path, old_entry)
+                self._on_entry_created(entry_path, new_entry)
+
+            elif new_entry.is_dir:
+                # Parent noticed that an entry was added/removed in the subdirectory -> poll it right away
+                sub_state = self._directories.get(entry_path)
+                if sub_state is not None and new_entry.mtime_ns != sub_state.mtime_ns:
+                    sub_state.mtime_ns = new_entry.mtime_ns
+                    sub_state.last_activity = now
+                    self._schedule(entry_path, sub_state, now)
+
+            elif new_entry != old_entry:
+                has_changes = True
+                self._emit(FileModifiedEvent(entry_path))
+
+        state.entries = new_entries
+        if has_changes:
+            state.last_activity = now
+            self._emit(DirModifiedEvent(path))
+
+        self._schedule(path, state, now + self._get_interval(path, state, now))
+
+    def _on_entry_created(self, entry_path: str, entry: _EntrySnapshot) -> None:
+        if entry.is_dir:
+            self._emit(DirCreatedEvent(entry_path))
+            self._discover(entry_path, emit_events=True)
+        else:
+            self._emit(FileCreatedEvent(entry_path))
+
+    def _on_entry_deleted(self, entry_path: str, entry: _EntrySnapshot) -> None:
+        if entry.is_dir:
+            self._remove_directory(entry_path, emit_events=True)
+        else:
+            self._emit(FileDeletedEvent(entry_path))
+
+    # Adds a directory and all subdirectories to the monitored directories.
+    # Each scan is charged to the stat budget once its number of entries is known, i.e. the bucket may go into debt by one directory, which delays the following scans and polls
+    def _discover(self, path: str, emit_events: bool) -> None:
+        if not self._wait_for_stats():
+            return
+        entries = self._scan(path)
+        if entries is None:
+            return
+        self._stat_tokens -= len(entries) + 1  # Entries and the directory itself
+
+        now = time.monotonic()
+        state = _DirectoryState(entries=entries, mtime_ns=self._get_mtime_ns(path))
+
+        # Directories with recently written files start out hot
+        newest_mtime_ns = max((e.mtime_ns for e in entries.values()), default=0)
+        age = time.time() - newest_mtime_ns / 1e9
+        state.last_activity = now - age if age > 0 else now
+
+        self._directories[path] = state
+        self._schedule(path, state, now + self._get_interval(path, state, now))
+
+        for name, entry in entries.items():
+            entry_path = os.path.join(path, name)
+            if entry.is_dir:
+                if emit_events:
+                    self._emit(DirCreatedEvent(entry_path))
+                self._discover(entry_path, emit_events)
+            elif emit_events:
+                self._emit(FileCreatedEvent(entry_path))
+
+    def _remove_directory(self, path: str, emit_events: bool) -> None:
+        state = self._directories.pop(path, None)
+        if state is not None:
+            for name, entry in state.entries.items():
+                entry_path = os.path.join(path, name)
+                if entry.is_dir:
+                    self._remove_directory(entry_path, emit_events)
+                elif emit_events:
+                    self._emit(FileDeletedEvent(entry_path))
+
+        if emit_events:
+            self._emit(DirDeletedEvent(path))
+
+        if path == self._root:
+            # Nothing left to monitor
+            self.stop()
+
+    def _emit(self, event: FileSystemEvent) -> None:
+        self.queue_event(event)  # type: ignore
+
+    def _get_interval(self, path: str, state: _DirectoryState, now: float) -> float:
+        if path == self._root or now - state.last_activity < self._hot_period:
+            return self._hot_interval
+        return self._cold_interval
+
+    def _schedule(self, path: str, state: _DirectoryState, poll_time: float) -> None:
+        state.next_poll = poll_time
+        heapq.heappush(self._poll_queue, (poll_time, path))
+
+    # Returns a snapshot of all entries in the directory or None if the directory does not exist
+    def _scan(self, path: str) -> Optional[dict[str, _EntrySnapshot]]:
+        entries: dict[str, _EntrySnapshot] = {}
+        try:
+            with os.scandir(path) as it:
+                for dir_entry in it:
+                    try:
+                        stat = dir_entry.stat(follow_symlinks=False)
+                        is_dir = dir_entry.is_dir(follow_symlinks=False)
+                    except FileNotFoundError:
+                        # Removed while scanning
+                        continue
+                    entries[dir_entry.name] = _EntrySnapshot(
+                        is_dir=is_dir,
+                        size=0 if is_dir else stat.st_size,
+                        mtime_ns=stat.st_mtime_ns,
+                    )
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return entries
+
+    def _get_mtime_ns(self, path: str) -> int:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+
+
+# Polling observer with per directory poll intervals based on recent activity. See AdaptivePollingEmitter
+class AdaptivePollingObserver(BaseObserver):
+    def __init__(
+        self,
+        hot_interval: timedelta,
+        cold_interval: timedelta,
+        hot_period: timedelta,
+        max_stats_per_second: int,
+        on_poll: Optional[Callable[[float], None]] = None,  # Gets the poll duration
+    ) -> None:
+        emitter_class = partial(
+            AdaptivePollingEmitter,
+            hot_interval=hot_interval,
+            cold_interval=cold_interval,
+            hot_period=hot_period,
+            max_stats_per_second=max_stats_per_second,
+            on_poll=on_poll,
+        )
+        # Timeout is the max time the emitter waits between checks for due directories
+        super().__init__(
+            emitter_class=emitter_class, timeout=hot_interval.total_seconds()  # type: ignore
+        )
@@ -0,0 +1,324 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_DIR = Path("/proc")
+
+# Bit rates (kbps) for MPEG audio frame headers, indexed by [version is MPEG1][layer][bitrate index]
+_MPEG_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+# Sample rates (Hz) indexed by version bits and sample rate index
+_MPEG_SAMPLE_RATES = {
+    0b11: (44100, 48000, 32000),  # MPEG1
+    0b10: (22050, 24000, 16000),  # MPEG2
+    0b00: (11025, 12000, 8000),  # MPEG2.5
+}
+_MPEG_TS_PACKET_SIZE = 188
+_MPEG_TS_SYNC_BYTE = 0x47
+_ID3V1_TAG_SIZE = 128
+# Bytes read from the end of the file when checking the trailer
+_TRAILER_READ_SIZE = 16 * 1024
+# Reason returned by FileCompletionDetector.check if the file no longer exists
+FILE_DELETED_REASON = "file deleted"
+
+
+@dataclass
+class _FileState:
+    size: int  # -1 if not stat'ed since the last registered change
+    mtime_ns: int
+    last_change: float  # Monotonic time of last observed change
+    # Largest observed time between two changes, i.e. the write cadence
+    max_gap: float = 0.0
+    change_count: int = 0  # Changes observed after the file was first seen
+
+
+# Decides when a file that is being written to (e.g. a recording) is complete. A file is complete when any of the following holds:
+# - No process holds the file open for writing (checked via /proc, only if enabled as the writer must run in the same PID namespace)
+# - The file ends with a valid audio frame and has not changed for a short window
+# - The size and mtime have not changed for an adaptive window based on the observed write cadence (clamped to [min_stable_time, max_stable_time])
+# - The file has not changed for the fallback time (i.e. a fixed debounce)
+# A file found to be open for writing is not complete until the fallback time has passed.
+# The cadence is only known once the file has changed MIN_CHANGES times, until then the window is the max stable time (or the fallback time if shorter).
+# The state of a file is kept when it is found complete, i.e. the cadence of a file still being written (e.g. a recording paused longer than the window) is not learned from scratch on every change.
+# States are dropped once the file has not changed for the fallback time and the max stable time, or when the file is deleted
+class FileCompletionDetector:
+    # Stable window = observed write cadence * factor
+    STABLE_WINDOW_FACTOR = 4
+    STABLE_WINDOW_FACTOR_VALID_TRAILER = 2
+    MIN_CHANGES = 2
+
+    def __init__(
+        self,
+        fallback_time: timedelta,
+        min_stable_time: timedelta,
+        max_stable_time: timedelta,
+        check_open_handles: bool = False,
+        check_audio_trailer: bool = True,
+        clock: Callable[[], float] = time.monotonic,  # Seconds, e.g. replaced in tests
+    ) -> None:
+        super().__init__()
+        self._fallback_time = fallback_time.total_seconds()
+        self._min_stable_time = min_stable_time.total_seconds()
+        self._max_stable_time = max_stable_time.total_seconds()
+        self._check_open_handles = check_open_handles
+        self._check_audio_trailer = check_audio_trailer
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._files: dict[Path, _FileState] = {}
+        # Time after which the state of an unchanged file is dropped
+        self._expiry_time = max(self._fallback_time, self._max_stable_time)
+        self._last_prune = clock()
+
+    # Number of files with state kept
+    @property
+    def file_count(self) -> int:
+        with self._lock:
+            return len(self._files)
+
+    # Registers a change of the file (e.g. from a file system event)
+    def on_file_changed(self, file_path: Path) -> None:
+        now = self._clock()
+        with self._lock:
+            self._prune(now)
+            state = self._files.get(file_path)
+            if state is None:
+                self._files[file_path] = _FileState(-1, 0, last_change=now)
+                return
+            self._register_change(state, now)
+            # Already registered, i.e. not again when the next check sees the new size
+            state.size = -1
+
+    # Time to wait before checking whether the file is complete
+    def get_check_delay(self, file_path: Path) -> timedelta:
+        with self._lock:
+            state = self._files.get(file_path)
+            if state is None or state.change_count < self.MIN_CHANGES:
+                return timedelta(seconds=self._get_unknown_cadence_window())
+            max_gap = state.max_gap
+        return timedelta(seconds=self._get_stable_window(max_gap))
+
+    # Returns the reason if the file is complete, otherwise None
+    def check(self, file_path: Path) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            state = self._files.get(file_path)
+            if state is None:
+                state = self._files[file_path] = _FileState(-1, 0, last_change=now)
+
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self.forget(file_path)
+            return FILE_DELETED_REASON
+
+        with self._lock:
+            if state.size != -1 and (stat.st_size, stat.st_mtime_ns) != (
+                state.size,
+                state.mtime_ns,
+            ):
+                self._register_change(state, now)
+            state.size, state.mtime_ns = stat.st_size, stat.st_mtime_ns
+            stable_time = now - state.last_change
+            max_gap = state.max_gap
+            change_count = state.change_count
+
+        if stable_time >= self._fallback_time:
+            return f"unchanged for {timedelta(seconds=round(stable_time))}"
+
+        if self._check_open_handles:
+            is_open = is_open_for_writing(file_path)
+            if is_open:
+                return None
+            if is_open is not None:
+                return "no process has the file open for writing"
+
+        if change_count < self.MIN_CHANGES:
+            # Too few changes to tell the cadence, e.g. a single quiet window of a recording
+            window = self._get_unknown_cadence_window()
+            if stable_time >= window:
+                return f"unchanged for {stable_time:.1f} seconds (window: {window:.1f} seconds, cadence unknown)"
+            return None
+
+        factor = self.STABLE_WINDOW_FACTOR
+        if self._check_audio_trailer and has_valid_audio_trailer(
+            file_path, stat.st_size
+        ):
+            factor = self.STABLE_WINDOW_FACTOR_VALID_TRAILER
+
+        stable_window = self._get_stable_window(max_gap, factor)
+        if stable_time >= stable_window:
+            return f"unchanged for {stable_time:.1f} seconds (window: {stable_window:.1f} seconds)"
+
+        return None
+
+    # Removes any state kept for the file
+    def forget(self, file_path: Path) -> None:
+        with self._lock:
+            self._files.pop(file_path, None)
+
+    def _register_change(self, state: _FileState, now: float) -> None:
+        state.max_gap = max(state.max_gap, now - state.last_change)
+        state.last_change = now
+        state.change_count += 1
+
+    # Drops the states of files unchanged for the expiry time. Runs at most once per expiry time, i.e. iterates all states rarely. Lock must be held
+    def _prune(self, now: float) -> None:
+        if now - self._last_prune < self._expiry_time:
+            return
+        self._last_prune = now
+        self._files = {
+            path: state
+            for path, state in self._files.items()
+            if now - state.last_change < self._expiry_time
+        }
+
+    def _get_unknown_cadence_window(self) -> float:
+        return min(self._max_stable_time, self._fallback_time)
+
+    def _get_stable_window(
+        self, max_gap: float, factor: int = STABLE_WINDOW_FACTOR
+    ) -> float:
+        return min(max(max_gap * factor, self._min_stable_time), self._max_stable_time)
+
+
+# Whether any process has the file open for writing.
+# Returns None if unknown (no /proc file system available)
+def is_open_for_writing(file_path: Path) -> Optional[bool]:
+    if not PROC_DIR.is_dir():
+        return None
+
+    target = os.path.realpath(file_path)
+    for pid_entry in os.scandir(PROC_DIR):
+        if not pid_entry.name.isdigit():
+            continue
+        fd_dir = os.path.join(pid_entry.path, "fd")
+        try:
+            fd_entries = list(os.scandir(fd_dir))
+        except OSError:
+            continue  # Process exited or no permission
+
+        for fd_entry in fd_entries:
+            try:
+                if os.readlink(fd_entry.path) != target:
+                    continue
+                if _is_fd_writable(
+                    os.path.join(pid_entry.path, "fdinfo", fd_entry.name)
+                ):
+                    return True
+            except OSError:
+                continue
+    return False
+
+
+def _is_fd_writable(fdinfo_path: str) -> bool:
+    with open(fdinfo_path, "r") as f:
+        for line in f:
+            if line.startswith("flags:"):
+                access_mode = int(line.split()[1], 8) & os.O_ACCMODE
+                return access_mode in (os.O_WRONLY, os.O_RDWR)
+    return False
+
+
+# Whether the file ends at the boundary of a complete audio frame, i.e. the writer did not stop in the middle of a frame
+# Supports MP3 (MPEG audio), AAC (ADTS) and MPEG-TS
+def has_valid_audio_trailer(file_path: Path, file_size: int) -> bool:
+    if file_size <= 0:
+        return False
+    try:
+        with open(file_path, "rb") as f:
+            offset = max(file_size - _TRAILER_READ_SIZE, 0)
+            f.seek(offset)
+            tail = f.read(file_size - offset)
+    except OSError:
+        return False
+
+    # File may have changed since stat
+    if offset + len(tail) != file_size:
+        return False
+
+    # ID3v1 tag at the very end of an mp3 file
+    if len(tail) >= _ID3V1_TAG_SIZE and tail[-_ID3V1_TAG_SIZE:][:3] == b"TAG":
+        tail = tail[:-_ID3V1_TAG_SIZE]
+
+    return _ends_with_ts_packet(tail, file_size) or _ends_with_frames(tail)
+
+
+def _ends_with_ts_packet(tail: bytes, file_size: int) -> bool:
+    return (
+        file_size % _MPEG_TS_PACKET_SIZE == 0
+        and len(tail) >= _MPEG_TS_PACKET_SIZE
+        and tail[-_MPEG_TS_PACKET_SIZE] == _MPEG_TS_SYNC_BYTE
+    )
+
+
+# Whether the data ends with (at least) two consecutive MPEG audio or ADTS frames, the last ending exactly at the end of the data
+def _ends_with_frames(tail: bytes) -> bool:
+    end = len(tail)
+    # Frame start -> frame end, for all frame candidates
+    frame_ends: dict[int, int] = {}
+    position = tail.rfind(b"\xff", 0, end - 3)
+    while position != -1:
+        # Both MPEG audio (11 bits) and ADTS (12 bits) frames start with a sync word of set bits
+        if tail[position + 1] & 0xE0 == 0xE0:
+            frame_length = _get_frame_length(tail, position)
+            if frame_length is not None:
+                frame_end = position + frame_length
+                frame_ends[position] = frame_end
+                # A frame ending where the last frame starts
+                if frame_ends.get(frame_end) == end:
+                    return True
+        position = tail.rfind(b"\xff", 0, position)
+    return False
+
+
+def _get_frame_length(data: bytes, position: int) -> Optional[int]:
+    if position + 7 <= len(data) and data[position + 1] & 0xF6 == 0xF0:
+        # ADTS header: sync (12 bits), id, layer (always 0), ...
+        frame_length = (
+            ((data[position + 3] & 0x03) << 11)
+            | (data[position + 4] << 3)
+            | (data[position + 5] >> 5)
+        )
+        return frame_length if frame_length >= 7 else None
+
+    header = int.from_bytes(data[position : position + 4], "big")
+    version_bits = (header >> 19) & 0b11
+    layer_bits = (header >> 17) & 0b11
+    bitrate_index = (header >> 12) & 0b1111
+    sample_rate_index = (header >> 10) & 0b11
+    padding = (header >> 9) & 0b1
+    if (
+        version_bits == 0b01
+        or layer_bits == 0b00
+        or bitrate_index in (0b0000, 0b1111)
+        or sample_rate_index == 0b11
+    ):
+        return None
+
+    is_mpeg1 = version_bits == 0b11
+    layer = 4 - layer_bits
+    bitrate = _MPEG_BITRATES[is_mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version_bits][sample_rate_index]
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 3 and not is_mpeg1:
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+
+# Invokes a callback for a key once its deadline has passed without the key being rescheduled.
+# All pending deadlines are kept in a single min-heap served by one scheduler thread, i.e. the number of threads is independent of the number of pending keys.
+# Rescheduling a key to a later deadline is O(1) (the heap entry is moved lazily when it is popped), to an earlier deadline O(log n).
+# Thread safe: keys can be scheduled from any thread. The callback is invoked on the scheduler thread.
+class Debouncer(Generic[K]):
+    def __init__(self, callback: Callable[[K], None], name: str = "debouncer") -> None:
+        super().__init__()
+        self._callback = callback
+        self._name = name
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._is_stopped = False
+
+        # Key -> monotonic time at which the callback should be invoked
+        self._deadlines: dict[K, float] = {}
+        # Min-heap of (deadline, sequence number, key). At most one live entry per key
+        self._heap: list[tuple[float, int, K]] = []
+        # Key -> (sequence number, deadline) of the live heap entry. Heap entries with another sequence number are stale
+        self._live_entries: dict[K, tuple[int, float]] = {}
+        self._sequence = itertools.count()
+
+    # Number of keys waiting for their deadline to pass
+    @property
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._deadlines)
+
+    # (Re)schedules the callback for the key to be invoked after the given delay
+    def schedule(self, key: K, delay: timedelta) -> None:
+        deadline = time.monotonic() + delay.total_seconds()
+        with self._condition:
+            if self._is_stopped:
+                return
+            self._ensure_thread_started()
+
+            self._deadlines[key] = deadline
+            live_entry = self._live_entries.get(key)
+            # Only push a new entry if the key is not queued already or the deadline moved forward.
+            # A later deadline is handled when the existing entry is popped
+            if live_entry is None or deadline < live_entry[1]:
+                self._push(key, deadline)
+                self._condition.notify()
+
+    # Removes the key without invoking the callback
+    def cancel(self, key: K) -> None:
+        with self._condition:
+            self._deadlines.pop(key, None)
+            self._live_entries.pop(key, None)
+
+    # Stops the scheduler thread. Pending callbacks are discarded
+    def stop(self) -> None:
+        with self._condition:
+            self._is_stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _ensure_thread_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=self._name, daemon=True
+            )
+            self._thread.start()
+
+    def _push(self, key: K, deadline: float) -> None:
+        sequence = next(self._sequence)
+        self._live_entries[key] = (sequence, deadline)
+        heapq.heappush(self._heap, (deadline, sequence, key))
+
+    def _run(self) -> None:
+        while True:
+            due_key = self._wait_for_due_key()
+            if due_key is None:
+                return  # Stopped
+
+            try:
+                self._callback(due_key)
+            except Exception as e:
+                logger.exception(f"Error in callback for '{due_key}': {e}")
+
+    # Blocks until a key is due and returns it, or returns None if stopped
+    def _wait_for_due_key(self) -> Optional[K]:
+        with self._condition:
+            while not self._is_stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                deadline, sequence, key = self._heap[0]
+                live_entry = self._live_entries.get(key)
+                if live_entry is None or live_entry[0] != sequence:
+                    # Stale entry (cancelled or replaced by an earlier deadline)
+                    heapq.heappop(self._heap)
+                    continue
+
+                now = time.monotonic()
+                if deadline > now:
+                    self._condition.wait(timeout=deadline - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                current_deadline = self._deadlines[key]
+                if current_deadline > now:
+                    # Rescheduled since the entry was queued -> requeue with the new deadline
+                    self._push(key, current_deadline)
+                    continue
+
+                del self._deadlines[key]
+                del self._live_entries[key]
+                return key
+
+            return None
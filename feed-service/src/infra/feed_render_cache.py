@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+from src.infra.repository import FileSystemPodcastRepository, PodcastNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RenderedFeed:
+    content: bytes
+    gzip_content: bytes
+    etag: str  # Content based, i.e. stays the same if a rerender results in the same feed
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.content) + len(self.gzip_content)
+
+    @classmethod
+    def from_content(cls, content: bytes) -> "RenderedFeed":
+        return cls(
+            content=content,
+            gzip_content=gzip.compress(content, mtime=0),
+            etag=f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"',
+        )
+
+
+# Identifies the state of a podcast directory a feed was rendered from:
+# (mtime of the directory, number of change events for the podcast)
+# The directory mtime covers added/removed/renamed episodes, the change events cover changes to existing files (e.g. metadata.yml or a growing recording)
+_Fingerprint = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class _CacheEntry:
+    fingerprint: _Fingerprint
+    feed: RenderedFeed
+
+
+# Renders feeds on request and caches the result until the podcast changes:
+# - Entries are keyed by the fingerprint of the podcast directory, so a changed podcast is never served from the cache
+# - Change events from the directory monitor (see 'invalidate') evict entries right away, without waiting for the debounce of the feed update
+# - The cache is LRU with a memory limit
+# - Concurrent requests for a podcast that is not cached share a single render
+class FeedRenderCache:
+    def __init__(
+        self,
+        repo: FileSystemPodcastRepository,
+        render_feed: Callable[[str], bytes],  # Podcast id -> feed
+        max_bytes: int,
+        max_parallel_renders: int = 4,
+    ) -> None:
+        super().__init__()
+        self._repo = repo
+        self._render_feed = render_feed
+        self._max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_parallel_renders, thread_name_prefix="feed-render"
+        )
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._size_bytes = 0
+        # Podcast id -> number of change events, part of the fingerprint
+        self._generations: dict[str, int] = {}
+        # Podcast id -> render in progress and the fingerprint it renders
+        self._renders: dict[str, tuple[_Fingerprint, Future[RenderedFeed]]] = {}
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._size_bytes
+
+    # Returns the feed of the podcast, rendering it if not cached.
+    # Stats the podcast directory for the fingerprint, i.e. call it off the event loop.
+    # The future fails with PodcastNotFoundError if the podcast does not exist
+    def get_feed(self, podcast_id: str) -> Future[RenderedFeed]:
+        mtime_ns = self._repo.get_directory_mtime_ns(podcast_id)
+        with self._lock:
+            if mtime_ns is None:
+                self._remove_entry(podcast_id)
+                future: Future[RenderedFeed] = Future()
+                future.set_exception(
+                    PodcastNotFoundError(f"Podcast not found: {podcast_id}")
+                )
+                return future
+
+            fingerprint = (mtime_ns, self._generations.get(podcast_id, 0))
+            entry = self._entries.get(podcast_id)
+            if entry is not None and entry.fingerprint == fingerprint:
+                self._entries.move_to_end(podcast_id)
+                future = Future()
+                future.set_result(entry.feed)
+                return future
+
+            render = self._renders.get(podcast_id)
+            if render is not None and render[0] == fingerprint:
+                return render[1]  # Share the render in progress
+
+            future = self._executor.submit(self._render, podcast_id, fingerprint)
+            self._renders[podcast_id] = (fingerprint, future)
+            return future
+
+    # Invalidates the cached feed of the podcast (e.g. on a change event for a file of the podcast)
+    def invalidate(self, podcast_id: str) -> None:
+        with self._lock:
+            self._generations[podcast_id] = self._generations.get(podcast_id, 0) + 1
+            self._remove_entry(podcast_id)
+
+    def _render(self, podcast_id: str, fingerprint: _Fingerprint) -> RenderedFeed:
+        try:
+            # Raises PodcastNotFoundError for a directory without metadata file
+            content = self._render_feed(podcast_id)
+            feed = RenderedFeed.from_content(content)
+            logger.debug(
+                f"Feed for podcast '{podcast_id}' rendered ({len(content)} bytes)"
+            )
+            self._store(podcast_id, fingerprint, feed)
+            return feed
+        finally:
+            with self._lock:
+                render = self._renders.get(podcast_id)
+                if render is not None and render[0] == fingerprint:
+                    del self._renders[podcast_id]
+
+    def _store(
+        self, podcast_id: str, fingerprint: _Fingerprint, feed: RenderedFeed
+    ) -> None:
+        with self._lock:
+            # Invalidated while rendering -> the next request renders again
+            if fingerprint[1] != self._generations.get(podcast_id, 0):
+                return
+            if feed.size_bytes > self._max_bytes:
+                return
+
+            self._remove_entry(podcast_id)
+            self._entries[podcast_id] = _CacheEntry(fingerprint, feed)
+            self._size_bytes += feed.size_bytes
+            # Evict least recently used feeds
+            while self._size_bytes > self._max_bytes:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= evicted.feed.size_bytes
+                logger.debug(f"Feed for podcast '{evicted_id}' evicted from cache")
+
+    def _remove_entry(self, podcast_id: str) -> None:
+        entry = self._entries.pop(podcast_id, None)
+        if entry is not None:
+            self._size_bytes -= entry.feed.size_bytes
@@ -1,14 +1,17 @@
 import logging
+import threading
 import time
 from datetime import timedelta
 from pathlib import Path
-from threading import Timer
-from typing import Callable
+from typing import Callable, Optional
 
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
 
 from src.domain.models import PodcastUpdatedEvent
+from src.infra.completion_detector import FILE_DELETED_REASON, FileCompletionDetector
+from src.infra.debouncer import Debouncer
 from src.infra.file_reader import PodcastFileService
+from src.metrics import FeedMetrics
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +19,46 @@ logger = logging.getLogger(__name__)
 # This handler absorbs all file events as long as they occur within the given debounce time
 # The debounce time is reset every time a new file event occurs for the same file
 # First when the debounce time has passed without any new file events for the given file, the callback is triggered
+# If a completion detector is given, the callback is triggered as soon as the file is detected to be complete (the debounce time is then only a fallback)
+# Pending files are tracked by a single debouncer thread (not a thread per file)
 class FileChangedEventHandler(FileSystemEventHandler):
     # Callback gets passed the path of the file that triggered the event
     def __init__(
-        self, debounce_time: timedelta, callback: Callable[[PodcastUpdatedEvent], None]
+        self,
+        debounce_time: timedelta,
+        callback: Callable[[PodcastUpdatedEvent], None],
+        completion_detector: Optional[FileCompletionDetector] = None,
+        metrics: Optional[FeedMetrics] = None,
     ) -> None:
         super().__init__()
         self._callback = callback
         self._debounce_time = debounce_time
+        self._completion_detector = completion_detector
+        self._metrics = metrics
+        # Path -> monotonic time of the first change event while the file is pending. Guarded by the lock, as it is changed on the observer and the debouncer thread
+        self._first_change_times: dict[Path, float] = {}
+        self._first_change_times_lock = threading.Lock()
+        # Invoked with the path of every (not ignored) file change right away, i.e. without debounce
+        self._change_listeners: list[Callable[[Path], None]] = []
         # All file events currently waiting for their debounce time to pass
-        self._pending_file_changed_events: dict[
-            Path, float
-        ] = {}  # File path -> last file event timestamp
+        self._pending_file_changed_events = Debouncer[Path](
+            self._on_debounce_elapsed, name="file-changed-debouncer"
+        )
+
+    # Number of files currently waiting for their debounce time to pass
+    @property
+    def pending_count(self) -> int:
+        return self._pending_file_changed_events.pending_count
+
+    def add_change_listener(self, listener: Callable[[Path], None]) -> None:
+        self._change_listeners.append(listener)
+
+    # Drops the state kept for the file, i.e. the time of its first change and the state of the completion detector. A pending debounce is left as is
+    def forget(self, file_path: Path) -> None:
+        with self._first_change_times_lock:
+            self._first_change_times.pop(file_path, None)
+        if self._completion_detector is not None:
+            self._completion_detector.forget(file_path)
 
     # Triggers on any kind of file change
     def on_any_event(self, event: FileSystemEvent) -> None:  # type: ignore
@@ -36,44 +67,61 @@ class FileChangedEventHandler(FileSystemEventHandler):
 
         # Ignore directory changes (as this is always triggered when a file changes)
         # Ignore any changes to the .rss feed files themselves
-        if (
-            file_changed_path.is_dir()
-            or file_changed_path.name
-            == PodcastFileService.FEED_FILE_NAME  # TODO: Inject ignore patterns
-        ):
+        if file_changed_path.is_dir() or PodcastFileService.is_generated_file(
+            file_changed_path.name
+        ):  # TODO: Inject ignore patterns
             return
 
-        current_time = time.time()
-        # Check if event already pending for this path
-        if file_changed_path not in self._pending_file_changed_events:
-            # Start timer in seperat thread to check on file after debounce time has passed
-            self._start_debounce_timer(file_changed_path)
+        for listener in self._change_listeners:
+            listener(file_changed_path)
 
-        # Update timestamp of last file event
-        self._pending_file_changed_events[file_changed_path] = current_time
+        with self._first_change_times_lock:
+            self._first_change_times.setdefault(file_changed_path, time.monotonic())
 
-    def _start_debounce_timer(self, file_path: Path):
-        Timer(
-            interval=self._debounce_time.total_seconds(),
-            function=lambda: self._raise_if_older_than_debounce(file_path),
-        ).start()
+        if self._completion_detector is None:
+            # Start or reset the debounce time for this path
+            self._pending_file_changed_events.schedule(
+                file_changed_path, self._debounce_time
+            )
+            return
 
-    # Check if last file event is older than debounce time -> then trigger file event
-    def _raise_if_older_than_debounce(self, file_path: Path) -> None:
-        last_event_time = self._pending_file_changed_events[file_path]
-        current_time = time.time()
-        time_passed_since_last_event = current_time - last_event_time
+        # Check again once the file has been unchanged for the stable window
+        self._completion_detector.on_file_changed(file_changed_path)
+        self._pending_file_changed_events.schedule(
+            file_changed_path,
+            self._completion_detector.get_check_delay(file_changed_path),
+        )
 
-        if time_passed_since_last_event >= self._debounce_time.total_seconds():
+    def _on_debounce_elapsed(self, file_path: Path) -> None:
+        if self._completion_detector is None:
+            logger.info(
+                f"File change detected after debounce time ({self._debounce_time}): {file_path}"
+            )
             self._on_file_changed_event(file_path)
-            del self._pending_file_changed_events[file_path]
-        else:
-            # Start a new debounce timer
-            # XXX: Maybe just a new thread and a while loop instead of keep starting new timers/threads?
-            self._start_debounce_timer(file_path)
+            return
+
+        reason = self._completion_detector.check(file_path)
+        if reason == FILE_DELETED_REASON:
+            # Not a complete file, i.e. there is no debounce time to observe. The feed is still updated, as an episode may have been removed
+            logger.info(f"File change detected, file was deleted: {file_path}")
+            self.forget(file_path)
+            self._callback(PodcastUpdatedEvent(episode_id=file_path))
+            return
+
+        if reason is None:
+            # Not complete yet, check again later
+            self._pending_file_changed_events.schedule(
+                file_path, self._completion_detector.get_check_delay(file_path)
+            )
+            return
+
+        logger.info(f"File change detected, file is complete ({reason}): {file_path}")
+        # NB: The detector keeps the write cadence of the file, in case it changes again (i.e. was not complete after all)
+        self._on_file_changed_event(file_path)
 
     def _on_file_changed_event(self, file_path: Path) -> None:
-        logger.info(
-            f"File change detected after debounce time ({self._debounce_time}): {file_path}"
-        )
-        self._callback(PodcastUpdatedEvent(episode_id=file_path))
+        with self._first_change_times_lock:
+            changed_at = self._first_change_times.pop(file_path, None)
+        if changed_at is not None and self._metrics is not None:
+            self._metrics.debounce_seconds.observe(time.monotonic() - changed_at)
+        self._callback(PodcastUpdatedEvent(episode_id=file_path, changed_at=changed_at))
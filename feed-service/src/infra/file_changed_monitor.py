@@ -1,26 +1,68 @@
 import logging
+import threading
 import time
+from functools import partial
 from pathlib import Path
+from typing import Any, Callable, Optional
 
+from typing_extensions import override
 from watchdog.events import FileSystemEventHandler
-from watchdog.observers.polling import PollingObserver
+from watchdog.observers.api import DEFAULT_OBSERVER_TIMEOUT, BaseObserver
+from watchdog.observers.polling import PollingEmitter, PollingObserver
 
 logger = logging.getLogger(__name__)
 
 
+class _TimedPollingEmitter(PollingEmitter):
+    def __init__(
+        self,
+        event_queue: Any,
+        watch: Any,
+        timeout: float,
+        on_poll: Callable[[float], None],
+    ) -> None:
+        super().__init__(event_queue, watch, timeout)  # type: ignore
+        self._on_poll = on_poll
+
+    @override
+    def queue_events(self, timeout: float) -> None:
+        # Wait here instead of in the base class, so only the poll itself is timed
+        if self.stopped_event.wait(timeout):
+            return
+        start = time.perf_counter()
+        super().queue_events(0)  # type: ignore
+        self._on_poll(time.perf_counter() - start)
+
+
+# Polling observer (see FileChangedMonitor) reporting the duration of each poll of the whole tree
+class TimedPollingObserver(BaseObserver):
+    def __init__(
+        self,
+        on_poll: Callable[[float], None],  # Gets the poll duration
+        timeout: float = DEFAULT_OBSERVER_TIMEOUT,
+    ) -> None:
+        super().__init__(
+            emitter_class=partial(_TimedPollingEmitter, on_poll=on_poll), timeout=timeout  # type: ignore
+        )
+
+
 # Recursively monitors a directory for file changes
 class FileChangedMonitor:
     def __init__(
-        self, root_dir: Path, file_changed_handler: FileSystemEventHandler
+        self,
+        root_dir: Path,
+        file_changed_handler: FileSystemEventHandler,
+        observer: Optional[BaseObserver] = None,
     ) -> None:
         super().__init__()
         self.root_dir = root_dir
         self.file_changed_handler = file_changed_handler
 
         # Polling observer is used (instead of default Oberver that uses system events) as system events for files that are being written to by another process are not always triggered on some OS's (e.g. Windows)
-        self.observer = PollingObserver()
+        self.observer = observer or PollingObserver()
+        self._stop_event = threading.Event()
 
-    # Starts monitoring
+    # Starts monitoring. Blocks until stopped
     def start(self) -> None:
         logger.info(f"Started monitoring directory for file changes: {self.root_dir}")
 
@@ -28,10 +70,14 @@ class FileChangedMonitor:
         self.observer.start()
 
         try:
-            # Keep alive
-            while True:
-                time.sleep(1)
+            # Keep alive. Waits with a timeout, so the main thread still handles signals (e.g. Ctrl+C)
+            while not self._stop_event.wait(1):
+                pass
         finally:
             # Stop and wait for observer to finish
             self.observer.stop()
             self.observer.join()
+
+    # Stops monitoring, e.g. from another thread
+    def stop(self) -> None:
+        self._stop_event.set()
@@ -1,47 +1,104 @@
+import gzip
+import hashlib
 import logging
 import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
 from pathlib import Path
 from threading import Lock
-from typing import Any
+from typing import Any, Callable, Optional
 
 import yaml
 from slugify import slugify
 
+from src.metrics import FeedMetrics
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # Optional dependency, .br feeds are not written if missing
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 # Adapter for local podcast file storage
 
-# Shared lock for writing to feed files
-lock = Lock()
-
 
 class PodcastFileServiceError(Exception):
     pass
 
 
+# Digest of a feed file as last written/read, and the stat values identifying that version of the file
+@dataclass(frozen=True)
+class _FeedFileDigest:
+    digest: bytes
+    size: int
+    mtime_ns: int
+
+
 class PodcastFileService:
     # TODO: Move to config
     FEED_FILE_NAME = "feed.rss"
+    # Archive pages of paged feeds (RFC 5005)
+    ARCHIVE_FEED_FILE_NAME_FORMAT = "feed-archive-{index}.rss"
+    ARCHIVE_FEED_FILE_NAME_PATTERN = r"^feed-archive-(?P<index>\d+)\.rss(\.gz|\.br)?$"
+    FEED_FILE_NAME_PATTERN = r"^feed(-archive-\d+)?\.rss$"
+    # Position of the oldest episode of the paged feed, i.e. the anchor of the archive pages (see Podcast.get_feed_pages), and the newest archived episode
+    ARCHIVE_STATE_FILE_NAME = "feed-archive.yml"
     METADATA_FILE_NAME = "metadata.yml"
     VALID_EPISODE_FILE_EXTENSIONS = (".mp3", ".mp4")
+    # Precompressed feeds written next to the feed (for e.g. nginx 'gzip_static'/'brotli_static')
+    GZIP_SUFFIX = ".gz"
+    BROTLI_SUFFIX = ".br"
+    TEMP_FILE_SUFFIX = ".tmp"
 
-    def __init__(self, base_dir: Path) -> None:
+    def __init__(self, base_dir: Path, metrics: Optional[FeedMetrics] = None) -> None:
         super().__init__()
         self._base_dir = base_dir
+        self._metrics = metrics
+        # Feed file path -> lock for writing to that feed. Feeds of different podcasts can be written in parallel
+        self._feed_locks: dict[Path, Lock] = {}
+        self._feed_locks_lock = Lock()
+        # Feed file path -> digest of the content last written to that feed
+        self._feed_digests: dict[Path, _FeedFileDigest] = {}
         logger.info(f"Using podcast base directory: {self._base_dir}")
 
     def read_podcast_dirs(self):
-        for dir_entry in os.scandir(self._base_dir):
-            if dir_entry.is_dir():
-                yield dir_entry
+        scanned = 0
+        try:
+            for dir_entry in os.scandir(self._base_dir):
+                scanned += 1
+                if dir_entry.is_dir():
+                    yield dir_entry
+        finally:
+            self._count_scanned(scanned)
+
+    # Returns the mtime of the podcast directory, or None if it does not exist
+    def get_podcast_dir_mtime_ns(self, podcast_dir: Path) -> Optional[int]:
+        try:
+            stat = os.stat(podcast_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return stat.st_mtime_ns if os.path.isdir(podcast_dir) else None
 
     # Returns an iterator over all episode files in a given podcast directory
     def read_episode_files(self, podcast_dir: Path):
-        for dir_entry in os.scandir(podcast_dir):
-            if dir_entry.is_file() and dir_entry.name.endswith(
-                self.VALID_EPISODE_FILE_EXTENSIONS
-            ):
-                yield dir_entry
+        scanned = 0
+        try:
+            for dir_entry in os.scandir(podcast_dir):
+                scanned += 1
+                if dir_entry.is_file() and dir_entry.name.endswith(
+                    self.VALID_EPISODE_FILE_EXTENSIONS
+                ):
+                    yield dir_entry
+        finally:
+            self._count_scanned(scanned)
+
+    # Counted once per directory, not per entry
+    def _count_scanned(self, scanned: int) -> None:
+        if self._metrics is not None and scanned:
+            self._metrics.files_scanned.inc(amount=scanned)
 
     # Reads the metadata file stored in the given podcast directory
     def read_metadata(self, podcast_dir: Path):
@@ -50,17 +107,257 @@ class PodcastFileService:
             metadata: dict[str, Any] = yaml.safe_load(f)
         return metadata
 
-    def write_feed(self, feed: bytes, podcast_title: str) -> Path:
+    # Deletes the episode files from the podcast directory, or moves them to 'move_to_dir' if set.
+    # Files belonging to an episode (named '<episode file name>.<suffix>', e.g. sidecar files written by the recorder) are removed as well.
+    # Leftover temp files of an episode (named '.<episode file name>.<suffix>.tmp', e.g. the recorder's journal of an interrupted recording) are always deleted
+    def remove_episode_files(
+        self,
+        podcast_dir: Path,
+        episode_file_names: list[str],
+        move_to_dir: Optional[Path] = None,
+    ) -> None:
+        remaining = set(episode_file_names)
+        file_names: list[str] = []
+        temp_file_names: list[str] = []
+        for dir_entry in os.scandir(podcast_dir):
+            if not dir_entry.is_file():
+                continue
+            name = dir_entry.name
+            if name in remaining:
+                file_names.append(name)
+            elif "." in name and name.rsplit(".", 1)[0] in remaining:
+                file_names.append(name)
+            elif self._is_episode_temp_file(name, remaining):
+                temp_file_names.append(name)
+
+        for file_name in temp_file_names:
+            try:
+                (podcast_dir / file_name).unlink()
+                logger.info(f"Episode temp file deleted: {podcast_dir / file_name}")
+            except FileNotFoundError:
+                pass
+
+        if move_to_dir is not None:
+            move_to_dir.mkdir(parents=True, exist_ok=True)
+
+        for file_name in file_names:
+            file_path = podcast_dir / file_name
+            try:
+                if move_to_dir is None:
+                    file_path.unlink()
+                    logger.info(f"Episode file deleted: {file_path}")
+                else:
+                    shutil.move(file_path, move_to_dir / file_name)
+                    logger.info(f"Episode file moved to {move_to_dir}: {file_path}")
+            except FileNotFoundError:
+                logger.debug(f"Episode file already removed: {file_path}")
+
+    @classmethod
+    def _is_episode_temp_file(
+        cls, file_name: str, episode_file_names: set[str]
+    ) -> bool:
+        if not (file_name.startswith(".") and file_name.endswith(cls.TEMP_FILE_SUFFIX)):
+            return False
+        # Strips the suffixes one by one, as the episode file name contains dots as well
+        name = file_name[1 : -len(cls.TEMP_FILE_SUFFIX)]
+        while "." in name:
+            name = name.rsplit(".", 1)[0]
+            if name in episode_file_names:
+                return True
+        return False
+
+    # Deletes the archive pages (including compressed variants) of the podcast feed up to the given index, or all if None
+    def remove_archive_feeds(
+        self, podcast_title: str, max_index: Optional[int] = None
+    ) -> None:
+        podcast_dir = self._get_feed_file_path(
+            podcast_title, self.FEED_FILE_NAME
+        ).parent
+        for dir_entry in os.scandir(podcast_dir):
+            match = re.match(self.ARCHIVE_FEED_FILE_NAME_PATTERN, dir_entry.name)
+            if match and (max_index is None or int(match["index"]) <= max_index):
+                Path(dir_entry.path).unlink(missing_ok=True)
+                logger.debug(f"Feed archive page removed: {dir_entry.path}")
+
+    # Number of episodes removed from the start of the paged feed. 0 if none were removed
+    def read_archive_removed_count(self, podcast_title: str) -> int:
+        state = self._read_archive_state(podcast_title)
+        return int(state.get("removed_episode_count", 0))
+
+    def write_archive_removed_count(
+        self, podcast_title: str, removed_count: int
+    ) -> None:
+        self._update_archive_state(podcast_title, removed_episode_count=removed_count)
+
+    # Position (counted from the first episode ever) and file name of the newest episode on the saved archive pages. None if no pages were saved yet
+    def read_last_archived_episode(
+        self, podcast_title: str
+    ) -> Optional[tuple[int, str]]:
+        state = self._read_archive_state(podcast_title)
+        if (
+            "archived_episode_count" not in state
+            or "last_archived_episode" not in state
+        ):
+            return None
+        return int(state["archived_episode_count"]), str(state["last_archived_episode"])
+
+    def write_last_archived_episode(
+        self, podcast_title: str, position: int, file_name: str
+    ) -> None:
+        self._update_archive_state(
+            podcast_title,
+            archived_episode_count=position,
+            last_archived_episode=file_name,
+        )
+
+    def _read_archive_state(self, podcast_title: str) -> dict[str, Any]:
+        state_file_path = self._get_feed_file_path(
+            podcast_title, self.ARCHIVE_STATE_FILE_NAME
+        )
+        try:
+            with open(state_file_path, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return {}
+
+    # Writes the given values to the archive state, keeping the other values
+    def _update_archive_state(self, podcast_title: str, **values: Any) -> None:
+        state_file_path = self._get_feed_file_path(
+            podcast_title, self.ARCHIVE_STATE_FILE_NAME
+        )
+        state = self._read_archive_state(podcast_title)
+        state.update(values)
+        self._write_atomic(state_file_path, yaml.safe_dump(state).encode("utf-8"))
+
+    # Whether the file is written by the feed service itself (feed, compressed feeds, archive state, temp files)
+    @classmethod
+    def is_generated_file(cls, file_name: str) -> bool:
+        if file_name.startswith(".") and file_name.endswith(cls.TEMP_FILE_SUFFIX):
+            return True
+        if re.match(cls.ARCHIVE_FEED_FILE_NAME_PATTERN, file_name):
+            return True
+        return file_name in (
+            cls.ARCHIVE_STATE_FILE_NAME,
+            cls.FEED_FILE_NAME,
+            cls.FEED_FILE_NAME + cls.GZIP_SUFFIX,
+            cls.FEED_FILE_NAME + cls.BROTLI_SUFFIX,
+        )
+
+    # Whether the file is a feed or a feed archive page (not including compressed variants)
+    @classmethod
+    def is_feed_file(cls, file_name: str) -> bool:
+        return re.match(cls.FEED_FILE_NAME_PATTERN, file_name) is not None
+
+    @classmethod
+    def get_archive_feed_file_name(cls, archive_index: int) -> str:
+        return cls.ARCHIVE_FEED_FILE_NAME_FORMAT.format(index=archive_index)
+
+    # Whether the feed file exists in the podcast directory
+    def feed_exists(self, podcast_title: str, feed_file_name: str) -> bool:
+        return self._get_feed_file_path(podcast_title, feed_file_name).is_file()
+
+    # Writes the feed (and precompressed variants) unless the content is unchanged.
+    # Files are replaced atomically, i.e. readers never see a partially written feed
+    def write_feed(
+        self, feed: bytes, podcast_title: str, feed_file_name: str = FEED_FILE_NAME
+    ) -> Path:
+        feed_file_path = self._get_feed_file_path(podcast_title, feed_file_name)
+
+        with self._get_feed_lock(feed_file_path):
+            digest = hashlib.sha256(feed).digest()
+            if digest == self._get_feed_digest(feed_file_path):
+                logger.debug(f"Feed unchanged, skipping write: {feed_file_path}")
+                self._count_write("unchanged")
+                # Recreate compressed variants if deleted
+                self._write_compressed_feeds(feed_file_path, feed, only_missing=True)
+                return feed_file_path
+
+            # Write compressed variants first, so they are never older than the feed itself
+            self._write_compressed_feeds(feed_file_path, feed, only_missing=False)
+            self._write_atomic(feed_file_path, feed)
+            self._count_write("written")
+
+            stat = os.stat(feed_file_path)
+            self._feed_digests[feed_file_path] = _FeedFileDigest(
+                digest, stat.st_size, stat.st_mtime_ns
+            )
+        return feed_file_path
+
+    def _count_write(self, result: str) -> None:
+        if self._metrics is not None:
+            self._metrics.feed_writes.inc(result)
+
+    # Returns the digest of the current feed file, or None if no feed exists
+    def _get_feed_digest(self, feed_file_path: Path) -> Optional[bytes]:
+        try:
+            stat = os.stat(feed_file_path)
+        except FileNotFoundError:
+            return None
+
+        # Only read the file if it changed since last written by us
+        cached = self._feed_digests.get(feed_file_path)
+        if cached and (cached.size, cached.mtime_ns) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            return cached.digest
+
+        with open(feed_file_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).digest()
+        self._feed_digests[feed_file_path] = _FeedFileDigest(
+            digest, stat.st_size, stat.st_mtime_ns
+        )
+        return digest
+
+    def _write_compressed_feeds(
+        self, feed_file_path: Path, feed: bytes, only_missing: bool
+    ) -> None:
+        variants: list[tuple[str, Optional[Callable[[bytes], bytes]]]] = [
+            (self.GZIP_SUFFIX, _compress_gzip),
+            (self.BROTLI_SUFFIX, _compress_brotli if brotli else None),
+        ]
+        for suffix, compress in variants:
+            file_path = feed_file_path.with_name(feed_file_path.name + suffix)
+            if compress is None:
+                # Never leave an outdated variant behind that would be served instead of the feed
+                file_path.unlink(missing_ok=True)
+            elif not only_missing or not file_path.exists():
+                self._write_atomic(file_path, compress(feed))
+
+    # Writes to a temp file in the same directory, then renames it to the target path
+    def _write_atomic(self, file_path: Path, data: bytes) -> None:
+        # Keep the permissions of the existing file (temp files are created as 0600)
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+
+        fd, temp_path = tempfile.mkstemp(
+            dir=file_path.parent,
+            prefix=f".{file_path.name}.",
+            suffix=self.TEMP_FILE_SUFFIX,
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def _get_feed_file_path(self, podcast_title: str, feed_file_name: str) -> Path:
         # Convert title to podcast dir
         podcast_dir = self._base_dir / slugify(
             podcast_title
         )  # TODO: Use identifier instead of relying on title slug
-        feed_file_path = podcast_dir / self.FEED_FILE_NAME
+        return podcast_dir / feed_file_name
 
-        with lock:
-            with open(feed_file_path, "wb") as f:
-                f.write(feed)
-        return feed_file_path
+    def _get_feed_lock(self, feed_file_path: Path) -> Lock:
+        with self._feed_locks_lock:
+            return self._feed_locks.setdefault(feed_file_path, Lock())
 
     # Raise exception if no access to the base directory
     # Call at startup to fail fast
@@ -78,3 +375,12 @@ class PodcastFileService:
             raise PodcastFileServiceError(
                 f"Podcast directory does not exist: {podcast_dir}"
             )
+
+
+def _compress_gzip(data: bytes) -> bytes:
+    # Fixed mtime, so the same feed always results in the same file
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data)  # type: ignore
@@ -0,0 +1,497 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from email.utils import formatdate
+from pathlib import Path
+from typing import BinaryIO, Optional
+from urllib.parse import unquote, urlsplit
+
+from src.infra.feed_render_cache import FeedRenderCache, RenderedFeed
+from src.infra.file_reader import PodcastFileService
+from src.infra.repository import PodcastNotFoundError
+
+logger = logging.getLogger(__name__)
+
+_MAX_HEADER_SIZE = 16 * 1024
+_STATUS_REASONS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    416: "Range Not Satisfiable",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpServerError(Exception):
+    pass
+
+
+class _BadRequestError(Exception):
+    pass
+
+
+class _RangeNotSatisfiableError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class _HttpRequest:
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]  # Lower case header name -> value
+
+    @property
+    def is_keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def accepts_gzip(self) -> bool:
+        for coding in self.headers.get("accept-encoding", "").split(","):
+            name, _, params = coding.strip().partition(";")
+            if name.strip().lower() == "gzip":
+                return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00")
+        return False
+
+
+# Feed file content kept in memory, identified by the stat values of the file it was read from
+@dataclass(frozen=True)
+class _CachedFeedFile:
+    size: int
+    mtime_ns: int
+    feed: RenderedFeed
+    last_modified: str
+
+
+# Minimal asyncio HTTP/1.1 server for the podcast files in the base directory, as an alternative to a separate web server:
+# - Feeds are served from memory (reloaded when the file changes) with ETag/304 and gzip.
+#   If a render cache is given, feed.rss is rendered on request instead, i.e. it is never behind the episodes on disk
+# - Episode files are served with sendfile (zero-copy), Range/If-Range and ETag/304 support
+# Only feeds and episode files are served at '<url prefix>/<podcast dir>/<file name>'. Connections above 'max_connections' are rejected with 503.
+# The server runs its own event loop in a separate thread. Files are opened, stat'ed and read in the default executor, as these block on slow (e.g. network) storage
+class PodcastHttpServer:
+    FEED_CONTENT_TYPE = "application/rss+xml; charset=utf-8"
+
+    def __init__(
+        self,
+        base_dir: Path,
+        host: str,
+        port: int,
+        max_connections: int,
+        keep_alive_timeout: timedelta,
+        url_path_prefix: str = "/",  # Path of the base URL
+        feed_cache: Optional[FeedRenderCache] = None,
+    ) -> None:
+        super().__init__()
+        self._base_dir = base_dir
+        self._host = host
+        self._port = port
+        self._max_connections = max_connections
+        self._keep_alive_timeout = keep_alive_timeout.total_seconds()
+        self._url_path_prefix = "/" + url_path_prefix.strip("/")
+        self._feed_cache = feed_cache
+
+        self._connection_count = 0  # Only accessed from the event loop thread
+        self._feeds: dict[Path, _CachedFeedFile] = {}  # Feed file path -> cached feed
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._started = threading.Event()
+        self._start_error: Optional[BaseException] = None
+
+    # Starts serving in a separate thread. Returns once the server is listening
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name="http-server", daemon=True
+        )
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise HttpServerError(
+                f"Failed to start HTTP server on {self._host}:{self._port}: {self._start_error}"
+            ) from self._start_error
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        try:
+            asyncio.run(self._serve())
+        except BaseException as e:
+            self._start_error = e
+            self._started.set()
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        server = await asyncio.start_server(
+            self._handle_connection,
+            self._host,
+            self._port,
+            limit=_MAX_HEADER_SIZE,
+            backlog=self._max_connections,
+        )
+        logger.info(
+            f"HTTP server listening on {self._host}:{self._port} (max {self._max_connections} connections)"
+        )
+        self._started.set()
+        async with server:
+            await self._stop_event.wait()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        if self._connection_count >= self._max_connections:
+            logger.warning("Max connections reached, rejecting connection")
+            await self._close(writer, self._format_error(503, is_keep_alive=False))
+            return
+
+        self._connection_count += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), self._keep_alive_timeout
+                    )
+                except _BadRequestError:
+                    writer.write(self._format_error(400, is_keep_alive=False))
+                    return
+                if request is None:
+                    return  # Connection closed by the client
+
+                if not await self._handle_request(request, writer):
+                    return
+        except (ConnectionError, asyncio.TimeoutError):
+            pass  # Client disconnected or idle keep-alive timeout
+        except Exception as e:
+            logger.exception(f"Error handling HTTP connection: {e}")
+        finally:
+            self._connection_count -= 1
+            await self._close(writer)
+
+    async def _close(
+        self, writer: asyncio.StreamWriter, data: Optional[bytes] = None
+    ) -> None:
+        try:
+            if data:
+                writer.write(data)
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    # Returns None if the connection was closed before a request was received
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[_HttpRequest]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as e:
+            raise _BadRequestError("Request header too large") from e
+
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        parts = request_line.split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise _BadRequestError(f"Invalid request line: {request_line}")
+
+        headers: dict[str, str] = {}
+        for line in header_lines:
+            if not line:
+                continue
+            name, separator, value = line.partition(":")
+            if not separator:
+                raise _BadRequestError(f"Invalid header: {line}")
+            headers[name.strip().lower()] = value.strip()
+
+        # Requests with a body are not supported (only GET/HEAD are allowed anyway)
+        if headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+            raise _BadRequestError("Request body not supported")
+
+        return _HttpRequest(parts[0], parts[1], parts[2], headers)
+
+    # Writes the response. Returns whether the connection should be kept open
+    async def _handle_request(
+        self, request: _HttpRequest, writer: asyncio.StreamWriter
+    ) -> bool:
+        is_keep_alive = request.is_keep_alive
+        if request.method not in ("GET", "HEAD"):
+            writer.write(
+                self._format_error(405, is_keep_alive, [("Allow", "GET, HEAD")])
+            )
+            await writer.drain()
+            return is_keep_alive
+
+        file_path = self._resolve_path(request.target)
+        if (
+            file_path is not None
+            and self._feed_cache is not None
+            and file_path.name == PodcastFileService.FEED_FILE_NAME
+        ):
+            await self._send_rendered_feed(request, writer, file_path.parent.name)
+        elif file_path is not None and PodcastFileService.is_feed_file(file_path.name):
+            await self._send_feed_file(request, writer, file_path)
+        elif file_path is not None and file_path.name.endswith(
+            PodcastFileService.VALID_EPISODE_FILE_EXTENSIONS
+        ):
+            await self._send_file(request, writer, file_path)
+        else:
+            writer.write(self._format_error(404, is_keep_alive))
+
+        await writer.drain()
+        return is_keep_alive
+
+    # Maps the request target to a file in a podcast directory. None if the target does not point to such a file
+    def _resolve_path(self, target: str) -> Optional[Path]:
+        path = unquote(urlsplit(target).path)
+        if self._url_path_prefix != "/":
+            if not path.startswith(self._url_path_prefix + "/"):
+                return None
+            path = path[len(self._url_path_prefix) :]
+
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or any(
+            part in ("", ".", "..") or "\0" in part or "\\" in part for part in parts
+        ):
+            return None
+        return self._base_dir / parts[0] / parts[1]
+
+    async def _send_rendered_feed(
+        self, request: _HttpRequest, writer: asyncio.StreamWriter, podcast_id: str
+    ) -> None:
+        assert self._feed_cache is not None
+        loop = asyncio.get_running_loop()
+        try:
+            # Looking up the cache stats the podcast directory, i.e. blocks
+            render = await loop.run_in_executor(
+                None, self._feed_cache.get_feed, podcast_id
+            )
+            feed = await asyncio.wrap_future(render)
+        except PodcastNotFoundError:
+            writer.write(self._format_error(404, request.is_keep_alive))
+            return
+        except Exception as e:
+            logger.exception(f"Failed to render feed for podcast '{podcast_id}': {e}")
+            writer.write(self._format_error(500, request.is_keep_alive))
+            return
+
+        self._send_feed(request, writer, feed)
+
+    async def _send_feed_file(
+        self, request: _HttpRequest, writer: asyncio.StreamWriter, file_path: Path
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self._get_feed_file, file_path)
+        if cached is None:
+            writer.write(self._format_error(404, request.is_keep_alive))
+            return
+
+        self._send_feed(
+            request, writer, cached.feed, [("Last-Modified", cached.last_modified)]
+        )
+
+    def _send_feed(
+        self,
+        request: _HttpRequest,
+        writer: asyncio.StreamWriter,
+        feed: RenderedFeed,
+        extra_headers: Optional[list[tuple[str, str]]] = None,
+    ) -> None:
+        headers = [
+            ("Content-Type", self.FEED_CONTENT_TYPE),
+            ("ETag", feed.etag),
+            ("Cache-Control", "no-cache"),
+            ("Vary", "Accept-Encoding"),
+        ]
+        headers.extend(extra_headers or [])
+        if _etag_matches(request.headers.get("if-none-match"), feed.etag):
+            writer.write(self._format_head(304, headers, request.is_keep_alive))
+            return
+
+        body = feed.content
+        if request.accepts_gzip:
+            body = feed.gzip_content
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("Content-Length", str(len(body))))
+
+        writer.write(self._format_head(200, headers, request.is_keep_alive))
+        if request.method != "HEAD":
+            writer.write(body)
+
+    # Returns the feed from memory, (re)loading it if the file changed. None if the feed does not exist.
+    # Runs in the executor. Concurrent requests for a changed feed may both reload it, the last one is kept
+    def _get_feed_file(self, file_path: Path) -> Optional[_CachedFeedFile]:
+        try:
+            stat = os.stat(file_path)
+        except (FileNotFoundError, NotADirectoryError):
+            self._feeds.pop(file_path, None)
+            return None
+
+        cached = self._feeds.get(file_path)
+        if cached and (cached.size, cached.mtime_ns) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            return cached
+
+        with open(file_path, "rb") as f:
+            body = f.read()
+        feed = _CachedFeedFile(
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            feed=RenderedFeed.from_content(body),
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+        )
+        self._feeds[file_path] = feed
+        return feed
+
+    async def _send_file(
+        self, request: _HttpRequest, writer: asyncio.StreamWriter, file_path: Path
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        opened = await loop.run_in_executor(None, _open_file, file_path)
+        if opened is None:
+            writer.write(self._format_error(404, request.is_keep_alive))
+            return
+
+        f, stat = opened
+        with f:
+            size = stat.st_size
+            etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+            content_type, _ = mimetypes.guess_type(file_path.name)
+            headers = [
+                ("Content-Type", content_type or "application/octet-stream"),
+                ("ETag", etag),
+                ("Last-Modified", last_modified),
+                ("Accept-Ranges", "bytes"),
+            ]
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                writer.write(self._format_head(304, headers, request.is_keep_alive))
+                return
+
+            status, offset, count = 200, 0, size
+            range_header = request.headers.get("range")
+            if_range = request.headers.get("if-range")
+            # If-Range: Only send the range if the file is unchanged, otherwise send the full file
+            if range_header and (if_range is None or if_range in (etag, last_modified)):
+                try:
+                    byte_range = _parse_range(range_header, size)
+                except _RangeNotSatisfiableError:
+                    writer.write(
+                        self._format_error(
+                            416,
+                            request.is_keep_alive,
+                            [("Content-Range", f"bytes */{size}")],
+                        )
+                    )
+                    return
+                if byte_range is not None:
+                    status, (offset, count) = 206, byte_range
+                    headers.append(
+                        (
+                            "Content-Range",
+                            f"bytes {offset}-{offset + count - 1}/{size}",
+                        )
+                    )
+
+            headers.append(("Content-Length", str(count)))
+            writer.write(self._format_head(status, headers, request.is_keep_alive))
+            if request.method == "HEAD" or count == 0:
+                return
+
+            await writer.drain()
+            # Zero-copy from the file to the socket (falls back to read/write if not supported, e.g. for TLS)
+            await loop.sendfile(writer.transport, f, offset, count)
+
+    def _format_head(
+        self, status: int, headers: list[tuple[str, str]], is_keep_alive: bool
+    ) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_STATUS_REASONS[status]}"]
+        lines.append(f"Date: {formatdate(usegmt=True)}")
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        lines.append(f"Connection: {'keep-alive' if is_keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    def _format_error(
+        self,
+        status: int,
+        is_keep_alive: bool,
+        headers: Optional[list[tuple[str, str]]] = None,
+    ) -> bytes:
+        body = f"{status} {_STATUS_REASONS[status]}\n".encode()
+        all_headers = [
+            ("Content-Type", "text/plain"),
+            ("Content-Length", str(len(body))),
+        ]
+        all_headers.extend(headers or [])
+        return self._format_head(status, all_headers, is_keep_alive) + body
+
+
+# Opens the file for reading. None if it does not exist
+def _open_file(file_path: Path) -> Optional[tuple[BinaryIO, os.stat_result]]:
+    try:
+        f = open(file_path, "rb")
+    except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+        return None
+    try:
+        return f, os.fstat(f.fileno())
+    except BaseException:
+        f.close()
+        raise
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+# Parses a 'Range' header into (offset, count).
+# Returns None if the header should be ignored (invalid or multiple ranges, in which case the full file is sent)
+def _parse_range(range_header: str, size: int) -> Optional[tuple[int, int]]:
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_str, separator, end_str = ranges.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if not start_str:
+            # Suffix range, i.e. the last n bytes
+            suffix_length = int(end_str)
+            if suffix_length <= 0:
+                raise _RangeNotSatisfiableError()
+            start, end = max(size - suffix_length, 0), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise _RangeNotSatisfiableError()
+    if start < 0 or end < start:
+        return None
+    end = min(end, size - 1)
+    return start, end - start + 1
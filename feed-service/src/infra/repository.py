@@ -1,5 +1,6 @@
 import logging
 from pathlib import Path
+from typing import Optional
 
 from src.domain.models import Podcast, PodcastEpisode, PodcastMetadata, ValidUrl
 from src.infra.file_parser import PodcastFileNameParser
@@ -12,6 +13,11 @@ class RepositoryError(Exception):
     pass
 
 
+# The directory does not exist or is not a podcast (has no metadata file)
+class PodcastNotFoundError(RepositoryError):
+    pass
+
+
 # TODO: Use base PodcastRepository in domain layer
 # class PodcastRepository(ABC):
 #     @abstractmethod
@@ -40,8 +46,14 @@ class FileSystemPodcastRepository:
     # Returns all podcasts from the base directory
     def get_all(self):
         logger.debug(f"Loading all podcasts")
-        for podcast_dir in self._file_service.read_podcast_dirs():
-            yield self.get(podcast_id=podcast_dir.name)
+        for podcast_id in self.get_ids():
+            yield self.get(podcast_id=podcast_id)
+
+    # Returns the ids of all podcasts in the base directory without loading them
+    def get_ids(self) -> list[str]:
+        return [
+            podcast_dir.name for podcast_dir in self._file_service.read_podcast_dirs()
+        ]
 
     # Returns podcast from a given directory
     def get(self, podcast_id: str) -> Podcast:
@@ -50,7 +62,10 @@ class FileSystemPodcastRepository:
         podcast_dir = self._base_dir / podcast_id
 
         # Get podcast metadata
-        metadata_yml = self._file_service.read_metadata(podcast_dir)
+        try:
+            metadata_yml = self._file_service.read_metadata(podcast_dir)
+        except (FileNotFoundError, NotADirectoryError) as e:
+            raise PodcastNotFoundError(f"Podcast not found: {podcast_id}") from e
         metadata = PodcastMetadata(**metadata_yml)
 
         # Load episode data from file names in podcast directory
@@ -65,11 +80,75 @@ class FileSystemPodcastRepository:
             description=metadata.description,
             image_url=metadata.image_url,
             file_name=podcast_dir.name,
+            retention_policy=(
+                metadata.retention.to_policy() if metadata.retention else None
+            ),
         )
 
         logger.debug(f"Podcast '{podcast.title}' with {len(podcast)} episode(s) loaded")
 
         return podcast
 
+    # Changes when episodes are added, removed or renamed. None if the podcast does not exist
+    def get_directory_mtime_ns(self, podcast_id: str) -> Optional[int]:
+        return self._file_service.get_podcast_dir_mtime_ns(self._base_dir / podcast_id)
+
     def save_feed(self, feed: bytes, podcast_title: str) -> Path:
         return self._file_service.write_feed(feed, podcast_title)
+
+    # Archive pages of paged feeds are immutable, i.e. only saved if not existing
+    def has_archive_feed(self, podcast_title: str, archive_index: int) -> bool:
+        return self._file_service.feed_exists(
+            podcast_title,
+            PodcastFileService.get_archive_feed_file_name(archive_index),
+        )
+
+    def save_archive_feed(
+        self, feed: bytes, podcast_title: str, archive_index: int
+    ) -> Path:
+        return self._file_service.write_feed(
+            feed,
+            podcast_title,
+            PodcastFileService.get_archive_feed_file_name(archive_index),
+        )
+
+    # Removes the episode files of the podcast. Episodes are moved to a directory per podcast in 'archive_dir' if set, otherwise deleted
+    def remove_episodes(
+        self,
+        podcast: Podcast,
+        episodes: list[PodcastEpisode],
+        archive_dir: Optional[Path] = None,
+    ) -> None:
+        self._file_service.remove_episode_files(
+            self._base_dir / podcast.file_name,
+            [episode.file_name for episode in episodes],
+            archive_dir / podcast.file_name if archive_dir else None,
+        )
+
+    # Removes the archive pages of a paged feed up to the given index (all if None), e.g. as the episodes on them were removed
+    def remove_archive_feeds(
+        self, podcast_title: str, max_index: Optional[int] = None
+    ) -> None:
+        self._file_service.remove_archive_feeds(podcast_title, max_index)
+
+    # Number of episodes removed from the start of the paged feed, i.e. the anchor of its archive pages
+    def get_archive_removed_count(self, podcast_title: str) -> int:
+        return self._file_service.read_archive_removed_count(podcast_title)
+
+    def save_archive_removed_count(
+        self, podcast_title: str, removed_count: int
+    ) -> None:
+        self._file_service.write_archive_removed_count(podcast_title, removed_count)
+
+    # Newest episode on the saved archive pages, used to detect episodes removed other than by retention (see GeneratePodcastFeedUseCase)
+    def get_last_archived_episode(
+        self, podcast_title: str
+    ) -> Optional[tuple[int, str]]:
+        return self._file_service.read_last_archived_episode(podcast_title)
+
+    def save_last_archived_episode(
+        self, podcast_title: str, position: int, file_name: str
+    ) -> None:
+        self._file_service.write_last_archived_episode(
+            podcast_title, position, file_name
+        )
@@ -1,15 +1,45 @@
 # switch to basic due to no type stubs for feedgen
 # pyright: basic
 import logging
+from datetime import datetime, timezone
+from typing import Optional
 from urllib.parse import urljoin
 
 from feedgen import feed
 from feedgen.entry import FeedEntry
+from feedgen.ext.base import BaseExtension
+from feedgen.util import xml_elem
 
-from src.domain.models import Podcast, PodcastEpisode, ValidUrl
+from src.domain.models import FeedPage, Podcast, PodcastEpisode, ValidUrl
+from src.infra.file_reader import PodcastFileService
 
 logger = logging.getLogger(__name__)
 
+ATOM_NS = "http://www.w3.org/2005/Atom"
+FEED_HISTORY_NS = "http://purl.org/syndication/history/1.0"
+# Build date of feeds without episodes. Fixed, as the directory mtime changes with every feed write
+EMPTY_FEED_BUILD_DATE = datetime.fromtimestamp(0, timezone.utc)
+
+
+# Adds the RFC 5005 (Feed Paging and Archiving) elements to a RSS feed.
+# feedgen only writes the 'self' atom link for RSS feeds, so the links are added here
+class FeedHistoryExtension(BaseExtension):
+    def __init__(self) -> None:
+        super().__init__()
+        self.links: list[tuple[str, str]] = []  # (rel, href)
+        self.is_archive = False
+
+    def extend_ns(self):
+        return {"fh": FEED_HISTORY_NS}
+
+    def extend_rss(self, feed):
+        channel = feed[0]
+        for rel, href in self.links:
+            xml_elem(f"{{{ATOM_NS}}}link", channel, rel=rel, href=href)
+        if self.is_archive:
+            xml_elem(f"{{{FEED_HISTORY_NS}}}archive", channel)
+        return feed
+
 
 class UrlGenerator:
     def __init__(self, base_url: ValidUrl) -> None:
@@ -26,6 +56,9 @@ class UrlGenerator:
     ) -> ValidUrl:
         return ValidUrl(urljoin(podcast_url, episode_file_name))
 
+    def generate_feed_url(self, podcast_url: ValidUrl, feed_file_name: str) -> ValidUrl:
+        return ValidUrl(urljoin(podcast_url, feed_file_name))
+
 
 # Converts a podcast domain model to an RSS feed
 class RssFeedAdapter:
@@ -34,8 +67,9 @@ class RssFeedAdapter:
         self._url_generator = url_generator
 
     # Generates a rss podcast feed from the given podcast
+    # If a page is given, only the episodes of that page are included together with the paging links (RFC 5005)
     # NB: Returned as bytes
-    def generate_feed(self, podcast: Podcast) -> bytes:
+    def generate_feed(self, podcast: Podcast, page: Optional[FeedPage] = None) -> bytes:
         logger.debug(f"Generating podcast feed for podcast: {podcast.title}")
 
         rss_feed = feed.FeedGenerator()
@@ -46,7 +80,17 @@ class RssFeedAdapter:
         rss_feed.title(podcast.title)
 
         podcast_url = self._url_generator.generate_podcast_url(podcast.file_name)
-        rss_feed.link(href=podcast_url, rel="self")
+        if page is not None and page.archive_index is not None:
+            # Archive pages refer to themselves
+            rss_feed.link(
+                href=self._url_generator.generate_feed_url(
+                    podcast_url,
+                    PodcastFileService.get_archive_feed_file_name(page.archive_index),
+                ),
+                rel="self",
+            )
+        else:
+            rss_feed.link(href=podcast_url, rel="self")
         # fg.subtitle("Feed subtitle")  # TODO: From metadata
 
         # Set optional fields
@@ -59,8 +103,20 @@ class RssFeedAdapter:
 
         # fg.id(podcast.url)
 
+        episodes = podcast.episodes
+        if page is not None:
+            episodes = page.episodes
+            self._add_paging(rss_feed, podcast_url, page)
+
+        # Use date of newest episode instead of the current time (the default), so an unchanged page results in an identical feed
+        rss_feed.lastBuildDate(
+            max(episode.date for episode in episodes)
+            if episodes
+            else EMPTY_FEED_BUILD_DATE
+        )
+
         # Add entry for each episode
-        for episode in podcast.episodes:
+        for episode in episodes:
             episode_media_url = self._url_generator.generate_episode_url(
                 podcast_url, episode.file_name
             )
@@ -73,6 +129,35 @@ class RssFeedAdapter:
         logger.debug(f"Podcast feed generation completed for: {podcast.title}")
         return rssfeed
 
+    def _add_paging(
+        self, rss_feed: feed.FeedGenerator, podcast_url: ValidUrl, page: FeedPage
+    ) -> None:
+        rss_feed.register_extension("history", FeedHistoryExtension, atom=False)
+        history: FeedHistoryExtension = getattr(rss_feed, "history")
+        history.is_archive = page.is_archive
+
+        if page.is_archive:
+            history.links.append(
+                (
+                    "current",
+                    self._url_generator.generate_feed_url(
+                        podcast_url, PodcastFileService.FEED_FILE_NAME
+                    ),
+                )
+            )
+        if page.prev_archive_index is not None:
+            history.links.append(
+                (
+                    "prev-archive",
+                    self._url_generator.generate_feed_url(
+                        podcast_url,
+                        PodcastFileService.get_archive_feed_file_name(
+                            page.prev_archive_index
+                        ),
+                    ),
+                )
+            )
+
     def _create_entry(
         self, episode: PodcastEpisode, episode_media_url: ValidUrl
     ) -> FeedEntry:
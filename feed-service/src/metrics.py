@@ -0,0 +1,386 @@
+import json
+import logging
+import math
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+from typing_extensions import override
+
+logger = logging.getLogger(__name__)
+
+# Minimal metric types rendered in the Prometheus text format. The rendering ('render', '_format_labels', '_escape', '_format_number') matches recording-service/src/metrics.py, keep both in sync.
+# Thread safe: values are updated from the monitor, debouncer and feed update threads. Updates happen once per event/feed update, so a lock per metric is cheap.
+
+
+class _Metric:
+    def __init__(
+        self, name: str, help: str, type_name: str, label_names: tuple[str, ...]
+    ) -> None:
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.type_name = type_name
+        self.label_names = label_names
+        self._lock = threading.Lock()
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        with self._lock:
+            lines.extend(self._render_values())
+        return lines
+
+    # NB: Called with the lock held
+    def _render_values(self) -> list[str]:
+        raise NotImplementedError
+
+    # Checked on update, so an invalid update fails at the caller instead of when rendering
+    def _check_labels(self, label_values: tuple[str, ...]) -> None:
+        if len(label_values) != len(self.label_names):
+            raise ValueError(
+                f"Metric '{self.name}' expects labels {self.label_names}, got {label_values}"
+            )
+
+    def _format_labels(
+        self, label_values: tuple[str, ...], *extra: tuple[str, str]
+    ) -> str:
+        pairs = [*zip(self.label_names, label_values), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter(_Metric):
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, help, "counter", label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._check_labels(label_values)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    @override
+    def _render_values(self) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(labels)} {_format_number(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        super().__init__(name, help, "gauge", label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str) -> None:
+        self._check_labels(label_values)
+        with self._lock:
+            self._values[label_values] = value
+
+    @override
+    def _render_values(self) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(labels)} {_format_number(value)}"
+            for labels, value in self._values.items()
+        ]
+
+
+# Gauge read from a function when rendered, e.g. the size of a queue
+class CallbackGauge(_Metric):
+    def __init__(self, name: str, help: str, get_value: Callable[[], float]):
+        super().__init__(name, help, "gauge", ())
+        self._get_value = get_value
+
+    def get(self) -> float:
+        return self._get_value()
+
+    @override
+    def _render_values(self) -> list[str]:
+        return [f"{self.name} {_format_number(self._get_value())}"]
+
+
+class _HistogramValue:
+    def __init__(self, bucket_count: int) -> None:
+        super().__init__()
+        self.counts = [0] * bucket_count
+        self.sum: float = 0
+        self.count = 0
+        self.max: float = 0
+
+
+# Summary of a histogram (all label values combined), e.g. for logging
+class HistogramSummary:
+    def __init__(self, count: int, sum: float, max: float) -> None:
+        super().__init__()
+        self.count = count
+        self.sum = sum
+        self.max = max
+
+    @property
+    def average(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+
+class Histogram(_Metric):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        bounds: tuple[float, ...],
+        label_names: tuple[str, ...] = (),
+    ):
+        super().__init__(name, help, "histogram", label_names)
+        self._bounds = tuple(sorted(bounds))
+        self._values: dict[tuple[str, ...], _HistogramValue] = {}
+        # Since the last call to 'pop_summary'
+        self._summary = _HistogramValue(0)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        self._check_labels(label_values)
+        with self._lock:
+            histogram = self._values.get(label_values)
+            if histogram is None:
+                histogram = _HistogramValue(len(self._bounds) + 1)  # Last is +Inf
+                self._values[label_values] = histogram
+            # Index of the first bucket with an upper bound >= value
+            histogram.counts[bisect_left(self._bounds, value)] += 1
+            for summary in (histogram, self._summary):
+                summary.sum += value
+                summary.count += 1
+                summary.max = max(summary.max, value)
+
+    # Returns the summary of the observations since the last call and resets it
+    def pop_summary(self) -> HistogramSummary:
+        with self._lock:
+            summary = self._summary
+            self._summary = _HistogramValue(0)
+        return HistogramSummary(summary.count, summary.sum, summary.max)
+
+    # Buckets are cumulative, i.e. each bucket counts all observations <= its bound
+    @override
+    def _render_values(self) -> list[str]:
+        lines: list[str] = []
+        bounds = [_format_number(b) for b in self._bounds] + ["+Inf"]
+        for label_values, histogram in self._values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                labels = self._format_labels(label_values, ("le", bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = self._format_labels(label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_number(histogram.sum)}")
+            lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_LATENCY_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+# Metrics of the feed-service, covering the path of a change from the directory monitor to the published feed
+class FeedMetrics:
+    def __init__(self) -> None:
+        super().__init__()
+        self.poll_seconds = Histogram(
+            "feed_monitor_poll_seconds",
+            "Duration of a poll of the monitored directory",
+            _DURATION_BUCKETS,
+        )
+        self.debounce_seconds = Histogram(
+            "feed_change_debounce_seconds",
+            "Time from the first change event of a file until it is detected to be complete",
+            _LATENCY_BUCKETS,
+        )
+        self.event_to_publish_seconds = Histogram(
+            "feed_event_to_publish_seconds",
+            "Time from the first change event of a file until the updated feed is written",
+            _LATENCY_BUCKETS,
+        )
+        self.scan_seconds = Histogram(
+            "feed_repository_scan_seconds",
+            "Duration of loading a podcast from its directory",
+            _DURATION_BUCKETS,
+        )
+        self.files_scanned = Counter(
+            "feed_repository_files_scanned_total",
+            "Directory entries read while loading podcasts",
+        )
+        self.update_seconds = Histogram(
+            "feed_update_seconds",
+            "Duration of a feed update (load, render and save)",
+            _DURATION_BUCKETS,
+            ("podcast",),
+        )
+        self.render_seconds = Histogram(
+            "feed_render_seconds",
+            "Duration of rendering the XML of a feed",
+            _DURATION_BUCKETS,
+            ("podcast",),
+        )
+        self.feed_size_bytes = Gauge(
+            "feed_size_bytes", "Size of the last rendered feed", ("podcast",)
+        )
+        self.feed_writes = Counter(
+            "feed_writes_total",
+            "Feed file writes by result ('unchanged' if the write was skipped)",
+            ("result",),
+        )
+        self._metrics: list[_Metric] = [
+            self.poll_seconds,
+            self.debounce_seconds,
+            self.event_to_publish_seconds,
+            self.scan_seconds,
+            self.files_scanned,
+            self.update_seconds,
+            self.render_seconds,
+            self.feed_size_bytes,
+            self.feed_writes,
+        ]
+        self._pending_debounce: Optional[CallbackGauge] = None
+        self._pending_updates: Optional[CallbackGauge] = None
+
+    # Gauges read from the components owning the values
+    def set_pending_sources(
+        self,
+        get_pending_debounce: Callable[[], float],
+        get_pending_updates: Callable[[], float],
+    ) -> None:
+        self._pending_debounce = CallbackGauge(
+            "feed_debounce_pending",
+            "Changed files waiting to be detected as complete",
+            get_pending_debounce,
+        )
+        self._pending_updates = CallbackGauge(
+            "feed_updates_pending",
+            "Queued or running feed updates",
+            get_pending_updates,
+        )
+        self._metrics.extend([self._pending_debounce, self._pending_updates])
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # Summary of the activity since the last call, e.g. for a periodic log line
+    def pop_summary(self) -> dict[str, Any]:
+        written = self.feed_writes.get("written")
+        unchanged = self.feed_writes.get("unchanged")
+        summary: dict[str, Any] = {
+            "debounce_pending": (
+                self._pending_debounce.get() if self._pending_debounce else None
+            ),
+            "updates_pending": (
+                self._pending_updates.get() if self._pending_updates else None
+            ),
+            "files_scanned_total": self.files_scanned.get(),
+            # Share of all feed writes (since start) skipped as the feed was unchanged
+            "write_skip_ratio": (
+                unchanged / (written + unchanged) if written + unchanged else None
+            ),
+        }
+        histograms = {
+            "poll": self.poll_seconds,
+            "debounce": self.debounce_seconds,
+            "event_to_publish": self.event_to_publish_seconds,
+            "scan": self.scan_seconds,
+            "update": self.update_seconds,
+            "render": self.render_seconds,
+        }
+        for name, histogram in histograms.items():
+            histogram_summary = histogram.pop_summary()
+            summary[f"{name}_count"] = histogram_summary.count
+            summary[f"{name}_avg_seconds"] = _round(histogram_summary.average)
+            summary[f"{name}_max_seconds"] = (
+                _round(histogram_summary.max) if histogram_summary.count else None
+            )
+        return summary
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 4) if value is not None else None
+
+
+# Logs a summary of the metrics as a single JSON line at a fixed interval
+class MetricsLogger:
+    def __init__(self, metrics: FeedMetrics, interval: float) -> None:
+        super().__init__()
+        self._metrics = metrics
+        self._interval = interval
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="metrics-logger", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            logger.info(f"Metrics: {json.dumps(self._metrics.pop_summary())}")
+
+
+# Serves the metrics in the Prometheus text format on /metrics
+class MetricsServer:
+    def __init__(self, metrics: FeedMetrics, host: str, port: int) -> None:
+        super().__init__()
+        self._metrics = metrics
+        self._host = host
+        self._port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        metrics = self._metrics
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            @override
+            def log_message(self, format: str, *args: Any) -> None:
+                pass  # No access log
+
+        self._server = ThreadingHTTPServer((self._host, self._port), _Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        logger.info(f"Serving metrics on http://{self._host}:{self._port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,117 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Generator
+
+logger = logging.getLogger(__name__)
+
+
+# Opt-in profiling of single runs (e.g. a feed update). Per profiled run, the following files are written to the output directory:
+# - <run>.prof: cProfile stats of the thread executing the run (open with e.g. snakeviz or pstats)
+# - <run>.json: Wall time, CPU time of the thread, peak traced memory and the top functions by cumulative time
+# Only the newest 'max_runs' runs are kept.
+# Profiled runs are serialized, i.e. parallel runs (e.g. feed updates of different podcasts) wait for each other while profiling is enabled.
+# Only one cProfile profiler can be active per process (Python 3.12+) and the peak of the traced memory is process wide, so parallel runs would fail or distort each other.
+# When disabled, profiling a run costs a single attribute check. Can be enabled/disabled at runtime (e.g. via signal)
+class Profiler:
+    TOP_FUNCTIONS_COUNT = 20
+
+    def __init__(self, output_dir: Path, max_runs: int, enabled: bool = False) -> None:
+        super().__init__()
+        self._output_dir = output_dir
+        self._max_runs = max_runs
+        self._enabled = enabled
+        self._run_lock = threading.Lock()  # Held during a profiled run
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        self._enabled = enabled
+        logger.info(
+            f"Profiling {'enabled' if enabled else 'disabled'} (output: {self._output_dir})"
+        )
+
+    def toggle(self) -> None:
+        self.set_enabled(not self._enabled)
+
+    # Profiles the code run in the context if profiling is enabled
+    @contextmanager
+    def profile(self, name: str) -> Generator[None, None, None]:
+        if not self._enabled:
+            yield
+            return
+
+        with self._run_lock:
+            tracemalloc.start()
+            profile = cProfile.Profile()
+            started_at = datetime.now(timezone.utc)
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                wall_time = time.perf_counter() - wall_start
+                cpu_time = time.thread_time() - cpu_start
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                try:
+                    self._write_run(
+                        name, started_at, profile, wall_time, cpu_time, peak_bytes
+                    )
+                except OSError as e:
+                    logger.warning(f"Unable to write profile for '{name}': {e}")
+
+    def _write_run(
+        self,
+        name: str,
+        started_at: datetime,
+        profile: cProfile.Profile,
+        wall_time: float,
+        cpu_time: float,
+        peak_bytes: int,
+    ) -> None:
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        run_id = f"{started_at.strftime('%Y%m%dT%H%M%S%f')}-{name}"
+        profile.dump_stats(self._output_dir / f"{run_id}.prof")
+
+        stats_output = io.StringIO()
+        stats = pstats.Stats(profile, stream=stats_output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+            self.TOP_FUNCTIONS_COUNT
+        )
+        summary = {
+            "name": name,
+            "started_at": started_at.isoformat(),
+            "wall_time_seconds": wall_time,
+            "cpu_time_seconds": cpu_time,
+            "peak_traced_memory_bytes": peak_bytes,
+            "top_functions": stats_output.getvalue().splitlines(),
+        }
+        with open(self._output_dir / f"{run_id}.json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info(
+            f"Profile of '{name}' written: wall {wall_time:.3f} s, CPU {cpu_time:.3f} s, peak memory {peak_bytes / 1024:.0f} KiB"
+        )
+        self._remove_old_runs()
+
+    # Keeps only the files of the newest runs. File names start with the start time of the run
+    def _remove_old_runs(self) -> None:
+        run_ids = sorted(
+            {path.stem for path in self._output_dir.glob("*.json")}, reverse=True
+        )
+        for run_id in run_ids[self._max_runs :]:
+            for path in self._output_dir.glob(f"{run_id}.*"):
+                path.unlink(missing_ok=True)
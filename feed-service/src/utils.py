@@ -30,6 +30,11 @@ def get_args():
         help="Path of yaml config file",
         default="config.yml",
     )
+    ap.add_argument(
+        "--retention-report",
+        action="store_true",
+        help="Print the episodes that would be removed by the retention limits and exit",
+    )
     args = vars(ap.parse_args())
     return args
 
@@ -0,0 +1,206 @@
+# pyright: reportPrivateUsage=false
+import os
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from typing_extensions import override
+from watchdog.events import (
+    DirMovedEvent,
+    FileMovedEvent,
+    FileSystemEvent,
+    FileSystemEventHandler,
+)
+from watchdog.observers.api import BaseObserver, EventQueue, ObservedWatch
+from watchdog.observers.polling import PollingObserver
+
+from src.infra.adaptive_polling_observer import (
+    AdaptivePollingEmitter,
+    AdaptivePollingObserver,
+)
+
+HOT_INTERVAL = timedelta(milliseconds=50)
+COLD_INTERVAL = timedelta(seconds=60)
+
+
+# Collects the events as (change, path), with moves as deletion and creation (as the adaptive emitter reports them). Directory modifications are left out, as the observers report them for different directories
+class EventCollector(FileSystemEventHandler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.changes: set[tuple[str, str]] = set()
+        self._changed = threading.Condition()
+
+    @override
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        with self._changed:
+            if isinstance(event, (FileMovedEvent, DirMovedEvent)):
+                self.changes.add(("deleted", event.src_path))
+                self.changes.add(("created", event.dest_path))
+            elif not (event.is_directory and event.event_type == "modified"):
+                self.changes.add((event.event_type, event.src_path))
+            self._changed.notify_all()
+
+    # Whether the changes were collected within the timeout
+    def wait_for(self, changes: set[tuple[str, str]], timeout: float = 5) -> bool:
+        with self._changed:
+            return self._changed.wait_for(lambda: changes <= self.changes, timeout)
+
+
+def start_observer(observer: BaseObserver, root: Path) -> EventCollector:
+    collector = EventCollector()
+    observer.schedule(collector, str(root), recursive=True)  # type: ignore
+    observer.start()
+    return collector
+
+
+def create_observer(hot_period: timedelta) -> AdaptivePollingObserver:
+    return AdaptivePollingObserver(
+        hot_interval=HOT_INTERVAL,
+        cold_interval=COLD_INTERVAL,
+        hot_period=hot_period,
+        max_stats_per_second=10000,
+    )
+
+
+def create_emitter(root: Path, max_stats_per_second: int) -> AdaptivePollingEmitter:
+    return AdaptivePollingEmitter(
+        EventQueue(),
+        ObservedWatch(str(root), recursive=True),
+        timeout=1,
+        hot_interval=HOT_INTERVAL,
+        cold_interval=COLD_INTERVAL,
+        hot_period=timedelta(minutes=1),
+        max_stats_per_second=max_stats_per_second,
+    )
+
+
+# Sets the modification time an hour back, i.e. the file was not written recently
+def write_old_file(file_path: Path) -> None:
+    file_path.write_bytes(b"\0")
+    hour_ago = time.time() - 3600
+    os.utime(file_path, (hour_ago, hour_ago))
+
+
+def test_events_match_polling_observer(tmp_path: Path):
+    podcast_dir = tmp_path / "podcast"
+    podcast_dir.mkdir()
+    write_old_file(podcast_dir / "old.mp3")
+    observers: list[BaseObserver] = [
+        PollingObserver(timeout=HOT_INTERVAL.total_seconds()),  # type: ignore
+        create_observer(hot_period=timedelta(minutes=1)),
+    ]
+    collectors = [start_observer(observer, tmp_path) for observer in observers]
+    # Each step waits for both observers, i.e. changes are not merged into one poll
+    steps = [
+        (
+            lambda: (podcast_dir / "new.mp3").write_bytes(b"\0"),
+            {("created", str(podcast_dir / "new.mp3"))},
+        ),
+        (
+            lambda: (podcast_dir / "new.mp3").write_bytes(b"\0" * 2),
+            {("modified", str(podcast_dir / "new.mp3"))},
+        ),
+        (
+            lambda: (podcast_dir / "old.mp3").unlink(),
+            {("deleted", str(podcast_dir / "old.mp3"))},
+        ),
+        (
+            lambda: podcast_dir.rename(tmp_path / "renamed"),
+            {
+                ("deleted", str(podcast_dir)),
+                ("deleted", str(podcast_dir / "new.mp3")),
+                ("created", str(tmp_path / "renamed")),
+                ("created", str(tmp_path / "renamed" / "new.mp3")),
+            },
+        ),
+    ]
+    try:
+        time.sleep(0.2)  # Initial snapshots
+        for change, expected in steps:
+            change()
+            for collector in collectors:
+                assert collector.wait_for(expected), expected
+    finally:
+        for observer in observers:
+            observer.stop()
+            observer.join()
+
+    assert collectors[0].changes == collectors[1].changes
+
+
+def test_cold_directory_is_polled_when_its_mtime_changes(tmp_path: Path):
+    podcast_dir = tmp_path / "podcast"
+    podcast_dir.mkdir()
+    old_file_path = podcast_dir / "old.mp3"
+    write_old_file(old_file_path)
+    observer = create_observer(hot_period=timedelta(seconds=1))
+    collector = start_observer(observer, tmp_path)
+    try:
+        time.sleep(0.2)  # Initial snapshot
+
+        # Cold: Writing to a file does not change the mtime of the directory, i.e. is not noticed until the cold interval
+        old_file_path.write_bytes(b"\0" * 2)
+        assert not collector.wait_for({("modified", str(old_file_path))}, 0.5)
+
+        # Adding a file changes the mtime, which the (always hot) root notices and polls the directory
+        new_file_path = podcast_dir / "new.mp3"
+        new_file_path.write_bytes(b"\0")
+        assert collector.wait_for(
+            {("created", str(new_file_path)), ("modified", str(old_file_path))}
+        )
+
+        # Hot after the change
+        new_file_path.write_bytes(b"\0" * 2)
+        assert collector.wait_for({("modified", str(new_file_path))}, 0.5)
+
+        # Cold again after the hot period
+        time.sleep(1.5)
+        collector.changes.clear()
+        new_file_path.write_bytes(b"\0" * 3)
+        assert not collector.wait_for({("modified", str(new_file_path))}, 0.5)
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def test_directories_are_scheduled_by_activity(tmp_path: Path):
+    write_old_file(tmp_path / "root.mp3")
+    (tmp_path / "cold").mkdir()
+    write_old_file(tmp_path / "cold" / "old.mp3")
+    (tmp_path / "hot").mkdir()
+    (tmp_path / "hot" / "new.mp3").write_bytes(b"\0")
+    emitter = create_emitter(tmp_path, max_stats_per_second=10000)
+
+    start = time.monotonic()
+    emitter.on_thread_start()
+
+    def get_delay(path: Path) -> float:
+        return emitter._directories[str(path)].next_poll - start
+
+    # The root is always hot
+    assert get_delay(tmp_path) < 1
+    assert get_delay(tmp_path / "hot") < 1
+    assert get_delay(tmp_path / "cold") > 30
+    # Due first, i.e. the emitter waits for the hot interval
+    assert emitter._poll_queue[0][1] in (str(tmp_path), str(tmp_path / "hot"))
+    now = time.monotonic()
+    assert emitter._get_time_until_next_poll(now) <= HOT_INTERVAL.total_seconds()
+
+
+def test_discovery_is_limited_by_stat_budget(tmp_path: Path):
+    for i in range(5):
+        directory = tmp_path / str(i)
+        directory.mkdir()
+        for j in range(49):
+            (directory / f"{j}.mp3").write_bytes(b"\0")
+    emitter = create_emitter(tmp_path, max_stats_per_second=100)
+
+    start = time.monotonic()
+    emitter.on_thread_start()
+
+    # 256 stats with a burst of 100, i.e. the directories after the burst wait for the bucket to refill
+    assert time.monotonic() - start >= 0.9
+    assert len(emitter._directories) == 6
+    # In debt, i.e. the next poll waits as well
+    assert emitter._stat_tokens < 0
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from src.infra.completion_detector import FILE_DELETED_REASON, FileCompletionDetector
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        super().__init__()
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def create_detector(
+    clock: FakeClock, max_stable_minutes: int = 2
+) -> FileCompletionDetector:
+    return FileCompletionDetector(
+        fallback_time=timedelta(minutes=5),
+        min_stable_time=timedelta(seconds=5),
+        max_stable_time=timedelta(minutes=max_stable_minutes),
+        check_audio_trailer=False,
+        clock=clock,
+    )
+
+
+# Appends to the file and registers the change, as the file changed handler does on a file system event
+def write(detector: FileCompletionDetector, file_path: Path) -> None:
+    with open(file_path, "ab") as f:
+        f.write(b"\0" * 1024)
+    detector.on_file_changed(file_path)
+
+
+# Checks the file once its check delay has passed, as the file changed handler does
+def check_after_delay(
+    detector: FileCompletionDetector, clock: FakeClock, file_path: Path
+) -> Optional[str]:
+    clock.advance(detector.get_check_delay(file_path).total_seconds())
+    return detector.check(file_path)
+
+
+def test_growing_file_with_single_quiet_window_is_not_complete(tmp_path: Path):
+    clock = FakeClock()
+    detector = create_detector(clock)
+    file_path = tmp_path / "recording.mp3"
+
+    # First write, then quiet for longer than the min stable time
+    write(detector, file_path)
+    assert detector.get_check_delay(file_path) == timedelta(minutes=2)
+    clock.advance(10)
+    assert detector.check(file_path) is None
+
+    # Still recording, written every 30 seconds
+    for _ in range(3):
+        clock.advance(20)
+        write(detector, file_path)
+        clock.advance(10)
+        assert detector.check(file_path) is None
+
+
+def test_file_is_complete_after_cadence_window(tmp_path: Path):
+    clock = FakeClock()
+    detector = create_detector(clock)
+    file_path = tmp_path / "recording.mp3"
+
+    for _ in range(3):
+        write(detector, file_path)
+        clock.advance(10)
+    write(detector, file_path)
+
+    # Cadence of 10 seconds * factor
+    assert detector.get_check_delay(file_path) == timedelta(seconds=40)
+    clock.advance(39)
+    assert detector.check(file_path) is None
+    clock.advance(1)
+    assert detector.check(file_path) is not None
+
+
+def test_file_with_unknown_cadence_is_complete_after_max_stable_time(
+    tmp_path: Path,
+):
+    clock = FakeClock()
+    detector = create_detector(clock)
+    file_path = tmp_path / "episode.mp3"
+
+    write(detector, file_path)
+    assert check_after_delay(detector, clock, file_path) is not None
+
+
+def test_cadence_is_kept_after_file_is_complete(tmp_path: Path):
+    clock = FakeClock()
+    detector = create_detector(clock, max_stable_minutes=10)
+    file_path = tmp_path / "recording.mp3"
+
+    for _ in range(3):
+        write(detector, file_path)
+        clock.advance(10)
+    assert check_after_delay(detector, clock, file_path) is not None
+
+    # Changed again, i.e. was still being written: The window is based on the longest gap so far (50 seconds) instead of starting over with an unknown cadence
+    write(detector, file_path)
+    assert detector.get_check_delay(file_path) == timedelta(seconds=200)
+
+
+def test_state_is_dropped_when_file_is_deleted(tmp_path: Path):
+    clock = FakeClock()
+    detector = create_detector(clock)
+    file_path = tmp_path / "recording.mp3"
+
+    write(detector, file_path)
+    file_path.unlink()
+    assert detector.check(file_path) == FILE_DELETED_REASON
+    assert detector.file_count == 0
+
+
+def test_state_of_unchanged_file_is_dropped(tmp_path: Path):
+    clock = FakeClock()
+    detector = create_detector(clock)
+    old_file_path = tmp_path / "old.mp3"
+    new_file_path = tmp_path / "new.mp3"
+
+    write(detector, old_file_path)
+    clock.advance(timedelta(minutes=5).total_seconds())
+    write(detector, new_file_path)
+    assert detector.file_count == 1
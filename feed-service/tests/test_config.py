@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import Any
+
+import pytest
+import yaml
+
+from src.config import ConfigError, YamlConfigParser
+
+
+def write_config(tmp_path: Path, **values: Any) -> Path:
+    config_path = tmp_path / "config.yml"
+    data = {"base_directory": str(tmp_path), "base_url": "http://localhost/"}
+    config_path.write_text(yaml.safe_dump({**data, **values}))
+    return config_path
+
+
+def test_valid_config(tmp_path: Path):
+    config = YamlConfigParser().parse(write_config(tmp_path, feed_page_size=50))
+
+    assert config.base_dir == tmp_path.resolve()
+    assert config.feed_page_size == 50
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"max_parallel_feed_updates": 0},
+        {"feed_page_size": "many"},
+        {"feed_page_size": 0},
+        {"feed_page_size": [50]},
+        {"monitor": {"hot_poll_interval_seconds": 120}},
+        {"completion": {"min_stable_seconds": 600}},
+    ],
+)
+def test_invalid_value_raises_config_error(tmp_path: Path, values: dict[str, Any]):
+    with pytest.raises(ConfigError):
+        YamlConfigParser().parse(write_config(tmp_path, **values))
+
+
+def test_archive_dir_inside_base_dir_raises_config_error(tmp_path: Path):
+    config_path = write_config(
+        tmp_path, retention={"archive_dir": str(tmp_path / "archive")}
+    )
+
+    with pytest.raises(ConfigError):
+        YamlConfigParser().parse(config_path)
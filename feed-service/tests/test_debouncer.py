@@ -0,0 +1,132 @@
+# pyright: reportPrivateUsage=false
+import threading
+import time
+from datetime import timedelta
+
+from src.infra.debouncer import Debouncer
+
+
+# Collects the keys the callback is invoked with, and the monotonic time of each call
+class CallbackRecorder:
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list[tuple[str, float]] = []
+        self._called = threading.Condition()
+
+    def __call__(self, key: str) -> None:
+        with self._called:
+            self.calls.append((key, time.monotonic()))
+            self._called.notify_all()
+
+    @property
+    def keys(self) -> list[str]:
+        with self._called:
+            return [key for key, _ in self.calls]
+
+    # Whether the callback was invoked the given number of times within the timeout
+    def wait_for(self, count: int, timeout: float = 5) -> bool:
+        with self._called:
+            return self._called.wait_for(lambda: len(self.calls) >= count, timeout)
+
+
+def ms(milliseconds: int) -> timedelta:
+    return timedelta(milliseconds=milliseconds)
+
+
+def test_callback_is_invoked_once_after_delay():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+    start = time.monotonic()
+
+    debouncer.schedule("a", ms(50))
+
+    assert recorder.wait_for(1)
+    assert recorder.calls[0][1] - start >= 0.05
+    assert not recorder.wait_for(2, 0.2)
+    assert debouncer.pending_count == 0
+    debouncer.stop()
+
+
+def test_reschedule_to_later_deadline_defers_callback():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+    start = time.monotonic()
+
+    debouncer.schedule("a", ms(100))
+    time.sleep(0.05)
+    debouncer.schedule("a", ms(300))
+
+    assert recorder.wait_for(1)
+    assert recorder.calls[0][1] - start >= 0.35
+    assert not recorder.wait_for(2, 0.2)
+    debouncer.stop()
+
+
+def test_reschedule_to_earlier_deadline_advances_callback():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+
+    debouncer.schedule("a", timedelta(seconds=10))
+    debouncer.schedule("a", ms(50))
+
+    assert recorder.wait_for(1, 1)
+    assert recorder.keys == ["a"]
+    debouncer.stop()
+
+
+def test_keys_are_invoked_in_deadline_order():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+
+    debouncer.schedule("c", ms(150))
+    debouncer.schedule("a", ms(50))
+    debouncer.schedule("b", ms(100))
+
+    assert recorder.wait_for(3)
+    assert recorder.keys == ["a", "b", "c"]
+    debouncer.stop()
+
+
+def test_cancelled_key_is_not_invoked():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+
+    debouncer.schedule("a", ms(50))
+    debouncer.schedule("b", ms(100))
+    debouncer.cancel("a")
+
+    assert debouncer.pending_count == 1
+    assert recorder.wait_for(1)
+    assert not recorder.wait_for(2, 0.1)
+    assert recorder.keys == ["b"]
+    debouncer.stop()
+
+
+def test_stop_discards_pending_keys():
+    recorder = CallbackRecorder()
+    debouncer = Debouncer[str](recorder)
+    debouncer.schedule("a", ms(100))
+
+    debouncer.stop()
+    debouncer.schedule("b", ms(10))
+
+    assert debouncer._thread is not None
+    assert not debouncer._thread.is_alive()
+    assert not recorder.wait_for(1, 0.2)
+
+
+def test_failing_callback_does_not_stop_the_debouncer():
+    recorder = CallbackRecorder()
+
+    def callback(key: str) -> None:
+        recorder(key)
+        if key == "a":
+            raise ValueError("Callback failed")
+
+    debouncer = Debouncer[str](callback)
+    debouncer.schedule("a", ms(10))
+    debouncer.schedule("b", ms(50))
+
+    assert recorder.wait_for(2)
+    assert recorder.keys == ["a", "b"]
+    debouncer.stop()
@@ -0,0 +1,193 @@
+import uuid
+import xml.etree.ElementTree as ET
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from src.application.generate_podcast_feed_usecase import GeneratePodcastFeedUseCase
+from src.application.retention_service import EpisodeRetentionService
+from src.domain.models import RetentionPolicy, ValidUrl
+from src.infra.file_parser import PodcastFileNameParser
+from src.infra.file_reader import PodcastFileService
+from src.infra.repository import FileSystemPodcastRepository
+from src.infra.rss_feed_adapter import RssFeedAdapter, UrlGenerator
+
+FIRST_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PAGE_SIZE = 3
+
+
+# Creates a podcast directory with an episode per day, oldest first. Returns the episode file names
+def create_podcast(base_dir: Path, episode_count: int) -> list[str]:
+    podcast_dir = base_dir / "podcast"
+    podcast_dir.mkdir()
+    (podcast_dir / "metadata.yml").write_text("title: podcast\n")
+    return add_episodes(podcast_dir, 0, episode_count)
+
+
+def add_episodes(podcast_dir: Path, first_day: int, episode_count: int) -> list[str]:
+    file_names: list[str] = []
+    for i in range(first_day, first_day + episode_count):
+        date = (FIRST_DATE + timedelta(days=i)).strftime("%Y-%m-%d")
+        file_name = f"{date}--1200-1300--podcast--{uuid.uuid4()}.mp3"
+        (podcast_dir / file_name).write_bytes(b"\0" * 100)
+        file_names.append(file_name)
+    return file_names
+
+
+def create_repo(base_dir: Path) -> FileSystemPodcastRepository:
+    return FileSystemPodcastRepository(
+        base_dir, PodcastFileNameParser(), PodcastFileService(base_dir)
+    )
+
+
+def create_usecase(
+    repo: FileSystemPodcastRepository, max_episodes: Optional[int] = None
+) -> GeneratePodcastFeedUseCase:
+    return GeneratePodcastFeedUseCase(
+        repo,
+        RssFeedAdapter(UrlGenerator(ValidUrl("http://localhost/"))),
+        page_size=PAGE_SIZE,
+        retention=EpisodeRetentionService(
+            repo, RetentionPolicy(max_episodes=max_episodes), page_size=PAGE_SIZE
+        ),
+    )
+
+
+# Episode file names of the feed file, oldest first
+def read_feed_episodes(feed_path: Path) -> list[str]:
+    channel = ET.parse(feed_path).getroot()[0]
+    urls = [item.find("enclosure").attrib["url"] for item in channel.iter("item")]  # type: ignore
+    return sorted(url.rsplit("/", 1)[-1] for url in urls)
+
+
+def has_prev_archive_link(feed_path: Path) -> bool:
+    return any(
+        link.attrib.get("rel") == "prev-archive"
+        for link in ET.parse(feed_path)
+        .getroot()
+        .iter("{http://www.w3.org/2005/Atom}link")
+    )
+
+
+def get_archive_page_names(podcast_dir: Path) -> list[str]:
+    return sorted(path.name for path in podcast_dir.glob("feed-archive-*.rss"))
+
+
+def test_pages_are_anchored_to_first_episode(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 8)
+    podcast = create_repo(tmp_path).get("podcast")
+
+    pages = podcast.get_feed_pages(PAGE_SIZE)
+
+    assert [(page.archive_index, page.prev_archive_index) for page in pages] == [
+        (1, None),
+        (None, 1),
+    ]
+    assert [e.file_name for e in pages[0].episodes] == file_names[:3]
+    # The current page holds 'page_size' to 2*'page_size'-1 episodes
+    assert [e.file_name for e in pages[1].episodes] == file_names[3:]
+
+
+def test_page_boundaries_are_stable_after_removals(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 12)
+    podcast = create_repo(tmp_path).get("podcast")
+    before = podcast.get_feed_pages(PAGE_SIZE)
+    episodes = sorted(podcast.episodes, key=lambda e: e.file_name)
+
+    for removed_count in range(1, 7):
+        remaining = replace(podcast, episodes=episodes[removed_count:])
+        after = remaining.get_feed_pages(PAGE_SIZE, removed_count)
+
+        # Pages keep their index and episodes, only the oldest page holds less episodes
+        assert after[-1].episodes == before[-1].episodes
+        for page in after[:-1]:
+            assert page.archive_index is not None
+            assert page.episodes == [
+                e
+                for e in before[page.archive_index - 1].episodes
+                if e.file_name in file_names[removed_count:]
+            ]
+        assert after[0].prev_archive_index is None
+
+
+def test_retention_keeps_archive_pages_of_remaining_episodes(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 12)
+    podcast_dir = tmp_path / "podcast"
+    repo = create_repo(tmp_path)
+    create_usecase(repo).generate_feed("podcast")
+    page_3 = podcast_dir / "feed-archive-3.rss"
+    page_3_mtime_ns = page_3.stat().st_mtime_ns
+
+    create_usecase(repo, max_episodes=8).generate_feed("podcast")
+
+    # Page 1 has no episodes left and page 2 is regenerated as the oldest page
+    assert get_archive_page_names(podcast_dir) == [
+        "feed-archive-2.rss",
+        "feed-archive-3.rss",
+    ]
+    assert read_feed_episodes(podcast_dir / "feed-archive-2.rss") == file_names[4:6]
+    assert not has_prev_archive_link(podcast_dir / "feed-archive-2.rss")
+    assert page_3.stat().st_mtime_ns == page_3_mtime_ns
+    assert read_feed_episodes(page_3) == file_names[6:9]
+    assert read_feed_episodes(podcast_dir / "feed.rss") == file_names[9:]
+    # The anchor is persisted next to the feed
+    assert repo.get_archive_removed_count("podcast") == 4
+
+
+def test_new_episodes_add_archive_pages(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 6)
+    podcast_dir = tmp_path / "podcast"
+    repo = create_repo(tmp_path)
+    usecase = create_usecase(repo)
+    usecase.generate_feed("podcast")
+    page_1_mtime_ns = (podcast_dir / "feed-archive-1.rss").stat().st_mtime_ns
+
+    file_names += add_episodes(podcast_dir, 6, 3)
+    usecase.generate_feed("podcast")
+
+    assert get_archive_page_names(podcast_dir) == [
+        "feed-archive-1.rss",
+        "feed-archive-2.rss",
+    ]
+    assert (podcast_dir / "feed-archive-1.rss").stat().st_mtime_ns == page_1_mtime_ns
+    assert read_feed_episodes(podcast_dir / "feed-archive-2.rss") == file_names[3:6]
+    assert has_prev_archive_link(podcast_dir / "feed-archive-2.rss")
+    assert read_feed_episodes(podcast_dir / "feed.rss") == file_names[6:]
+
+
+def test_manually_deleted_episode_regenerates_archive_pages(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 10)
+    podcast_dir = tmp_path / "podcast"
+    repo = create_repo(tmp_path)
+    usecase = create_usecase(repo)
+    usecase.generate_feed("podcast")
+
+    (podcast_dir / file_names[1]).unlink()
+    usecase.generate_feed("podcast")
+
+    remaining = file_names[:1] + file_names[2:]
+    assert get_archive_page_names(podcast_dir) == [
+        "feed-archive-1.rss",
+        "feed-archive-2.rss",
+    ]
+    assert read_feed_episodes(podcast_dir / "feed-archive-1.rss") == remaining[:3]
+    assert read_feed_episodes(podcast_dir / "feed-archive-2.rss") == remaining[3:6]
+    assert read_feed_episodes(podcast_dir / "feed.rss") == remaining[6:]
+
+
+def test_manually_deleted_episode_of_current_page_keeps_archive_pages(
+    tmp_path: Path,
+):
+    file_names = create_podcast(tmp_path, 10)
+    podcast_dir = tmp_path / "podcast"
+    repo = create_repo(tmp_path)
+    usecase = create_usecase(repo)
+    usecase.generate_feed("podcast")
+    page_2_mtime_ns = (podcast_dir / "feed-archive-2.rss").stat().st_mtime_ns
+
+    (podcast_dir / file_names[-1]).unlink()
+    usecase.generate_feed("podcast")
+
+    assert (podcast_dir / "feed-archive-2.rss").stat().st_mtime_ns == page_2_mtime_ns
+    assert read_feed_episodes(podcast_dir / "feed.rss") == file_names[6:9]
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from src.application.generate_podcast_feed_usecase import GeneratePodcastFeedUseCase
+from src.application.retention_service import EpisodeRetentionService
+from src.domain.models import RetentionPolicy, ValidUrl
+from src.infra.feed_render_cache import FeedRenderCache
+from src.infra.file_parser import PodcastFileNameParser
+from src.infra.file_reader import PodcastFileService
+from src.infra.repository import FileSystemPodcastRepository, PodcastNotFoundError
+from src.infra.rss_feed_adapter import RssFeedAdapter, UrlGenerator
+
+FIRST_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+# Creates a podcast directory with an episode per day, oldest first. Returns the episode file names
+def create_podcast(base_dir: Path, episode_count: int) -> list[str]:
+    podcast_dir = base_dir / "podcast"
+    podcast_dir.mkdir()
+    (podcast_dir / "metadata.yml").write_text("title: podcast\n")
+    file_names: list[str] = []
+    for i in range(episode_count):
+        date = (FIRST_DATE + timedelta(days=i)).strftime("%Y-%m-%d")
+        file_name = f"{date}--1200-1300--podcast--{uuid.uuid4()}.mp3"
+        (podcast_dir / file_name).write_bytes(b"\0" * 100)
+        file_names.append(file_name)
+    return file_names
+
+
+def create_usecase(
+    base_dir: Path, max_episodes: Optional[int] = None, page_size: Optional[int] = None
+) -> GeneratePodcastFeedUseCase:
+    repo = FileSystemPodcastRepository(
+        base_dir, PodcastFileNameParser(), PodcastFileService(base_dir)
+    )
+    retention = EpisodeRetentionService(
+        repo, RetentionPolicy(max_episodes=max_episodes), page_size=page_size
+    )
+    return GeneratePodcastFeedUseCase(
+        repo,
+        RssFeedAdapter(UrlGenerator(ValidUrl("http://localhost/"))),
+        page_size=page_size,
+        retention=retention,
+    )
+
+
+def create_cache(
+    base_dir: Path, usecase: GeneratePodcastFeedUseCase
+) -> FeedRenderCache:
+    repo = FileSystemPodcastRepository(
+        base_dir, PodcastFileNameParser(), PodcastFileService(base_dir)
+    )
+    return FeedRenderCache(repo, usecase.render_feed, max_bytes=1024 * 1024)
+
+
+def test_podcast_without_metadata_is_not_found(tmp_path: Path):
+    (tmp_path / "podcast").mkdir()
+    cache = create_cache(tmp_path, create_usecase(tmp_path))
+
+    with pytest.raises(PodcastNotFoundError):
+        cache.get_feed("podcast").result()
+
+
+def test_missing_podcast_is_not_found(tmp_path: Path):
+    cache = create_cache(tmp_path, create_usecase(tmp_path))
+
+    with pytest.raises(PodcastNotFoundError):
+        cache.get_feed("podcast").result()
+
+
+def test_rendered_feed_leaves_out_episodes_exceeding_retention(tmp_path: Path):
+    file_names = create_podcast(tmp_path, 5)
+    cache = create_cache(tmp_path, create_usecase(tmp_path, max_episodes=3))
+
+    content = cache.get_feed("podcast").result().content
+
+    assert all(file_name.encode() not in content for file_name in file_names[:2])
+    assert all(file_name.encode() in content for file_name in file_names[2:])
+    # Removing is left to the feed update
+    assert all((tmp_path / "podcast" / name).exists() for name in file_names)
+
+
+def test_rendered_paged_feed_equals_saved_feed(tmp_path: Path):
+    create_podcast(tmp_path, 12)
+    usecase = create_usecase(tmp_path, max_episodes=8, page_size=3)
+
+    rendered = usecase.render_feed("podcast")
+    feed_path = usecase.generate_feed("podcast")
+
+    assert feed_path.read_bytes() == rendered
@@ -0,0 +1,100 @@
+import threading
+
+from src.application.feed_update_queue import FeedUpdateQueue
+
+
+# Records the updates and blocks each until released, i.e. the test decides when an update completes
+class BlockingUpdater:
+    def __init__(self) -> None:
+        super().__init__()
+        self.updates: list[str] = []
+        self._changed = threading.Condition()
+        self._releases: dict[str, int] = {}  # Podcast id -> updates to complete
+
+    def __call__(self, podcast_id: str) -> None:
+        with self._changed:
+            self.updates.append(podcast_id)
+            self._changed.notify_all()
+            assert self._changed.wait_for(
+                lambda: self._releases.get(podcast_id, 0) > 0, 5
+            )
+            self._releases[podcast_id] -= 1
+
+    # Completes an update of the podcast (the running one, or the next)
+    def release(self, podcast_id: str) -> None:
+        with self._changed:
+            self._releases[podcast_id] = self._releases.get(podcast_id, 0) + 1
+            self._changed.notify_all()
+
+    # Waits until the given number of updates has started
+    def wait_for_updates(self, count: int) -> bool:
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self.updates) >= count, 5)
+
+
+def test_requests_for_queued_podcast_are_coalesced():
+    updater = BlockingUpdater()
+    queue = FeedUpdateQueue(updater, max_parallel_updates=1)
+    # Occupies the only worker, i.e. 'a' stays queued
+    queue.submit("other")
+    assert updater.wait_for_updates(1)
+
+    for _ in range(3):
+        queue.submit("a")
+    updater.release("other")
+    updater.release("a")
+    queue.shutdown()
+
+    assert updater.updates == ["other", "a"]
+    assert queue.pending_count == 0
+
+
+def test_request_during_update_causes_exactly_one_rerun():
+    updater = BlockingUpdater()
+    queue = FeedUpdateQueue(updater, max_parallel_updates=2)
+    queue.submit("a")
+    assert updater.wait_for_updates(1)
+
+    # Marks the running update dirty
+    queue.submit("a")
+    queue.submit("a")
+    assert queue.pending_count == 1
+    updater.release("a")
+    assert updater.wait_for_updates(2)
+    updater.release("a")
+    queue.shutdown()
+
+    assert updater.updates == ["a", "a"]
+    assert queue.pending_count == 0
+
+
+def test_updates_of_different_podcasts_run_in_parallel():
+    updater = BlockingUpdater()
+    queue = FeedUpdateQueue(updater, max_parallel_updates=2)
+
+    queue.submit("a")
+    queue.submit("b")
+
+    # Both started before either completed
+    assert updater.wait_for_updates(2)
+    updater.release("a")
+    updater.release("b")
+    queue.shutdown()
+    assert sorted(updater.updates) == ["a", "b"]
+
+
+def test_failed_update_does_not_block_later_updates():
+    updates: list[str] = []
+
+    def update_feed(podcast_id: str) -> None:
+        updates.append(podcast_id)
+        if len(updates) == 1:
+            raise OSError("Disk full")
+
+    queue = FeedUpdateQueue(update_feed, max_parallel_updates=1)
+    queue.submit("a")
+    queue.submit("b")
+    queue.shutdown()
+
+    assert updates == ["a", "b"]
+    assert queue.pending_count == 0
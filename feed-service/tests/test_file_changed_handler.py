@@ -0,0 +1,61 @@
+# pyright: reportPrivateUsage=false
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent
+
+from src.domain.models import PodcastUpdatedEvent
+from src.infra.completion_detector import FileCompletionDetector
+from src.infra.file_changed_handler import FileChangedEventHandler
+
+
+def create_handler(
+    published: list[PodcastUpdatedEvent], published_event: threading.Event
+) -> FileChangedEventHandler:
+    def on_published(event: PodcastUpdatedEvent) -> None:
+        published.append(event)
+        published_event.set()
+
+    detector = FileCompletionDetector(
+        fallback_time=timedelta(seconds=1),
+        min_stable_time=timedelta(milliseconds=10),
+        max_stable_time=timedelta(milliseconds=50),
+        check_audio_trailer=False,
+    )
+    return FileChangedEventHandler(
+        timedelta(seconds=1), callback=on_published, completion_detector=detector
+    )
+
+
+def test_state_of_deleted_file_is_dropped(tmp_path: Path):
+    published: list[PodcastUpdatedEvent] = []
+    published_event = threading.Event()
+    handler = create_handler(published, published_event)
+    file_path = tmp_path / "episode.mp3"
+
+    file_path.write_bytes(b"\0")
+    handler.on_any_event(FileCreatedEvent(str(file_path)))
+    file_path.unlink()
+    handler.on_any_event(FileDeletedEvent(str(file_path)))
+
+    # The feed is still updated, as an episode may have been removed
+    assert published_event.wait(5)
+    assert [event.episode_id for event in published] == [file_path]
+    assert handler._first_change_times == {}
+    assert handler._completion_detector is not None
+    assert handler._completion_detector.file_count == 0
+
+
+def test_state_of_complete_file_is_dropped(tmp_path: Path):
+    published: list[PodcastUpdatedEvent] = []
+    published_event = threading.Event()
+    handler = create_handler(published, published_event)
+    file_path = tmp_path / "episode.mp3"
+
+    file_path.write_bytes(b"\0")
+    handler.on_any_event(FileCreatedEvent(str(file_path)))
+
+    assert published_event.wait(5)
+    assert published[0].changed_at is not None
+    assert handler._first_change_times == {}
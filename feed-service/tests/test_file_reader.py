@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from src.infra.file_reader import PodcastFileService
+
+EPISODE_FILE_NAME = "2024-01-01--1200-1300--podcast--episode.mp3"
+OTHER_FILE_NAME = "2024-01-02--1200-1300--podcast--other.mp3"
+
+
+def test_remove_episode_files_deletes_sidecar_and_temp_files(tmp_path: Path):
+    for file_name in (
+        EPISODE_FILE_NAME,
+        EPISODE_FILE_NAME + ".yml",
+        f".{EPISODE_FILE_NAME}.journal.tmp",
+        f".{EPISODE_FILE_NAME}.journal.new.tmp",
+        OTHER_FILE_NAME,
+        f".{OTHER_FILE_NAME}.journal.tmp",
+    ):
+        (tmp_path / file_name).write_bytes(b"\0")
+
+    PodcastFileService(tmp_path).remove_episode_files(tmp_path, [EPISODE_FILE_NAME])
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        f".{OTHER_FILE_NAME}.journal.tmp",
+        OTHER_FILE_NAME,
+    ]
+
+
+def test_temp_files_of_moved_episode_are_deleted(tmp_path: Path):
+    podcast_dir = tmp_path / "podcast"
+    podcast_dir.mkdir()
+    (podcast_dir / EPISODE_FILE_NAME).write_bytes(b"\0")
+    (podcast_dir / f".{EPISODE_FILE_NAME}.journal.tmp").write_bytes(b"\0")
+    move_to_dir = tmp_path / "removed"
+
+    PodcastFileService(tmp_path).remove_episode_files(
+        podcast_dir, [EPISODE_FILE_NAME], move_to_dir
+    )
+
+    assert list(podcast_dir.iterdir()) == []
+    assert [path.name for path in move_to_dir.iterdir()] == [EPISODE_FILE_NAME]
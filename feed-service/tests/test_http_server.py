@@ -0,0 +1,222 @@
+# pyright: reportPrivateUsage=false
+import gzip
+import http.client
+import socket
+import threading
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+from typing_extensions import override
+
+from src.infra.feed_render_cache import FeedRenderCache
+from src.infra.file_parser import PodcastFileNameParser
+from src.infra.file_reader import PodcastFileService
+from src.infra.http_server import (
+    PodcastHttpServer,
+    _parse_range,
+    _RangeNotSatisfiableError,
+)
+from src.infra.repository import FileSystemPodcastRepository
+
+EPISODE_PATH = "/podcast/2024-01-01--1200-1300--podcast--episode.mp3"
+EPISODE_CONTENT = bytes(range(256)) * 4
+FEED_CONTENT = b"<rss>feed</rss>"
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        ("bytes=0-99", (0, 100)),
+        ("bytes=100-", (100, 900)),
+        ("bytes=-100", (900, 100)),
+        ("bytes=-2000", (0, 1000)),  # Suffix longer than the file
+        ("bytes=900-2000", (900, 100)),  # End beyond the file
+        ("BYTES = 0-0", (0, 1)),
+        ("bytes=0-99,200-299", None),  # Multiple ranges
+        ("bytes=99-0", None),
+        ("bytes=a-b", None),
+        ("bytes=100", None),
+        ("items=0-99", None),
+    ],
+)
+def test_parse_range(range_header: str, expected: Optional[tuple[int, int]]):
+    assert _parse_range(range_header, 1000) == expected
+
+
+@pytest.mark.parametrize("range_header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_parse_range_not_satisfiable(range_header: str):
+    with pytest.raises(_RangeNotSatisfiableError):
+        _parse_range(range_header, 1000)
+
+
+@pytest.fixture
+def server(tmp_path: Path) -> Iterator[PodcastHttpServer]:
+    podcast_dir = tmp_path / "podcast"
+    podcast_dir.mkdir()
+    (podcast_dir / "feed.rss").write_bytes(FEED_CONTENT)
+    (tmp_path / EPISODE_PATH.lstrip("/")).write_bytes(EPISODE_CONTENT)
+
+    server = PodcastHttpServer(
+        tmp_path,
+        host="127.0.0.1",
+        port=get_free_port(),
+        max_connections=10,
+        keep_alive_timeout=timedelta(seconds=5),
+    )
+    server.start()
+    yield server
+    server.stop()
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(
+    server: PodcastHttpServer,
+    path: str,
+    headers: Optional[dict[str, str]] = None,
+    method: str = "GET",
+) -> tuple[http.client.HTTPResponse, bytes]:
+    connection = http.client.HTTPConnection("127.0.0.1", server._port, timeout=5)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
+
+
+def test_episode_range(server: PodcastHttpServer):
+    response, body = request(server, EPISODE_PATH, {"Range": "bytes=10-19"})
+
+    assert response.status == 206
+    assert response.getheader("Content-Range") == f"bytes 10-19/{len(EPISODE_CONTENT)}"
+    assert body == EPISODE_CONTENT[10:20]
+
+
+def test_episode_range_not_satisfiable(server: PodcastHttpServer):
+    response, _ = request(server, EPISODE_PATH, {"Range": "bytes=5000-"})
+
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{len(EPISODE_CONTENT)}"
+
+
+def test_episode_not_modified(server: PodcastHttpServer):
+    response, _ = request(server, EPISODE_PATH)
+    etag = response.getheader("ETag")
+    assert response.status == 200 and etag
+
+    response, body = request(server, EPISODE_PATH, {"If-None-Match": f"W/{etag}"})
+
+    assert response.status == 304
+    assert body == b""
+
+
+def test_episode_if_range_matching_etag_sends_range(server: PodcastHttpServer):
+    response, _ = request(server, EPISODE_PATH, method="HEAD")
+    etag = response.getheader("ETag")
+    last_modified = response.getheader("Last-Modified")
+    assert etag and last_modified
+
+    for validator in (etag, last_modified):
+        response, body = request(
+            server, EPISODE_PATH, {"Range": "bytes=0-9", "If-Range": validator}
+        )
+        assert response.status == 206
+        assert body == EPISODE_CONTENT[:10]
+
+
+def test_episode_if_range_outdated_sends_full_file(server: PodcastHttpServer):
+    response, body = request(
+        server, EPISODE_PATH, {"Range": "bytes=0-9", "If-Range": '"outdated"'}
+    )
+
+    assert response.status == 200
+    assert response.getheader("Content-Range") is None
+    assert body == EPISODE_CONTENT
+
+
+def test_feed_not_modified(server: PodcastHttpServer):
+    response, body = request(server, "/podcast/feed.rss")
+    etag = response.getheader("ETag")
+    assert response.status == 200 and etag
+    assert body == FEED_CONTENT
+
+    response, body = request(server, "/podcast/feed.rss", {"If-None-Match": etag})
+
+    assert response.status == 304
+    assert body == b""
+
+
+def test_feed_is_reloaded_when_changed(server: PodcastHttpServer, tmp_path: Path):
+    response, _ = request(server, "/podcast/feed.rss")
+    etag = response.getheader("ETag")
+    assert etag
+    (tmp_path / "podcast" / "feed.rss").write_bytes(b"<rss>changed feed</rss>")
+
+    response, body = request(server, "/podcast/feed.rss", {"If-None-Match": etag})
+
+    assert response.status == 200
+    assert body == b"<rss>changed feed</rss>"
+
+
+def test_feed_gzip(server: PodcastHttpServer):
+    response, body = request(
+        server, "/podcast/feed.rss", {"Accept-Encoding": "br, gzip"}
+    )
+
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == FEED_CONTENT
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/podcast/missing.mp3", "/podcast/metadata.yml", "/podcast/../podcast/feed.rss"],
+)
+def test_not_found(server: PodcastHttpServer, path: str):
+    response, _ = request(server, path)
+
+    assert response.status == 404
+
+
+# Records the threads the podcast directory is stat'ed from
+class ThreadRecordingRepository(FileSystemPodcastRepository):
+    def __init__(self, base_dir: Path) -> None:
+        super().__init__(
+            base_dir, PodcastFileNameParser(), PodcastFileService(base_dir)
+        )
+        self.thread_names: list[str] = []
+
+    @override
+    def get_directory_mtime_ns(self, podcast_id: str) -> Optional[int]:
+        self.thread_names.append(threading.current_thread().name)
+        return super().get_directory_mtime_ns(podcast_id)
+
+
+def test_rendered_feed_does_not_block_event_loop(tmp_path: Path):
+    (tmp_path / "podcast").mkdir()
+    repo = ThreadRecordingRepository(tmp_path)
+    server = PodcastHttpServer(
+        tmp_path,
+        host="127.0.0.1",
+        port=get_free_port(),
+        max_connections=10,
+        keep_alive_timeout=timedelta(seconds=5),
+        feed_cache=FeedRenderCache(
+            repo, lambda podcast_id: FEED_CONTENT, max_bytes=1024
+        ),
+    )
+    server.start()
+    try:
+        response, body = request(server, "/podcast/feed.rss")
+    finally:
+        server.stop()
+
+    assert response.status == 200
+    assert body == FEED_CONTENT
+    assert repo.thread_names and "http-server" not in repo.thread_names
@@ -0,0 +1,92 @@
+import pytest
+
+from src.metrics import CallbackGauge, Counter, Gauge, Histogram
+
+
+def test_counter_renders_help_type_and_values():
+    counter = Counter("writes_total", "Feed writes", ("result",))
+    counter.inc("written")
+    counter.inc("written", amount=2)
+    counter.inc("unchanged", amount=0.5)
+
+    assert counter.render() == [
+        "# HELP writes_total Feed writes",
+        "# TYPE writes_total counter",
+        'writes_total{result="written"} 3',
+        'writes_total{result="unchanged"} 0.5',
+    ]
+
+
+def test_label_values_are_escaped():
+    gauge = Gauge("size_bytes", "Feed size", ("podcast",))
+    gauge.set(1, 'a\\b"c\nd')
+
+    assert gauge.render()[-1] == 'size_bytes{podcast="a\\\\b\\"c\\nd"} 1'
+
+
+def test_metric_without_labels():
+    counter = Counter("files_total", "Files")
+    counter.inc()
+
+    assert counter.render()[-1] == "files_total 1"
+
+
+def test_special_values():
+    gauge = Gauge("value", "Value", ("kind",))
+    gauge.set(float("inf"), "inf")
+    gauge.set(float("-inf"), "-inf")
+    gauge.set(float("nan"), "nan")
+
+    assert gauge.render()[2:] == [
+        'value{kind="inf"} +Inf',
+        'value{kind="-inf"} -Inf',
+        'value{kind="nan"} NaN',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("update_seconds", "Updates", (0.1, 1), ("podcast",))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.observe(value, "a")
+
+    assert histogram.render() == [
+        "# HELP update_seconds Updates",
+        "# TYPE update_seconds histogram",
+        'update_seconds_bucket{podcast="a",le="0.1"} 2',
+        'update_seconds_bucket{podcast="a",le="1"} 3',
+        'update_seconds_bucket{podcast="a",le="+Inf"} 4',
+        'update_seconds_sum{podcast="a"} 5.65',
+        'update_seconds_count{podcast="a"} 4',
+    ]
+
+
+def test_histogram_summary_is_reset():
+    histogram = Histogram("scan_seconds", "Scans", (1,))
+    histogram.observe(1)
+    histogram.observe(3)
+
+    summary = histogram.pop_summary()
+
+    assert (summary.count, summary.sum, summary.max, summary.average) == (2, 4, 3, 2)
+    assert histogram.pop_summary().average is None
+    # The rendered histogram keeps all observations
+    assert histogram.render()[-1] == "scan_seconds_count 2"
+
+
+def test_callback_gauge_reads_value_when_rendered():
+    values = [1, 2]
+    gauge = CallbackGauge("pending", "Pending", lambda: values.pop(0))
+
+    assert gauge.render()[-1] == "pending 1"
+    assert gauge.render()[-1] == "pending 2"
+
+
+def test_invalid_label_count_fails_on_update():
+    counter = Counter("writes_total", "Feed writes", ("result",))
+
+    with pytest.raises(ValueError):
+        counter.inc()
+    assert counter.render() == [
+        "# HELP writes_total Feed writes",
+        "# TYPE writes_total counter",
+    ]
@@ -0,0 +1,64 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from src.profiling import Profiler
+
+
+def run_profiled(profiler: Profiler, name: str) -> None:
+    with profiler.profile(name):
+        sum(range(1000))
+
+
+def get_run_names(output_dir: Path) -> list[str]:
+    return [
+        json.loads(path.read_text())["name"]
+        for path in sorted(output_dir.glob("*.json"))
+    ]
+
+
+def test_disabled_profiler_writes_nothing(tmp_path: Path):
+    profiler = Profiler(tmp_path / "profiles", max_runs=2)
+
+    run_profiled(profiler, "run")
+
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_only_newest_runs_are_kept(tmp_path: Path):
+    output_dir = tmp_path / "profiles"
+    profiler = Profiler(output_dir, max_runs=2, enabled=True)
+
+    for i in range(4):
+        run_profiled(profiler, f"run-{i}")
+
+    assert get_run_names(output_dir) == ["run-2", "run-3"]
+    assert len(list(output_dir.glob("*.prof"))) == 2
+
+
+def test_parallel_runs_are_serialized(tmp_path: Path):
+    output_dir = tmp_path / "profiles"
+    profiler = Profiler(output_dir, max_runs=10, enabled=True)
+    lock = threading.Lock()
+    active_runs: list[int] = []
+    max_active_runs = 0
+
+    def run(name: str) -> None:
+        nonlocal max_active_runs
+        with profiler.profile(name):
+            with lock:
+                active_runs.append(1)
+                max_active_runs = max(max_active_runs, len(active_runs))
+            time.sleep(0.05)
+            with lock:
+                active_runs.pop()
+
+    threads = [threading.Thread(target=run, args=(f"run-{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_active_runs == 1
+    assert sorted(get_run_names(output_dir)) == ["run-0", "run-1", "run-2"]
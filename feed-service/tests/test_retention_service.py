@@ -0,0 +1,159 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from src.application.retention_service import EpisodeRetentionService
+from src.domain.models import Podcast, RetentionPolicy
+from src.infra.file_parser import PodcastFileNameParser
+from src.infra.file_reader import PodcastFileService
+from src.infra.repository import FileSystemPodcastRepository
+
+FIRST_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def create_repo(base_dir: Path) -> FileSystemPodcastRepository:
+    return FileSystemPodcastRepository(
+        base_dir, PodcastFileNameParser(), PodcastFileService(base_dir)
+    )
+
+
+# Creates a podcast directory with an episode per day, oldest first
+def create_podcast(
+    base_dir: Path, title: str, episode_sizes: list[int], retention: str = ""
+) -> None:
+    podcast_dir = base_dir / title
+    podcast_dir.mkdir()
+    (podcast_dir / "metadata.yml").write_text(f"title: {title}\n{retention}")
+    for i, size in enumerate(episode_sizes):
+        date = (FIRST_DATE + timedelta(days=i)).strftime("%Y-%m-%d")
+        file_name = f"{date}--1200-1300--{title}--{uuid.uuid4()}.mp3"
+        (podcast_dir / file_name).write_bytes(b"\0" * size)
+
+
+def get_removed_dates(service: EpisodeRetentionService, podcast: Podcast) -> list[str]:
+    return [
+        removal.episode.date.strftime("%Y-%m-%d")
+        for removal in service.get_removals(podcast)
+    ]
+
+
+def create_service(
+    repo: FileSystemPodcastRepository,
+    policy: Optional[RetentionPolicy] = None,
+    max_total_bytes: Optional[int] = None,
+    page_size: Optional[int] = None,
+) -> EpisodeRetentionService:
+    return EpisodeRetentionService(
+        repo,
+        policy or RetentionPolicy(),
+        max_total_bytes=max_total_bytes,
+        page_size=page_size,
+    )
+
+
+def test_max_episodes_removes_oldest_episodes(tmp_path: Path):
+    create_podcast(tmp_path, "podcast", [100] * 5)
+    repo = create_repo(tmp_path)
+    service = create_service(repo, RetentionPolicy(max_episodes=3))
+
+    assert get_removed_dates(service, repo.get("podcast")) == [
+        "2024-01-01",
+        "2024-01-02",
+    ]
+
+
+def test_max_bytes_of_podcast_overrides_default(tmp_path: Path):
+    create_podcast(tmp_path, "podcast", [100] * 5, "retention:\n  max_bytes: 250\n")
+    repo = create_repo(tmp_path)
+    service = create_service(repo, RetentionPolicy(max_bytes=1000))
+
+    assert get_removed_dates(service, repo.get("podcast")) == [
+        "2024-01-01",
+        "2024-01-02",
+        "2024-01-03",
+    ]
+
+
+def test_newest_episode_is_kept_when_exceeding_limits(tmp_path: Path):
+    create_podcast(tmp_path, "podcast", [100, 1000])
+    repo = create_repo(tmp_path)
+    service = create_service(repo, RetentionPolicy(max_bytes=500))
+
+    assert get_removed_dates(service, repo.get("podcast")) == ["2024-01-01"]
+
+
+def test_total_budget_removes_oldest_episodes_of_all_podcasts(tmp_path: Path):
+    # Episodes of 'a' are on the first days, of 'b' on the same days but larger
+    create_podcast(tmp_path, "a", [100] * 4)
+    create_podcast(tmp_path, "b", [200] * 4)
+    repo = create_repo(tmp_path)
+    service = create_service(repo, max_total_bytes=900)
+
+    removals = service.create_report()
+
+    # Newest first: 300 bytes per day, i.e. the last 3 days fit the budget
+    assert sorted(
+        (r.podcast_id, r.episode.date.strftime("%Y-%m-%d")) for r in removals
+    ) == [("a", "2024-01-01"), ("b", "2024-01-01")]
+    assert all("total budget" in removal.reason for removal in removals)
+
+
+def test_total_budget_keeps_newest_episode_of_each_podcast(tmp_path: Path):
+    create_podcast(tmp_path, "a", [1000])
+    create_podcast(tmp_path, "b", [1000, 1000])
+    repo = create_repo(tmp_path)
+    service = create_service(repo, max_total_bytes=500)
+
+    removals = service.create_report()
+
+    assert [(r.podcast_id, r.episode.date.day) for r in removals] == [("b", 1)]
+
+
+def test_total_budget_applies_podcast_limits_first(tmp_path: Path):
+    create_podcast(tmp_path, "a", [100] * 4, "retention:\n  max_episodes: 2\n")
+    create_podcast(tmp_path, "b", [100] * 4)
+    repo = create_repo(tmp_path)
+    service = create_service(repo, max_total_bytes=600)
+
+    removals = service.create_report()
+
+    # 'a' only accounts for its 2 newest episodes, leaving room for all of 'b'
+    assert sorted((r.podcast_id, r.episode.date.day) for r in removals) == [
+        ("a", 1),
+        ("a", 2),
+    ]
+
+
+def test_removal_keeps_archive_pages_of_remaining_episodes(tmp_path: Path):
+    create_podcast(tmp_path, "podcast", [100] * 12)
+    podcast_dir = tmp_path / "podcast"
+    for index in range(1, 4):
+        (podcast_dir / f"feed-archive-{index}.rss").write_text(f"page {index}")
+        (podcast_dir / f"feed-archive-{index}.rss.gz").write_text(f"page {index}")
+    repo = create_repo(tmp_path)
+    service = create_service(repo, RetentionPolicy(max_episodes=8), page_size=3)
+
+    podcast = service.apply(repo.get("podcast"))
+
+    # Page 1 has no episodes left and page 2 is now the oldest page, page 3 is untouched
+    assert len(podcast) == 8
+    assert sorted(path.name for path in podcast_dir.glob("feed-archive-*.rss*")) == [
+        "feed-archive-3.rss",
+        "feed-archive-3.rss.gz",
+    ]
+    assert (podcast_dir / "feed-archive-3.rss").read_text() == "page 3"
+    assert repo.get_archive_removed_count("podcast") == 4
+    # The anchor is kept, i.e. the pages of the remaining episodes keep their indices
+    pages = podcast.get_feed_pages(3, repo.get_archive_removed_count("podcast"))
+    assert [(page.archive_index, len(page.episodes)) for page in pages] == [
+        (2, 2),
+        (3, 3),
+        (None, 3),
+    ]
+
+    # Removing more episodes adds to the anchor
+    service = create_service(repo, RetentionPolicy(max_episodes=6), page_size=3)
+    service.apply(podcast)
+    assert repo.get_archive_removed_count("podcast") == 6
+    assert list(podcast_dir.glob("feed-archive-*.rss*")) == []
@@ -0,0 +1,52 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+from src.domain.models import Podcast, PodcastEpisode, ValidUrl
+from src.infra.rss_feed_adapter import RssFeedAdapter, UrlGenerator
+
+
+def create_adapter() -> RssFeedAdapter:
+    return RssFeedAdapter(UrlGenerator(ValidUrl("http://localhost/")))
+
+
+def create_episode(date: datetime) -> PodcastEpisode:
+    uuid = "9b4c8d3e-0f5a-4c1b-8e2d-7a6f5b4c3d2e"
+    return PodcastEpisode(
+        date=date,
+        title=date.strftime("%Y-%m-%d"),
+        file_size_bytes=100,
+        uuid=uuid,
+        file_name=f"{date.strftime('%Y-%m-%d')}--1200-1300--podcast--{uuid}.mp3",
+    )
+
+
+def get_last_build_date(feed: bytes) -> str:
+    last_build_date = ET.fromstring(feed).find("channel/lastBuildDate")
+    assert last_build_date is not None and last_build_date.text is not None
+    return last_build_date.text
+
+
+def test_last_build_date_is_date_of_newest_episode():
+    podcast = Podcast(
+        title="podcast",
+        file_name="podcast",
+        episodes=[
+            create_episode(datetime(2024, 1, 2, tzinfo=timezone.utc)),
+            create_episode(datetime(2024, 1, 1, tzinfo=timezone.utc)),
+        ],
+    )
+
+    feed = create_adapter().generate_feed(podcast)
+
+    assert get_last_build_date(feed) == "Tue, 02 Jan 2024 00:00:00 +0000"
+
+
+def test_feed_without_episodes_is_identical_when_regenerated():
+    podcast = Podcast(title="podcast", file_name="podcast", episodes=[])
+    adapter = create_adapter()
+
+    feed = adapter.generate_feed(podcast)
+
+    # Not the current time, i.e. the feed write is skipped if nothing changed
+    assert get_last_build_date(feed) == "Thu, 01 Jan 1970 00:00:00 +0000"
+    assert adapter.generate_feed(podcast) == feed
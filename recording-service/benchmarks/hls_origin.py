@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import math
+import re
+import time
+from typing import Any
+
+from aiohttp import web
+
+from src import event_loop
+
+# Local stand-in for a live HLS origin. Serves a media playlist (/live.m3u8) of segments produced in real time:
+# python -m benchmarks.hls_origin --port 8810 --low-latency
+# With --low-latency, the playlist also lists the partial segments (EXT-X-PART) of the last segments and the segment in progress, announces the next part (EXT-X-PRELOAD-HINT) and supports blocking reloads (_HLS_msn/_HLS_part).
+# Requests for the part in progress are held until it is complete. Each part is filled with its label (e.g. '00000012.0003|'), i.e. the continuity of a recording can be checked. Request counts and the age of the media served are available on /stats
+
+_MEDIA_PATTERN = re.compile(r"^(seg(\d+)|part(\d+)\.(\d+))\.aac$")
+# Complete segments listed in the playlist
+_WINDOW_SEGMENTS = 6
+# Complete segments listed with their parts (low latency)
+_PART_SEGMENTS = 2
+
+
+class _Timeline:
+    def __init__(self, segment_seconds: float, part_seconds: float) -> None:
+        super().__init__()
+        self.part_seconds = part_seconds
+        self.parts_per_segment = max(1, round(segment_seconds / part_seconds))
+        self.segment_seconds = self.parts_per_segment * part_seconds
+        # Started before, i.e. the playlist window is full from the start
+        self._start = time.monotonic() - _WINDOW_SEGMENTS * self.segment_seconds
+
+    # Parts completed so far
+    def get_completed_parts(self) -> int:
+        return int((time.monotonic() - self._start) / self.part_seconds)
+
+    # Seconds until the part (by its index since the start) is complete
+    def get_seconds_until_complete(self, part_index: int) -> float:
+        return self._start + (part_index + 1) * self.part_seconds - time.monotonic()
+
+
+def create_app(
+    segment_seconds: float, part_seconds: float, bitrate_kbps: int, low_latency: bool
+) -> web.Application:
+    timeline = _Timeline(segment_seconds, part_seconds)
+    part_size = int(bitrate_kbps * 1000 / 8 * timeline.part_seconds)
+    stats: dict[str, Any] = {
+        "playlist_requests": 0,
+        "blocking_playlist_requests": 0,
+        "media_requests": 0,
+        "media_bytes": 0,
+        "media_ages": [],  # Seconds since the media served was complete
+    }
+
+    def part_data(part_index: int) -> bytes:
+        msn, part = divmod(part_index, timeline.parts_per_segment)
+        label = f"{msn:08d}.{part:04d}|".encode()
+        return (label * (part_size // len(label) + 1))[:part_size]
+
+    def render_playlist() -> str:
+        completed = timeline.get_completed_parts()
+        complete_segments = completed // timeline.parts_per_segment
+        first = max(0, complete_segments - _WINDOW_SEGMENTS)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:9" if low_latency else "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{math.ceil(timeline.segment_seconds)}",
+            f"#EXT-X-MEDIA-SEQUENCE:{first}",
+        ]
+        if low_latency:
+            lines += [
+                f"#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * timeline.part_seconds:.3f}",
+                f"#EXT-X-PART-INF:PART-TARGET={timeline.part_seconds:.3f}",
+            ]
+        for msn in range(first, complete_segments):
+            if low_latency and msn >= complete_segments - _PART_SEGMENTS:
+                lines += part_lines(msn, timeline.parts_per_segment)
+            lines += [f"#EXTINF:{timeline.segment_seconds:.3f},", f"seg{msn}.aac"]
+        if low_latency:
+            # Segment in progress
+            lines += part_lines(
+                complete_segments, completed % timeline.parts_per_segment
+            )
+            next_msn, next_part = divmod(completed, timeline.parts_per_segment)
+            lines.append(
+                f'#EXT-X-PRELOAD-HINT:TYPE=PART,URI="part{next_msn}.{next_part}.aac"'
+            )
+        return "\n".join(lines) + "\n"
+
+    def part_lines(msn: int, count: int) -> list[str]:
+        return [
+            f'#EXT-X-PART:DURATION={timeline.part_seconds:.3f},URI="part{msn}.{part}.aac"'
+            + (",INDEPENDENT=YES" if part == 0 else "")
+            for part in range(count)
+        ]
+
+    async def handle_playlist(request: web.Request) -> web.Response:
+        stats["playlist_requests"] += 1
+        msn = request.query.get("_HLS_msn")
+        if low_latency and msn is not None:
+            stats["blocking_playlist_requests"] += 1
+            part = request.query.get("_HLS_part")
+            # Held until the playlist contains the part (or the whole segment if no part is given)
+            part_index = (
+                int(msn) * timeline.parts_per_segment + int(part)
+                if part is not None
+                else (int(msn) + 1) * timeline.parts_per_segment - 1
+            )
+            wait = timeline.get_seconds_until_complete(part_index)
+            if wait > 3 * timeline.segment_seconds:
+                raise web.HTTPBadRequest(text="Too far in the future")
+            await asyncio.sleep(max(0.0, wait))
+        return web.Response(
+            text=render_playlist(), content_type="application/vnd.apple.mpegurl"
+        )
+
+    async def handle_media(request: web.Request) -> web.Response:
+        match = _MEDIA_PATTERN.match(request.match_info["name"])
+        if match is None:
+            raise web.HTTPNotFound()
+        completed = timeline.get_completed_parts()
+        first_part = (
+            max(0, completed // timeline.parts_per_segment - _WINDOW_SEGMENTS)
+            * timeline.parts_per_segment
+        )
+        if match.group(2) is not None:
+            start = int(match.group(2)) * timeline.parts_per_segment
+            part_indexes = range(start, start + timeline.parts_per_segment)
+        else:
+            part_index = int(match.group(3)) * timeline.parts_per_segment + int(
+                match.group(4)
+            )
+            if int(match.group(4)) >= timeline.parts_per_segment:
+                raise web.HTTPNotFound()
+            # The part in progress (preload hint) is held until complete
+            if low_latency and part_index == completed:
+                await asyncio.sleep(
+                    max(0.0, timeline.get_seconds_until_complete(part_index))
+                )
+                completed = timeline.get_completed_parts()
+            part_indexes = range(part_index, part_index + 1)
+        if part_indexes[0] < first_part or part_indexes[-1] >= completed:
+            raise web.HTTPNotFound()
+
+        body = b"".join(part_data(i) for i in part_indexes)
+        stats["media_requests"] += 1
+        stats["media_bytes"] += len(body)
+        stats["media_ages"].append(
+            -timeline.get_seconds_until_complete(part_indexes[-1])
+        )
+        return web.Response(body=body, content_type="audio/aac")
+
+    async def handle_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/live.m3u8", handle_playlist)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/{name}", handle_media)
+    return app
+
+
+def run(
+    host: str,
+    port: int,
+    segment_seconds: float,
+    part_seconds: float,
+    bitrate_kbps: int,
+    low_latency: bool,
+) -> None:
+    loop = event_loop.new_event_loop("auto")
+    web.run_app(
+        create_app(segment_seconds, part_seconds, bitrate_kbps, low_latency),
+        host=host,
+        port=port,
+        loop=loop,
+        access_log=None,
+        print=None,
+    )
+
+
+def _parse_args() -> dict[str, Any]:
+    ap = argparse.ArgumentParser(description="Serves a live HLS stream")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8810)
+    ap.add_argument("--segment-seconds", type=float, default=4)
+    ap.add_argument("--part-seconds", type=float, default=1)
+    ap.add_argument("--bitrate-kbps", type=int, default=64)
+    ap.add_argument(
+        "--low-latency",
+        action="store_true",
+        help="Serve Low-Latency HLS (partial segments, preload hints, blocking reloads)",
+    )
+    return vars(ap.parse_args())
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(
+        args["host"],
+        args["port"],
+        args["segment_seconds"],
+        args["part_seconds"],
+        args["bitrate_kbps"],
+        args["low_latency"],
+    )
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from multiprocessing import Process
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from pendulum import Duration  # type: ignore
+
+from benchmarks import stream_server
+from main import CHUNK_SIZE
+from src import event_loop, utils
+from src.audio_storage import AudioStorageAdapter
+from src.audio_stream import AudioChunk, HttpAudioStreamAdapter, HttpStreamClient
+from src.metrics import RecorderMetrics
+from src.models import ValidUrl
+
+# Benchmarks of the recording path (HTTP stream -> storage) per event loop implementation and read mode (chunked/raw), against a local stand-in stream server. Results are written as JSON to compare across commits:
+# python -m benchmarks.run_benchmarks --streams 50 --duration 20 --output results.json
+# - paced: streams at a realistic bitrate. Shows the CPU cost per stream, i.e. how many streams a single process can record
+# - unpaced: streams as fast as possible. Shows the throughput limit of the event loop
+
+
+def benchmark_loop(
+    loop_type: str, raw_stream: bool, url: ValidUrl, streams: int, duration: int
+) -> dict[str, Any]:
+    loop = event_loop.new_event_loop(loop_type)
+    metrics = RecorderMetrics()
+    stream_adapter = HttpAudioStreamAdapter(
+        HttpStreamClient(CHUNK_SIZE, metrics), raw_stream
+    )
+    storage = AudioStorageAdapter(metrics)
+    chunks = 0
+
+    async def count_chunks(
+        audio_data: AsyncIterator[AudioChunk],
+    ) -> AsyncIterator[AudioChunk]:
+        nonlocal chunks
+        async for chunk in audio_data:
+            chunks += 1
+            yield chunk
+
+    async def record(stream_name: str) -> None:
+        countdown = utils.CountdownTimer(
+            Duration(seconds=duration), utils.TimeProvider()
+        )
+        await storage.save(
+            count_chunks(stream_adapter.get_audio_data(url, countdown, stream_name)),
+            Path(os.devnull),
+            stream_name,
+        )
+
+    async def record_all() -> tuple[float, float]:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(record(f"stream-{i}") for i in range(streams)))
+        return time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    # Recordings are started from a loop timer as by the scheduler of the service (see RecordingSchedulerService)
+    result: "asyncio.Future[tuple[float, float]]" = loop.create_future()
+
+    async def start_recordings() -> None:
+        try:
+            result.set_result(await record_all())
+        except Exception as e:
+            result.set_exception(e)
+
+    loop.call_later(0, lambda: loop.create_task(start_recordings()))
+    try:
+        wall_time, cpu_time = loop.run_until_complete(result)
+    finally:
+        loop.close()
+
+    bytes_received = sum(
+        metrics.for_stream(f"stream-{i}").bytes_written.value for i in range(streams)
+    )
+    megabytes = bytes_received / 1024 / 1024
+    return {
+        "event_loop": event_loop.get_event_loop_name(loop),
+        "raw_stream": raw_stream,
+        "streams": streams,
+        "wall_seconds": wall_time,
+        "cpu_seconds": cpu_time,
+        "throughput_mib_per_second": megabytes / wall_time,
+        "throughput_mib_per_second_per_stream": megabytes / wall_time / streams,
+        "cpu_percent": 100 * cpu_time / wall_time,
+        "cpu_percent_per_stream": 100 * cpu_time / wall_time / streams,
+        "cpu_ms_per_mib": 1000 * cpu_time / megabytes if megabytes else None,
+        "chunks_per_mib": chunks / megabytes if megabytes else None,
+    }
+
+
+def benchmark(
+    loop_types: list[str], streams: int, duration: int, bitrate_kbps: int, port: int
+) -> dict[str, Any]:
+    server = Process(
+        target=stream_server.run, args=("127.0.0.1", port, bitrate_kbps), daemon=True
+    )
+    server.start()
+    try:
+        time.sleep(1)  # Wait for the server to listen
+        url = ValidUrl(f"http://127.0.0.1:{port}/stream")
+        results: dict[str, Any] = {}
+        for loop_type in loop_types:
+            for raw_stream in (False, True):
+                name = f"{loop_type}_raw" if raw_stream else loop_type
+                results[name] = benchmark_loop(
+                    loop_type, raw_stream, url, streams, duration
+                )
+        return results
+    finally:
+        server.terminate()
+        server.join()
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_args() -> dict[str, Any]:
+    ap = argparse.ArgumentParser(description="Runs the recording-service benchmarks")
+    ap.add_argument("--streams", type=int, default=50, help="Concurrent streams")
+    ap.add_argument(
+        "--duration", type=int, default=20, help="Seconds to record per benchmark"
+    )
+    ap.add_argument(
+        "--bitrate-kbps", type=int, default=128, help="Bitrate of the paced streams"
+    )
+    ap.add_argument(
+        "--event-loops",
+        nargs="+",
+        choices=("asyncio", "uvloop"),
+        default=["asyncio", "uvloop"],
+    )
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument("--output", type=Path, default=None, help="Defaults to stdout")
+    return vars(ap.parse_args())
+
+
+def main(args: dict[str, Any]) -> dict[str, Any]:
+    loop_types: list[str] = args["event_loops"]
+    if "uvloop" in loop_types and not event_loop.is_uvloop_available():
+        print("uvloop is not installed, skipping it", file=sys.stderr)
+        loop_types = [t for t in loop_types if t != "uvloop"]
+
+    results: dict[str, Any] = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "chunk_size": CHUNK_SIZE,
+        "bitrate_kbps": args["bitrate_kbps"],
+        "results": {},
+    }
+    for name, bitrate_kbps in (("paced", args["bitrate_kbps"]), ("unpaced", 0)):
+        print(f"Benchmarking {name} streams", file=sys.stderr)
+        results["results"][name] = benchmark(
+            loop_types, args["streams"], args["duration"], bitrate_kbps, args["port"]
+        )
+    return results
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    output = json.dumps(main(args), indent=2)
+    if args["output"] is not None:
+        args["output"].write_text(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from multiprocessing import Process
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+from pendulum import Duration  # type: ignore
+
+from benchmarks import hls_origin
+from benchmarks.run_benchmarks import get_commit
+from main import CHUNK_SIZE
+from src import event_loop, utils
+from src.audio_stream import HlsAudioStreamAdapter, HttpStreamClient
+from src.metrics import RecorderMetrics
+from src.models import ValidUrl
+
+# Benchmarks of recording a live HLS stream as regular HLS and as Low-Latency HLS, against a local stand-in origin (see hls_origin). Results are written as JSON to compare across commits:
+# python -m benchmarks.run_hls_benchmarks --duration 30 --output results.json
+# Shows how far the recording trails the live edge (age of the media when fetched, at the start and on average), the requests per minute of audio and whether the recording is continuous
+
+_LABEL_PATTERN = re.compile(rb"(\d{8})\.(\d{4})\|")
+
+
+def benchmark_hls(
+    low_latency: bool,
+    duration: int,
+    segment_seconds: float,
+    part_seconds: float,
+    bitrate_kbps: int,
+    port: int,
+) -> dict[str, Any]:
+    origin = Process(
+        target=hls_origin.run,
+        args=(
+            "127.0.0.1",
+            port,
+            segment_seconds,
+            part_seconds,
+            bitrate_kbps,
+            low_latency,
+        ),
+        daemon=True,
+    )
+    origin.start()
+    try:
+        time.sleep(1)  # Wait for the origin to listen
+        loop = event_loop.new_event_loop("asyncio")
+        try:
+            data, wall_time, cpu_time = loop.run_until_complete(
+                _record(ValidUrl(f"http://127.0.0.1:{port}/live.m3u8"), duration)
+            )
+            stats = loop.run_until_complete(
+                _get_stats(f"http://127.0.0.1:{port}/stats")
+            )
+        finally:
+            loop.close()
+    finally:
+        origin.terminate()
+        origin.join()
+
+    parts_per_segment = max(1, round(segment_seconds / part_seconds))
+    missing_parts, repeated_parts = _check_continuity(data, parts_per_segment)
+    ages: list[float] = stats["media_ages"]
+    minutes = wall_time / 60
+    return {
+        "low_latency": low_latency,
+        "wall_seconds": wall_time,
+        "cpu_seconds": cpu_time,
+        "bytes": len(data),
+        "playlist_requests": stats["playlist_requests"],
+        "blocking_playlist_requests": stats["blocking_playlist_requests"],
+        "media_requests": stats["media_requests"],
+        "requests_per_minute": (stats["playlist_requests"] + stats["media_requests"])
+        / minutes,
+        # Seconds the media was complete before it was fetched, i.e. how far the recording trails the live edge
+        "start_age_seconds": ages[0] if ages else None,
+        "mean_age_seconds": sum(ages) / len(ages) if ages else None,
+        "max_age_seconds": max(ages) if ages else None,
+        "missing_parts": missing_parts,
+        "repeated_parts": repeated_parts,
+    }
+
+
+async def _record(url: ValidUrl, duration: int) -> tuple[bytes, float, float]:
+    stream_adapter = HlsAudioStreamAdapter(
+        HttpStreamClient(CHUNK_SIZE, RecorderMetrics())
+    )
+    countdown = utils.CountdownTimer(Duration(seconds=duration), utils.TimeProvider())
+    data = bytearray()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    async for chunk in stream_adapter.get_audio_data(url, countdown, "hls"):
+        data += chunk
+    return (
+        bytes(data),
+        time.perf_counter() - wall_start,
+        time.process_time() - cpu_start,
+    )
+
+
+async def _get_stats(url: str) -> dict[str, Any]:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            return await response.json()
+
+
+# Counts the parts missing between and repeated in the recorded parts (by the labels the origin fills the parts with)
+def _check_continuity(data: bytes, parts_per_segment: int) -> tuple[int, int]:
+    indexes: list[int] = []
+    for match in _LABEL_PATTERN.finditer(data):
+        index = int(match.group(1)) * parts_per_segment + int(match.group(2))
+        if not indexes or indexes[-1] != index:
+            indexes.append(index)
+    missing = sum(max(0, b - a - 1) for a, b in zip(indexes, indexes[1:]))
+    repeated = sum(1 for a, b in zip(indexes, indexes[1:]) if b <= a)
+    return missing, repeated
+
+
+def _parse_args() -> dict[str, Any]:
+    ap = argparse.ArgumentParser(description="Runs the HLS recording benchmarks")
+    ap.add_argument(
+        "--duration", type=int, default=30, help="Seconds to record per benchmark"
+    )
+    ap.add_argument("--segment-seconds", type=float, default=4)
+    ap.add_argument("--part-seconds", type=float, default=1)
+    ap.add_argument("--bitrate-kbps", type=int, default=64)
+    ap.add_argument("--port", type=int, default=8810)
+    ap.add_argument("--output", type=Path, default=None, help="Defaults to stdout")
+    return vars(ap.parse_args())
+
+
+def main(args: dict[str, Any]) -> dict[str, Any]:
+    results: dict[str, Any] = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "segment_seconds": args["segment_seconds"],
+        "part_seconds": args["part_seconds"],
+        "bitrate_kbps": args["bitrate_kbps"],
+        "results": {},
+    }
+    for name, low_latency in (("regular", False), ("low_latency", True)):
+        print(f"Benchmarking {name} HLS", file=sys.stderr)
+        results["results"][name] = benchmark_hls(
+            low_latency,
+            args["duration"],
+            args["segment_seconds"],
+            args["part_seconds"],
+            args["bitrate_kbps"],
+            args["port"],
+        )
+    return results
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    output = json.dumps(main(args), indent=2)
+    if args["output"] is not None:
+        args["output"].write_text(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import os
+from typing import Any
+
+from aiohttp import web
+
+from src import event_loop
+
+# Local stand-in for a radio stream server (e.g. Icecast). Serves an endless stream of (random) audio bytes on /stream:
+# python -m benchmarks.stream_server --port 8800 --bitrate-kbps 128
+# With a bitrate, the data is sent paced at that bitrate like a live stream. Without, as fast as possible (throughput limit of the client)
+
+# Bytes sent per write. Large compared to the chunk size of the recorder, so the server is not the bottleneck
+_WRITE_SIZE = 64 * 1024
+# Writes per second when paced
+_WRITES_PER_SECOND = 10
+
+
+def create_app(bitrate_kbps: int) -> web.Application:
+    payload = os.urandom(_WRITE_SIZE)
+
+    async def handle_stream(request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "audio/mpeg", "icy-br": str(bitrate_kbps)}
+        )
+        await response.prepare(request)
+        try:
+            await _send(response, payload, bitrate_kbps)
+        except ConnectionError:
+            pass  # Client disconnected, e.g. the recording ended
+        return response
+
+    app = web.Application()
+    app.router.add_get("/stream", handle_stream)
+    return app
+
+
+async def _send(response: web.StreamResponse, payload: bytes, bitrate_kbps: int):
+    if bitrate_kbps <= 0:
+        while True:
+            await response.write(payload)
+
+    # Paced: send the bytes of each interval at once, on a fixed schedule (no drift)
+    loop = asyncio.get_running_loop()
+    bytes_per_write = bitrate_kbps * 1000 // 8 // _WRITES_PER_SECOND
+    view = memoryview(payload)
+    next_write = loop.time()
+    while True:
+        remaining = bytes_per_write
+        while remaining > 0:
+            size = min(remaining, _WRITE_SIZE)
+            await response.write(view[:size])
+            remaining -= size
+        next_write += 1 / _WRITES_PER_SECOND
+        await asyncio.sleep(max(0, next_write - loop.time()))
+
+
+def run(host: str, port: int, bitrate_kbps: int) -> None:
+    # Use the fastest loop available, so the server keeps up with the client
+    loop = event_loop.new_event_loop("auto")
+    web.run_app(
+        create_app(bitrate_kbps),
+        host=host,
+        port=port,
+        loop=loop,
+        access_log=None,
+        print=None,
+    )
+
+
+def _parse_args() -> dict[str, Any]:
+    ap = argparse.ArgumentParser(description="Serves an endless audio stream")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8800)
+    ap.add_argument(
+        "--bitrate-kbps",
+        type=int,
+        default=128,
+        help="Pace of the stream. 0 to send as fast as possible",
+    )
+    return vars(ap.parse_args())
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    run(args["host"], args["port"], args["bitrate_kbps"])
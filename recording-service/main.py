@@ -1,22 +1,29 @@
 import asyncio
 import logging
-from ctypes import util
+import signal
+from pathlib import Path
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
 from pydantic import HttpUrl
 
 import src.config
-from src import utils
+from src import event_loop, utils
 from src.audio_storage import AudioStorageAdapter
 from src.audio_stream import (
     HlsAudioStreamAdapter,
     HttpAudioStreamAdapter,
     HttpStreamClient,
 )
-from src.config import AppConfig
+from src.capture_plan import CapturePlan, format_plan
+from src.config import AppConfig, JournalConfig, StreamConfig
+from src.config_reload import ConfigReloader
+from src.loop_watchdog import LoopWatchdog, enable_asyncio_debug
+from src.metrics import MetricsServer, RecorderMetrics
 from src.models import ValidUrl
+from src.profiling import Profiler
 from src.recording_service import RecordAudioService
 from src.scheduler_service import RecordingSchedulerService
+from src.stream_mirrors import MirrorPolicy
+from src.stream_reconnect import ReconnectPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -25,28 +32,89 @@ CHUNK_SIZE = (
 )  # Read/write x KB at a time # XXX: Experiment with this wrt performance and memory usage
 
 
-def resolve_dependencies(stream_url: ValidUrl):
-    http_stream_client = HttpStreamClient(CHUNK_SIZE)
+def resolve_dependencies(
+    stream_url: ValidUrl,
+    profiler: Profiler,
+    metrics: RecorderMetrics,
+    stream_config: StreamConfig,
+    reconnect_policy: ReconnectPolicy,
+    mirror_urls: list[ValidUrl],
+    mirror_policy: MirrorPolicy,
+    journal_config: JournalConfig,
+):
+    http_stream_client = HttpStreamClient(
+        CHUNK_SIZE, metrics, stream_config.raw_buffer_seconds, stream_config.http2
+    )
     if stream_url.endswith(".m3u8"):
         audio_format: str = "mp4"
-        stream_adapter = HlsAudioStreamAdapter(http_stream_client)
+        stream_adapter = HlsAudioStreamAdapter(
+            http_stream_client,
+            reconnect_policy,
+            mirror_urls,
+            mirror_policy,
+            stream_config.dedup_segments,
+        )
     else:
         audio_format: str = "mp3"
-        stream_adapter = HttpAudioStreamAdapter(http_stream_client)
+        stream_adapter = HttpAudioStreamAdapter(
+            http_stream_client,
+            stream_config.raw,
+            reconnect_policy,
+            mirror_urls,
+            mirror_policy,
+        )
 
     audio_service = RecordAudioService(
         stream_adapter,
-        AudioStorageAdapter(),
+        AudioStorageAdapter(metrics),
         stream_url,
         utils.TimeProvider(),
+        profiler,
+        metrics,
+        journal_config.interval if journal_config.enabled else None,
     )
 
     return audio_service, utils.TimeProvider(), audio_format
 
 
-# Starts the recording scheduler with the given config
-def main(config: AppConfig):
-    scheduler = RecordingSchedulerService(*resolve_dependencies(config.stream_url))
+# Starts the recording scheduler with the given config (loaded from the given path, to reload it)
+def main(config: AppConfig, config_path: Path):
+    loop = asyncio.get_event_loop()
+    profiler = Profiler(
+        config.profiling.output_dir,
+        config.profiling.max_runs,
+        config.profiling.sample_interval,
+        config.profiling.enabled,
+    )
+    # Toggle profiling without restart: kill -USR1 <pid>
+    if hasattr(signal, "SIGUSR1"):
+        loop.add_signal_handler(signal.SIGUSR1, profiler.toggle)
+
+    metrics = RecorderMetrics()
+    if config.watchdog.enabled:
+        LoopWatchdog(loop, config.watchdog.lag_threshold, metrics=metrics).start()
+    if config.watchdog.asyncio_debug:
+        enable_asyncio_debug(loop, config.watchdog.lag_threshold)
+    if config.metrics.enabled:
+        metrics_server = MetricsServer(
+            metrics, config.metrics.host, config.metrics.port
+        )
+        loop.run_until_complete(metrics_server.start())
+
+    scheduler = RecordingSchedulerService(
+        *resolve_dependencies(
+            config.stream_url,
+            profiler,
+            metrics,
+            config.stream,
+            config.reconnect,
+            config.mirror_urls,
+            config.mirrors,
+            config.journal,
+        ),
+        config.plan.days,
+        config.plan.max_concurrent,
+    )
     [
         scheduler.add_recording_schedule(schedule)
         for schedule in config.recording_schedules
@@ -54,16 +122,35 @@ def main(config: AppConfig):
 
     scheduler.run()
 
+    # Reload the recording schedules without restart: kill -HUP <pid>
+    reloader = ConfigReloader(
+        config_path,
+        config,
+        scheduler,
+        config.reload.interval if config.reload.watch else None,
+    )
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, reloader.reload)
+    reloader.start()
+
+
+# Prints the recordings planned by the recording schedules, e.g. to check a config before deploying it
+def print_plan(config: AppConfig, days: int):
+    plan = CapturePlan(config.recording_schedules, utils.get_utc_now(), days)
+    print(format_plan(plan, config.plan.max_concurrent))
+
 
 if __name__ == "__main__":
     # utils.setup_logging()
     utils.setup_logging(logging.DEBUG)
     try:
-        config_file_path = utils.read_config_path()
-        config = src.config.from_yaml(config_file_path)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        main(config)
+        cli_args = utils.read_cli_args()
+        config = src.config.from_yaml(cli_args.config_path)
+        if cli_args.plan:
+            print_plan(config, cli_args.plan_days or config.plan.days)
+            raise SystemExit(0)
+        loop = event_loop.new_event_loop(cli_args.event_loop or config.event_loop)
+        main(config, cli_args.config_path)
         loop.run_forever()
     # Do nothing on keyboard interrupt
     except (KeyboardInterrupt, SystemExit):
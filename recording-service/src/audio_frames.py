@@ -0,0 +1,198 @@
+import logging
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+# Finds where a recording can be appended to without a partial frame in between, e.g. after the recorder crashed mid-write.
+# Supports the formats recorded from streams: MPEG audio (MP3) and ADTS (AAC) frames with optional ID3 tags in between (e.g. HLS packed audio), MPEG-TS packets and ISO BMFF (fMP4) boxes
+
+# Bytes before the durable offset searched for frames
+_TAIL_SIZE = 256 * 1024
+# Consecutive frames needed to consider a frame header found by scanning as valid
+_SYNC_FRAMES = 3
+_TS_PACKET_SIZE = 188
+_BMFF_BOX_TYPES = {
+    b"ftyp",
+    b"styp",
+    b"moof",
+    b"mdat",
+    b"moov",
+    b"sidx",
+    b"emsg",
+    b"prft",
+}
+
+# kbps by MPEG version (1, or 2 for MPEG 2 and 2.5) and layer
+_MPEG_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz by the version bits of the header (0: MPEG 2.5, 2: MPEG 2, 3: MPEG 1)
+_MPEG_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+
+# Returns the end of the last complete frame (or packet/box) of the file, searched from shortly before 'durable_offset' (known to be written completely) to the end of the file.
+# I.e. data written after the durable offset is kept as far as it consists of complete frames. Falls back to the durable offset if no frames are found
+def find_append_offset(file_path: Path, durable_offset: int) -> int:
+    size = file_path.stat().st_size
+    durable_offset = min(durable_offset, size)
+    with open(file_path, "rb") as f:
+        head = f.read(_TS_PACKET_SIZE * 2 + 1)
+        if _is_bmff(head):
+            boundary = _find_bmff_boundary(f, size)
+            tail_start = 0
+        else:
+            tail_start = max(0, durable_offset - _TAIL_SIZE)
+            f.seek(tail_start)
+            tail = f.read(size - tail_start)
+            if _is_ts(head):
+                boundary = _find_ts_boundary(tail)
+            else:
+                boundary = _find_frame_boundary(tail)
+
+    if boundary is None:
+        logger.warning(
+            f"No complete frames found at the end of {file_path}, appending at the last durable offset"
+        )
+        return durable_offset
+    return tail_start + boundary
+
+
+def _is_bmff(head: bytes) -> bool:
+    return len(head) >= 8 and head[4:8] in _BMFF_BOX_TYPES
+
+
+def _is_ts(head: bytes) -> bool:
+    return (
+        len(head) > _TS_PACKET_SIZE * 2
+        and head[0] == 0x47
+        and head[_TS_PACKET_SIZE] == 0x47
+        and head[_TS_PACKET_SIZE * 2] == 0x47
+    )
+
+
+# End of the last complete top-level box. Walks the boxes from the start of the file, reading only their headers
+def _find_bmff_boundary(f: BinaryIO, size: int) -> Optional[int]:
+    offset = 0
+    while offset + 8 <= size:
+        f.seek(offset)
+        header = f.read(16)
+        box_size = int.from_bytes(header[0:4], "big")
+        if box_size == 1 and len(header) == 16:
+            box_size = int.from_bytes(header[8:16], "big")  # 64-bit size
+        if box_size < 8 or offset + box_size > size:
+            break  # Incomplete (or a box extending to the end of the file)
+        offset += box_size
+    return offset if offset > 0 else None
+
+
+# End of the last complete packet, aligned to the packets found in the data
+def _find_ts_boundary(data: bytes) -> Optional[int]:
+    for start in range(min(_TS_PACKET_SIZE, len(data))):
+        if all(
+            data[i] == 0x47
+            for i in range(
+                start, start + _TS_PACKET_SIZE * _SYNC_FRAMES, _TS_PACKET_SIZE
+            )
+            if i < len(data)
+        ):
+            return start + (len(data) - start) // _TS_PACKET_SIZE * _TS_PACKET_SIZE
+    return None
+
+
+# End of the last complete MPEG audio or ADTS frame (or ID3 tag). Frames are followed from the first position where consecutive frames are found, resyncing after data that is no frame
+def _find_frame_boundary(data: bytes) -> Optional[int]:
+    end: Optional[int] = None
+    position = _find_sync(data, 0)
+    while position is not None:
+        length = _get_id3_length(data, position) or _get_frame_length(data, position)
+        if length is None:
+            position = _find_sync(data, position + 1)
+            continue
+        if position + length > len(data):
+            break  # Partial frame
+        position += length
+        end = position
+    return end
+
+
+# Position of the first frame (or ID3 tag) from 'start' followed by consecutive frames, or reaching the end of the data
+def _find_sync(data: bytes, start: int) -> Optional[int]:
+    position = start
+    id3_position = -1
+    while position < len(data):
+        if id3_position < position:
+            id3_position = data.find(b"ID3", position)
+            if id3_position < 0:
+                id3_position = len(data)
+        sync_position = data.find(b"\xff", position)
+        position = min(id3_position, sync_position if sync_position >= 0 else len(data))
+        if position >= len(data):
+            return None
+        if _is_synced(data, position):
+            return position
+        position += 1
+    return None
+
+
+def _is_synced(data: bytes, position: int) -> bool:
+    for _ in range(_SYNC_FRAMES):
+        if len(data) - position < 7:
+            return True  # End of the data (or a partial header)
+        length = _get_id3_length(data, position) or _get_frame_length(data, position)
+        if length is None:
+            return False
+        position += length
+        if position > len(data):
+            return True  # Partial last frame
+    return True
+
+
+# Length of the ID3v2 tag at the position (header, synchsafe size and optional footer), if any
+def _get_id3_length(data: bytes, position: int) -> Optional[int]:
+    header = data[position : position + 10]
+    if len(header) < 10 or header[0:3] != b"ID3" or any(b & 0x80 for b in header[6:10]):
+        return None
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    has_footer = bool(header[5] & 0x10)
+    return 10 + size + (10 if has_footer else 0)
+
+
+# Length of the MPEG audio or ADTS frame at the position, if its header is valid
+def _get_frame_length(data: bytes, position: int) -> Optional[int]:
+    header = data[position : position + 7]
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+
+    layer_bits = (header[1] >> 1) & 0x03
+    if layer_bits == 0:
+        # ADTS: 12-bit sync and layer 0
+        if header[1] & 0xF0 != 0xF0 or len(header) < 7:
+            return None
+        length = ((header[3] & 0x03) << 11) | (header[4] << 3) | (header[5] >> 5)
+        return length if length >= 7 else None
+
+    version_bits = (header[1] >> 3) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    layer = 4 - layer_bits
+    version = 1 if version_bits == 3 else 2
+    bitrate = _MPEG_BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4
+    if layer == 3 and version == 2:
+        return 72 * bitrate // sample_rate + padding
+    return 144 * bitrate // sample_rate + padding
@@ -1,11 +1,17 @@
+import asyncio
 import logging
 import os
+import time
 from pathlib import Path
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, BinaryIO, Optional
 
 import yaml
 
+from src.audio_stream import AudioChunk
+from src.metrics import RecorderMetrics
 from src.models import RecordingSchedule
+from src.recording_journal import RecordingJournal
+from src.stream_reconnect import StreamGap
 
 logger = logging.getLogger(__name__)
 
@@ -16,28 +22,65 @@ class AudioStorageError(Exception):
 
 
 class AudioStorageAdapter:  # XXX: FileRepo
-    def __init__(self) -> None:
+    def __init__(self, metrics: Optional[RecorderMetrics] = None) -> None:
         super().__init__()
         # self.audio_format = audio_format
+        self._metrics = metrics if metrics is not None else RecorderMetrics()
 
     async def save(  # XXX: Dto with binary data and domain object? .save(audio_file: AudioFile)
         self,
-        audio_data_iterator: AsyncIterator[bytes],
+        audio_data_iterator: AsyncIterator[AudioChunk],
         output_path: Path,
+        stream_name: Optional[str] = None,  # Optional. Used to label metrics
+        # Optional. Periodically updated with the durable offset of the file, and removed once the file is complete
+        journal: Optional[RecordingJournal] = None,
+        # Optional. Offset to append to an existing file at (e.g. to resume a recording), i.e. anything after it is overwritten
+        append_offset: Optional[int] = None,
     ):
-        # "wb" is write binary
+        metrics = self._metrics.for_stream(stream_name)
+        # "wb" is write binary, "r+b" to write into an existing file
         try:
-            with open(output_path, "wb") as f:
+            with open(output_path, "wb" if append_offset is None else "r+b") as f:
+                if append_offset is not None:
+                    f.truncate(append_offset)
+                    f.seek(append_offset)
+                last_sync = time.perf_counter()
                 async for chunk in audio_data_iterator:
+                    # Writes block the event loop (and with it all other recordings)
+                    write_start = time.perf_counter()
                     f.write(chunk)
+                    if (
+                        journal is not None
+                        and write_start - last_sync >= journal.interval
+                    ):
+                        await self._sync(f, journal)
+                        last_sync = write_start
+                    metrics.disk_write_seconds.inc(time.perf_counter() - write_start)
+                    metrics.bytes_written.inc(len(chunk))
 
             logger.info(f"Audio file saved: {output_path}")
+            if journal is not None:
+                journal.remove()
 
         except Exception as e:
             raise AudioStorageError(
                 f"An error occured while writing audio file: {output_path}"
             ) from e
 
+    # Writes the file to disk and then its offset to the journal, i.e. the journal never points past the data on disk.
+    # Flushing only hands the buffer to the OS, whereas fsync and the journal write wait for the disk and run in the executor (not blocking other recordings)
+    async def _sync(self, f: BinaryIO, journal: RecordingJournal) -> None:
+        f.flush()
+        offset = f.tell()
+        await asyncio.get_running_loop().run_in_executor(
+            None, _write_durable, f.fileno(), offset, journal
+        )
+
+
+def _write_durable(fd: int, offset: int, journal: RecordingJournal) -> None:
+    os.fsync(fd)
+    journal.write(offset)
+
 
 def ensure_dir_with_metadata(directory: Path, metadata: dict[str, Any]) -> Path:
     _ensure_dir(directory)
@@ -60,3 +103,23 @@ def _write_meta_data(directory: Path, metadata: dict[str, Any]):
     if not metadata_file.exists():
         with open(metadata_file, "w") as f:
             yaml.dump(metadata, f, allow_unicode=True)
+
+
+# Writes the gaps of a recording (e.g. while reconnecting) to a sidecar file next to it: <audio file name>.yml
+def write_gaps_file(audio_file_path: Path, gaps: list[StreamGap]) -> Path:
+    gaps_file = audio_file_path.with_name(audio_file_path.name + ".yml")
+    data = {
+        "gap_seconds_total": round(sum(gap.duration_seconds for gap in gaps), 3),
+        "gaps": [
+            {
+                "start": gap.start.isoformat(),
+                "end": gap.end.isoformat(),
+                "duration_seconds": round(gap.duration_seconds, 3),
+                "reason": gap.reason,
+            }
+            for gap in gaps
+        ],
+    }
+    with open(gaps_file, "w") as f:
+        yaml.dump(data, f, allow_unicode=True, sort_keys=False)
+    return gaps_file
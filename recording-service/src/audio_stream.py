@@ -1,53 +1,230 @@
 import asyncio
+import copy
+import hashlib
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import AsyncIterator, Optional
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Mapping,
+    Optional,
+    TypeVar,
+    Union,
+)
 from urllib.parse import urljoin
 
-import aiohttp
-import m3u8  # type: ignore
-
-from src import utils
+import m3u8
+
+from src import ll_hls, utils
+from src.hls_variants import VariantPolicy, get_bitrate_kbps, select_variant
+from src.http_transport import (
+    Http2Transport,
+    HttpResponse,
+    aiohttp_get,
+    is_http2_available,
+)
+from src.ll_hls import PartLocation, PartPosition
+from src.metrics import RecorderMetrics, StreamMetrics
 from src.models import ValidUrl
+from src.raw_http_stream import (
+    RawHttpStream,
+    RawStreamError,
+    RawStreamNotSupportedError,
+    parse_bitrate_kbps,
+)
+from src.segment_dedup import SegmentDeduplicator
+from src.stream_mirrors import MirrorPolicy, MirrorStream, hedge
+from src.stream_reconnect import (
+    ReconnectError,
+    ReconnectingStream,
+    ReconnectPolicy,
+    StreamGaps,
+)
 
 logger = logging.getLogger(__name__)
 
+# Chunk of audio data. Raw streams yield views of reused buffers, i.e. a view is only valid until the next chunk is requested
+AudioChunk = Union[bytes, memoryview]
+
 
 class AudioStreamException(Exception):
     pass
 
 
+# A text resource (e.g. a HLS playlist) with the validators needed to request it conditionally
+@dataclass(frozen=True)
+class HttpTextResource:
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
 class HttpStreamClient:
     def __init__(
         self,
         chunk_size: int,
+        metrics: Optional[RecorderMetrics] = None,
+        raw_buffer_seconds: float = 1,  # Seconds of audio per buffer of raw streams
+        http2: bool = False,  # Whether to send requests over HTTP/2 (see Http2Transport). Can be selected per stream with 'with_http2'
     ):
         super().__init__()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:100.0) Gecko/20100101 Firefox/100.0",
         }
         self.chunk_size = chunk_size
+        self.metrics = metrics if metrics is not None else RecorderMetrics()
+        self.raw_buffer_seconds = raw_buffer_seconds
+        # Shared by all streams using HTTP/2, i.e. their requests to the same origin share a connection
+        self._http2_transport = Http2Transport() if is_http2_available() else None
+        self.http2 = self._check_http2(http2)
+
+    # Returns a client sharing this client's connections and metrics, which sends requests over HTTP/2 (or HTTP/1.1 with aiohttp if not 'enabled')
+    def with_http2(self, enabled: bool) -> "HttpStreamClient":
+        enabled = self._check_http2(enabled)
+        if enabled == self.http2:
+            return self
+        client = copy.copy(self)
+        client.http2 = enabled
+        return client
+
+    async def close(self) -> None:
+        if self._http2_transport is not None:
+            await self._http2_transport.close()
+
+    # Whether HTTP/2 can be used if selected, i.e. falls back to HTTP/1.1 if httpx[http2] is not installed
+    def _check_http2(self, enabled: bool) -> bool:
+        if enabled and self._http2_transport is None:
+            logger.warning(
+                "HTTP/2 selected but httpx[http2] is not installed, using HTTP/1.1"
+            )
+            return False
+        return enabled
+
+    # Sends a GET request over HTTP/2 if enabled, otherwise over HTTP/1.1 with aiohttp. No timeout if 'timeout' is None
+    @asynccontextmanager
+    async def _get(
+        self, url: ValidUrl, headers: Mapping[str, str], timeout: Optional[float]
+    ) -> AsyncGenerator[HttpResponse, None]:
+        if self.http2 and self._http2_transport is not None:
+            async with self._http2_transport.get(url, headers, timeout) as response:
+                yield response
+        else:
+            async with aiohttp_get(url, headers, timeout) as response:
+                yield response
 
     # Yields a chunk of bytes from a HTTP stream
     async def get_stream(
         self,
         url: ValidUrl,
         stream_name: Optional[str] = None,  # Optional. Used for better logging output
+        # Optional. Called with the bitrate announced by the stream (icy-br), if any
+        on_bitrate: Optional[Callable[[int], None]] = None,
     ) -> AsyncIterator[bytes]:
         try:
             logger.debug(f"{format_stream_name(stream_name)}Fetching stream for: {url}")
 
-            session_timeout = aiohttp.ClientTimeout(total=None)
-            async with aiohttp.ClientSession(timeout=session_timeout) as session:
-                async with session.get(url, headers=self.headers) as response:
-                    response.raise_for_status()
-                    async for chunk in response.content.iter_chunked(n=self.chunk_size):
-                        yield chunk
+            metrics = self.metrics.for_stream(stream_name)
+            async with self._get(url, self.headers, timeout=None) as response:
+                response.raise_for_status()
+                bitrate = parse_bitrate_kbps(response.headers.get("icy-br"))
+                if bitrate is not None and on_bitrate is not None:
+                    on_bitrate(bitrate)
+                fetch_start = time.perf_counter()
+                async for chunk in response.iter_chunked(self.chunk_size):
+                    metrics.chunk_fetch_seconds.observe(
+                        time.perf_counter() - fetch_start
+                    )
+                    metrics.bytes_received.inc(len(chunk))
+                    yield chunk
+                    fetch_start = time.perf_counter()
         except Exception as e:
             raise AudioStreamException(
                 f"Unable to fetch stream: {url}. Check your stream URL."
             ) from e
 
+    # Yields the data of a continuous HTTP stream (e.g. Icecast) as views of reused buffers holding 'raw_buffer_seconds' of audio each, i.e. with far less per-chunk overhead than 'get_stream'.
+    # NB: A view is only valid until the next chunk is requested. Falls back to 'get_stream' if the stream cannot be read raw
+    async def get_raw_stream(
+        self,
+        url: ValidUrl,
+        stream_name: Optional[str] = None,  # Optional. Used for better logging output
+        # Optional. Called with the bitrate announced by the stream (icy-br), if any
+        on_bitrate: Optional[Callable[[int], None]] = None,
+    ) -> AsyncIterator[AudioChunk]:
+        logger.debug(f"{format_stream_name(stream_name)}Fetching raw stream for: {url}")
+        metrics = self.metrics.for_stream(stream_name)
+        stream = RawHttpStream(url, self.headers, self.raw_buffer_seconds)
+        try:
+            await stream.open()
+        except RawStreamNotSupportedError as e:
+            logger.info(
+                f"{format_stream_name(stream_name)}Stream cannot be read raw, falling back to chunked reads: {e}"
+            )
+            async for chunk in self.get_stream(url, stream_name, on_bitrate):
+                yield chunk
+            return
+        except (RawStreamError, OSError, asyncio.TimeoutError) as e:
+            raise AudioStreamException(
+                f"Unable to fetch stream: {url}. Check your stream URL."
+            ) from e
+
+        logger.debug(
+            f"{format_stream_name(stream_name)}Reading raw stream with buffers of {stream.buffer_size} bytes"
+        )
+        if stream.bitrate_kbps is not None and on_bitrate is not None:
+            on_bitrate(stream.bitrate_kbps)
+        try:
+            fetch_start = time.perf_counter()
+            while (buffer := await stream.read()) is not None:
+                metrics.chunk_fetch_seconds.observe(time.perf_counter() - fetch_start)
+                metrics.bytes_received.inc(len(buffer))
+                yield buffer
+                fetch_start = time.perf_counter()
+        except (RawStreamError, OSError) as e:
+            raise AudioStreamException(f"Unable to fetch stream: {url}") from e
+        finally:
+            stream.close()
+
+    # Fetches the whole body of a resource (e.g. a HLS segment)
+    async def get_bytes(
+        self,
+        url: ValidUrl,
+        stream_name: Optional[str] = None,  # Optional. Used for better logging output
+    ) -> bytes:
+        try:
+            async with self._get(url, self.headers, timeout=None) as response:
+                response.raise_for_status()
+                data = await response.read()
+        except Exception as e:
+            raise AudioStreamException(f"Unable to fetch: {url}") from e
+        self.metrics.for_stream(stream_name).bytes_received.inc(len(data))
+        return data
+
+    # Fetches a text resource. If the previous response is given, the request is conditional and None is returned if the resource is unchanged (304)
+    async def get_text(
+        self, url: ValidUrl, previous: Optional[HttpTextResource] = None
+    ) -> Optional[HttpTextResource]:
+        headers = dict(self.headers)
+        if previous is not None and previous.etag is not None:
+            headers["If-None-Match"] = previous.etag
+        if previous is not None and previous.last_modified is not None:
+            headers["If-Modified-Since"] = previous.last_modified
+
+        async with self._get(url, headers, timeout=30) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            return HttpTextResource(
+                await response.text(),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+
 
 # Base for stream adapters
 class AudioStreamAdapter(ABC):
@@ -56,24 +233,47 @@ class AudioStreamAdapter(ABC):
         self.http_stream_client = http_stream_client
 
     @abstractmethod
-    # Yields a chunk of bytes from a stream
+    # Yields a chunk of bytes from a stream. Periods without audio (e.g. while reconnecting) are added to 'gaps'
     async def get_audio_data(
         self,
         url: ValidUrl,
         countdown: utils.CountdownTimer,
         stream_name: Optional[str] = None,
-    ) -> AsyncIterator[bytes]:
+        gaps: Optional[StreamGaps] = None,
+        variant_policy: Optional[VariantPolicy] = None,  # Only used for HLS streams
+        http2: Optional[
+            bool
+        ] = None,  # Whether to use HTTP/2 for this stream. Defaults to the client's setting
+    ) -> AsyncIterator[AudioChunk]:
         raise NotImplementedError
         yield
 
+    # The client of a stream, using HTTP/2 if selected for the stream
+    def _get_client(self, http2: Optional[bool]) -> HttpStreamClient:
+        if http2 is None:
+            return self.http_stream_client
+        return self.http_stream_client.with_http2(http2)
+
 
 # Simple audio stream adapter that fetches data from a HTTP stream for a given duration
 class HttpAudioStreamAdapter(AudioStreamAdapter):
     def __init__(
         self,
         http_stream_client: HttpStreamClient,
+        raw_stream: bool = False,  # Whether to read the stream into reused buffers (see HttpStreamClient.get_raw_stream)
+        reconnect_policy: Optional[ReconnectPolicy] = None,
+        mirror_urls: Optional[list[ValidUrl]] = None,  # Equivalent URLs of the stream
+        mirror_policy: Optional[MirrorPolicy] = None,
     ):
         super().__init__(http_stream_client)
+        self.raw_stream = raw_stream
+        self.reconnect_policy = (
+            reconnect_policy if reconnect_policy is not None else ReconnectPolicy()
+        )
+        self.mirror_urls = mirror_urls if mirror_urls is not None else []
+        self.mirror_policy = (
+            mirror_policy if mirror_policy is not None else MirrorPolicy()
+        )
 
     # Yields a chunk of bytes from a HTTP stream
     async def get_audio_data(
@@ -81,16 +281,79 @@ class HttpAudioStreamAdapter(AudioStreamAdapter):
         url: ValidUrl,
         countdown: utils.CountdownTimer,
         stream_name: Optional[str] = None,
-    ) -> AsyncIterator[bytes]:
+        gaps: Optional[StreamGaps] = None,
+        variant_policy: Optional[VariantPolicy] = None,
+        http2: Optional[bool] = None,
+    ) -> AsyncIterator[AudioChunk]:
         logger.debug(f"Starting to fetch audio stream for {countdown.duration_total}")
         countdown.start()
 
+        client = self._get_client(http2)
+        metrics = client.metrics.for_stream(stream_name)
+        # Raw reads use a HTTP/1.1 connection of their own, i.e. HTTP/2 streams are read in chunks
+        raw_stream = self.raw_stream and not client.http2
+
+        def open_url(
+            stream_url: ValidUrl, on_bitrate: Optional[Callable[[int], None]] = None
+        ) -> AsyncIterator[AudioChunk]:
+            if raw_stream:
+                return client.get_raw_stream(stream_url, stream_name, on_bitrate)
+            return client.get_stream(stream_url, stream_name, on_bitrate)
+
+        # With mirrors, every (re)connect races all mirrors
+        mirror_policy = self.mirror_policy
+        if raw_stream:
+            # Raw streams hand out data once per buffer, i.e. the other mirrors need the buffer duration to deliver audio
+            mirror_policy = replace(
+                mirror_policy,
+                throughput_window=mirror_policy.throughput_window
+                + client.raw_buffer_seconds,
+            )
+        mirrors = (
+            MirrorStream(
+                [url, *self.mirror_urls],
+                open_url,
+                mirror_policy,
+                stream_name,
+                on_switch=metrics.mirror_switches.inc,
+            )
+            if self.mirror_urls
+            else None
+        )
+
+        def open_stream() -> AsyncIterator[AudioChunk]:
+            if mirrors is not None:
+                return mirrors.chunks()
+            return open_url(url)
+
+        if self.reconnect_policy.enabled:
+            policy = self.reconnect_policy
+            if raw_stream:
+                # Raw streams hand out data once per buffer, i.e. a stall is only detectable after the buffer duration
+                policy = replace(
+                    policy,
+                    stall_timeout=policy.stall_timeout + client.raw_buffer_seconds,
+                )
+            chunks = ReconnectingStream(
+                open_stream,
+                policy,
+                countdown,
+                gaps if gaps is not None else StreamGaps(),
+                stream_name,
+                on_reconnect=metrics.reconnects.inc,
+            ).chunks()
+        else:
+            chunks = open_stream()
+
         # Keep fetching data from the stream until the countdown expires
-        async for chunk in self.http_stream_client.get_stream(url, stream_name):
-            yield chunk
-            if countdown.is_expired():
-                logger.debug("Countdown expired")
-                break
+        try:
+            async for chunk in chunks:
+                yield chunk
+                if countdown.is_expired():
+                    logger.debug("Countdown expired")
+                    break
+        except ReconnectError as e:
+            raise AudioStreamException(str(e)) from e
 
 
 # Get data from HLS stream (playlist url from which new segments are fetched continuously)
@@ -98,42 +361,139 @@ class HlsAudioStreamAdapter(HttpAudioStreamAdapter):
     def __init__(
         self,
         http_stream_client: HttpStreamClient,
+        reconnect_policy: Optional[ReconnectPolicy] = None,
+        mirror_urls: Optional[list[ValidUrl]] = None,  # Equivalent playlist URLs
+        mirror_policy: Optional[MirrorPolicy] = None,
+        dedup_segments: int = 0,  # Recent segments to drop byte-identical segments of (see SegmentDeduplicator). 0 to disable
     ):
-        super().__init__(http_stream_client)
+        super().__init__(
+            http_stream_client,
+            reconnect_policy=reconnect_policy,
+            mirror_urls=mirror_urls,
+            mirror_policy=mirror_policy,
+        )
+        self.dedup_segments = dedup_segments
 
     # Yields a chunk of bytes from a HLS stream
+    # If reconnecting is enabled, failed playlist reloads and segment fetches are retried at the next reload (tracked as gaps) until the gap budget is exceeded
+    # With mirrors, the initial playlist load races all mirrors. Slow playlist reloads and segments are hedged on the other mirrors (see _HlsMirrors)
+    # If the URL is a master playlist, the variant is chosen by the variant policy. Low-Latency HLS playlists are recorded by partial segments (see _get_low_latency_audio_data)
+    # Segments byte-identical to a recent segment (re-listed under a new URI) are dropped. To drop them before they are written, segments are held until complete
     async def get_audio_data(
         self,
         url: ValidUrl,
         countdown: utils.CountdownTimer,
         stream_name: Optional[str] = None,
-    ) -> AsyncIterator[bytes]:
+        gaps: Optional[StreamGaps] = None,
+        variant_policy: Optional[VariantPolicy] = None,
+        http2: Optional[bool] = None,
+    ) -> AsyncIterator[AudioChunk]:
         WAIT_TIME_SEC = 5  # Time to wait until checking for new segments
         recorded_segments: list[str] = []
+        client = self._get_client(http2)
+        metrics = client.metrics.for_stream(stream_name)
+        mirrors = _HlsMirrors(
+            client,
+            [url, *self.mirror_urls],
+            self.mirror_policy,
+            metrics,
+            variant_policy if variant_policy is not None else VariantPolicy(),
+            stream_name,
+        )
+        gaps = gaps if gaps is not None else StreamGaps()
+        dedup = SegmentDeduplicator(self.dedup_segments)
+        is_initial_reload = True
+        low_latency_playlist: Optional[m3u8.M3U8] = None
 
         countdown.start()
 
-        # Get initial segments
-        new_segments = self._get_new_segments(url, recorded_segments)
-        # Start recording from most recent segment
-        recorded_segments = new_segments[:-1]
-
         while not countdown.is_expired():
-            new_segments = self._get_new_segments(url, recorded_segments)
-            logger.debug(f"{len(new_segments)} new segment(s) found")
-
-            for segment in new_segments:
-                async for chunk in self.http_stream_client.get_stream(
-                    self._to_url(url, segment), stream_name
+            try:
+                new_segments = await self._get_new_segments(
+                    mirrors, recorded_segments, race=is_initial_reload
+                )
+                if (
+                    is_initial_reload
+                    and mirrors.playlist is not None
+                    and ll_hls.is_low_latency(mirrors.playlist)
                 ):
-                    yield chunk
-                    # Immediately stop if countdown expires
-                    if countdown.is_expired():
-                        logger.debug("Countdown expired")
-                        break
-
-            # Update recorded segments
-            recorded_segments.extend(new_segments)
+                    low_latency_playlist = mirrors.playlist
+                    break
+                if is_initial_reload:
+                    # Start recording from most recent segment
+                    recorded_segments = new_segments[:-1]
+                    new_segments = new_segments[-1:]
+                    is_initial_reload = False
+                logger.debug(f"{len(new_segments)} new segment(s) found")
+
+                for segment in new_segments:
+                    # Marked as recorded before fetching, i.e. a failed segment is skipped (part of the gap) instead of recorded twice
+                    recorded_segments.append(segment)
+                    fetch_start = time.perf_counter()
+                    if mirrors.has_mirrors:
+                        # Fetched whole, i.e. a slow download can be hedged on another mirror
+                        data = await mirrors.fetch_segment(segment)
+                        metrics.segment_fetch_seconds.observe(
+                            time.perf_counter() - fetch_start
+                        )
+                        gaps.close()
+                        if not self._is_duplicate(
+                            dedup, dedup.new_hash(data), segment, metrics, stream_name
+                        ):
+                            yield data
+                        if countdown.is_expired():
+                            logger.debug("Countdown expired")
+                            break
+                        continue
+
+                    if dedup.enabled:
+                        # Hashed as received and held until complete. A segment cut short by the countdown is not a duplicate (unless identical up to there)
+                        chunks: list[AudioChunk] = []
+                        segment_hash = dedup.new_hash()
+                        async for chunk in client.get_stream(
+                            self._to_url(mirrors.playlist_url, segment), stream_name
+                        ):
+                            gaps.close()
+                            segment_hash.update(chunk)
+                            chunks.append(chunk)
+                            if countdown.is_expired():
+                                break
+                        metrics.segment_fetch_seconds.observe(
+                            time.perf_counter() - fetch_start
+                        )
+                        if not self._is_duplicate(
+                            dedup, segment_hash, segment, metrics, stream_name
+                        ):
+                            for chunk in chunks:
+                                yield chunk
+                        if countdown.is_expired():
+                            logger.debug("Countdown expired")
+                            break
+                        continue
+
+                    consumer_time = 0.0  # Time spent by the consumer of the chunks, e.g. writing to disk
+                    async for chunk in client.get_stream(
+                        self._to_url(mirrors.playlist_url, segment), stream_name
+                    ):
+                        gaps.close()
+                        yield_start = time.perf_counter()
+                        yield chunk
+                        consumer_time += time.perf_counter() - yield_start
+                        # Immediately stop if countdown expires
+                        if countdown.is_expired():
+                            logger.debug("Countdown expired")
+                            break
+                    metrics.segment_fetch_seconds.observe(
+                        time.perf_counter() - fetch_start - consumer_time
+                    )
+            except AudioStreamException as e:
+                self._handle_stream_error(
+                    e,
+                    gaps,
+                    metrics,
+                    stream_name,
+                    "Retrying at the next playlist reload",
+                )
 
             # Wait before fetching new segments
             logger.debug(
@@ -141,26 +501,306 @@ class HlsAudioStreamAdapter(HttpAudioStreamAdapter):
             )
             await asyncio.sleep(WAIT_TIME_SEC)
 
+        if low_latency_playlist is not None:
+            async for chunk in self._get_low_latency_audio_data(
+                mirrors,
+                low_latency_playlist,
+                countdown,
+                gaps,
+                dedup,
+                metrics,
+                stream_name,
+            ):
+                yield chunk
+
+    # Yields the partial segments (EXT-X-PART) of a Low-Latency HLS stream, starting with the most recent part. A part is fetched as soon as it is announced (preload hint, answered by the server once the part is available) or listed (blocking playlist reload).
+    # I.e. the recording trails the live edge by about one part instead of several segments, and the playlist is only requested when it has changed
+    async def _get_low_latency_audio_data(
+        self,
+        mirrors: "_HlsMirrors",
+        playlist: m3u8.M3U8,
+        countdown: utils.CountdownTimer,
+        gaps: StreamGaps,
+        dedup: SegmentDeduplicator,
+        metrics: StreamMetrics,
+        stream_name: Optional[str] = None,
+    ) -> AsyncIterator[AudioChunk]:
+        position = ll_hls.get_live_edge(playlist)
+        part_target = ll_hls.get_part_target(playlist)
+        logger.info(
+            f"{format_stream_name(stream_name)}Low-latency playlist, recording parts of {part_target} seconds from part {position.part} of segment {position.msn}"
+        )
+        is_reload_needed = False
+
+        while not countdown.is_expired():
+            try:
+                if is_reload_needed:
+                    # Answered at once if the part is listed already
+                    playlist = await mirrors.reload_blocking(position)
+                    is_reload_needed = False
+                if ll_hls.is_behind(playlist, position):
+                    position = ll_hls.get_live_edge(playlist)
+                    logger.warning(
+                        f"{format_stream_name(stream_name)}Fell behind the playlist, continuing with part {position.part} of segment {position.msn}"
+                    )
+
+                location = ll_hls.locate_part(playlist, position)
+                if location is None:
+                    hint = ll_hls.get_preload_hint(playlist)
+                    if hint is None or hint.position != position:
+                        # Answered once the playlist lists the part
+                        playlist = await mirrors.reload_blocking(position)
+                        continue
+                    location = PartLocation(
+                        hint.uri, PartPosition(position.msn, position.part + 1)
+                    )
+
+                data = await mirrors.fetch_part(location.uri)
+                position = location.next_position
+                gaps.close()
+                if not self._is_duplicate(
+                    dedup, dedup.new_hash(data), location.uri, metrics, stream_name
+                ):
+                    yield data
+            except AudioStreamException as e:
+                self._handle_stream_error(
+                    e, gaps, metrics, stream_name, "Retrying after a playlist reload"
+                )
+                await asyncio.sleep(part_target)
+                is_reload_needed = True
+
+    # Whether the segment is a duplicate of a recent segment, i.e. to be dropped
+    def _is_duplicate(
+        self,
+        dedup: SegmentDeduplicator,
+        segment_hash: hashlib.blake2b,
+        segment_file: str,
+        metrics: StreamMetrics,
+        stream_name: Optional[str],
+    ) -> bool:
+        if not dedup.is_duplicate(segment_hash):
+            return False
+        logger.info(
+            f"{format_stream_name(stream_name)}Dropping segment identical to a recent segment: {segment_file}"
+        )
+        metrics.duplicate_segments.inc()
+        return True
+
+    # Tracks a failed request as a gap, to be retried. Raises if reconnecting is disabled or the gap budget is exceeded
+    def _handle_stream_error(
+        self,
+        error: AudioStreamException,
+        gaps: StreamGaps,
+        metrics: StreamMetrics,
+        stream_name: Optional[str],
+        retry_message: str,
+    ) -> None:
+        if not self.reconnect_policy.enabled:
+            raise error
+        logger.warning(f"{format_stream_name(stream_name)}{retry_message}, {error}")
+        metrics.reconnects.inc()
+        gaps.open(f"stream failed: {error}")
+        try:
+            self.reconnect_policy.check_gap_budget(
+                gaps, format_stream_name(stream_name)
+            )
+        except ReconnectError as budget_error:
+            raise AudioStreamException(str(budget_error)) from error
+
     # Updates internal segment state and returns new segments
-    def _get_new_segments(
-        self, playlist_url: ValidUrl, old_segments: list[str]
+    async def _get_new_segments(
+        self,
+        mirrors: "_HlsMirrors",
+        old_segments: list[str],
+        race: bool = False,  # Whether to race the mirrors instead of hedging
     ) -> list[str]:
+        # Reload playlist
+        playlist = await mirrors.reload(race)
+        if playlist is None:
+            return []  # Unchanged
+
+        # Get all segments not in old. A segment in progress (Low-Latency HLS) has no file yet
+        new_segment_files: list[str] = [
+            segment_file
+            for segment_file in playlist.files
+            if segment_file is not None and segment_file not in old_segments
+        ]
+
+        # Update state and return new segments
+        return new_segment_files
+
+    def _to_url(self, base_url: ValidUrl, segment_file: str) -> ValidUrl:
+        return ValidUrl(urljoin(base_url, segment_file))
+
+
+# Reloads a HLS playlist using conditional requests, i.e. an unchanged playlist is neither downloaded nor parsed again
+class _PlaylistLoader:
+    def __init__(
+        self,
+        http_stream_client: HttpStreamClient,
+        playlist_url: ValidUrl,
+        metrics: StreamMetrics,
+    ):
+        super().__init__()
+        self._http_stream_client = http_stream_client
+        self._playlist_url = playlist_url
+        self._metrics = metrics
+        self._previous: Optional[HttpTextResource] = None
+        self.playlist: Optional[m3u8.M3U8] = None  # Last loaded
+
+    @property
+    def playlist_url(self) -> ValidUrl:
+        return self._playlist_url
+
+    # Returns the reloaded playlist or None if unchanged since the last reload
+    async def reload(self) -> Optional[m3u8.M3U8]:
         try:
-            # Reload playlist
-            playlist = m3u8.load(playlist_url)
+            resource = await self._http_stream_client.get_text(
+                self._playlist_url, self._previous
+            )
         except Exception as e:
+            self._metrics.playlist_reload_errors.inc()
             raise AudioStreamException(
-                f"Unable to fetch stream: {playlist_url}. Check your stream URL."
+                f"Unable to fetch stream: {self._playlist_url}. Check your stream URL."
             ) from e
 
-        # Get all segments not in old
-        new_segment_files: list[str] = [segment_file for segment_file in playlist.files if segment_file not in old_segments]  # type: ignore
+        if resource is None:
+            self._metrics.playlist_reloads_not_modified.inc()
+            return None
 
-        # Update state and return new segments
-        return new_segment_files
+        return self._update(resource)
 
-    def _to_url(self, base_url: ValidUrl, segment_file: str) -> ValidUrl:
-        return ValidUrl(urljoin(base_url, segment_file))
+    # Loads the playlist once it contains the part at the position or a later one (Low-Latency HLS blocking reload)
+    async def load_blocking(self, position: PartPosition) -> m3u8.M3U8:
+        url = ValidUrl(ll_hls.get_blocking_reload_url(self._playlist_url, position))
+        try:
+            # Not conditional, the server holds the request until the playlist has changed
+            resource = await self._http_stream_client.get_text(url)
+            if resource is None:
+                raise ValueError("Unexpected response status: 304")
+        except Exception as e:
+            self._metrics.playlist_reload_errors.inc()
+            raise AudioStreamException(f"Unable to fetch playlist: {url}") from e
+        return self._update(resource)
+
+    def _update(self, resource: HttpTextResource) -> m3u8.M3U8:
+        self._metrics.playlist_reloads_changed.inc()
+        self._previous = resource
+        self.playlist = m3u8.loads(resource.content, uri=self._playlist_url)
+        return self.playlist
+
+
+R = TypeVar("R")
+
+
+# The mirrors (equivalent playlist URLs) of a HLS stream. Requests go to the preferred mirror and are hedged on the other mirrors (in order) if slower than the hedge delay or failed.
+# The mirror answering first becomes the preferred one. Segments (and variants of a master playlist) are requested by the same URI relative to the playlist URL of each mirror
+class _HlsMirrors:
+    def __init__(
+        self,
+        http_stream_client: HttpStreamClient,
+        playlist_urls: list[ValidUrl],
+        policy: MirrorPolicy,
+        metrics: StreamMetrics,
+        variant_policy: VariantPolicy,
+        stream_name: Optional[str] = None,  # Optional. Used for better logging output
+    ):
+        super().__init__()
+        self._http_stream_client = http_stream_client
+        self._loaders = [
+            _PlaylistLoader(http_stream_client, url, metrics) for url in playlist_urls
+        ]
+        self._policy = policy
+        self._metrics = metrics
+        self._variant_policy = variant_policy
+        self._stream_name = stream_name
+        self._preferred = 0
+
+    @property
+    def has_mirrors(self) -> bool:
+        return len(self._loaders) > 1
+
+    # URL of the media playlist of the preferred mirror
+    @property
+    def playlist_url(self) -> ValidUrl:
+        return self._loaders[self._preferred].playlist_url
+
+    # Last media playlist loaded from the preferred mirror
+    @property
+    def playlist(self) -> Optional[m3u8.M3U8]:
+        return self._loaders[self._preferred].playlist
+
+    # Returns the reloaded media playlist or None if unchanged since the last reload. With 'race', all mirrors are requested at once.
+    # A master playlist is resolved to the variant chosen by the variant policy, which is reloaded from then on
+    async def reload(self, race: bool = False) -> Optional[m3u8.M3U8]:
+        playlist = await self._hedge(
+            [loader.reload for loader in self._loaders],
+            0 if race else self._policy.hedge_delay,
+        )
+        if playlist is not None and playlist.is_variant:
+            self._use_variant(playlist)
+            return await self.reload(race)
+        return playlist
+
+    async def fetch_segment(self, segment_file: str) -> bytes:
+        def fetch(loader: _PlaylistLoader) -> Callable[[], Awaitable[bytes]]:
+            segment_url = ValidUrl(urljoin(loader.playlist_url, segment_file))
+            return lambda: self._http_stream_client.get_bytes(
+                segment_url, self._stream_name
+            )
+
+        return await self._hedge(
+            [fetch(loader) for loader in self._loaders], self._policy.hedge_delay
+        )
+
+    def _use_variant(self, master_playlist: m3u8.M3U8) -> None:
+        try:
+            variant = select_variant(master_playlist, self._variant_policy)
+        except ValueError as e:
+            raise AudioStreamException(
+                f"Unable to choose a variant of: {self.playlist_url}: {e}"
+            ) from e
+        logger.info(
+            f"{format_stream_name(self._stream_name)}Master playlist with {len(master_playlist.playlists)} variant(s), recording the variant of {get_bitrate_kbps(variant):.0f} kbps ({variant.stream_info.codecs or 'unknown codec'}): {variant.uri}"
+        )
+        self._loaders = [
+            _PlaylistLoader(
+                self._http_stream_client,
+                ValidUrl(urljoin(loader.playlist_url, variant.uri)),
+                self._metrics,
+            )
+            for loader in self._loaders
+        ]
+
+    # Low-Latency HLS requests go to the preferred mirror only. The server holds them until the part is available, i.e. their latency says nothing about the mirror
+    async def reload_blocking(self, position: PartPosition) -> m3u8.M3U8:
+        return await self._loaders[self._preferred].load_blocking(position)
+
+    async def fetch_part(self, part_uri: str) -> bytes:
+        return await self._http_stream_client.get_bytes(
+            ValidUrl(urljoin(self.playlist_url, part_uri)), self._stream_name
+        )
+
+    # Hedges the requests (one per mirror) starting with the preferred mirror
+    async def _hedge(
+        self, requests: list[Callable[[], Awaitable[R]]], delay: float
+    ) -> R:
+        order = [self._preferred] + [
+            i for i in range(len(requests)) if i != self._preferred
+        ]
+        index, result = await hedge(
+            [requests[i] for i in order],
+            delay,
+            # Racing (no delay) is not hedging
+            on_hedge=self._metrics.hedged_requests.inc if delay > 0 else None,
+        )
+        if order[index] != self._preferred:
+            logger.info(
+                f"{format_stream_name(self._stream_name)}Switching mirror from {self._loaders[self._preferred].playlist_url} to {self._loaders[order[index]].playlist_url}"
+            )
+            self._preferred = order[index]
+            self._metrics.mirror_switches.inc()
+        return result
 
 
 def format_stream_name(stream_name: Optional[str]) -> str:
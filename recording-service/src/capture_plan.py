@@ -0,0 +1,252 @@
+import bisect
+import functools
+import heapq
+import logging
+import operator
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from apscheduler.triggers.cron import CronTrigger  # type: ignore
+
+from src.models import RecordingSchedule
+
+logger = logging.getLogger(__name__)
+
+# Compiles recording schedules into a timeline of the capture windows (recording periods) of the next days, sorted by start.
+# Used to start recordings from a single timer (see RecordingSchedulerService) and to print the plan (main.py --plan). Windows are computed with plain datetimes and the weekdays of each frequency are resolved once, i.e. thousands of schedules are planned in milliseconds
+
+# Sorts windows by start and end
+_WINDOW_KEY = operator.itemgetter(0, 1)
+# Any monday, to resolve the weekdays of a frequency
+_REFERENCE_MONDAY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class CapturePlanError(Exception):
+    pass
+
+
+class CaptureWindow(NamedTuple):
+    start: datetime  # UTC
+    end: datetime  # UTC
+    schedule: RecordingSchedule
+
+
+# Overlapping windows merged, i.e. a period the stream is recorded without interruption
+class CaptureBlock(NamedTuple):
+    start: datetime
+    end: datetime
+    windows: list[CaptureWindow]
+    max_concurrent: int  # Most windows recorded at the same time
+
+
+# Overlapping windows of the same output directory (i.e. podcast). Only the first is recorded (see RecordingSchedulerService)
+class CaptureConflict(NamedTuple):
+    window: CaptureWindow
+    other: CaptureWindow  # Skipped
+
+
+class CapturePlan:
+    def __init__(
+        self, schedules: list[RecordingSchedule], start: datetime, days: int
+    ) -> None:
+        super().__init__()
+        if days <= 0:
+            raise ValueError("Plan days must be positive")
+        # As plain datetime, e.g. not pendulum, which is slower to compare
+        self.start = datetime.fromtimestamp(start.timestamp(), timezone.utc)
+        self.end = self.start + timedelta(days=days)
+        # Midnights of the dates a window may start on. Includes the day before the plan, as its windows may still be in progress
+        first_midnight = datetime.combine(
+            self.start.date() - timedelta(days=1), time(), timezone.utc
+        )
+        self._midnights = [
+            first_midnight + timedelta(days=i)
+            for i in range((self.end - first_midnight).days + 1)
+        ]
+        self._midnights_by_frequency: dict[str, list[datetime]] = {}
+        self._max_duration = timedelta(0)
+        self._windows_by_schedule: dict[uuid.UUID, list[CaptureWindow]] = {}
+        self.windows: list[CaptureWindow] = []  # Sorted by start and end
+        for schedule in schedules:
+            self._windows_by_schedule[schedule.id] = self._get_windows(schedule)
+        self.windows = [
+            window
+            for windows in self._windows_by_schedule.values()
+            for window in windows
+        ]
+        self.windows.sort(key=_WINDOW_KEY)
+
+    # Replans only the given schedules, e.g. the changes of a reloaded config. Windows are removed and inserted in place, i.e. the other windows are not touched.
+    # The windows of the added schedules are computed first, i.e. the plan is unchanged if one of them cannot be planned
+    def update(
+        self,
+        removed: Optional[list[RecordingSchedule]] = None,
+        added: Optional[list[RecordingSchedule]] = None,
+    ) -> None:
+        added_windows = [
+            (schedule, self._get_windows(schedule)) for schedule in added or []
+        ]
+        for schedule in removed or []:
+            for window in self._windows_by_schedule.pop(schedule.id, []):
+                index = bisect.bisect_left(
+                    self.windows, _WINDOW_KEY(window), key=_WINDOW_KEY
+                )
+                # Windows of other schedules may have the same start and end
+                while self.windows[index] is not window:
+                    index += 1
+                del self.windows[index]
+        for schedule, windows in added_windows:
+            self._windows_by_schedule[schedule.id] = windows
+            for window in windows:
+                bisect.insort(self.windows, window, key=_WINDOW_KEY)
+
+    # Windows in progress at the time, i.e. to be recorded
+    def get_due_windows(self, at: datetime) -> list[CaptureWindow]:
+        first = bisect.bisect_left(
+            self.windows, at - self._max_duration, key=_get_window_start
+        )
+        last = bisect.bisect_right(self.windows, at, key=_get_window_start)
+        return [window for window in self.windows[first:last] if at < window.end]
+
+    # Start of the first window after the time, if any within the plan
+    def get_next_start(self, at: datetime) -> Optional[datetime]:
+        index = bisect.bisect_right(self.windows, at, key=_get_window_start)
+        return self.windows[index].start if index < len(self.windows) else None
+
+    def get_blocks(self) -> list[CaptureBlock]:
+        blocks: list[CaptureBlock] = []
+        windows: list[CaptureWindow] = []
+        block_end = self.start
+        ends: list[datetime] = []  # Heap of the ends of the windows in progress
+        max_concurrent = 0
+        for window in self.windows:
+            if windows and window.start >= block_end:
+                blocks.append(
+                    CaptureBlock(windows[0].start, block_end, windows, max_concurrent)
+                )
+                windows, ends, max_concurrent = [], [], 0
+            while ends and ends[0] <= window.start:
+                heapq.heappop(ends)
+            heapq.heappush(ends, window.end)
+            max_concurrent = max(max_concurrent, len(ends))
+            block_end = max(block_end, window.end) if windows else window.end
+            windows.append(window)
+        if windows:
+            blocks.append(
+                CaptureBlock(windows[0].start, block_end, windows, max_concurrent)
+            )
+        return blocks
+
+    # Conflicts of all output directories, or of the given ones (as strings, e.g. of changed schedules)
+    def get_conflicts(
+        self, output_dirs: Optional[set[str]] = None
+    ) -> list[CaptureConflict]:
+        windows = self.windows
+        if output_dirs is not None:
+            windows = sorted(
+                (
+                    window
+                    for schedule_windows in self._windows_by_schedule.values()
+                    if schedule_windows
+                    and str(schedule_windows[0].schedule.output_dir) in output_dirs
+                    for window in schedule_windows
+                ),
+                key=_WINDOW_KEY,
+            )
+        conflicts: list[CaptureConflict] = []
+        recorded_by_dir: dict[Path, CaptureWindow] = {}
+        for window in windows:
+            output_dir = window.schedule.output_dir
+            recorded = recorded_by_dir.get(output_dir)
+            if recorded is not None and window.start < recorded.end:
+                # Skipped, i.e. does not conflict with later windows
+                conflicts.append(CaptureConflict(recorded, window))
+            else:
+                recorded_by_dir[output_dir] = window
+        return conflicts
+
+    # Blocks recording more windows at the same time than the limit
+    def get_overruns(self, max_concurrent: int) -> list[CaptureBlock]:
+        return [
+            block
+            for block in self.get_blocks()
+            if block.max_concurrent > max_concurrent
+        ]
+
+    def _get_windows(self, schedule: RecordingSchedule) -> list[CaptureWindow]:
+        start_time = schedule.start_timeofday
+        offset = timedelta(
+            hours=start_time.hour, minutes=start_time.minute, seconds=start_time.second
+        )
+        duration = schedule.duration.as_timedelta()
+        self._max_duration = max(self._max_duration, duration)
+        windows: list[CaptureWindow] = []
+        for midnight in self._get_midnights(schedule.frequency):
+            start = midnight + offset
+            end = start + duration
+            if self.start < end and start < self.end:
+                windows.append(CaptureWindow(start, end, schedule))
+        return windows
+
+    # Midnights of the dates of the plan on the weekdays of the frequency
+    def _get_midnights(self, frequency: str) -> list[datetime]:
+        midnights = self._midnights_by_frequency.get(frequency)
+        if midnights is None:
+            weekdays = get_weekdays(frequency)
+            midnights = [m for m in self._midnights if m.weekday() in weekdays]
+            self._midnights_by_frequency[frequency] = midnights
+        return midnights
+
+
+# Weekdays (0 is monday) of a frequency, i.e. a day-of-week cron expression, as interpreted by the scheduler before the plan (apscheduler)
+@functools.lru_cache(maxsize=None)
+def get_weekdays(frequency: str) -> frozenset[int]:
+    try:
+        trigger: Any = CronTrigger(
+            day_of_week=frequency, hour=0, minute=0, second=0, timezone="UTC"
+        )
+    except ValueError as e:
+        raise CapturePlanError(f"Invalid frequency: {frequency}, {e}") from e
+    days = [_REFERENCE_MONDAY + timedelta(days=i) for i in range(7)]
+    return frozenset(
+        day.weekday() for day in days if trigger.get_next_fire_time(None, day) == day
+    )
+
+
+def _get_window_start(window: CaptureWindow) -> datetime:
+    return window.start
+
+
+# Prints the plan, e.g. to check a config before deploying it
+def format_plan(plan: CapturePlan, max_concurrent: Optional[int] = None) -> str:
+    blocks = plan.get_blocks()
+    conflicts = plan.get_conflicts()
+    schedules = {window.schedule.id for window in plan.windows}
+    lines = [
+        f"Capture plan {_format_time(plan.start)} - {_format_time(plan.end)} (UTC): {len(plan.windows)} recording(s) of {len(schedules)} schedule(s) in {len(blocks)} block(s), at most {max((b.max_concurrent for b in blocks), default=0)} at a time",
+    ]
+    skipped = {id(conflict.other) for conflict in conflicts}
+    for block in blocks:
+        overrun = max_concurrent is not None and block.max_concurrent > max_concurrent
+        lines.append("")
+        lines.append(
+            f"{_format_time(block.start)} - {_format_time(block.end)}: {len(block.windows)} recording(s), at most {block.max_concurrent} at a time"
+            + (f" (OVER CAPACITY of {max_concurrent})" if overrun else "")
+        )
+        for window in block.windows:
+            lines.append(
+                f"  {_format_time(window.start)} - {_format_time(window.end)}  {window.schedule.title}"
+                + (" (CONFLICT, skipped)" if id(window) in skipped else "")
+            )
+    if conflicts:
+        lines.append("")
+        lines.append(
+            f"{len(conflicts)} conflict(s): overlapping recordings of the same podcast, only the first is recorded"
+        )
+    return "\n".join(lines)
+
+
+def _format_time(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M")
@@ -1,5 +1,5 @@
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any, Dict, Optional, Type, TypeVar, Union, overload
 
@@ -11,10 +11,18 @@ from pendulum.tz.timezone import Timezone
 from slugify import slugify
 
 from src import utils
+from src.capture_plan import CapturePlanError, get_weekdays
+from src.event_loop import EVENT_LOOP_TYPES
+from src.hls_variants import VariantPolicy
 from src.models import RecordingSchedule, ValidUrl
+from src.stream_mirrors import MirrorPolicy
+from src.stream_reconnect import ReconnectPolicy
 
 logger = logging.getLogger(__name__)
 
+# Safe loader, using libyaml if PyYAML is built with it. Several times faster, e.g. to reload configs with thousands of schedules
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 class ConfigError(Exception):
     pass
@@ -28,11 +36,124 @@ class ParseConfigError(ConfigError):
     pass
 
 
+@dataclass(frozen=True)
+class ProfilingConfig:
+    # Whether to profile recordings from startup. Can be toggled at runtime by sending SIGUSR1 to the process
+    enabled: bool = False
+    output_dir: Path = Path("profiles")
+    # Number of profiled recordings to keep in the output directory
+    max_runs: int = 20
+    # Seconds between stack samples
+    sample_interval: float = 0.01
+
+    def __post_init__(self):
+        if self.max_runs <= 0:
+            raise ValueError("Max runs must be positive")
+        if self.sample_interval <= 0:
+            raise ValueError("Sample interval must be positive")
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    # Whether to serve metrics in the Prometheus text format on http://<host>:<port>/metrics
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9102
+
+    def __post_init__(self):
+        if not 0 < self.port < 65536:
+            raise ValueError("Port must be between 1 and 65535")
+
+
+@dataclass(frozen=True)
+class WatchdogConfig:
+    # Whether to detect (and log the stack of) calls blocking the event loop shared by all recordings
+    enabled: bool = True
+    # Loop lag (seconds) above which the loop is considered blocked
+    lag_threshold: float = 0.25
+    # Whether to enable the asyncio debug mode, logging every callback taking longer than the lag threshold. Adds overhead to every callback
+    asyncio_debug: bool = False
+
+    def __post_init__(self):
+        if self.lag_threshold <= 0:
+            raise ValueError("Lag threshold must be positive")
+
+
+@dataclass(frozen=True)
+class StreamConfig:
+    # Whether to read HTTP streams (not HLS) into reused buffers instead of small chunks. Less CPU per stream for long recordings
+    raw: bool = False
+    # Seconds of audio (at the bitrate announced by the stream) per buffer of raw streams
+    raw_buffer_seconds: float = 1
+    # Whether to send requests over HTTP/2 where supported (requires httpx[http2]). Can be overridden per schedule
+    http2: bool = False
+    # Recent HLS segments to drop byte-identical segments of (e.g. re-listed under a new URI). 0 to disable.
+    # Off by default: a segment is held until complete to be compared, i.e. it is written at once instead of as it is received
+    dedup_segments: int = 0
+
+    def __post_init__(self):
+        if self.raw_buffer_seconds <= 0:
+            raise ValueError("Raw buffer seconds must be positive")
+        if self.dedup_segments < 0:
+            raise ValueError("Dedup segments must be non-negative")
+
+
+@dataclass(frozen=True)
+class JournalConfig:
+    # Whether to keep a journal of each recording in progress, to resume the recording in the same file if the service is restarted within the recording period
+    enabled: bool = True
+    # Seconds between writing the recording to disk (fsync) and updating its journal
+    interval: float = 5
+
+    def __post_init__(self):
+        if self.interval <= 0:
+            raise ValueError("Journal interval must be positive")
+
+
+@dataclass(frozen=True)
+class ReloadConfig:
+    # Whether to reload the config when the file changes. It is always reloaded on SIGHUP
+    watch: bool = False
+    # Seconds between checking the file for changes
+    interval: float = 2
+
+    def __post_init__(self):
+        if self.interval <= 0:
+            raise ValueError("Reload interval must be positive")
+
+
+@dataclass(frozen=True)
+class PlanConfig:
+    # Days of recordings planned ahead (see CapturePlan)
+    days: int = 7
+    # Recordings at the same time above which the plan is logged as over capacity (e.g. of the bandwidth or disk). None for no limit
+    max_concurrent: Optional[int] = None
+
+    def __post_init__(self):
+        if self.days <= 0:
+            raise ValueError("Plan days must be positive")
+        if self.max_concurrent is not None and self.max_concurrent <= 0:
+            raise ValueError("Max concurrent recordings must be positive")
+
+
 @dataclass(frozen=True)
 class AppConfig:
     stream_url: ValidUrl
     output_directory: Path
     recording_schedules: list[RecordingSchedule]
+    profiling: ProfilingConfig = field(default_factory=ProfilingConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    watchdog: WatchdogConfig = field(default_factory=WatchdogConfig)
+    # Event loop implementation, one of EVENT_LOOP_TYPES
+    event_loop: str = "auto"
+    stream: StreamConfig = field(default_factory=StreamConfig)
+    reconnect: ReconnectPolicy = field(default_factory=ReconnectPolicy)
+    # Equivalent URLs of the stream (e.g. on other CDNs or relays)
+    mirror_urls: list[ValidUrl] = field(default_factory=list[ValidUrl])
+    mirrors: MirrorPolicy = field(default_factory=MirrorPolicy)
+    journal: JournalConfig = field(default_factory=JournalConfig)
+    reload: ReloadConfig = field(default_factory=ReloadConfig)
+    plan: PlanConfig = field(default_factory=PlanConfig)
 
     def __post__init__(self):
         if not self.recording_schedules:
@@ -54,7 +175,7 @@ def from_yaml(file_path: Path) -> AppConfig:
 def _read_yaml(file_path: Path) -> dict[str, Any]:
     try:
         with open(file_path, "r") as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=_YamlLoader)
 
     except FileNotFoundError as e:
         raise LoadConfigFileError(f"Configuration file not found: {file_path}") from e
@@ -94,18 +215,181 @@ def _parse_data(data: dict[str, Any]) -> AppConfig:
         )
 
         recording_schedules: list[RecordingSchedule] = []
+        # Start times and durations by the times of day of the schedules, which many schedules share
+        times_cache: dict[tuple[str, str], tuple[Time, Duration]] = {}
         for schedule in schedules:
             recording_schedule = _parse_schedule(
-                base_output_dir, user_timezone, schedule, audio_format
+                base_output_dir, user_timezone, schedule, audio_format, times_cache
             )
             recording_schedules.append(recording_schedule)
 
+        # Parse optional profiling section
+        profiling = _parse_profiling(data.get("profiling") or {})
+        # Parse optional metrics section
+        metrics = _parse_metrics(data.get("metrics") or {})
+        # Parse optional watchdog section
+        watchdog = _parse_watchdog(data.get("watchdog") or {})
+        # Parse optional event loop
+        event_loop = _parse_event_loop(data.get("event_loop") or "auto")
+        # Parse optional stream section
+        stream = _parse_stream(data.get("stream") or {})
+        # Parse optional reconnect section
+        reconnect = _parse_reconnect(data.get("reconnect") or {})
+        # Parse optional mirrors section
+        mirror_urls, mirrors = _parse_mirrors(data.get("mirrors") or {}, stream_url)
+        # Parse optional journal section
+        journal = _parse_journal(data.get("journal") or {})
+        # Parse optional reload section
+        reload = _parse_reload(data.get("reload") or {})
+        # Parse optional plan section
+        plan = _parse_plan(data.get("plan") or {})
+
         # Everything parsed successfully, return the config object
-        return AppConfig(stream_url, base_output_dir, recording_schedules)
+        return AppConfig(
+            stream_url,
+            base_output_dir,
+            recording_schedules,
+            profiling,
+            metrics,
+            watchdog,
+            event_loop,
+            stream,
+            reconnect,
+            mirror_urls,
+            mirrors,
+            journal,
+            reload,
+            plan,
+        )
     except KeyError as e:
         raise ParseConfigError(f"Missing key: {e}") from e
     except ValueError as e:
         raise ParseConfigError(f"Invalid value: {e}") from e
+    except TypeError as e:
+        # E.g. a number where a list is expected
+        raise ParseConfigError(f"Invalid type: {e}") from e
+
+
+# Parses the optional profiling section. Missing keys fall back to defaults
+def _parse_profiling(data: dict[str, Any]) -> ProfilingConfig:
+    default = ProfilingConfig()
+    return ProfilingConfig(
+        enabled=data.get("enabled", default.enabled),
+        output_dir=Path(data.get("output_dir", default.output_dir)).resolve(),
+        max_runs=int(data.get("max_runs", default.max_runs)),
+        sample_interval=float(data.get("sample_interval", default.sample_interval)),
+    )
+
+
+# Parses the optional metrics section. Missing keys fall back to defaults
+def _parse_metrics(data: dict[str, Any]) -> MetricsConfig:
+    default = MetricsConfig()
+    return MetricsConfig(
+        enabled=data.get("enabled", default.enabled),
+        host=str(data.get("host", default.host)),
+        port=int(data.get("port", default.port)),
+    )
+
+
+# Parses the optional watchdog section. Missing keys fall back to defaults
+def _parse_watchdog(data: dict[str, Any]) -> WatchdogConfig:
+    default = WatchdogConfig()
+    return WatchdogConfig(
+        enabled=data.get("enabled", default.enabled),
+        lag_threshold=float(data.get("lag_threshold_seconds", default.lag_threshold)),
+        asyncio_debug=data.get("asyncio_debug", default.asyncio_debug),
+    )
+
+
+def _parse_event_loop(value: Any) -> str:
+    if value not in EVENT_LOOP_TYPES:
+        raise ValueError(
+            f"Invalid event loop '{value}', must be one of {EVENT_LOOP_TYPES}"
+        )
+    return value
+
+
+# Parses the optional stream section. Missing keys fall back to defaults
+def _parse_stream(data: dict[str, Any]) -> StreamConfig:
+    default = StreamConfig()
+    return StreamConfig(
+        raw=data.get("raw", default.raw),
+        raw_buffer_seconds=float(
+            data.get("raw_buffer_seconds", default.raw_buffer_seconds)
+        ),
+        http2=data.get("http2", default.http2),
+        dedup_segments=int(data.get("dedup_segments", default.dedup_segments)),
+    )
+
+
+# Parses the optional reconnect section. Missing keys fall back to defaults
+def _parse_reconnect(data: dict[str, Any]) -> ReconnectPolicy:
+    default = ReconnectPolicy()
+    return ReconnectPolicy(
+        enabled=data.get("enabled", default.enabled),
+        stall_timeout=float(data.get("stall_timeout_seconds", default.stall_timeout)),
+        initial_backoff=float(
+            data.get("initial_backoff_seconds", default.initial_backoff)
+        ),
+        max_backoff=float(data.get("max_backoff_seconds", default.max_backoff)),
+        gap_budget=float(data.get("gap_budget_seconds", default.gap_budget)),
+        warm_standby=data.get("warm_standby", default.warm_standby),
+    )
+
+
+# Parses the optional mirrors section. Missing keys fall back to defaults
+def _parse_mirrors(
+    data: dict[str, Any], stream_url: ValidUrl
+) -> tuple[list[ValidUrl], MirrorPolicy]:
+    url_values: list[Any] = data.get("urls") or []
+    urls = [ValidUrl(url) for url in url_values]
+    for url in urls:
+        # The audio format is derived from the stream url
+        if url.endswith(".m3u8") != stream_url.endswith(".m3u8"):
+            raise ValueError(
+                f"Mirror url '{url}' must be of the same stream type (HLS or not) as the stream url"
+            )
+
+    default = MirrorPolicy()
+    bitrate_kbps = data.get("bitrate_kbps", default.bitrate_kbps)
+    return urls, MirrorPolicy(
+        min_throughput_ratio=float(
+            data.get("min_throughput_ratio", default.min_throughput_ratio)
+        ),
+        throughput_window=float(
+            data.get("throughput_window_seconds", default.throughput_window)
+        ),
+        bitrate_kbps=int(bitrate_kbps) if bitrate_kbps is not None else None,
+        hedge_delay=float(data.get("hedge_delay_seconds", default.hedge_delay)),
+    )
+
+
+# Parses the optional journal section. Missing keys fall back to defaults
+def _parse_journal(data: dict[str, Any]) -> JournalConfig:
+    default = JournalConfig()
+    return JournalConfig(
+        enabled=data.get("enabled", default.enabled),
+        interval=float(data.get("interval_seconds", default.interval)),
+    )
+
+
+# Parses the optional reload section. Missing keys fall back to defaults
+def _parse_reload(data: dict[str, Any]) -> ReloadConfig:
+    default = ReloadConfig()
+    return ReloadConfig(
+        watch=data.get("watch", default.watch),
+        interval=float(data.get("interval_seconds", default.interval)),
+    )
+
+
+# Parses the optional plan section. Missing keys fall back to defaults
+def _parse_plan(data: dict[str, Any]) -> PlanConfig:
+    default = PlanConfig()
+    max_concurrent = data.get("max_concurrent", default.max_concurrent)
+    return PlanConfig(
+        days=int(data.get("days", default.days)),
+        max_concurrent=int(max_concurrent) if max_concurrent is not None else None,
+    )
 
 
 # Parses a single recording schedule
@@ -114,15 +398,21 @@ def _parse_schedule(
     user_timezone: Timezone,
     schedule_raw: Any,
     audio_format: str,
+    times_cache: Optional[dict[tuple[str, str], tuple[Time, Duration]]] = None,
 ) -> RecordingSchedule:
     title = utils.get_typed_value_or_fail(schedule_raw, "title")
     schedule_dir = base_output_dir / slugify(title)
 
-    start_time, duration = _parse_start_time_and_duration(
+    times: tuple[str, str] = (
         utils.get_typed_value_or_fail(schedule_raw, "start_timeofday"),
         utils.get_typed_value_or_fail(schedule_raw, "end_timeofday"),
-        user_timezone,
     )
+    if times_cache is not None and times in times_cache:
+        start_time, duration = times_cache[times]
+    else:
+        start_time, duration = _parse_start_time_and_duration(*times, user_timezone)
+        if times_cache is not None:
+            times_cache[times] = (start_time, duration)
 
     # Get optional properties
     description = schedule_raw.get("description", None)
@@ -132,6 +422,14 @@ def _parse_schedule(
         else None
     )
     frequency = schedule_raw.get("frequency", None)
+    if frequency:
+        # Fail on load (or reload) instead of when planning
+        try:
+            get_weekdays(frequency.replace(" ", ""))
+        except CapturePlanError as e:
+            raise ParseConfigError(f"Schedule '{title}': {e}") from e
+    hls_variant = _parse_hls_variant(schedule_raw.get("hls_variant") or {})
+    http2 = schedule_raw.get("http2", None)
 
     # Pass only if frequency if has value
     # XXX: Hack to avoid duplicate instance init. Better way?
@@ -149,11 +447,24 @@ def _parse_schedule(
         description,
         image_url,
         **kwargs,  # type: ignore
+        hls_variant=hls_variant,
+        http2=http2,
     )
 
     return recording_schedule
 
 
+# Parses the optional HLS variant section of a schedule. Missing keys fall back to defaults
+def _parse_hls_variant(data: dict[str, Any]) -> VariantPolicy:
+    default = VariantPolicy()
+    codec = data.get("codec", default.codec)
+    return VariantPolicy(
+        selection=str(data.get("selection", default.selection)),
+        min_bitrate_kbps=int(data.get("min_bitrate_kbps", default.min_bitrate_kbps)),
+        codec=str(codec) if codec is not None else None,
+    )
+
+
 # Gets the start time (UTC) and duration from the raw start and end times
 def _parse_start_time_and_duration(
     start_time_local_val: str, end_time_local_val: str, user_timezone: Timezone
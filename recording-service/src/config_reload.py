@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Optional
+
+import src.config
+from src.config import AppConfig, ConfigError
+from src.scheduler_service import RecordingSchedulerService, SchedulerError
+
+logger = logging.getLogger(__name__)
+
+
+# Reloads the config file without restarting the service, on SIGHUP (see main) and optionally when the file changes.
+# Only the recording schedules are applied (see RecordingSchedulerService.update_recording_schedules), i.e. recordings in progress are not interrupted. Other settings require a restart
+class ConfigReloader:
+    def __init__(
+        self,
+        config_path: Path,
+        config: AppConfig,
+        scheduler: RecordingSchedulerService,
+        watch_interval: Optional[float] = None,
+    ) -> None:
+        super().__init__()
+        self._config_path = config_path
+        self._config = config  # As applied
+        self._scheduler = scheduler
+        self._watch_interval = watch_interval
+        self._watch_task: Optional[asyncio.Task[None]] = None
+        self._reload_task: Optional[asyncio.Task[None]] = None
+        self._reload_pending = False
+
+    # Watches the file for changes, if enabled
+    def start(self) -> None:
+        if self._watch_interval is not None and self._watch_task is None:
+            self._watch_task = asyncio.get_event_loop().create_task(self._watch())
+
+    # Reloads in the background, e.g. called by a signal handler. A reload requested during a reload is run after it
+    def reload(self) -> None:
+        if self._reload_task is not None:
+            self._reload_pending = True
+            return
+        self._reload_task = asyncio.get_event_loop().create_task(self._reload())
+
+    async def _reload(self) -> None:
+        try:
+            self._reload_pending = True
+            while self._reload_pending:
+                self._reload_pending = False
+                await self._reload_once()
+        finally:
+            self._reload_task = None
+
+    async def _reload_once(self) -> None:
+        start_time = time.perf_counter()
+        try:
+            # Parsed in a thread, as parsing thousands of schedules would block the recordings on the event loop
+            new_config = await asyncio.get_event_loop().run_in_executor(
+                None, src.config.from_yaml, self._config_path
+            )
+        except ConfigError as e:
+            # E.g. a file saved halfway through editing. Keep recording with the current config
+            logger.error(f"Could not reload config, keeping the current config: {e}")
+            return
+
+        apply_start_time = time.perf_counter()
+        self._warn_restart_required(new_config)
+        try:
+            diff = self._scheduler.update_recording_schedules(
+                new_config.recording_schedules
+            )
+        except SchedulerError as e:
+            # The scheduler is left unchanged (see update_recording_schedules)
+            logger.error(
+                f"Could not apply reloaded config, keeping the current config: {e}"
+            )
+            return
+        self._config = replace(
+            self._config, recording_schedules=new_config.recording_schedules
+        )
+        parse_ms = (apply_start_time - start_time) * 1000
+        apply_ms = (time.perf_counter() - apply_start_time) * 1000
+        logger.info(
+            f"Config reloaded (parsed in {parse_ms:.1f} ms, applied in {apply_ms:.1f} ms): {len(diff.added)} added, {len(diff.removed)} removed, {len(diff.modified)} modified, {len(diff.unchanged)} unchanged recording schedules"
+        )
+
+    def _warn_restart_required(self, new_config: AppConfig) -> None:
+        changed = [
+            f.name
+            for f in fields(AppConfig)
+            if f.name != "recording_schedules"
+            and getattr(self._config, f.name) != getattr(new_config, f.name)
+        ]
+        if changed:
+            logger.warning(
+                f"Changes to {', '.join(changed)} are not applied until the service is restarted"
+            )
+
+    # Polls the modification time (and size) of the file, e.g. for deployments without signals such as a mounted config map
+    async def _watch(self) -> None:
+        assert self._watch_interval is not None
+        last_stat = self._stat()
+        while True:
+            await asyncio.sleep(self._watch_interval)
+            stat = self._stat()
+            # None while the file is replaced (or deleted), reload once it is back
+            if stat is not None and stat != last_stat:
+                logger.info(f"Config file changed: {self._config_path}")
+                self.reload()
+            if stat is not None:
+                last_stat = stat
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self._config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
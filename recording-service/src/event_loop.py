@@ -0,0 +1,50 @@
+import asyncio
+import logging
+from types import ModuleType
+from typing import Optional
+
+# Optional dependency: faster socket I/O for many concurrent streams
+uvloop: Optional[ModuleType]
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
+# Event loop implementations that can be selected
+# - auto: uvloop if installed, otherwise the asyncio default loop
+# - asyncio: the asyncio default loop
+# - uvloop: uvloop, falls back to the asyncio default loop if not installed
+EVENT_LOOP_TYPES = ("auto", "asyncio", "uvloop")
+
+
+def is_uvloop_available() -> bool:
+    return uvloop is not None
+
+
+# Creates a new event loop of the given type and sets it as the current loop (used by e.g. the timer of the RecordingSchedulerService)
+def new_event_loop(loop_type: str) -> asyncio.AbstractEventLoop:
+    if loop_type not in EVENT_LOOP_TYPES:
+        raise ValueError(
+            f"Invalid event loop '{loop_type}', must be one of {EVENT_LOOP_TYPES}"
+        )
+
+    if loop_type == "uvloop" and uvloop is None:
+        logger.warning(
+            "Event loop 'uvloop' selected but uvloop is not installed, using the asyncio default loop"
+        )
+
+    if loop_type != "asyncio" and uvloop is not None:
+        loop: asyncio.AbstractEventLoop = uvloop.new_event_loop()
+    else:
+        loop = asyncio.new_event_loop()
+
+    asyncio.set_event_loop(loop)
+    logger.info(f"Using event loop: {get_event_loop_name(loop)}")
+    return loop
+
+
+# Name of the implementation of the loop, e.g. for logging and benchmark results
+def get_event_loop_name(loop: asyncio.AbstractEventLoop) -> str:
+    return f"{type(loop).__module__}.{type(loop).__name__}"
@@ -0,0 +1,68 @@
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import m3u8
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SELECTIONS = ("highest", "lowest")
+
+
+@dataclass(frozen=True)
+class VariantPolicy:
+    # How to choose the variant of a HLS master playlist, one of VARIANT_SELECTIONS:
+    # 'highest': Highest bitrate. 'lowest': Lowest bitrate of at least 'min_bitrate_kbps' (or the highest bitrate if none is high enough)
+    selection: str = "highest"
+    min_bitrate_kbps: int = 0
+    # Only consider variants with this codec (e.g. 'mp4a.40.2' or just 'mp4a'), if any
+    codec: Optional[str] = None
+
+    def __post_init__(self):
+        if self.selection not in VARIANT_SELECTIONS:
+            raise ValueError(
+                f"Invalid variant selection '{self.selection}', must be one of {VARIANT_SELECTIONS}"
+            )
+        if self.min_bitrate_kbps < 0:
+            raise ValueError("Min bitrate must be non-negative")
+
+
+# Chooses the variant (media playlist) of a master playlist according to the policy
+def select_variant(master_playlist: m3u8.M3U8, policy: VariantPolicy) -> Any:
+    variants: list[Any] = list(master_playlist.playlists)
+    if not variants:
+        raise ValueError("Master playlist has no variants")
+
+    if policy.codec is not None:
+        codec = policy.codec
+        matching = [v for v in variants if _has_codec(v, codec)]
+        if matching:
+            variants = matching
+        else:
+            logger.warning(
+                f"No variant with codec '{codec}', choosing from all variants (codecs: {', '.join(sorted({str(v.stream_info.codecs) for v in variants}))})"
+            )
+
+    if policy.selection == "lowest":
+        sufficient = [
+            v for v in variants if get_bitrate_kbps(v) >= policy.min_bitrate_kbps
+        ]
+        if sufficient:
+            return min(sufficient, key=get_bitrate_kbps)
+        logger.warning(
+            f"No variant with a bitrate of at least {policy.min_bitrate_kbps} kbps, choosing the highest"
+        )
+    return max(variants, key=get_bitrate_kbps)
+
+
+# Bitrate of a variant, the average bitrate if given (otherwise the peak bitrate)
+def get_bitrate_kbps(variant: Any) -> float:
+    stream_info = variant.stream_info
+    bandwidth = stream_info.average_bandwidth or stream_info.bandwidth or 0
+    return bandwidth / 1000
+
+
+# Whether the variant has the codec. A codec without profile (e.g. 'mp4a') matches any profile (e.g. 'mp4a.40.2')
+def _has_codec(variant: Any, codec: str) -> bool:
+    codecs = str(variant.stream_info.codecs or "").split(",")
+    return any(c.strip() == codec or c.strip().startswith(codec + ".") for c in codecs)
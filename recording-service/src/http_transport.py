@@ -0,0 +1,194 @@
+import importlib.util
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import Any, AsyncGenerator, AsyncIterator, Mapping, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from typing_extensions import override
+
+# Optional dependency: HTTP/2 client (installed with 'httpx[http2]', which also installs the HTTP/2 protocol implementation 'h2')
+httpx: Optional[ModuleType]
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+def is_http2_available() -> bool:
+    return httpx is not None and importlib.util.find_spec("h2") is not None
+
+
+# Response of a GET request, independent of the HTTP client used
+class HttpResponse(ABC):
+    @property
+    @abstractmethod
+    def status(self) -> int:
+        raise NotImplementedError
+
+    @property
+    @abstractmethod
+    def headers(self) -> Mapping[str, str]:
+        raise NotImplementedError
+
+    # Negotiated protocol, e.g. 'HTTP/1.1' or 'HTTP/2'
+    @property
+    @abstractmethod
+    def http_version(self) -> str:
+        raise NotImplementedError
+
+    # Raises if the status is an error (4xx/5xx)
+    @abstractmethod
+    def raise_for_status(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_chunked(self, chunk_size: int) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def read(self) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def text(self) -> str:
+        raise NotImplementedError
+
+
+# HTTP/1.1 response of aiohttp
+class AiohttpResponse(HttpResponse):
+    def __init__(self, response: aiohttp.ClientResponse) -> None:
+        super().__init__()
+        self._response = response
+
+    @property
+    @override
+    def status(self) -> int:
+        return self._response.status
+
+    @property
+    @override
+    def headers(self) -> Mapping[str, str]:
+        return self._response.headers
+
+    @property
+    @override
+    def http_version(self) -> str:
+        version = self._response.version
+        if version is None:
+            return "HTTP/1.1"
+        return f"HTTP/{version.major}.{version.minor}"
+
+    @override
+    def raise_for_status(self) -> None:
+        self._response.raise_for_status()
+
+    @override
+    def iter_chunked(self, chunk_size: int) -> AsyncIterator[bytes]:
+        return self._response.content.iter_chunked(n=chunk_size)
+
+    @override
+    async def read(self) -> bytes:
+        return await self._response.read()
+
+    @override
+    async def text(self) -> str:
+        return await self._response.text()
+
+
+# Sends GET requests with aiohttp, using a new session (i.e. a new HTTP/1.1 connection) per request
+@asynccontextmanager
+async def aiohttp_get(
+    url: str, headers: Mapping[str, str], timeout: Optional[float]
+) -> AsyncGenerator[HttpResponse, None]:
+    session_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(timeout=session_timeout) as session:
+        async with session.get(url, headers=headers) as response:
+            yield AiohttpResponse(response)
+
+
+# Response of httpx, HTTP/2 or HTTP/1.1 depending on the protocol negotiated
+class _HttpxResponse(HttpResponse):
+    def __init__(self, response: Any) -> None:  # httpx.Response
+        super().__init__()
+        self._response = response
+
+    @property
+    @override
+    def status(self) -> int:
+        return self._response.status_code
+
+    @property
+    @override
+    def headers(self) -> Mapping[str, str]:
+        return self._response.headers
+
+    @property
+    @override
+    def http_version(self) -> str:
+        return self._response.http_version
+
+    @override
+    def raise_for_status(self) -> None:
+        # Unlike aiohttp, httpx also raises for redirects and 304
+        if self._response.status_code >= 400:
+            self._response.raise_for_status()
+
+    @override
+    def iter_chunked(self, chunk_size: int) -> AsyncIterator[bytes]:
+        return self._response.aiter_bytes(chunk_size)
+
+    @override
+    async def read(self) -> bytes:
+        return await self._response.aread()
+
+    @override
+    async def text(self) -> str:
+        await self._response.aread()
+        return self._response.text
+
+
+# Sends GET requests over HTTP/2 where the server supports it, negotiated by ALPN on HTTPS connections. Otherwise (e.g. plain HTTP) falls back to HTTP/1.1.
+# All requests share one client, i.e. concurrent requests to the same origin (e.g. playlist reloads and segments of all HLS streams from a CDN) are multiplexed over a single connection with compressed headers. HTTP/1.1 connections are kept alive and reused
+class Http2Transport:
+    def __init__(self) -> None:
+        super().__init__()
+        if not is_http2_available():
+            raise RuntimeError("HTTP/2 requires httpx[http2] to be installed")
+        self._client: Any = None  # httpx.AsyncClient
+        self._origin_versions: dict[str, str] = {}  # Last protocol per origin
+
+    @asynccontextmanager
+    async def get(
+        self, url: str, headers: Mapping[str, str], timeout: Optional[float]
+    ) -> AsyncGenerator[HttpResponse, None]:
+        assert httpx is not None
+        if self._client is None:
+            # Created on first use, i.e. on the running event loop
+            self._client = httpx.AsyncClient(http2=True, follow_redirects=True)
+        async with self._client.stream(
+            "GET", url, headers=headers, timeout=httpx.Timeout(timeout)
+        ) as response:
+            self._log_protocol(url, str(response.http_version))
+            yield _HttpxResponse(response)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # Logs the protocol of an origin once and when it changes, e.g. to see the origins falling back to HTTP/1.1
+    def _log_protocol(self, url: str, http_version: str) -> None:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if self._origin_versions.get(origin) == http_version:
+            return
+        self._origin_versions[origin] = http_version
+        if http_version == "HTTP/2":
+            logger.info(f"Using HTTP/2 for {origin}")
+        else:
+            logger.info(f"{origin} does not support HTTP/2, using {http_version}")
@@ -0,0 +1,113 @@
+import logging
+from typing import Any, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import m3u8
+
+logger = logging.getLogger(__name__)
+
+# Helpers for Low-Latency HLS (RFC 8216bis): media playlists listing partial segments (EXT-X-PART) of the segment in progress, reloaded with blocking requests (_HLS_msn/_HLS_part)
+
+
+# Position of a partial segment: media sequence number of its segment and index of the part within the segment
+class PartPosition(NamedTuple):
+    msn: int
+    part: int
+
+
+# URI of the media at a position, and the position following it
+class PartLocation(NamedTuple):
+    uri: str
+    next_position: PartPosition
+
+
+# Partial segment announced by the server before it is listed (EXT-X-PRELOAD-HINT)
+class PreloadHint(NamedTuple):
+    uri: str
+    position: PartPosition
+
+
+# Whether the media playlist supports blocking reloads of partial segments
+def is_low_latency(playlist: m3u8.M3U8) -> bool:
+    server_control: Any = playlist.server_control
+    part_inf: Any = playlist.part_inf
+    return (
+        server_control is not None
+        and str(server_control.can_block_reload).upper() == "YES"
+        and part_inf is not None
+        and part_inf.part_target is not None
+    )
+
+
+# Seconds per partial segment (PART-TARGET) of a low-latency playlist
+def get_part_target(playlist: m3u8.M3U8) -> float:
+    part_inf: Any = playlist.part_inf
+    return float(part_inf.part_target)
+
+
+# Position of the most recent part listed, i.e. where a recording starts
+def get_live_edge(playlist: m3u8.M3U8) -> PartPosition:
+    segments: list[Any] = list(playlist.segments)
+    media_sequence = int(playlist.media_sequence or 0)
+    for index in range(len(segments) - 1, -1, -1):
+        if segments[index].parts:
+            return PartPosition(media_sequence + index, len(segments[index].parts) - 1)
+    # No parts listed, start with the last complete segment
+    return PartPosition(media_sequence + max(len(segments) - 1, 0), 0)
+
+
+# Whether the position is no longer listed, i.e. the recording fell behind the playlist window
+def is_behind(playlist: m3u8.M3U8, position: PartPosition) -> bool:
+    return position.msn < int(playlist.media_sequence or 0)
+
+
+# Locates the media at the position, or None if not listed yet.
+# A segment completed with fewer parts continues with the next segment. A complete segment no longer listed by parts is fetched whole if it starts at the position (otherwise skipped)
+def locate_part(playlist: m3u8.M3U8, position: PartPosition) -> Optional[PartLocation]:
+    segments: list[Any] = list(playlist.segments)
+    index = position.msn - int(playlist.media_sequence or 0)
+    while 0 <= index < len(segments):
+        segment = segments[index]
+        if position.part < len(segment.parts):
+            return PartLocation(
+                segment.parts[position.part].uri,
+                PartPosition(position.msn, position.part + 1),
+            )
+        if segment.uri is None:
+            return None  # Segment in progress, part not listed yet
+        if position.part == 0 and not segment.parts:
+            return PartLocation(segment.uri, PartPosition(position.msn + 1, 0))
+        position = PartPosition(position.msn + 1, 0)
+        index += 1
+    return None
+
+
+# The preload hint of the next part, if any. Hints of byte ranges are not supported
+def get_preload_hint(playlist: m3u8.M3U8) -> Optional[PreloadHint]:
+    hint: Any = playlist.preload_hint
+    segments: list[Any] = list(playlist.segments)
+    if (
+        hint is None
+        or str(hint.hint_type).upper() != "PART"
+        or hint.byterange_start is not None
+        or not segments
+    ):
+        return None
+    last_msn = int(playlist.media_sequence or 0) + len(segments) - 1
+    last_segment = segments[-1]
+    if last_segment.uri is None:
+        # Next part of the segment in progress
+        return PreloadHint(hint.uri, PartPosition(last_msn, len(last_segment.parts)))
+    return PreloadHint(hint.uri, PartPosition(last_msn + 1, 0))
+
+
+# URL of a blocking playlist reload, which the server answers once the playlist contains the part at the position (or a later one)
+def get_blocking_reload_url(playlist_url: str, position: PartPosition) -> str:
+    parts = urlsplit(playlist_url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in ("_HLS_msn", "_HLS_part")
+    ]
+    query += [("_HLS_msn", str(position.msn)), ("_HLS_part", str(position.part))]
+    return urlunsplit(parts._replace(query=urlencode(query)))
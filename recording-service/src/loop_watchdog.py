@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from src.metrics import RecorderMetrics
+
+logger = logging.getLogger(__name__)
+
+
+# Detects stalls of the event loop shared by all recordings, i.e. blocking calls (file writes, yaml dumps, synchronous HTTP requests, slow scheduler callbacks).
+# - A heartbeat task on the loop measures the loop lag continuously (how late it wakes up from a sleep)
+# - A watchdog thread checks the heartbeat. If it is late by more than the threshold, the stack of the loop thread is captured while the loop is still blocked, and logged together with the task running on the loop (tasks of recordings are named after their schedule)
+# The overhead is one heartbeat per interval and one thread wakeup per half threshold, independent of the number of callbacks run by the loop.
+class LoopWatchdog:
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        lag_threshold: float,  # Seconds
+        interval: float = 0.5,  # Seconds between heartbeats
+        metrics: Optional[RecorderMetrics] = None,
+    ) -> None:
+        super().__init__()
+        self._loop = loop
+        self._lag_threshold = lag_threshold
+        self._interval = interval
+        self._metrics = metrics
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        # Heartbeat the last stall was reported for, i.e. each stall is reported once
+        self._reported_beat: Optional[float] = None
+        # Set by the watchdog thread, read by the heartbeat once the loop runs again
+        self._stalled_task_name: Optional[str] = None
+        self._heartbeat_task: Optional[asyncio.Task[None]] = None
+        self._stop_event = threading.Event()
+
+    # Must be called on the loop thread
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = self._loop.create_task(
+            self._heartbeat(), name="loop-watchdog-heartbeat"
+        )
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        logger.info(
+            f"Event loop watchdog started (lag threshold: {self._lag_threshold} seconds)"
+        )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self) -> None:
+        lag_histogram = (
+            self._metrics.loop_lag_seconds.labels() if self._metrics else None
+        )
+        while True:
+            expected = time.monotonic() + self._interval
+            await asyncio.sleep(self._interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            if lag_histogram is not None:
+                lag_histogram.observe(lag)
+
+            if lag >= self._lag_threshold:
+                task_name = self._stalled_task_name or "unknown"
+                self._stalled_task_name = None
+                if self._metrics is not None:
+                    self._metrics.loop_stalls.labels(task_name).inc()
+                logger.warning(
+                    f"Event loop was blocked for {lag:.3f} seconds (task: {task_name})"
+                )
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self._lag_threshold / 2):
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat - self._interval
+            if lag < self._lag_threshold or self._reported_beat == last_beat:
+                continue
+            self._reported_beat = last_beat
+            self._report_stall(lag)
+
+    # Logs what the loop is doing while it is still blocked
+    def _report_stall(self, lag: float) -> None:
+        if self._loop_thread_id is None:
+            return
+        # Reading the current task from another thread is racy, but the loop is blocked in a single callback
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task is not None else "callback"
+        self._stalled_task_name = task_name
+
+        frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        logger.warning(
+            f"Event loop blocked for more than {lag:.3f} seconds (task: {task_name}). Stack of the loop thread:\n{stack}"
+        )
+
+
+# Enables the asyncio debug mode logging callbacks taking longer than the threshold.
+# NB: Unlike the watchdog, debug mode adds overhead to every callback (e.g. a stack is extracted per scheduled callback), use it for investigations only
+def enable_asyncio_debug(
+    loop: asyncio.AbstractEventLoop, slow_callback_duration: float
+):
+    loop.set_debug(True)
+    loop.slow_callback_duration = slow_callback_duration
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
+    logger.info(
+        f"asyncio debug mode enabled (slow callback duration: {slow_callback_duration} seconds)"
+    )
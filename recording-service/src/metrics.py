@@ -0,0 +1,383 @@
+import logging
+import math
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Generic, Optional, TypeVar
+
+from aiohttp import web
+from typing_extensions import override
+
+logger = logging.getLogger(__name__)
+
+# Minimal metric types rendered in the Prometheus text format. The rendering ('render', '_format_labels', '_escape', '_format_number') matches feed-service/src/metrics.py, keep both in sync.
+# NB: Values are updated and rendered on the event loop thread only, so no locking is needed.
+# Hot paths should get the labeled value once (see 'labels') and only update it per chunk, i.e. no string formatting or dict lookups per chunk.
+
+
+class CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class GaugeValue:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.value: float = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+
+class HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        super().__init__()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        # Index of the first bucket with an upper bound >= value
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+TValue = TypeVar("TValue", CounterValue, GaugeValue, HistogramValue)
+
+
+class _Metric(ABC, Generic[TValue]):
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...]) -> None:
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], TValue] = {}
+
+    # Returns the value for the given label values, creating it on first use
+    def labels(self, *label_values: str) -> TValue:
+        value = self._values.get(label_values)
+        if value is None:
+            if len(label_values) != len(self.label_names):
+                raise ValueError(
+                    f"Metric '{self.name}' expects labels {self.label_names}, got {label_values}"
+                )
+            value = self._create_value()
+            self._values[label_values] = value
+        return value
+
+    @abstractmethod
+    def _create_value(self) -> TValue:
+        pass
+
+    @property
+    @abstractmethod
+    def type_name(self) -> str:
+        pass
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for label_values, value in self._values.items():
+            lines.extend(self._render_value(label_values, value))
+        return lines
+
+    @abstractmethod
+    def _render_value(self, label_values: tuple[str, ...], value: TValue) -> list[str]:
+        pass
+
+    def _format_labels(
+        self, label_values: tuple[str, ...], *extra: tuple[str, str]
+    ) -> str:
+        pairs = [*zip(self.label_names, label_values), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter(_Metric[CounterValue]):
+    @property
+    @override
+    def type_name(self) -> str:
+        return "counter"
+
+    @override
+    def _create_value(self) -> CounterValue:
+        return CounterValue()
+
+    @override
+    def _render_value(
+        self, label_values: tuple[str, ...], value: CounterValue
+    ) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(label_values)} {_format_number(value.value)}"
+        ]
+
+
+class Gauge(_Metric[GaugeValue]):
+    @property
+    @override
+    def type_name(self) -> str:
+        return "gauge"
+
+    @override
+    def _create_value(self) -> GaugeValue:
+        return GaugeValue()
+
+    @override
+    def _render_value(
+        self, label_values: tuple[str, ...], value: GaugeValue
+    ) -> list[str]:
+        return [
+            f"{self.name}{self._format_labels(label_values)} {_format_number(value.value)}"
+        ]
+
+
+class Histogram(_Metric[HistogramValue]):
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: tuple[str, ...],
+        bounds: tuple[float, ...],
+    ) -> None:
+        super().__init__(name, help, label_names)
+        self._bounds = tuple(sorted(bounds))
+
+    @property
+    @override
+    def type_name(self) -> str:
+        return "histogram"
+
+    @override
+    def _create_value(self) -> HistogramValue:
+        return HistogramValue(self._bounds)
+
+    # Buckets are cumulative, i.e. each bucket counts all observations <= its bound
+    @override
+    def _render_value(
+        self, label_values: tuple[str, ...], value: HistogramValue
+    ) -> list[str]:
+        lines: list[str] = []
+        cumulative = 0
+        bounds = [_format_number(b) for b in value.bounds] + ["+Inf"]
+        for bound, count in zip(bounds, value.counts):
+            cumulative += count
+            labels = self._format_labels(label_values, ("le", bound))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = self._format_labels(label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_number(value.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SEGMENT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+# Metrics of a single stream (i.e. recording schedule). Get via RecorderMetrics.for_stream
+@dataclass(frozen=True)
+class StreamMetrics:
+    bytes_received: CounterValue
+    bytes_written: CounterValue
+    chunk_fetch_seconds: HistogramValue
+    segment_fetch_seconds: HistogramValue
+    disk_write_seconds: CounterValue
+    start_offset_seconds: GaugeValue
+    playlist_reloads_changed: CounterValue
+    playlist_reloads_not_modified: CounterValue
+    playlist_reload_errors: CounterValue
+    reconnects: CounterValue
+    gap_seconds: CounterValue
+    mirror_switches: CounterValue
+    hedged_requests: CounterValue
+    duplicate_segments: CounterValue
+
+
+# Metrics of the recording-service
+class RecorderMetrics:
+    def __init__(self) -> None:
+        super().__init__()
+        self.bytes_received = Counter(
+            "recorder_bytes_received_total",
+            "Bytes received from the stream",
+            ("schedule",),
+        )
+        self.bytes_written = Counter(
+            "recorder_bytes_written_total",
+            "Bytes written to recording files",
+            ("schedule",),
+        )
+        self.chunk_fetch_seconds = Histogram(
+            "recorder_chunk_fetch_seconds",
+            "Time waiting for the next chunk of the stream",
+            ("schedule",),
+            _LATENCY_BUCKETS,
+        )
+        self.segment_fetch_seconds = Histogram(
+            "recorder_segment_fetch_seconds",
+            "Time to fetch a HLS segment",
+            ("schedule",),
+            _SEGMENT_BUCKETS,
+        )
+        self.playlist_reloads = Counter(
+            "recorder_hls_playlist_reloads_total",
+            "HLS playlist reloads by response status ('304' if unchanged, 'error' if failed)",
+            ("schedule", "status"),
+        )
+        self.disk_write_seconds = Counter(
+            "recorder_disk_write_blocked_seconds_total",
+            "Time the event loop was blocked writing recordings to disk",
+            ("schedule",),
+        )
+        self.start_offset_seconds = Gauge(
+            "recorder_start_offset_seconds",
+            "Offset of the start of the last recording from its scheduled start",
+            ("schedule",),
+        )
+        self.reconnects = Counter(
+            "recorder_reconnects_total",
+            "Reconnects within a recording period after the stream failed, ended or stalled",
+            ("schedule",),
+        )
+        self.gap_seconds = Counter(
+            "recorder_gap_seconds_total",
+            "Seconds of audio missing in recordings, e.g. while reconnecting",
+            ("schedule",),
+        )
+        self.mirror_switches = Counter(
+            "recorder_mirror_switches_total",
+            "Switches to another mirror of the stream within a recording, e.g. as the throughput fell below the bitrate",
+            ("schedule",),
+        )
+        self.hedged_requests = Counter(
+            "recorder_hedged_requests_total",
+            "HLS requests repeated on another mirror as the first mirror was slow or failed",
+            ("schedule",),
+        )
+        self.duplicate_segments = Counter(
+            "recorder_hls_duplicate_segments_total",
+            "HLS segments dropped as byte-identical to a recent segment, e.g. re-listed under a new URI",
+            ("schedule",),
+        )
+        self.active_recordings = Gauge(
+            "recorder_active_recordings", "Recordings in progress", ()
+        )
+        self.loop_lag_seconds = Histogram(
+            "recorder_event_loop_lag_seconds",
+            "Delay of the event loop in running a scheduled callback (measured by the loop watchdog)",
+            (),
+            _LOOP_LAG_BUCKETS,
+        )
+        self.loop_stalls = Counter(
+            "recorder_event_loop_stalls_total",
+            "Event loop stalls above the lag threshold by the task blocking the loop",
+            ("task",),
+        )
+        self._metrics: list[_Metric[Any]] = [
+            self.bytes_received,
+            self.bytes_written,
+            self.chunk_fetch_seconds,
+            self.segment_fetch_seconds,
+            self.playlist_reloads,
+            self.disk_write_seconds,
+            self.start_offset_seconds,
+            self.reconnects,
+            self.gap_seconds,
+            self.mirror_switches,
+            self.hedged_requests,
+            self.duplicate_segments,
+            self.active_recordings,
+            self.loop_lag_seconds,
+            self.loop_stalls,
+        ]
+        self._streams: dict[str, StreamMetrics] = {}
+
+    # Returns the metrics of the stream, labeled with its name
+    def for_stream(self, stream_name: Optional[str]) -> StreamMetrics:
+        schedule = stream_name or ""
+        stream = self._streams.get(schedule)
+        if stream is None:
+            stream = StreamMetrics(
+                self.bytes_received.labels(schedule),
+                self.bytes_written.labels(schedule),
+                self.chunk_fetch_seconds.labels(schedule),
+                self.segment_fetch_seconds.labels(schedule),
+                self.disk_write_seconds.labels(schedule),
+                self.start_offset_seconds.labels(schedule),
+                self.playlist_reloads.labels(schedule, "200"),
+                self.playlist_reloads.labels(schedule, "304"),
+                self.playlist_reloads.labels(schedule, "error"),
+                self.reconnects.labels(schedule),
+                self.gap_seconds.labels(schedule),
+                self.mirror_switches.labels(schedule),
+                self.hedged_requests.labels(schedule),
+                self.duplicate_segments.labels(schedule),
+            )
+            self._streams[schedule] = stream
+        return stream
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Serves the metrics in the Prometheus text format on /metrics
+class MetricsServer:
+    def __init__(self, metrics: RecorderMetrics, host: str, port: int) -> None:
+        super().__init__()
+        self._metrics = metrics
+        self._host = host
+        self._port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+        logger.info(f"Serving metrics on http://{self._host}:{self._port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self._metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
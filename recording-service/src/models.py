@@ -13,6 +13,7 @@ from pendulum import Date, DateTime, Duration, Period, Time  # type: ignore
 from typing_extensions import override
 
 from src import utils
+from src.hls_variants import VariantPolicy
 from src.utils import TimePeriod
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,10 @@ class RecordingTask:
     # duration: Duration
     id: uuid.UUID = field(default_factory=lambda: uuid.uuid4())
     # XXX: stream_url?
+    # Variant to record if the stream is a HLS master playlist
+    hls_variant: VariantPolicy = field(default_factory=VariantPolicy)
+    # Whether to use HTTP/2 for the stream, None to use the default (stream.http2)
+    http2: Optional[bool] = None
 
     def __post_init__(self):
         file_path = self._make_file_path(
@@ -90,12 +95,19 @@ class RecordingSchedule:
     output_dir: Path
     metadata: dict[str, Any]
 
-    id: uuid.UUID = field(init=False, default_factory=lambda: uuid.uuid4())
+    # Random per instance, i.e. not stable across config (re)loads. Not compared, i.e. schedules with the same settings are equal (see scheduler_service.diff_schedules)
+    id: uuid.UUID = field(
+        init=False, compare=False, default_factory=lambda: uuid.uuid4()
+    )
 
     # Optional
     description: Optional[str] = None
     image_url: Optional[ValidUrl] = None
     frequency: str = "*"  # Defaults to "daily" cron expression
+    # Variant to record if the stream is a HLS master playlist
+    hls_variant: VariantPolicy = field(default_factory=VariantPolicy)
+    # Whether to use HTTP/2 for the stream, None to use the default (stream.http2)
+    http2: Optional[bool] = None
 
     @property
     def end_timeofday(self) -> Time:
@@ -120,12 +132,17 @@ class RecordingSchedule:
     # Gets the current or next task.
     def get_current_or_next_task(self, recording_start_time: DateTime) -> RecordingTask:
         recording_period = self.resolve_recording_period(recording_start_time)
+        return self.get_task(recording_period)
 
+    # Gets the task of a recording period of this schedule, e.g. of the capture plan
+    def get_task(self, recording_period: TimePeriod) -> RecordingTask:
         return RecordingTask(
             title=self.title,
             recording_period=recording_period,
             base_dir=self.output_dir,
             audio_format=self.audio_format,
+            hls_variant=self.hls_variant,
+            http2=self.http2,
         )
 
     def resolve_recording_period(self, recording_start_time: DateTime) -> TimePeriod:
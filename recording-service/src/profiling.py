@@ -0,0 +1,205 @@
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from types import FrameType
+from typing import AsyncGenerator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ProfileRun:
+    name: str
+    thread_id: int
+    started_at: datetime
+    # Set while the run is profiled, i.e. profiling was enabled at some point during the run
+    profiled_since: Optional[float] = None
+    profiled_seconds: float = 0
+    cpu_since: Optional[float] = None
+    cpu_seconds: float = 0
+    samples: Counter[str] = field(default_factory=Counter[str])
+
+    @property
+    def is_profiled(self) -> bool:
+        return self.profiled_seconds > 0 or self.profiled_since is not None
+
+
+# Opt-in sampling profiler for long running async tasks (e.g. a recording).
+# A recording runs for hours on the event loop together with other recordings, so instead of tracing every call (cProfile), the stack of the event loop thread is sampled at a fixed interval.
+# Per profiled run, the following files are written to the output directory:
+# - <run>.collapsed: Sampled stacks in collapsed format (open with e.g. speedscope or flamegraph.pl)
+# - <run>.json: Wall time and CPU time of the process while profiled, peak traced memory and the most sampled functions
+# Only the newest 'max_runs' runs are kept.
+# NB: Samples are taken from the thread running the task, i.e. runs active at the same time share samples of the event loop.
+# Runs are always registered (cheap), but only sampled while profiling is enabled. Profiling can be enabled at runtime (e.g. via signal), which also covers runs already in progress.
+class Profiler:
+    TOP_FUNCTIONS_COUNT = 20
+
+    def __init__(
+        self,
+        output_dir: Path,
+        max_runs: int,
+        sample_interval: float,  # Seconds
+        enabled: bool = False,
+    ) -> None:
+        super().__init__()
+        self._output_dir = output_dir
+        self._max_runs = max_runs
+        self._sample_interval = sample_interval
+        self._enabled = False
+        self._lock = threading.Lock()
+        self._runs: list[_ProfileRun] = []
+        self._sampler: Optional[threading.Thread] = None
+        self.set_enabled(enabled)
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool) -> None:
+        with self._lock:
+            if enabled == self._enabled:
+                return
+            self._enabled = enabled
+            for run in self._runs:
+                if enabled:
+                    self._start_profiling_run(run)
+                else:
+                    self._stop_profiling_run(run)
+
+            if enabled:
+                tracemalloc.start()
+                self._start_sampler()
+            else:
+                tracemalloc.stop()
+
+        logger.info(
+            f"Profiling {'enabled' if enabled else 'disabled'} (output: {self._output_dir})"
+        )
+
+    def toggle(self) -> None:
+        self.set_enabled(not self._enabled)
+
+    # Profiles the task run in the context while profiling is enabled
+    @asynccontextmanager
+    async def profile(self, name: str) -> AsyncGenerator[None, None]:
+        run = _ProfileRun(name, threading.get_ident(), datetime.now(timezone.utc))
+        with self._lock:
+            self._runs.append(run)
+            if self._enabled:
+                self._start_profiling_run(run)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._runs.remove(run)
+                self._stop_profiling_run(run)
+                peak_bytes = (
+                    tracemalloc.get_traced_memory()[1]
+                    if tracemalloc.is_tracing()
+                    else None
+                )
+
+            if run.is_profiled:
+                try:
+                    self._write_run(run, peak_bytes)
+                except OSError as e:
+                    logger.warning(f"Unable to write profile for '{name}': {e}")
+
+    # NB: Callers must hold the lock
+    def _start_profiling_run(self, run: _ProfileRun) -> None:
+        run.profiled_since = time.perf_counter()
+        run.cpu_since = time.process_time()
+
+    # NB: Callers must hold the lock
+    def _stop_profiling_run(self, run: _ProfileRun) -> None:
+        if run.profiled_since is None or run.cpu_since is None:
+            return
+        run.profiled_seconds += time.perf_counter() - run.profiled_since
+        run.cpu_seconds += time.process_time() - run.cpu_since
+        run.profiled_since = None
+        run.cpu_since = None
+
+    # NB: Callers must hold the lock
+    def _start_sampler(self) -> None:
+        if self._sampler is not None and self._sampler.is_alive():
+            return
+        self._sampler = threading.Thread(
+            target=self._sample, name="profiler-sampler", daemon=True
+        )
+        self._sampler.start()
+
+    # Samples the stacks of the threads running the active runs until profiling is disabled
+    def _sample(self) -> None:
+        while True:
+            time.sleep(self._sample_interval)
+            frames = sys._current_frames()  # type: ignore
+            with self._lock:
+                if not self._enabled:
+                    return
+                for run in self._runs:
+                    frame = frames.get(run.thread_id)
+                    if frame is not None:
+                        run.samples[self._get_collapsed_stack(frame)] += 1
+
+    # Stack as 'outermost;...;innermost' with frames as 'function (file:line)'
+    @staticmethod
+    def _get_collapsed_stack(frame: Optional[FrameType]) -> str:
+        stack: list[str] = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(
+                f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _write_run(self, run: _ProfileRun, peak_bytes: Optional[int]) -> None:
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        run_id = f"{run.started_at.strftime('%Y%m%dT%H%M%S%f')}-{run.name}"
+        with open(self._output_dir / f"{run_id}.collapsed", "w") as f:
+            for stack, count in run.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # Samples per innermost function, i.e. where the time was spent
+        functions: Counter[str] = Counter()
+        for stack, count in run.samples.items():
+            functions[stack.rsplit(";", 1)[-1]] += count
+
+        summary = {
+            "name": run.name,
+            "started_at": run.started_at.isoformat(),
+            "profiled_wall_time_seconds": run.profiled_seconds,
+            "profiled_process_cpu_time_seconds": run.cpu_seconds,
+            "peak_traced_memory_bytes": peak_bytes,
+            "sample_interval_seconds": self._sample_interval,
+            "samples": sum(run.samples.values()),
+            "top_functions": [
+                {"function": function, "samples": count}
+                for function, count in functions.most_common(self.TOP_FUNCTIONS_COUNT)
+            ],
+        }
+        with open(self._output_dir / f"{run_id}.json", "w") as f:
+            json.dump(summary, f, indent=2)
+
+        logger.info(
+            f"Profile of '{run.name}' written: profiled for {run.profiled_seconds:.1f} s, process CPU {run.cpu_seconds:.1f} s, {summary['samples']} samples"
+        )
+        self._remove_old_runs()
+
+    # Keeps only the files of the newest runs. File names start with the start time of the run
+    def _remove_old_runs(self) -> None:
+        run_ids = sorted(
+            {path.stem for path in self._output_dir.glob("*.json")}, reverse=True
+        )
+        for run_id in run_ids[self._max_runs :]:
+            for path in self._output_dir.glob(f"{run_id}.*"):
+                path.unlink(missing_ok=True)
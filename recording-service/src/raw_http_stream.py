@@ -0,0 +1,345 @@
+import asyncio
+import logging
+import ssl
+from collections import deque
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+
+from typing_extensions import override
+
+logger = logging.getLogger(__name__)
+
+
+class RawStreamError(Exception):
+    pass
+
+
+# The response cannot be read raw (e.g. chunked transfer encoding), the caller should fall back to a regular HTTP client
+class RawStreamNotSupportedError(RawStreamError):
+    pass
+
+
+MAX_REDIRECTS = 5
+MAX_HEADER_SIZE = 16 * 1024
+MIN_BUFFER_SIZE = 4 * 1024
+MAX_BUFFER_SIZE = 1024 * 1024
+# Used for the buffer size if the stream does not announce its bitrate
+DEFAULT_BITRATE_KBPS = 128
+
+
+# Protocol reading the response of a continuous stream (e.g. Icecast) into a ring of preallocated buffers.
+# The transport reads directly into the free space of the current buffer (no intermediate bytes objects). Filled buffers are handed to the reader as memoryviews and reused once the reader requests the next buffer.
+# If all buffers are filled (reader is slower than the stream), reading from the socket is paused.
+class _RawStreamProtocol(asyncio.BufferedProtocol):
+    def __init__(self, buffer_seconds: float, buffer_count: int) -> None:
+        super().__init__()
+        self._buffer_seconds = buffer_seconds
+        self._buffer_count = buffer_count
+        self._transport: Optional[asyncio.Transport] = None
+        self._header_buffer = bytearray(MAX_HEADER_SIZE)
+        self._header_size = 0
+        self._headers_parsed = False
+        self.bitrate_kbps: Optional[int] = None  # Announced by the server, if any
+        self.headers_received: "asyncio.Future[tuple[int, dict[str, str]]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        # Created once the headers (and with it the bitrate) are known
+        self._buffers: list[memoryview] = []
+        self._free: deque[int] = deque()
+        self._filled: deque[tuple[int, int]] = deque()  # Index, size
+        self._current: Optional[int] = None
+        self._position = 0
+        self._reading: Optional[int] = None  # Buffer handed to the reader
+        self._reading_paused = False
+        self._eof = False
+        self._exception: Optional[Exception] = None
+        self._waiter: Optional["asyncio.Future[None]"] = None
+
+    @property
+    def buffer_size(self) -> int:
+        return len(self._buffers[0]) if self._buffers else 0
+
+    @override
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = transport  # type: ignore
+
+    @override
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if not self._headers_parsed:
+            return memoryview(self._header_buffer)[self._header_size :]
+        if not self._buffers:
+            # Not a stream (e.g. a redirect), the body is discarded
+            return memoryview(self._header_buffer)
+        if self._current is None:
+            # Reading is paused, but the transport still had data. Grow the ring instead of dropping it
+            self._buffers.append(memoryview(bytearray(self.buffer_size)))
+            self._current = len(self._buffers) - 1
+            self._position = 0
+        return self._buffers[self._current][self._position :]
+
+    @override
+    def buffer_updated(self, nbytes: int) -> None:
+        if not self._headers_parsed:
+            self._header_size += nbytes
+            self._parse_headers()
+            return
+        if not self._buffers:
+            return
+
+        self._position += nbytes
+        if self._current is not None and self._position == self.buffer_size:
+            self._complete_current_buffer()
+
+    @override
+    def eof_received(self) -> Optional[bool]:
+        self._finish(None)
+        return False
+
+    @override
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._finish(exc)
+
+    # Returns the next filled buffer, or None at the end of the stream.
+    # NB: The view is only valid until the next call, the buffer is reused afterwards
+    async def read(self) -> Optional[memoryview]:
+        if self._reading is not None:
+            self._free.append(self._reading)
+            self._reading = None
+            if self._current is None:
+                self._current = self._free.popleft()
+                self._position = 0
+            if self._reading_paused and self._transport is not None:
+                self._reading_paused = False
+                self._transport.resume_reading()
+
+        # A buffer is handed out after 'buffer_seconds' at the latest, even if not full (e.g. the bitrate is lower than announced)
+        flush_handle = asyncio.get_running_loop().call_later(
+            self._buffer_seconds, self._flush_partial_buffer
+        )
+        try:
+            while not self._filled:
+                if self._exception is not None:
+                    raise self._exception
+                if self._eof:
+                    return None
+                self._waiter = asyncio.get_running_loop().create_future()
+                try:
+                    await self._waiter
+                finally:
+                    self._waiter = None
+        finally:
+            flush_handle.cancel()
+
+        self._reading, size = self._filled.popleft()
+        return self._buffers[self._reading][:size]
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+
+    def _parse_headers(self) -> None:
+        end = self._header_buffer.find(b"\r\n\r\n", 0, self._header_size)
+        if end == -1:
+            if self._header_size == MAX_HEADER_SIZE:
+                self._finish(RawStreamError("Response headers too large"))
+                self.close()
+            return
+
+        try:
+            status, headers = _parse_response_head(bytes(self._header_buffer[:end]))
+        except ValueError as e:
+            self._finish(RawStreamError(f"Invalid response: {e}"))
+            self.close()
+            return
+
+        self._headers_parsed = True
+        if status == 200:
+            self.bitrate_kbps = parse_bitrate_kbps(headers.get("icy-br"))
+            self._create_buffers(self.bitrate_kbps or DEFAULT_BITRATE_KBPS)
+            # Body data received together with the headers
+            body = memoryview(self._header_buffer)[end + 4 : self._header_size]
+            while body and self._current is not None:
+                target = self._buffers[self._current][self._position :]
+                size = min(len(body), len(target))
+                target[:size] = body[:size]
+                body = body[size:]
+                self.buffer_updated(size)
+        if not self.headers_received.done():
+            self.headers_received.set_result((status, headers))
+
+    def _create_buffers(self, bitrate_kbps: int) -> None:
+        size = int(bitrate_kbps * 1000 / 8 * self._buffer_seconds)
+        size = min(max(size, MIN_BUFFER_SIZE), MAX_BUFFER_SIZE)
+        self._buffers = [memoryview(bytearray(size)) for _ in range(self._buffer_count)]
+        self._current = 0
+        self._free = deque(range(1, self._buffer_count))
+
+    def _complete_current_buffer(self) -> None:
+        if self._current is None:
+            return
+        self._filled.append((self._current, self._position))
+        self._current = None
+        self._position = 0
+        if self._free:
+            self._current = self._free.popleft()
+        elif self._transport is not None and not self._reading_paused:
+            self._reading_paused = True
+            self._transport.pause_reading()
+        self._wake_reader()
+
+    def _flush_partial_buffer(self) -> None:
+        if self._position > 0:
+            self._complete_current_buffer()
+
+    def _finish(self, exc: Optional[Exception]) -> None:
+        if self._eof or self._exception is not None:
+            return
+        if exc is not None:
+            self._exception = exc
+        else:
+            self._eof = True
+            # Hand out the partially filled buffer
+            if self._position > 0:
+                self._complete_current_buffer()
+        if not self.headers_received.done():
+            self.headers_received.set_exception(
+                exc or RawStreamError("Connection closed before the response headers")
+            )
+        self._wake_reader()
+
+    def _wake_reader(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+# Raw reader of a continuous HTTP stream (e.g. Icecast), for long recordings with as little per-byte and per-chunk overhead as possible.
+# Data is read into a ring of preallocated buffers sized to hold 'buffer_seconds' of audio at the bitrate announced by the server (icy-br), and handed out as memoryviews of the buffers (no copies). A buffer is handed out after 'buffer_seconds' at the latest, even if not full.
+# Sends HTTP/1.0 requests (no chunked transfer encoding) and follows redirects. Responses that cannot be read raw raise RawStreamNotSupportedError.
+class RawHttpStream:
+    def __init__(
+        self,
+        url: str,
+        headers: dict[str, str],
+        buffer_seconds: float,
+        buffer_count: int = 4,
+        connect_timeout: float = 30,
+    ) -> None:
+        super().__init__()
+        self.url = url
+        self._headers = headers
+        self._buffer_seconds = buffer_seconds
+        self._buffer_count = buffer_count
+        self._connect_timeout = connect_timeout
+        self._protocol: Optional[_RawStreamProtocol] = None
+
+    @property
+    def buffer_size(self) -> int:
+        return self._protocol.buffer_size if self._protocol is not None else 0
+
+    # Bitrate announced by the server (icy-br), if any
+    @property
+    def bitrate_kbps(self) -> Optional[int]:
+        return self._protocol.bitrate_kbps if self._protocol is not None else None
+
+    # Connects and reads the response headers, following redirects
+    async def open(self) -> None:
+        for _ in range(MAX_REDIRECTS + 1):
+            protocol = await self._connect(self.url)
+            try:
+                status, headers = await asyncio.wait_for(
+                    protocol.headers_received, self._connect_timeout
+                )
+            except BaseException:
+                protocol.close()
+                raise
+
+            if status in (301, 302, 303, 307, 308) and "location" in headers:
+                protocol.close()
+                self.url = urljoin(self.url, headers["location"])
+                logger.debug(f"Redirected to: {self.url}")
+                continue
+            if status != 200:
+                protocol.close()
+                raise RawStreamError(f"Unexpected response status: {status}")
+            transfer_encoding = headers.get("transfer-encoding", "identity").lower()
+            content_encoding = headers.get("content-encoding", "identity").lower()
+            if transfer_encoding != "identity" or content_encoding != "identity":
+                protocol.close()
+                raise RawStreamNotSupportedError(
+                    f"Encoded responses cannot be read raw (transfer encoding: {transfer_encoding}, content encoding: {content_encoding})"
+                )
+
+            self._protocol = protocol
+            return
+        raise RawStreamError(f"Too many redirects: {self.url}")
+
+    # Returns the next filled buffer, or None at the end of the stream.
+    # NB: The view is only valid until the next call, the buffer is reused afterwards
+    async def read(self) -> Optional[memoryview]:
+        if self._protocol is None:
+            raise RawStreamError("Stream is not open")
+        return await self._protocol.read()
+
+    def close(self) -> None:
+        if self._protocol is not None:
+            self._protocol.close()
+
+    async def _connect(self, url: str) -> _RawStreamProtocol:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise RawStreamNotSupportedError(f"Unsupported URL: {url}")
+        is_https = parts.scheme == "https"
+        port = parts.port or (443 if is_https else 80)
+
+        loop = asyncio.get_running_loop()
+        transport, protocol = await asyncio.wait_for(
+            loop.create_connection(
+                lambda: _RawStreamProtocol(self._buffer_seconds, self._buffer_count),
+                parts.hostname,
+                port,
+                ssl=ssl.create_default_context() if is_https else None,
+            ),
+            self._connect_timeout,
+        )
+
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{port}"
+        request_headers = {
+            "Host": host,
+            **self._headers,
+            "Accept-Encoding": "identity",
+            "Connection": "close",
+        }
+        request = f"GET {target} HTTP/1.0\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in request_headers.items()
+        )
+        transport.write(f"{request}\r\n".encode("latin-1"))
+        return protocol
+
+
+# Parses the status line and headers (lowercase names) of a response. Also accepts the 'ICY 200 OK' status line of SHOUTcast servers
+def _parse_response_head(head: bytes) -> tuple[int, dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    status_parts = lines[0].split(" ", 2)
+    if len(status_parts) < 2 or not (
+        status_parts[0].startswith("HTTP/") or status_parts[0] == "ICY"
+    ):
+        raise ValueError(f"Invalid status line: {lines[0]}")
+
+    headers: dict[str, str] = {}
+    for line in lines[1:]:
+        name, separator, value = line.partition(":")
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    return int(status_parts[1]), headers
+
+
+# Parses the bitrate announced by a server, e.g. 'icy-br: 128' or 'icy-br: 128,128'. None if missing or invalid
+def parse_bitrate_kbps(value: Optional[str]) -> Optional[int]:
+    try:
+        bitrate = int((value or "").split(",")[0].strip())
+    except ValueError:
+        return None
+    return bitrate if bitrate > 0 else None
@@ -0,0 +1,141 @@
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Journal of a recording in progress: a hidden sidecar file next to it (.<recording file name>.journal.tmp) with the task id, the period and the offset up to which the recording is durable (written to disk).
+# Named like a temporary file (dot prefix, .tmp suffix), which the feed service ignores, i.e. journal updates do not trigger feed updates.
+# If the recorder is restarted within the period, the recording is resumed by appending to the same file (see RecordAudioService), i.e. a show stays a single episode. The journal is removed once the recording is complete
+
+JOURNAL_PREFIX = "."
+JOURNAL_SUFFIX = ".journal.tmp"
+# Suffix of the journal while it is written, before replacing the previous journal
+JOURNAL_WRITE_SUFFIX = ".journal.new.tmp"
+
+
+class RecordingJournalError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class JournalEntry:
+    task_id: uuid.UUID
+    file_path: Path
+    period_start: datetime  # UTC
+    period_end: datetime  # UTC
+    durable_offset: int  # Bytes of the recording written to disk
+    updated_at: datetime  # UTC, when the durable offset was written
+
+
+def get_journal_path(audio_file_path: Path) -> Path:
+    return audio_file_path.with_name(
+        JOURNAL_PREFIX + audio_file_path.name + JOURNAL_SUFFIX
+    )
+
+
+# Writes the entry atomically (via a temporary file), i.e. a crash leaves either the previous or the new entry
+def write_entry(entry: JournalEntry) -> None:
+    journal_path = get_journal_path(entry.file_path)
+    temp_path = entry.file_path.with_name(
+        JOURNAL_PREFIX + entry.file_path.name + JOURNAL_WRITE_SUFFIX
+    )
+    data = {
+        "task_id": str(entry.task_id),
+        "file_path": str(entry.file_path),
+        "period_start": entry.period_start.isoformat(),
+        "period_end": entry.period_end.isoformat(),
+        "durable_offset": entry.durable_offset,
+        "updated_at": entry.updated_at.isoformat(),
+    }
+    with open(temp_path, "w") as f:
+        yaml.safe_dump(data, f, sort_keys=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal_path)
+
+
+def read_entry(journal_path: Path) -> JournalEntry:
+    try:
+        with open(journal_path, "r") as f:
+            data: Any = yaml.safe_load(f)
+        return JournalEntry(
+            uuid.UUID(data["task_id"]),
+            Path(data["file_path"]),
+            datetime.fromisoformat(data["period_start"]),
+            datetime.fromisoformat(data["period_end"]),
+            int(data["durable_offset"]),
+            datetime.fromisoformat(data["updated_at"]),
+        )
+    except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError) as e:
+        raise RecordingJournalError(f"Invalid journal: {journal_path}") from e
+
+
+def remove_entry(audio_file_path: Path) -> None:
+    try:
+        os.remove(get_journal_path(audio_file_path))
+    except FileNotFoundError:
+        pass
+
+
+# Returns the entry of the recording of the period in the directory, if any (and its file still exists).
+# Journals of other (i.e. ended) periods are removed, as their recordings cannot be resumed anymore
+def find_entry(
+    directory: Path, period_start: datetime, period_end: datetime
+) -> Optional[JournalEntry]:
+    found: Optional[JournalEntry] = None
+    for journal_path in directory.glob(f"{JOURNAL_PREFIX}*{JOURNAL_SUFFIX}"):
+        try:
+            entry = read_entry(journal_path)
+        except RecordingJournalError as e:
+            logger.warning(f"Ignoring {e}")
+            continue
+        is_period = (
+            entry.period_start == period_start and entry.period_end == period_end
+        )
+        if is_period and entry.file_path.exists():
+            found = entry
+        elif entry.period_end <= datetime.now(timezone.utc):
+            logger.info(f"Removing journal of an ended recording: {journal_path}")
+            remove_entry(entry.file_path)
+    return found
+
+
+# Writes the durable offset of a recording in progress to its journal, at most every 'interval' seconds
+class RecordingJournal:
+    def __init__(
+        self,
+        task_id: uuid.UUID,
+        file_path: Path,
+        period_start: datetime,
+        period_end: datetime,
+        interval: float,
+    ) -> None:
+        super().__init__()
+        self._task_id = task_id
+        self._file_path = file_path
+        self._period_start = period_start
+        self._period_end = period_end
+        self.interval = interval
+
+    # Records the offset, which must be written to disk already (e.g. by fsync)
+    def write(self, durable_offset: int) -> None:
+        write_entry(
+            JournalEntry(
+                self._task_id,
+                self._file_path,
+                self._period_start,
+                self._period_end,
+                durable_offset,
+                datetime.now(timezone.utc),
+            )
+        )
+
+    def remove(self) -> None:
+        remove_entry(self._file_path)
@@ -1,13 +1,20 @@
 import asyncio
 import logging
-from typing import Any
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, cast
 
 from pendulum import DateTime, Duration, Period, Time  # type: ignore
 
-from src import audio_storage, utils
+from src import audio_storage, recording_journal, utils
+from src.audio_frames import find_append_offset
 from src.audio_storage import AudioStorageAdapter
 from src.audio_stream import HttpAudioStreamAdapter
+from src.metrics import RecorderMetrics
 from src.models import RecordingSchedule, RecordingTask, ValidUrl
+from src.profiling import Profiler
+from src.recording_journal import JournalEntry, RecordingJournal
+from src.stream_reconnect import StreamGap, StreamGaps
 
 logger = logging.getLogger(__name__)
 
@@ -19,12 +26,19 @@ class RecordAudioService:
         audio_storage_adapter: audio_storage.AudioStorageAdapter,
         stream_url: ValidUrl,
         time_provider: utils.TimeProvider,
+        profiler: Optional[Profiler] = None,
+        metrics: Optional[RecorderMetrics] = None,
+        # Seconds between updates of the journal of a recording (see recording_journal), None to disable. With a journal, a recording interrupted by a restart is resumed
+        journal_interval: Optional[float] = None,
     ) -> None:
         super().__init__()
         self._audio_storage_adapter = audio_storage_adapter
         self._audio_stream_adapter = audio_stream_adapter
         self._stream_url = stream_url
         self._time_provider = time_provider
+        self._profiler = profiler
+        self._metrics = metrics if metrics is not None else RecorderMetrics()
+        self._journal_interval = journal_interval
 
     # Records audio for a given task
     async def record_audio_task(self, task: RecordingTask, metadata: dict[str, Any]):
@@ -33,14 +47,64 @@ class RecordAudioService:
         # Account for task being in the future
         await self.wait_until_start_if_in_future(task, current_time)
 
+        if self._profiler is None:
+            return await self._record(task, metadata)
+        # Profile the recording itself, not the wait for the start time
+        async with self._profiler.profile(f"recording-{task.file_path.stem}"):
+            await self._record(task, metadata)
+
+    async def _record(self, task: RecordingTask, metadata: dict[str, Any]):
+        current_time = self._time_provider.get_current_time()
+        # Positive if started late, e.g. due to a slow start or a restart during the recording period
+        start_offset = cast(
+            timedelta, task.recording_period.start.diff(current_time, False)
+        )
+        self._metrics.for_stream(task.title).start_offset_seconds.set(
+            start_offset.total_seconds()
+        )
+
         # Account for starting in between the recording period
         duration_left = self.get_duration_left(task, current_time)
 
         # Ensure output directory exist with metadata
         audio_storage.ensure_dir_with_metadata(task.file_path.parent, metadata=metadata)
 
-        logger.info(
-            f"Starting recording for task: {task.id}. Duration: {duration_left}. Writing to path: {task.file_path}"
+        gaps = StreamGaps()
+        append_offset: Optional[int] = None
+        # Scanning for journals and frames reads from disk, i.e. runs in the executor to not stall other recordings (e.g. when several are resumed after a restart)
+        loop = asyncio.get_running_loop()
+        journal_entry = await loop.run_in_executor(None, self._find_journal_entry, task)
+        if journal_entry is not None:
+            # Continue the recording of a previous run (e.g. before a crash or restart) in the same file
+            task = replace(task, id=journal_entry.task_id)
+            append_offset = await loop.run_in_executor(
+                None, find_append_offset, task.file_path, journal_entry.durable_offset
+            )
+            # From the last journal update, although data written after it may have been kept
+            gaps.gaps.append(
+                StreamGap(
+                    journal_entry.updated_at,
+                    datetime.now(timezone.utc),
+                    "recorder restarted",
+                )
+            )
+            logger.info(
+                f"Resuming recording for task: {task.id} at {append_offset} bytes (durable: {journal_entry.durable_offset} bytes). Duration: {duration_left}. Writing to path: {task.file_path}"
+            )
+        else:
+            logger.info(
+                f"Starting recording for task: {task.id}. Duration: {duration_left}. Writing to path: {task.file_path}"
+            )
+        journal = (
+            RecordingJournal(
+                task.id,
+                task.file_path,
+                task.recording_period.start,
+                task.recording_period.end,
+                self._journal_interval,
+            )
+            if self._journal_interval is not None
+            else None
         )
 
         # XXX: Consider moving countdown timer here instead of hidden in adapter
@@ -50,11 +114,57 @@ class RecordAudioService:
             self._stream_url,
             utils.CountdownTimer(duration_left, time_provider=self._time_provider),
             stream_name=task.title,
+            gaps=gaps,
+            variant_policy=task.hls_variant,
+            http2=task.http2,
         )
 
-        await self._audio_storage_adapter.save(audio_data_iterator, task.file_path)
+        active_recordings = self._metrics.active_recordings.labels()
+        active_recordings.inc()
+        try:
+            await self._audio_storage_adapter.save(
+                audio_data_iterator,
+                task.file_path,
+                stream_name=task.title,
+                journal=journal,
+                append_offset=append_offset,
+            )
+        finally:
+            active_recordings.dec()
+            # Also if the recording failed, e.g. as the gap budget was exceeded
+            gaps.close()
+            if gaps.gaps:
+                self._write_gaps(task, gaps)
         logger.info(f"Recording complete. Saved at: {task}")
 
+    # Returns the journal entry of a recording of the task's period left by a previous run, if any
+    def _find_journal_entry(self, task: RecordingTask) -> Optional[JournalEntry]:
+        if self._journal_interval is None:
+            return None
+        entry = recording_journal.find_entry(
+            task.base_dir, task.recording_period.start, task.recording_period.end
+        )
+        if entry is None:
+            return None
+        # The file name also depends on the title, which may have changed since
+        if replace(task, id=entry.task_id).file_path != entry.file_path:
+            logger.warning(
+                f"Task '{task.title}': Not resuming the recording at {entry.file_path} of a previous run, as the file name of the task has changed"
+            )
+            return None
+        return entry
+
+    def _write_gaps(self, task: RecordingTask, gaps: StreamGaps):
+        total = gaps.total_seconds()
+        self._metrics.for_stream(task.title).gap_seconds.inc(total)
+        try:
+            gaps_file = audio_storage.write_gaps_file(task.file_path, gaps.gaps)
+            logger.warning(
+                f"Task '{task.title}': Recording has {len(gaps.gaps)} gap(s) of {total:.1f} seconds in total, see {gaps_file}"
+            )
+        except OSError as e:
+            logger.error(f"Task '{task.title}': Unable to write gaps file: {e}")
+
     def get_duration_left(self, task: RecordingTask, current_time: DateTime):
         duration_left = task.recording_period.get_time_remaining(current_time)
         # Fail if no duration left.
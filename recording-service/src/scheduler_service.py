@@ -1,89 +1,235 @@
+import asyncio
 import logging
-from datetime import datetime
-from typing import Optional
+import uuid
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
 
-# import asyncio
-from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
-from apscheduler.triggers.cron import CronTrigger  # type: ignore
-from pendulum import DateTime, Duration, Time  # type: ignore
+import pendulum
+from pendulum import DateTime  # type: ignore
 
 from src import utils
-from src.models import RecordingSchedule
+from src.capture_plan import CapturePlan, CapturePlanError, CaptureWindow
+from src.models import RecordingSchedule, RecordingTask
 from src.recording_service import RecordAudioService
+from src.utils import TimePeriod
 
 logger = logging.getLogger(__name__)
 
 
+# Seconds the timer waits at most, i.e. recordings start on time also if the wall clock jumps (e.g. is adjusted, or the host resumes from suspend)
+_MAX_TIMER_SECONDS = 60
+# Interval of compiling a new plan, i.e. of extending the plan by the days passed
+_REPLAN_INTERVAL = timedelta(days=1)
+# Upcoming recordings logged on start
+_LOGGED_WINDOWS = 10
+
+
 class SchedulerError(Exception):
     pass
 
 
+# Changes between the recording schedules of two configs
+class ScheduleDiff(NamedTuple):
+    added: list[RecordingSchedule]
+    removed: list[RecordingSchedule]
+    modified: list[tuple[RecordingSchedule, RecordingSchedule]]  # (old, new)
+    unchanged: list[RecordingSchedule]  # Old schedules, i.e. with their ids
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+# Diffs schedules by their output directory (i.e. the podcast, named after the title) instead of their ids, which are random per config load.
+# Schedules of the same directory (e.g. a show on different times) are matched to an equal schedule first, the rest in the order of the config
+def diff_schedules(
+    old_schedules: list[RecordingSchedule], new_schedules: list[RecordingSchedule]
+) -> ScheduleDiff:
+    diff = ScheduleDiff([], [], [], [])
+    # By path string, which is faster to hash than paths (of thousands of schedules)
+    old_by_dir: dict[str, list[RecordingSchedule]] = {}
+    for schedule in old_schedules:
+        old_by_dir.setdefault(str(schedule.output_dir), []).append(schedule)
+
+    unmatched_new: list[RecordingSchedule] = []
+    for schedule in new_schedules:
+        candidates = old_by_dir.get(str(schedule.output_dir), [])
+        if schedule in candidates:
+            # Keep the old schedule, i.e. the id of its planned recordings
+            diff.unchanged.append(candidates.pop(candidates.index(schedule)))
+        else:
+            unmatched_new.append(schedule)
+
+    for schedule in unmatched_new:
+        candidates = old_by_dir.get(str(schedule.output_dir), [])
+        if candidates:
+            diff.modified.append((candidates.pop(0), schedule))
+        else:
+            diff.added.append(schedule)
+    for candidates in old_by_dir.values():
+        diff.removed.extend(candidates)
+    return diff
+
+
 # Scheduler service for scheduling recording jobs.
+# Compiles the schedules into a plan of the recordings of the next days (see CapturePlan) and starts the recordings from a single timer, set to the start of the next recording
 class RecordingSchedulerService:
     def __init__(
         self,
         recording_service: RecordAudioService,
         time_provider: utils.TimeProvider,
         audio_format: str,
+        plan_days: int = 7,
+        max_concurrent: Optional[int] = None,
     ) -> None:
         super().__init__()
         self._recorder = recording_service
         self._time_provider = time_provider
         self.audio_format = audio_format
-        # Create async scheduler for running async tasks
-        self.scheduler = AsyncIOScheduler(timezone="UTC")
+        self._plan_days = plan_days
+        # Recordings at the same time above which the plan is logged as over capacity. None for no limit
+        self._max_concurrent = max_concurrent
+        self._schedules: list[RecordingSchedule] = []
+        self._plan: Optional[CapturePlan] = None  # Compiled when started
+        # NB: Runs on the current event loop (asyncio or uvloop)
+        self._loop = asyncio.get_event_loop()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Windows started (or skipped) by schedule id and start, i.e. started once while the timer fires during the window. Ends, to forget ended windows
+        self._started_windows: dict[tuple[uuid.UUID, datetime], datetime] = {}
+        # Recordings in progress, by task id. Kept running when their schedule is changed or removed
+        self._active_tasks: dict[uuid.UUID, RecordingTask] = {}
+        self._recordings: set[asyncio.Task[None]] = set()  # Referenced until done
 
     def add_recording_schedule(self, recording_schedule: RecordingSchedule):
-        current_time = self._time_provider.get_current_time()
+        if self._plan is not None:
+            self._update_plan([], [recording_schedule])
+        self._schedules.append(recording_schedule)
 
-        # Check if we should be recording right now, then set next run time to right now
-        # Get inital task to run to peek at the recording period
-        initial_task = recording_schedule.get_current_or_next_task(current_time)
-        is_due = (
-            initial_task.recording_period.start <= current_time
-            and current_time <= initial_task.recording_period.end
-        )
+    # Applies changed recording schedules (e.g. of a reloaded config) to the running scheduler. Only the recordings of added, removed and modified schedules are replanned.
+    # Recordings in progress are left untouched, also of changed schedules, i.e. changes take effect from the next recording.
+    # Raises SchedulerError if the changes cannot be planned, leaving the schedules and the plan unchanged
+    def update_recording_schedules(
+        self, recording_schedules: list[RecordingSchedule]
+    ) -> ScheduleDiff:
+        diff = diff_schedules(self._schedules, recording_schedules)
+        removed = diff.removed + [old for old, _ in diff.modified]
+        added = [new for _, new in diff.modified] + diff.added
+        if self._plan is not None and diff.has_changes:
+            self._update_plan(removed, added)
+        self._schedules = diff.unchanged + added
+
+        for schedule in diff.removed:
+            logger.info(f"Removed recording schedule: {schedule.title}")
+        for _, schedule in diff.modified:
+            logger.info(f"Updated recording schedule: {schedule.title}")
+        for schedule in diff.added:
+            logger.info(f"Added recording schedule: {schedule.title}")
+        return diff
 
-        next_run_time = None
-        # If due, schedule a recording task to run immediately
-        if is_due:
-            # Delay by 5 seconds to allow scheduler to start
-            next_run_time = current_time + Duration(seconds=5)
+    def run(self):
+        current_time = self._time_provider.get_current_time()
+        self._plan = self._compile_plan(current_time)
+        self._log_plan_issues()
+        logger.info(
+            f"Starting scheduler with {len(self._schedules)} recording schedules, {len(self._plan.windows)} recordings planned for the next {self._plan_days} days. Next recordings:"
+        )
+        for window in self._plan.windows[:_LOGGED_WINDOWS]:
             logger.info(
-                f"Scheduler was started during a recording period for '{recording_schedule.title}' and will be run immediately (next run scheduled for now + 5 sec. delay): {next_run_time}"
+                f"    {window.schedule.title}: {window.start.isoformat()} - {window.end.isoformat()}"
             )
 
-        self._add_job(recording_schedule, next_run_time)
+        # Start the recordings in progress (e.g. if restarted during a recording period) as soon as the loop runs
+        self._set_timer(
+            0
+        )  # NB: Non-blocking, caller responsible for keeping process alive
 
-    # Schedules a recording task to run at the specified time
-    def _add_job(
-        self,
-        recording_schedule: RecordingSchedule,
-        next_run_time: Optional[DateTime] = None,
-    ):
+    def _compile_plan(self, current_time: DateTime) -> CapturePlan:
         try:
-            trigger = self._get_trigger(
-                recording_schedule.frequency,
-                recording_schedule.start_timeofday,
+            return CapturePlan(
+                self._schedules,
+                self._pendulum_dt_to_std_dt(current_time),
+                self._plan_days,
             )
+        except CapturePlanError as e:
+            raise SchedulerError(f"Could not plan recordings: {e}") from e
 
-            job = self.scheduler.add_job(
-                func=self._execute_recording_task,
-                trigger=trigger,
-                args=[recording_schedule],
-                id=str(recording_schedule.id),
-                name=recording_schedule.title,
+    def _update_plan(
+        self, removed: list[RecordingSchedule], added: list[RecordingSchedule]
+    ):
+        assert self._plan is not None
+        try:
+            self._plan.update(removed, added)
+        except CapturePlanError as e:
+            raise SchedulerError(f"Could not plan recordings: {e}") from e
+        self._log_plan_issues({str(schedule.output_dir) for schedule in added})
+        # Start the added recordings in progress, and wait for the next recording of the new plan
+        self._set_timer(0)
+
+    # Logs overlapping recordings of the same podcast (of the given directories, or all) and the recordings over capacity
+    def _log_plan_issues(self, output_dirs: Optional[set[str]] = None):
+        assert self._plan is not None
+        conflicts = self._plan.get_conflicts(output_dirs)
+        if conflicts:
+            first = conflicts[0]
+            logger.warning(
+                f"{len(conflicts)} planned recordings overlap a recording of the same podcast and will be skipped, e.g. '{first.other.schedule.title}' at {first.other.start.isoformat()}. Print the plan with --plan"
             )
+        if self._max_concurrent is not None:
+            overruns = self._plan.get_overruns(self._max_concurrent)
+            if overruns:
+                first = overruns[0]
+                logger.warning(
+                    f"{len(overruns)} times more than {self._max_concurrent} recordings are planned at the same time, e.g. {first.max_concurrent} from {first.start.isoformat()}. Print the plan with --plan"
+                )
+
+    def _set_timer(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._loop.call_later(delay, self._on_timer)
+
+    # Starts the recordings due and sets the timer to the start of the next recording
+    def _on_timer(self):
+        self._timer = None
+        current_time = self._time_provider.get_current_time()
+        assert self._plan is not None
+        now = self._pendulum_dt_to_std_dt(current_time)
+        if now - self._plan.start >= _REPLAN_INTERVAL:
+            self._plan = self._compile_plan(current_time)
+            logger.debug(f"Extended the plan to {self._plan.end.isoformat()}")
+
+        # Due until their end, i.e. a late timer (e.g. on startup) still records the rest of the period
+        for window in self._plan.get_due_windows(now):
+            key = (window.schedule.id, window.start)
+            if key not in self._started_windows:
+                self._started_windows[key] = window.end
+                self._start_recording(window)
+        self._started_windows = {
+            key: end for key, end in self._started_windows.items() if now < end
+        }
 
-            # Add next run time to job if specified
-            if next_run_time is not None:
-                # Convert pendulum DateTime to python datetime as apscheduler doesn't like pendulum DateTime... (AttributeError: 'NoneType' object has no attribute 'convert')
-                job.next_run_time = self._pendulum_dt_to_std_dt(next_run_time)
+        next_start = self._plan.get_next_start(now)
+        delay = _MAX_TIMER_SECONDS
+        if next_start is not None:
+            delay = min(delay, (next_start - now).total_seconds())
+        self._set_timer(delay)
 
-        except ValueError as e:
-            raise SchedulerError(
-                f"An incorrect value was specified while adding job: {e}"
-            ) from e
+    def _start_recording(self, window: CaptureWindow):
+        recording_period = TimePeriod(
+            pendulum.instance(window.start), pendulum.instance(window.end)
+        )
+        recording = self._loop.create_task(
+            self._execute_recording_task(window.schedule, recording_period)
+        )
+        self._recordings.add(recording)
+        recording.add_done_callback(self._on_recording_done)
+
+    def _on_recording_done(self, recording: "asyncio.Task[None]"):
+        self._recordings.discard(recording)
+        if not recording.cancelled() and recording.exception() is not None:
+            logger.error(
+                f"Recording task raised an exception: {recording.exception()}",
+                exc_info=recording.exception(),
+            )
 
     # Converts a pendulum DateTime to a python datetime
     def _pendulum_dt_to_std_dt(self, next_run_time: DateTime) -> datetime:
@@ -93,35 +239,40 @@ class RecordingSchedulerService:
         )
         return next_run_time_std_dt
 
-    # Gets trigger based on frequency
-    def _get_trigger(self, frequency: str, start_time: Time):
-        return CronTrigger(
-            day_of_week=frequency,
-            hour=start_time.hour,
-            minute=start_time.minute,
-            second=start_time.second,
-            timezone="UTC",
-        )
-
-    async def _execute_recording_task(self, recording_schedule: RecordingSchedule):
+    async def _execute_recording_task(
+        self, recording_schedule: RecordingSchedule, recording_period: TimePeriod
+    ):
         logger.info(
             f"Executing task for recording schedule: {recording_schedule.title}"
         )
+        # Name the task after the schedule, e.g. to attribute event loop stalls to the recording
+        current_task = asyncio.current_task()
+        if current_task is not None:
+            current_task.set_name(f"recording '{recording_schedule.title}'")
 
-        current_time = self._time_provider.get_current_time()
-        task = recording_schedule.get_current_or_next_task(
-            recording_start_time=current_time
-        )
+        task = recording_schedule.get_task(recording_period)
+        # E.g. a schedule changed during its recording period is due again, while the recording of the old schedule is still in progress
+        if self._is_recording(task):
+            logger.info(
+                f"Skipping task, the period is already being recorded: {task.title}"
+            )
+            return
 
+        self._active_tasks[task.id] = task
         try:
             await self._recorder.record_audio_task(task, recording_schedule.metadata)
             logger.info(f"Recording task complete: {task}")
 
         except Exception as e:
             raise SchedulerError(f"Recording failed: {task}, {e}") from e
+        finally:
+            del self._active_tasks[task.id]
 
-    def run(self):
-        logger.info(f"Starting scheduler with jobs:")
-        self.scheduler.print_jobs()
-
-        self.scheduler.start()  # NB: Non-blocking, caller responsible for keeping process alive
+    # Whether a recording in progress (to the same directory, i.e. of the same podcast) overlaps the period of the task
+    def _is_recording(self, task: RecordingTask) -> bool:
+        return any(
+            active_task.base_dir == task.base_dir
+            and active_task.recording_period.start < task.recording_period.end
+            and task.recording_period.start < active_task.recording_period.end
+            for active_task in self._active_tasks.values()
+        )
@@ -0,0 +1,38 @@
+import hashlib
+from collections import OrderedDict
+
+# Bytes per content hash. Collisions are negligible for the few segments compared
+_DIGEST_SIZE = 16
+
+
+# Detects HLS segments byte-identical to one of the last 'window' segments recorded, e.g. as an origin re-lists the same media under a new URI after a playlist rotation or failover.
+# Only the content hashes are kept, i.e. the memory used is bounded by the window regardless of the length of the recording
+class SegmentDeduplicator:
+    def __init__(self, window: int) -> None:
+        super().__init__()
+        if window < 0:
+            raise ValueError("Dedup window must be non-negative")
+        self._window = window
+        self._digests: OrderedDict[bytes, None] = OrderedDict()
+
+    # Disabled with a window of 0
+    @property
+    def enabled(self) -> bool:
+        return self._window > 0
+
+    # Returns a hash to be updated with the chunks of a segment as they are received, i.e. a segment is hashed without joining its chunks
+    def new_hash(self, data: bytes = b"") -> hashlib.blake2b:
+        return hashlib.blake2b(data, digest_size=_DIGEST_SIZE)
+
+    # Whether the segment (by the hash of its content) is a duplicate of a recent segment. Otherwise it is remembered as recent
+    def is_duplicate(self, segment_hash: hashlib.blake2b) -> bool:
+        if not self.enabled:
+            return False
+        digest = segment_hash.digest()
+        if digest in self._digests:
+            self._digests.move_to_end(digest)
+            return True
+        self._digests[digest] = None
+        if len(self._digests) > self._window:
+            self._digests.popitem(last=False)
+        return False
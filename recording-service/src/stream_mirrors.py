@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    Optional,
+    Sequence,
+    Sized,
+    TypeVar,
+)
+
+from src.models import ValidUrl
+from src.stream_reconnect import StreamConnection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MirrorPolicy:
+    # Switch to another mirror if the throughput over a window falls below this ratio of the bitrate of the stream. 0 to only switch on failures and stalls
+    min_throughput_ratio: float = 0.9
+    # Seconds over which the throughput is measured. Also the time the other mirrors get to deliver audio when switching
+    throughput_window: float = 10
+    # Bitrate to compare the throughput against. If not set, the bitrate announced by the stream (icy-br) is used. Without either, mirrors are only switched on failures and stalls
+    bitrate_kbps: Optional[int] = None
+    # Seconds after which a slow HLS request (playlist reload or segment) is repeated on the next mirror
+    hedge_delay: float = 2
+
+    def __post_init__(self):
+        if self.min_throughput_ratio < 0:
+            raise ValueError("Min throughput ratio must be non-negative")
+        if self.throughput_window <= 0:
+            raise ValueError("Throughput window must be positive")
+        if self.bitrate_kbps is not None and self.bitrate_kbps <= 0:
+            raise ValueError("Bitrate must be positive")
+        if self.hedge_delay < 0:
+            raise ValueError("Hedge delay must be non-negative")
+
+
+R = TypeVar("R")
+
+
+# Runs the given requests (e.g. the same request to several mirrors) one after another, starting the next one if none of the running ones succeeded within 'delay' seconds or all of them failed.
+# Returns the index and result of the first request to succeed, the others are cancelled. With a delay of 0, all requests are raced. If all requests fail, the error of the last one to fail is raised
+async def hedge(
+    requests: Sequence[Callable[[], Awaitable[R]]],
+    delay: float,
+    # Called when a further request is started
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> tuple[int, R]:
+    if not requests:
+        raise ValueError("No requests to hedge")
+
+    tasks: dict["asyncio.Future[R]", int] = {}
+    errors: list[BaseException] = []
+    try:
+        for index, request in enumerate(requests):
+            if index > 0 and on_hedge is not None:
+                on_hedge()
+            tasks[asyncio.ensure_future(request())] = index
+            is_last = index == len(requests) - 1
+            deadline = time.monotonic() + delay
+            while tasks:
+                timeout = None if is_last else max(0, deadline - time.monotonic())
+                done, _ = await asyncio.wait(
+                    list(tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break  # Too slow, start the next request
+                for task in done:
+                    task_index = tasks.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return task_index, task.result()
+                    errors.append(error)
+        raise errors[-1]
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+T = TypeVar("T", bound=Sized)
+
+
+# Reads a continuous stream available at several equivalent URLs (mirrors), e.g. on other CDNs or relays.
+# All mirrors are connected at once and the first to deliver audio is used. If the throughput of the used mirror falls below the bitrate of the stream, the other mirrors are connected while reading on, and the first of them to deliver audio within the throughput window replaces it.
+# If the used mirror fails or ends, the mirrors still connecting take over. Otherwise, failures and stalls are left to the caller (e.g. ReconnectingStream, racing the mirrors again)
+class MirrorStream(Generic[T]):
+    def __init__(
+        self,
+        urls: list[ValidUrl],
+        # Opens the stream at the given URL. The callback is called with the bitrate announced by the stream, if any
+        open_stream: Callable[[ValidUrl, Callable[[int], None]], AsyncIterator[T]],
+        policy: MirrorPolicy,
+        stream_name: Optional[str] = None,  # Optional. Used for better logging output
+        on_switch: Optional[Callable[[], None]] = None,
+    ) -> None:
+        super().__init__()
+        if not urls:
+            raise ValueError("No stream URLs given")
+        self._urls = urls
+        self._open_stream = open_stream
+        self._policy = policy
+        self._log_prefix = f"Stream '{stream_name}': " if stream_name else ""
+        self._on_switch = on_switch
+        self._bitrate_kbps = policy.bitrate_kbps
+
+    async def chunks(self) -> AsyncIterator[T]:
+        connections: dict[StreamConnection[T], ValidUrl] = {
+            self._connect(url): url for url in self._urls
+        }
+        current: Optional[StreamConnection[T]] = None
+        current_url: Optional[ValidUrl] = None
+        window_start = time.monotonic()
+        window_bytes = 0
+        error: Optional[BaseException] = None
+        try:
+            while connections:
+                await asyncio.wait(
+                    [c.next_chunk for c in connections],
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                # The used mirror first, i.e. it wins a tie
+                for connection in sorted(connections, key=lambda c: c is not current):
+                    if not connection.next_chunk.done():
+                        continue
+                    url = connections[connection]
+                    try:
+                        chunk = connection.next_chunk.result()
+                    except StopAsyncIteration:
+                        logger.debug(f"{self._log_prefix}Mirror ended: {url}")
+                        error = None
+                    except Exception as e:
+                        logger.debug(f"{self._log_prefix}Mirror failed: {url}: {e}")
+                        error = e
+                    else:
+                        if connection is not current:
+                            # First mirror to deliver audio, at the start or after a switch
+                            for other in connections:
+                                if other is not connection:
+                                    await other.close()
+                            connections = {connection: url}
+                            error = None
+                            self._log_use(url, current_url)
+                            current, current_url = connection, url
+                            window_start, window_bytes = time.monotonic(), 0
+
+                        yield chunk
+                        connection.request_next()
+                        window_bytes += len(chunk)
+                        elapsed = time.monotonic() - window_start
+                        if elapsed >= self._policy.throughput_window:
+                            await self._check_throughput(
+                                connections, url, window_bytes / elapsed
+                            )
+                            window_start, window_bytes = time.monotonic(), 0
+                        break
+
+                    del connections[connection]
+                    await connection.close()
+                    if connection is current:
+                        current = None
+                    break
+            if error is not None:
+                raise error
+        finally:
+            for connection in connections:
+                await connection.close()
+
+    # Opens the other mirrors if the throughput of the used one is below the bitrate. Mirrors opened in the previous window that did not deliver audio are closed
+    async def _check_throughput(
+        self,
+        connections: dict[StreamConnection[T], ValidUrl],
+        url: ValidUrl,
+        bytes_per_second: float,
+    ) -> None:
+        if len(connections) > 1:
+            logger.info(
+                f"{self._log_prefix}No other mirror delivered audio, staying on: {url}"
+            )
+            for connection in [c for c, u in connections.items() if u != url]:
+                del connections[connection]
+                await connection.close()
+            return
+
+        if (
+            len(self._urls) < 2
+            or self._bitrate_kbps is None
+            or self._policy.min_throughput_ratio == 0
+        ):
+            return
+        kbps = bytes_per_second * 8 / 1000
+        if kbps >= self._bitrate_kbps * self._policy.min_throughput_ratio:
+            return
+        logger.warning(
+            f"{self._log_prefix}Throughput of {kbps:.0f} kbps below the bitrate of {self._bitrate_kbps} kbps, connecting the other mirrors"
+        )
+        for other_url in self._urls:
+            if other_url != url:
+                connections[self._connect(other_url)] = other_url
+
+    def _connect(self, url: ValidUrl) -> StreamConnection[T]:
+        return StreamConnection(self._open_stream(url, self._set_announced_bitrate))
+
+    def _set_announced_bitrate(self, bitrate_kbps: int) -> None:
+        if self._policy.bitrate_kbps is None:
+            self._bitrate_kbps = bitrate_kbps
+
+    def _log_use(self, url: ValidUrl, previous_url: Optional[ValidUrl]) -> None:
+        if previous_url is None:
+            logger.info(f"{self._log_prefix}Using mirror: {url}")
+            return
+        logger.info(f"{self._log_prefix}Switching mirror from {previous_url} to {url}")
+        if self._on_switch is not None:
+            self._on_switch()
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Generic, Optional, TypeVar, cast
+
+from src import utils
+
+logger = logging.getLogger(__name__)
+
+
+class ReconnectError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    # Whether to reconnect within the recording period if the stream fails, ends or stalls. If disabled, any error ends the recording
+    enabled: bool = True
+    # Seconds without data after which the connection is considered stalled
+    stall_timeout: float = 2
+    # The first reconnect is immediate, following ones wait a random time (full jitter) up to initial_backoff * 2^n seconds, capped at max_backoff
+    initial_backoff: float = 0.25
+    max_backoff: float = 10
+    # Seconds of audio that may be missing in a single recording before giving up
+    gap_budget: float = 300
+    # Whether to open a second connection as soon as the connection stalls, and use whichever connection delivers data first
+    warm_standby: bool = False
+
+    def __post_init__(self):
+        if self.stall_timeout <= 0:
+            raise ValueError("Stall timeout must be positive")
+        if self.initial_backoff < 0 or self.max_backoff < self.initial_backoff:
+            raise ValueError(
+                "Backoff must be non-negative and max backoff must be at least the initial backoff"
+            )
+        if self.gap_budget < 0:
+            raise ValueError("Gap budget must be non-negative")
+
+    # Gives up the recording if its gaps exceed the gap budget
+    def check_gap_budget(self, gaps: "StreamGaps", log_prefix: str = "") -> None:
+        total = gaps.total_seconds()
+        if total > self.gap_budget:
+            raise ReconnectError(
+                f"{log_prefix}Gaps of {total:.1f} seconds exceed the gap budget of {self.gap_budget} seconds"
+            )
+
+    # Seconds to wait before the given reconnect attempt (starting at 1)
+    def get_backoff(self, attempt: int) -> float:
+        if attempt <= 1:
+            return 0
+        return random.uniform(
+            0, min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 2))
+        )
+
+
+# A period of a recording without audio, e.g. while reconnecting
+@dataclass(frozen=True)
+class StreamGap:
+    start: datetime  # UTC
+    end: datetime  # UTC
+    reason: str
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end - self.start).total_seconds()
+
+
+# Collects the gaps of a single recording
+class StreamGaps:
+    def __init__(self) -> None:
+        super().__init__()
+        self.gaps: list[StreamGap] = []
+        self._open_since: Optional[float] = None  # Monotonic
+        self._open_start: Optional[datetime] = None
+        self._open_reason = ""
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_since is not None
+
+    # Starts a gap (if none is open). 'since' is the monotonic time the gap started, e.g. when the last data was received
+    def open(self, reason: str, since: Optional[float] = None) -> None:
+        if self._open_since is not None:
+            return
+        now = time.monotonic()
+        since = now if since is None else min(since, now)
+        self._open_since = since
+        self._open_start = datetime.now(timezone.utc) - timedelta(seconds=now - since)
+        self._open_reason = reason
+
+    # Ends the open gap (if any), e.g. when data is received again. Returns the closed gap
+    def close(self) -> Optional[StreamGap]:
+        if self._open_since is None or self._open_start is None:
+            return None
+        end = self._open_start + timedelta(seconds=time.monotonic() - self._open_since)
+        gap = StreamGap(self._open_start, end, self._open_reason)
+        self.gaps.append(gap)
+        self._open_since = None
+        self._open_start = None
+        return gap
+
+    # Total seconds of all gaps, including the open one
+    def total_seconds(self) -> float:
+        total = sum(gap.duration_seconds for gap in self.gaps)
+        if self._open_since is not None:
+            total += time.monotonic() - self._open_since
+        return total
+
+
+T = TypeVar("T")
+
+
+# A connection to a stream, with the request for its next chunk running in the background (e.g. to race several connections)
+class StreamConnection(Generic[T]):
+    def __init__(self, chunks: AsyncIterator[T]) -> None:
+        super().__init__()
+        self.chunks = chunks
+        self.next_chunk: "asyncio.Future[T]" = asyncio.ensure_future(chunks.__anext__())
+
+    def request_next(self) -> None:
+        self.next_chunk = asyncio.ensure_future(self.chunks.__anext__())
+
+    async def close(self) -> None:
+        if not self.next_chunk.done():
+            self.next_chunk.cancel()
+            await asyncio.wait({self.next_chunk})
+        if not self.next_chunk.cancelled():
+            self.next_chunk.exception()  # Retrieved, i.e. not logged as unhandled
+        if isinstance(self.chunks, AsyncGenerator):
+            await self.chunks.aclose()
+
+
+# Yields the chunks of a continuous stream until the countdown expires, reconnecting within the recording period if the stream fails, ends or stalls.
+# A stall is detected after 'stall_timeout' without data. With a warm standby, a second connection is opened while the stalled one is kept, and whichever delivers data first is used.
+# Missing audio is tracked as gaps. If the gaps exceed the gap budget, the recording is given up (ReconnectError)
+class ReconnectingStream(Generic[T]):
+    def __init__(
+        self,
+        open_stream: Callable[[], AsyncIterator[T]],
+        policy: ReconnectPolicy,
+        countdown: utils.CountdownTimer,
+        gaps: StreamGaps,
+        stream_name: Optional[str] = None,  # Optional. Used for better logging output
+        on_reconnect: Optional[Callable[[], None]] = None,
+    ) -> None:
+        super().__init__()
+        self._open_stream = open_stream
+        self._policy = policy
+        self._countdown = countdown
+        self._gaps = gaps
+        self._log_prefix = f"Stream '{stream_name}': " if stream_name else ""
+        self._on_reconnect = on_reconnect
+
+    async def chunks(self) -> AsyncIterator[T]:
+        connections: list[StreamConnection[T]] = []
+        attempt = 0
+        last_data = time.monotonic()
+        try:
+            while not self._countdown.is_expired():
+                if not connections:
+                    if attempt > 0:
+                        await self._wait_before_reconnect(attempt)
+                        if self._countdown.is_expired():
+                            return
+                        if self._on_reconnect is not None:
+                            self._on_reconnect()
+                    attempt += 1
+                    connections.append(StreamConnection(self._open_stream()))
+
+                done, _ = await asyncio.wait(
+                    [c.next_chunk for c in connections],
+                    timeout=self._policy.stall_timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    await self._handle_stall(connections, last_data)
+                    self._policy.check_gap_budget(self._gaps, self._log_prefix)
+                    continue
+
+                # Oldest connection first, i.e. the primary wins a tie
+                for connection in [c for c in connections if c.next_chunk.done()]:
+                    try:
+                        chunk = connection.next_chunk.result()
+                    except StopAsyncIteration:
+                        reason = "stream ended"
+                    except Exception as e:
+                        reason = f"stream failed: {e}"
+                    else:
+                        # Data again: drop the other connections and end the gap
+                        for other in connections:
+                            if other is not connection:
+                                await other.close()
+                        connections = [connection]
+                        gap = self._gaps.close()
+                        if gap is not None:
+                            logger.info(
+                                f"{self._log_prefix}Stream recovered after a gap of {gap.duration_seconds:.2f} seconds ({gap.reason})"
+                            )
+                        attempt = 0
+                        last_data = time.monotonic()
+                        yield chunk
+                        connection.request_next()
+                        break
+
+                    logger.warning(f"{self._log_prefix}Reconnecting, {reason}")
+                    connections.remove(connection)
+                    await connection.close()
+                    self._gaps.open(reason, since=last_data)
+                    self._policy.check_gap_budget(self._gaps, self._log_prefix)
+        finally:
+            for connection in connections:
+                await connection.close()
+            self._gaps.close()
+
+    # Replaces or adds a connection to the stalled one(s)
+    async def _handle_stall(
+        self, connections: list[StreamConnection[T]], last_data: float
+    ) -> None:
+        self._gaps.open("stalled", since=last_data)
+        if self._policy.warm_standby and len(connections) < 2:
+            logger.warning(
+                f"{self._log_prefix}No data for {self._policy.stall_timeout} seconds, opening a standby connection"
+            )
+        else:
+            # Without standby (or if the standby stalled as well), give up on the oldest connection
+            logger.warning(
+                f"{self._log_prefix}No data for {self._policy.stall_timeout} seconds, reconnecting"
+            )
+            await connections.pop(0).close()
+        if self._on_reconnect is not None:
+            self._on_reconnect()
+        connections.append(StreamConnection(self._open_stream()))
+
+    async def _wait_before_reconnect(self, attempt: int) -> None:
+        backoff = self._policy.get_backoff(attempt)
+        remaining = cast(
+            timedelta, self._countdown.get_time_remaining()
+        ).total_seconds()
+        if backoff > 0:
+            logger.debug(
+                f"{self._log_prefix}Waiting {backoff:.2f} seconds before reconnecting"
+            )
+            await asyncio.sleep(min(backoff, remaining))
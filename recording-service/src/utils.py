@@ -2,17 +2,31 @@ import argparse
 import logging
 import time
 from datetime import datetime
-from typing import Any, Dict, Type, TypeVar, Union, overload
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Type, TypeVar, Union, overload
 
 import pendulum
 from pendulum import DateTime, Duration, Period, Time  # type: ignore
 from pendulum.tz import timezone
 from pendulum.tz.timezone import Timezone
 
+from src.event_loop import EVENT_LOOP_TYPES
+
 logger = logging.getLogger(__name__)
 
 
-def read_config_path():
+# Arguments given on the command line
+class CliArgs(NamedTuple):
+    config_path: Path
+    # Overrides the event loop of the config if set
+    event_loop: Optional[str]
+    # Whether to print the capture plan and exit
+    plan: bool
+    # Overrides the days of the plan printed if set
+    plan_days: Optional[int]
+
+
+def read_cli_args() -> CliArgs:
     ap = argparse.ArgumentParser()
     ap.add_argument(
         "-c",
@@ -21,12 +35,30 @@ def read_config_path():
         help="Path of yaml config file",
         default="config.yml",
     )
+    ap.add_argument(
+        "--event-loop",
+        required=False,
+        choices=EVENT_LOOP_TYPES,
+        help="Event loop implementation, overrides the config",
+        default=None,
+    )
+    ap.add_argument(
+        "--plan",
+        action="store_true",
+        help="Print the recordings planned by the recording schedules and exit",
+    )
+    ap.add_argument(
+        "--plan-days",
+        type=int,
+        required=False,
+        help="Days of recordings to print with --plan, overrides the config",
+        default=None,
+    )
     args = vars(ap.parse_args())
 
-    # Get config from args
-    config_file_path = args["config"]
-
-    return config_file_path
+    return CliArgs(
+        Path(args["config"]), args["event_loop"], args["plan"], args["plan_days"]
+    )
 
 
 def setup_logging(level: int = logging.INFO):
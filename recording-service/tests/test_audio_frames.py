@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from src.audio_frames import find_append_offset
+
+# MPEG 1 layer 3, 128 kbps, 44100 Hz, no padding: 144 * 128000 // 44100 bytes
+MP3_FRAME = b"\xff\xfb\x90\x00" + b"\0" * 413
+ADTS_FRAME_LENGTH = 200
+
+
+def create_adts_frame(length: int = ADTS_FRAME_LENGTH) -> bytes:
+    header = bytes(
+        [
+            0xFF,
+            0xF1,
+            0x50,
+            0x80 | (length >> 11) & 0x03,
+            (length >> 3) & 0xFF,
+            ((length & 0x07) << 5) | 0x1F,
+            0xFC,
+        ]
+    )
+    return header + b"\0" * (length - len(header))
+
+
+def create_box(box_type: bytes, size: int) -> bytes:
+    return size.to_bytes(4, "big") + box_type + b"\0" * (size - 8)
+
+
+def create_id3_tag(size: int) -> bytes:
+    # Synchsafe size (7 bits per byte)
+    synchsafe = bytes([(size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b"ID3\x04\x00\x00" + synchsafe + b"\0" * size
+
+
+def write(tmp_path: Path, data: bytes) -> Path:
+    file_path = tmp_path / "recording"
+    file_path.write_bytes(data)
+    return file_path
+
+
+def test_mp3_is_cut_after_last_complete_frame(tmp_path: Path):
+    file_path = write(tmp_path, MP3_FRAME * 5 + MP3_FRAME[:100])
+
+    assert find_append_offset(file_path, len(MP3_FRAME) * 2) == len(MP3_FRAME) * 5
+
+
+def test_mp3_with_id3_tags_is_cut_after_last_complete_frame(tmp_path: Path):
+    data = create_id3_tag(50) + MP3_FRAME * 3 + create_id3_tag(20) + MP3_FRAME * 2
+    file_path = write(tmp_path, data + MP3_FRAME[:10])
+
+    assert find_append_offset(file_path, 0) == len(data)
+
+
+def test_adts_is_cut_after_last_complete_frame(tmp_path: Path):
+    frame = create_adts_frame()
+    file_path = write(tmp_path, frame * 4 + frame[:150])
+
+    assert find_append_offset(file_path, ADTS_FRAME_LENGTH) == ADTS_FRAME_LENGTH * 4
+
+
+def test_trailing_garbage_is_cut(tmp_path: Path):
+    file_path = write(tmp_path, MP3_FRAME * 4 + b"\0garbage\0" * 10)
+
+    assert find_append_offset(file_path, len(MP3_FRAME)) == len(MP3_FRAME) * 4
+
+
+def test_bmff_is_cut_after_last_complete_box(tmp_path: Path):
+    boxes = (
+        create_box(b"ftyp", 24) + create_box(b"moof", 100) + create_box(b"mdat", 500)
+    )
+    partial_box = create_box(b"moof", 100)[:60]
+    file_path = write(tmp_path, boxes + partial_box)
+
+    assert find_append_offset(file_path, 0) == len(boxes)
+
+
+def test_falls_back_to_durable_offset_without_frames(tmp_path: Path):
+    file_path = write(tmp_path, b"\0" * 1000)
+
+    assert find_append_offset(file_path, 600) == 600
+
+
+def test_durable_offset_beyond_the_file_is_limited_to_its_size(tmp_path: Path):
+    file_path = write(tmp_path, b"\0" * 1000)
+
+    assert find_append_offset(file_path, 5000) == 1000
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pendulum
+from pendulum import Time  # type: ignore
+
+from src.capture_plan import CapturePlan, format_plan
+from src.models import RecordingSchedule
+
+
+def create_schedule(
+    title: str,
+    start: Time,
+    minutes: int,
+    output_dir: str = "",
+    frequency: str = "*",
+) -> RecordingSchedule:
+    return RecordingSchedule(
+        title,
+        start,
+        pendulum.duration(minutes=minutes),
+        "mp3",
+        Path(output_dir or title),
+        {},
+        frequency=frequency,
+    )
+
+
+def utc(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 1, day, hour, minute, tzinfo=timezone.utc)
+
+
+def test_window_across_midnight_is_due_on_next_day():
+    schedule = create_schedule("night", Time(23, 0), 120)
+    # Starts during the window of the day before the plan
+    plan = CapturePlan([schedule], utc(2, 0, 30), days=1)
+
+    assert [(w.start, w.end) for w in plan.get_due_windows(utc(2, 0, 30))] == [
+        (utc(1, 23), utc(2, 1))
+    ]
+    assert plan.get_due_windows(utc(2, 1)) == []
+    assert plan.get_next_start(utc(2, 0, 30)) == utc(2, 23)
+    # The last window ends after the plan
+    assert plan.get_next_start(utc(2, 23)) is None
+
+
+def test_windows_keep_utc_time_across_dst_change():
+    schedule = create_schedule("show", Time(1, 30), 60)
+    # Daylight saving time starts on 2024-03-31 at 02:00 local time
+    start = pendulum.datetime(2024, 3, 30, 12, tz="Europe/Copenhagen")
+
+    plan = CapturePlan([schedule], start, days=3)
+
+    assert plan.start == datetime(2024, 3, 30, 11, tzinfo=timezone.utc)
+    # 24 hours apart, also across the change
+    assert [w.start for w in plan.windows] == [
+        datetime(2024, 3, 31, 1, 30, tzinfo=timezone.utc),
+        datetime(2024, 4, 1, 1, 30, tzinfo=timezone.utc),
+        datetime(2024, 4, 2, 1, 30, tzinfo=timezone.utc),
+    ]
+    # Compared as absolute times: 03:45 summer time is 01:45 UTC
+    at = pendulum.datetime(2024, 3, 31, 3, 45, tz="Europe/Copenhagen")
+    assert [w.schedule for w in plan.get_due_windows(at)] == [schedule]
+
+
+def test_windows_are_planned_on_weekdays_of_frequency():
+    schedule = create_schedule("weekend", Time(10, 0), 60, frequency="sat,sun")
+
+    # 2024-01-01 is a monday
+    plan = CapturePlan([schedule], utc(1, 0), days=14)
+
+    assert [w.start.day for w in plan.windows] == [6, 7, 13, 14]
+
+
+def test_update_equals_new_plan():
+    a = create_schedule("a", Time(10, 0), 60)
+    b = create_schedule("b", Time(10, 0), 60)
+    c = create_schedule("c", Time(9, 0), 30)
+    plan = CapturePlan([a, b], utc(1, 0), days=3)
+
+    plan.update(removed=[a], added=[c])
+
+    assert plan.windows == CapturePlan([b, c], utc(1, 0), days=3).windows
+
+
+def test_conflicts_of_same_output_dir():
+    a = create_schedule("a", Time(10, 0), 60, output_dir="podcast")
+    b = create_schedule("b", Time(10, 30), 60, output_dir="podcast")
+    other = create_schedule("other", Time(10, 30), 60)
+    plan = CapturePlan([a, b, other], utc(1, 0), days=2)
+
+    conflicts = plan.get_conflicts()
+
+    assert [(c.window.schedule, c.other.schedule) for c in conflicts] == [(a, b)] * 2
+    assert plan.get_conflicts({"other"}) == []
+
+
+def test_overruns_of_concurrent_recordings():
+    a = create_schedule("a", Time(10, 0), 60)
+    b = create_schedule("b", Time(10, 30), 60)
+    c = create_schedule("c", Time(12, 0), 60)
+    plan = CapturePlan([a, b, c], utc(1, 0), days=1)
+
+    assert [(block.start, block.max_concurrent) for block in plan.get_blocks()] == [
+        (utc(1, 10), 2),
+        (utc(1, 12), 1),
+    ]
+    assert [block.start for block in plan.get_overruns(1)] == [utc(1, 10)]
+    assert plan.get_overruns(2) == []
+
+
+def test_format_plan():
+    a = create_schedule("a", Time(10, 0), 60, output_dir="podcast")
+    b = create_schedule("b", Time(10, 30), 60)
+    c = create_schedule("c", Time(10, 45), 30, output_dir="podcast")
+    plan = CapturePlan([a, b, c], utc(1, 0), days=1)
+
+    assert format_plan(plan, max_concurrent=2) == "\n".join(
+        [
+            "Capture plan 2024-01-01 00:00 - 2024-01-02 00:00 (UTC): 3 recording(s) of 3 schedule(s) in 1 block(s), at most 3 at a time",
+            "",
+            "2024-01-01 10:00 - 2024-01-01 11:30: 3 recording(s), at most 3 at a time (OVER CAPACITY of 2)",
+            "  2024-01-01 10:00 - 2024-01-01 11:00  a",
+            "  2024-01-01 10:30 - 2024-01-01 11:30  b",
+            "  2024-01-01 10:45 - 2024-01-01 11:15  c (CONFLICT, skipped)",
+            "",
+            "1 conflict(s): overlapping recordings of the same podcast, only the first is recorded",
+        ]
+    )
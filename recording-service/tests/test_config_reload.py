@@ -0,0 +1,152 @@
+# pyright: reportPrivateUsage=false
+import asyncio
+from pathlib import Path
+
+import pytest
+from typing_extensions import override
+
+from src import config
+from src.audio_storage import AudioStorageAdapter
+from src.audio_stream import HttpAudioStreamAdapter, HttpStreamClient
+from src.config_reload import ConfigReloader
+from src.models import RecordingSchedule, ValidUrl
+from src.recording_service import RecordAudioService
+from src.scheduler_service import (
+    RecordingSchedulerService,
+    ScheduleDiff,
+    SchedulerError,
+)
+from src.utils import TimeProvider
+
+
+def create_config_text(titles: list[str]) -> str:
+    schedules = "".join(
+        f"  - title: {title}\n    start_timeofday: '10:00'\n    end_timeofday: '11:00'\n"
+        for title in titles
+    )
+    return f"stream_url: http://localhost/stream\noutput_dir: recordings\ntime_zone: UTC\nrecording_schedules:\n{schedules}"
+
+
+def create_scheduler() -> RecordingSchedulerService:
+    recorder = RecordAudioService(
+        HttpAudioStreamAdapter(HttpStreamClient(chunk_size=1024)),
+        AudioStorageAdapter(),
+        ValidUrl("http://localhost/stream"),
+        TimeProvider(),
+    )
+    return RecordingSchedulerService(recorder, TimeProvider(), "mp3")
+
+
+# Fails to apply the schedules, e.g. as they cannot be planned
+class FailingSchedulerService(RecordingSchedulerService):
+    @override
+    def update_recording_schedules(
+        self, recording_schedules: list[RecordingSchedule]
+    ) -> ScheduleDiff:
+        raise SchedulerError("Could not plan recordings")
+
+
+def create_reloader(
+    config_path: Path, scheduler: RecordingSchedulerService
+) -> ConfigReloader:
+    app_config = config.from_yaml(config_path)
+    for schedule in app_config.recording_schedules:
+        scheduler.add_recording_schedule(schedule)
+    return ConfigReloader(config_path, app_config, scheduler)
+
+
+def get_titles(scheduler: RecordingSchedulerService) -> list[str]:
+    return [schedule.title for schedule in scheduler._schedules]
+
+
+# Reloads and waits for the reload (and any pending reload) to complete
+async def reload(reloader: ConfigReloader) -> None:
+    reloader.reload()
+    assert reloader._reload_task is not None
+    await asyncio.wait_for(reloader._reload_task, 5)
+
+
+def test_changed_schedules_are_applied(tmp_path: Path):
+    async def run():
+        config_path = tmp_path / "config.yml"
+        config_path.write_text(create_config_text(["a", "b"]))
+        scheduler = create_scheduler()
+        reloader = create_reloader(config_path, scheduler)
+        schedule_a = scheduler._schedules[0]
+
+        config_path.write_text(create_config_text(["a", "c"]))
+        await reload(reloader)
+
+        assert get_titles(scheduler) == ["a", "c"]
+        # Unchanged schedules are kept
+        assert scheduler._schedules[0] is schedule_a
+        assert [s.title for s in reloader._config.recording_schedules] == ["a", "c"]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "config_text",
+    [
+        "stream_url: [",  # E.g. saved halfway through editing
+        create_config_text(["a"]).replace("output_dir: recordings", "output_dir: 5"),
+        "stream_url: http://localhost/stream\noutput_dir: recordings\ntime_zone: UTC\nrecording_schedules: 5\n",
+    ],
+)
+def test_invalid_config_keeps_current_config(tmp_path: Path, config_text: str):
+    async def run():
+        config_path = tmp_path / "config.yml"
+        config_path.write_text(create_config_text(["a"]))
+        scheduler = create_scheduler()
+        reloader = create_reloader(config_path, scheduler)
+
+        config_path.write_text(config_text)
+        await reload(reloader)
+        assert get_titles(scheduler) == ["a"]
+
+        # Later reloads still run
+        config_path.write_text(create_config_text(["b"]))
+        await reload(reloader)
+        assert get_titles(scheduler) == ["b"]
+
+    asyncio.run(run())
+
+
+def test_failed_update_keeps_current_config(tmp_path: Path):
+    async def run():
+        config_path = tmp_path / "config.yml"
+        config_path.write_text(create_config_text(["a"]))
+        recorder = create_scheduler()._recorder
+        scheduler = FailingSchedulerService(recorder, TimeProvider(), "mp3")
+        reloader = create_reloader(config_path, scheduler)
+        app_config = reloader._config
+
+        config_path.write_text(create_config_text(["b"]))
+        await reload(reloader)
+
+        assert reloader._config is app_config
+        assert reloader._reload_task is None
+
+    asyncio.run(run())
+
+
+def test_reload_requested_during_reload_runs_after_it(tmp_path: Path):
+    async def run():
+        config_path = tmp_path / "config.yml"
+        config_path.write_text(create_config_text(["a"]))
+        scheduler = create_scheduler()
+        reloader = create_reloader(config_path, scheduler)
+
+        config_path.write_text(create_config_text(["b"]))
+        reloader.reload()
+        task = reloader._reload_task
+        assert task is not None
+        # Requested while the first reload is parsing the file
+        await asyncio.sleep(0)
+        config_path.write_text(create_config_text(["c"]))
+        reloader.reload()
+        await asyncio.wait_for(task, 5)
+
+        assert get_titles(scheduler) == ["c"]
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import m3u8
+import pytest
+
+from src.hls_variants import VariantPolicy, get_bitrate_kbps, select_variant
+
+MASTER_PLAYLIST = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=64000,CODECS="mp4a.40.5"
+low-he-aac.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=140000,AVERAGE-BANDWIDTH=128000,CODECS="mp4a.40.2"
+mid-aac.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=320000,CODECS="mp4a.40.2"
+high-aac.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=500000,CODECS="flac"
+lossless.m3u8
+"""
+
+
+def select_uri(policy: VariantPolicy) -> str:
+    return select_variant(m3u8.loads(MASTER_PLAYLIST), policy).uri
+
+
+def test_highest_bitrate_by_default():
+    assert select_uri(VariantPolicy()) == "lossless.m3u8"
+
+
+def test_lowest_bitrate_of_at_least_min_bitrate():
+    assert select_uri(VariantPolicy("lowest")) == "low-he-aac.m3u8"
+    assert select_uri(VariantPolicy("lowest", min_bitrate_kbps=100)) == "mid-aac.m3u8"
+
+
+def test_lowest_falls_back_to_highest_if_no_bitrate_is_high_enough():
+    assert select_uri(VariantPolicy("lowest", min_bitrate_kbps=1000)) == "lossless.m3u8"
+
+
+def test_codec_filters_variants():
+    assert select_uri(VariantPolicy(codec="mp4a.40.2")) == "high-aac.m3u8"
+    # A codec without profile matches any profile
+    assert select_uri(VariantPolicy("lowest", codec="mp4a")) == "low-he-aac.m3u8"
+
+
+def test_unknown_codec_chooses_from_all_variants():
+    assert select_uri(VariantPolicy(codec="opus")) == "lossless.m3u8"
+
+
+def test_average_bitrate_is_preferred():
+    playlist = m3u8.loads(MASTER_PLAYLIST)
+
+    assert [get_bitrate_kbps(v) for v in playlist.playlists] == [64, 128, 320, 500]
+
+
+def test_master_playlist_without_variants():
+    with pytest.raises(ValueError):
+        select_variant(m3u8.loads("#EXTM3U\n"), VariantPolicy())
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        VariantPolicy("best")
+    with pytest.raises(ValueError):
+        VariantPolicy(min_bitrate_kbps=-1)
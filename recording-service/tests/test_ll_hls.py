@@ -0,0 +1,138 @@
+import m3u8
+
+from src import ll_hls
+from src.ll_hls import PartLocation, PartPosition
+
+# Segment 10 and 11 complete (11 still listed by parts), segment 12 in progress with 2 parts and a hint of the 3rd
+LOW_LATENCY_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:9
+#EXT-X-TARGETDURATION:4
+#EXT-X-PART-INF:PART-TARGET=1.0
+#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=3.0
+#EXT-X-MEDIA-SEQUENCE:10
+#EXTINF:4.0,
+segment10.aac
+#EXT-X-PART:DURATION=1.0,URI="part11.0.aac"
+#EXT-X-PART:DURATION=1.0,URI="part11.1.aac"
+#EXT-X-PART:DURATION=1.0,URI="part11.2.aac"
+#EXTINF:3.0,
+segment11.aac
+#EXT-X-PART:DURATION=1.0,URI="part12.0.aac"
+#EXT-X-PART:DURATION=1.0,URI="part12.1.aac"
+#EXT-X-PRELOAD-HINT:TYPE=PART,URI="part12.2.aac"
+"""
+
+# Segment 12 completed, the hint is the first part of segment 13
+COMPLETED_SEGMENT_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:9
+#EXT-X-TARGETDURATION:4
+#EXT-X-PART-INF:PART-TARGET=1.0
+#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=3.0
+#EXT-X-MEDIA-SEQUENCE:11
+#EXTINF:3.0,
+segment11.aac
+#EXT-X-PART:DURATION=1.0,URI="part12.0.aac"
+#EXT-X-PART:DURATION=1.0,URI="part12.1.aac"
+#EXTINF:2.0,
+segment12.aac
+#EXT-X-PRELOAD-HINT:TYPE=PART,URI="part13.0.aac"
+"""
+
+REGULAR_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:5
+#EXTINF:10.0,
+segment5.aac
+#EXTINF:10.0,
+segment6.aac
+"""
+
+
+def test_is_low_latency():
+    assert ll_hls.is_low_latency(m3u8.loads(LOW_LATENCY_PLAYLIST))
+    assert not ll_hls.is_low_latency(m3u8.loads(REGULAR_PLAYLIST))
+    assert ll_hls.get_part_target(m3u8.loads(LOW_LATENCY_PLAYLIST)) == 1.0
+
+
+def test_live_edge_is_last_listed_part():
+    playlist = m3u8.loads(LOW_LATENCY_PLAYLIST)
+
+    assert ll_hls.get_live_edge(playlist) == PartPosition(12, 1)
+
+
+def test_live_edge_without_parts_is_last_segment():
+    playlist = m3u8.loads(REGULAR_PLAYLIST)
+
+    assert ll_hls.get_live_edge(playlist) == PartPosition(6, 0)
+
+
+def test_locate_listed_part():
+    playlist = m3u8.loads(LOW_LATENCY_PLAYLIST)
+
+    assert ll_hls.locate_part(playlist, PartPosition(11, 2)) == PartLocation(
+        "part11.2.aac", PartPosition(11, 3)
+    )
+
+
+def test_locate_part_after_last_part_of_completed_segment_continues_with_next_segment():
+    playlist = m3u8.loads(LOW_LATENCY_PLAYLIST)
+
+    assert ll_hls.locate_part(playlist, PartPosition(11, 3)) == PartLocation(
+        "part12.0.aac", PartPosition(12, 1)
+    )
+
+
+def test_locate_segment_not_listed_by_parts_is_fetched_whole():
+    playlist = m3u8.loads(LOW_LATENCY_PLAYLIST)
+
+    assert ll_hls.locate_part(playlist, PartPosition(10, 0)) == PartLocation(
+        "segment10.aac", PartPosition(11, 0)
+    )
+
+
+def test_locate_part_not_listed_yet():
+    playlist = m3u8.loads(LOW_LATENCY_PLAYLIST)
+
+    assert ll_hls.locate_part(playlist, PartPosition(12, 2)) is None
+    assert ll_hls.locate_part(playlist, PartPosition(13, 0)) is None
+
+
+def test_preload_hint_of_segment_in_progress():
+    hint = ll_hls.get_preload_hint(m3u8.loads(LOW_LATENCY_PLAYLIST))
+
+    assert hint is not None
+    assert (hint.uri, hint.position) == ("part12.2.aac", PartPosition(12, 2))
+
+
+def test_preload_hint_after_completed_segment_is_next_segment():
+    hint = ll_hls.get_preload_hint(m3u8.loads(COMPLETED_SEGMENT_PLAYLIST))
+
+    assert hint is not None
+    assert (hint.uri, hint.position) == ("part13.0.aac", PartPosition(13, 0))
+
+
+def test_byte_range_preload_hint_is_not_supported():
+    playlist = m3u8.loads(
+        LOW_LATENCY_PLAYLIST.replace(
+            'URI="part12.2.aac"', 'URI="part12.aac",BYTERANGE-START=2000'
+        )
+    )
+
+    assert ll_hls.get_preload_hint(playlist) is None
+
+
+def test_is_behind():
+    playlist = m3u8.loads(COMPLETED_SEGMENT_PLAYLIST)
+
+    assert ll_hls.is_behind(playlist, PartPosition(10, 2))
+    assert not ll_hls.is_behind(playlist, PartPosition(11, 0))
+
+
+def test_blocking_reload_url_replaces_position():
+    url = ll_hls.get_blocking_reload_url(
+        "https://example.com/live.m3u8?token=a&_HLS_msn=1&_HLS_part=0",
+        PartPosition(12, 2),
+    )
+
+    assert url == "https://example.com/live.m3u8?token=a&_HLS_msn=12&_HLS_part=2"
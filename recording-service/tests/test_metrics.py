@@ -0,0 +1,85 @@
+import pytest
+
+from src.metrics import Counter, Gauge, Histogram, RecorderMetrics
+
+
+def test_counter_renders_help_type_and_values():
+    counter = Counter("reloads_total", "Playlist reloads", ("schedule", "status"))
+    counter.labels("news", "200").inc()
+    counter.labels("news", "200").inc(2)
+    counter.labels("news", "304").inc(0.5)
+
+    assert counter.render() == [
+        "# HELP reloads_total Playlist reloads",
+        "# TYPE reloads_total counter",
+        'reloads_total{schedule="news",status="200"} 3',
+        'reloads_total{schedule="news",status="304"} 0.5',
+    ]
+
+
+def test_label_values_are_escaped():
+    gauge = Gauge("offset_seconds", "Start offset", ("schedule",))
+    gauge.labels('a\\b"c\nd').set(1)
+
+    assert gauge.render()[-1] == 'offset_seconds{schedule="a\\\\b\\"c\\nd"} 1'
+
+
+def test_metric_without_labels():
+    gauge = Gauge("active", "Active recordings", ())
+    gauge.labels().inc()
+    gauge.labels().inc()
+    gauge.labels().dec()
+
+    assert gauge.render()[-1] == "active 1"
+
+
+def test_special_values():
+    gauge = Gauge("value", "Value", ("kind",))
+    gauge.labels("inf").set(float("inf"))
+    gauge.labels("-inf").set(float("-inf"))
+    gauge.labels("nan").set(float("nan"))
+
+    assert gauge.render()[2:] == [
+        'value{kind="inf"} +Inf',
+        'value{kind="-inf"} -Inf',
+        'value{kind="nan"} NaN',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("fetch_seconds", "Fetches", ("schedule",), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        histogram.labels("news").observe(value)
+
+    assert histogram.render() == [
+        "# HELP fetch_seconds Fetches",
+        "# TYPE fetch_seconds histogram",
+        'fetch_seconds_bucket{schedule="news",le="0.1"} 2',
+        'fetch_seconds_bucket{schedule="news",le="1"} 3',
+        'fetch_seconds_bucket{schedule="news",le="+Inf"} 4',
+        'fetch_seconds_sum{schedule="news"} 5.65',
+        'fetch_seconds_count{schedule="news"} 4',
+    ]
+
+
+def test_invalid_label_count_fails_on_update():
+    counter = Counter("reloads_total", "Playlist reloads", ("schedule", "status"))
+
+    with pytest.raises(ValueError):
+        counter.labels("news")
+
+
+def test_stream_metrics_share_values():
+    metrics = RecorderMetrics()
+    metrics.for_stream("news").bytes_received.inc(10)
+    metrics.for_stream("news").bytes_received.inc(5)
+    metrics.for_stream(None).bytes_received.inc(1)
+
+    rendered = metrics.render().splitlines()
+
+    assert 'recorder_bytes_received_total{schedule="news"} 15' in rendered
+    assert 'recorder_bytes_received_total{schedule=""} 1' in rendered
+    assert (
+        'recorder_hls_playlist_reloads_total{schedule="news",status="304"} 0'
+        in rendered
+    )
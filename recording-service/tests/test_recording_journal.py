@@ -0,0 +1,70 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from src import recording_journal
+from src.recording_journal import JournalEntry
+
+NOW = datetime.now(timezone.utc)
+
+
+def create_entry(
+    directory: Path, file_name: str, period_start: datetime, period_end: datetime
+) -> JournalEntry:
+    file_path = directory / file_name
+    file_path.write_bytes(b"\0" * 100)
+    entry = JournalEntry(uuid.uuid4(), file_path, period_start, period_end, 100, NOW)
+    recording_journal.write_entry(entry)
+    return entry
+
+
+def test_journal_is_hidden_temp_file(tmp_path: Path):
+    journal_path = recording_journal.get_journal_path(tmp_path / "recording.mp3")
+
+    assert journal_path.name == ".recording.mp3.journal.tmp"
+
+
+def test_entry_of_period_is_found(tmp_path: Path):
+    start, end = NOW - timedelta(minutes=10), NOW + timedelta(minutes=50)
+    entry = create_entry(tmp_path, "recording.mp3", start, end)
+
+    assert recording_journal.find_entry(tmp_path, start, end) == entry
+
+
+def test_entry_of_ended_period_is_removed(tmp_path: Path):
+    ended = create_entry(
+        tmp_path, "ended.mp3", NOW - timedelta(hours=2), NOW - timedelta(hours=1)
+    )
+    start, end = NOW - timedelta(minutes=10), NOW + timedelta(minutes=50)
+
+    assert recording_journal.find_entry(tmp_path, start, end) is None
+    assert not recording_journal.get_journal_path(ended.file_path).exists()
+    # The recording itself is kept
+    assert ended.file_path.exists()
+
+
+def test_entry_of_other_active_period_is_kept(tmp_path: Path):
+    # E.g. of another schedule writing to the same directory
+    other = create_entry(
+        tmp_path, "other.mp3", NOW - timedelta(minutes=5), NOW + timedelta(minutes=5)
+    )
+    start, end = NOW - timedelta(minutes=10), NOW + timedelta(minutes=50)
+
+    assert recording_journal.find_entry(tmp_path, start, end) is None
+    assert recording_journal.get_journal_path(other.file_path).exists()
+
+
+def test_entry_of_missing_recording_is_not_found(tmp_path: Path):
+    start, end = NOW - timedelta(minutes=10), NOW + timedelta(minutes=50)
+    entry = create_entry(tmp_path, "recording.mp3", start, end)
+    entry.file_path.unlink()
+
+    assert recording_journal.find_entry(tmp_path, start, end) is None
+
+
+def test_invalid_journal_is_ignored(tmp_path: Path):
+    start, end = NOW - timedelta(minutes=10), NOW + timedelta(minutes=50)
+    recording_journal.get_journal_path(tmp_path / "invalid.mp3").write_text("[")
+    entry = create_entry(tmp_path, "recording.mp3", start, end)
+
+    assert recording_journal.find_entry(tmp_path, start, end) == entry
@@ -0,0 +1,99 @@
+# pyright: reportPrivateUsage=false
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import pendulum
+import yaml
+from typing_extensions import override
+
+from src import recording_journal
+from src.audio_storage import AudioStorageAdapter
+from src.audio_stream import AudioChunk, HttpAudioStreamAdapter, HttpStreamClient
+from src.hls_variants import VariantPolicy
+from src.models import RecordingTask, ValidUrl
+from src.recording_journal import JournalEntry
+from src.recording_service import RecordAudioService
+from src.stream_reconnect import StreamGaps
+from src.utils import CountdownTimer, TimePeriod, TimeProvider
+
+MP3_FRAME = b"\xff\xfb\x90\x00" + b"\0" * 413
+
+
+# Yields the given chunks instead of a live stream
+class FakeStreamAdapter(HttpAudioStreamAdapter):
+    def __init__(self, chunks: list[bytes]) -> None:
+        super().__init__(HttpStreamClient(chunk_size=1024))
+        self._chunks = chunks
+
+    @override
+    async def get_audio_data(
+        self,
+        url: ValidUrl,
+        countdown: CountdownTimer,
+        stream_name: Optional[str] = None,
+        gaps: Optional[StreamGaps] = None,
+        variant_policy: Optional[VariantPolicy] = None,
+        http2: Optional[bool] = None,
+    ) -> AsyncIterator[AudioChunk]:
+        for chunk in self._chunks:
+            yield chunk
+
+
+def create_period() -> TimePeriod:
+    now = pendulum.now("UTC")
+    return TimePeriod(now.subtract(minutes=10), now.add(minutes=50))
+
+
+def create_task(base_dir: Path, period: TimePeriod) -> RecordingTask:
+    return RecordingTask("show", period, base_dir, "mp3")
+
+
+def create_service(chunks: list[bytes]) -> RecordAudioService:
+    return RecordAudioService(
+        FakeStreamAdapter(chunks),
+        AudioStorageAdapter(),
+        ValidUrl("http://localhost/stream"),
+        TimeProvider(),
+        journal_interval=60,
+    )
+
+
+def test_interrupted_recording_is_resumed_in_same_file(tmp_path: Path):
+    # A previous run wrote 3 frames and part of a 4th, of which 2 frames were durable
+    period = create_period()
+    previous_task = create_task(tmp_path, period)
+    previous_task.file_path.write_bytes(MP3_FRAME * 3 + MP3_FRAME[:200])
+    recording_journal.write_entry(
+        JournalEntry(
+            previous_task.id,
+            previous_task.file_path,
+            previous_task.recording_period.start,
+            previous_task.recording_period.end,
+            len(MP3_FRAME) * 2,
+            previous_task.recording_period.start.add(minutes=5),
+        )
+    )
+    # Restarted, i.e. the task is created again with a new id
+    task = create_task(tmp_path, period)
+    assert task.file_path != previous_task.file_path
+
+    asyncio.run(create_service([MP3_FRAME, MP3_FRAME])._record(task, {}))
+
+    # The partial frame is cut and the new data appended
+    assert previous_task.file_path.read_bytes() == MP3_FRAME * 5
+    assert not task.file_path.exists()
+    assert not recording_journal.get_journal_path(previous_task.file_path).exists()
+    gaps_file = previous_task.file_path.with_name(previous_task.file_path.name + ".yml")
+    gaps = yaml.safe_load(gaps_file.read_text())["gaps"]
+    assert [gap["reason"] for gap in gaps] == ["recorder restarted"]
+
+
+def test_recording_without_journal_starts_new_file(tmp_path: Path):
+    task = create_task(tmp_path, create_period())
+
+    asyncio.run(create_service([MP3_FRAME])._record(task, {"title": "show"}))
+
+    assert task.file_path.read_bytes() == MP3_FRAME
+    assert (tmp_path / "metadata.yml").exists()
+    assert not task.file_path.with_name(task.file_path.name + ".yml").exists()
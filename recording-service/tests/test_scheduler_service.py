@@ -0,0 +1,259 @@
+# pyright: reportPrivateUsage=false
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import pendulum
+import pytest
+from pendulum import DateTime, Time  # type: ignore
+from typing_extensions import override
+
+from src.audio_storage import AudioStorageAdapter
+from src.audio_stream import HttpAudioStreamAdapter, HttpStreamClient
+from src.capture_plan import CaptureWindow
+from src.models import RecordingSchedule, RecordingTask, ValidUrl
+from src.recording_service import RecordAudioService
+from src.scheduler_service import (
+    RecordingSchedulerService,
+    SchedulerError,
+    diff_schedules,
+)
+from src.utils import TimePeriod, TimeProvider
+
+
+class FakeTimeProvider(TimeProvider):
+    def __init__(self, now: DateTime) -> None:
+        super().__init__()
+        self.now = now
+
+    @override
+    def get_current_time(self) -> DateTime:
+        return self.now
+
+
+# Records the tasks instead of recording, until released
+class FakeRecorder(RecordAudioService):
+    def __init__(self, time_provider: TimeProvider) -> None:
+        super().__init__(
+            HttpAudioStreamAdapter(HttpStreamClient(chunk_size=1024)),
+            AudioStorageAdapter(),
+            ValidUrl("http://localhost/stream"),
+            time_provider,
+        )
+        self.tasks: list[RecordingTask] = []
+        self.release = asyncio.Event()
+
+    @override
+    async def record_audio_task(self, task: RecordingTask, metadata: dict[str, Any]):
+        self.tasks.append(task)
+        await self.release.wait()
+
+
+# Collects the windows started by the timer instead of starting recordings
+class SchedulerService(RecordingSchedulerService):
+    def __init__(self, time_provider: FakeTimeProvider, plan_days: int = 7) -> None:
+        super().__init__(FakeRecorder(time_provider), time_provider, "mp3", plan_days)
+        self.started: list[CaptureWindow] = []
+
+    @override
+    def _start_recording(self, window: CaptureWindow):
+        self.started.append(window)
+
+    # Compiles the plan without starting the timer, i.e. the tests fire it
+    def start_plan(self) -> None:
+        self._plan = self._compile_plan(self._time_provider.get_current_time())
+
+
+def create_schedule(
+    title: str, start: Time, minutes: int, frequency: str = "*"
+) -> RecordingSchedule:
+    return RecordingSchedule(
+        title,
+        start,
+        pendulum.duration(minutes=minutes),
+        "mp3",
+        Path(title),
+        {},
+        frequency=frequency,
+    )
+
+
+def utc(day: int, hour: int, minute: int = 0) -> DateTime:
+    return pendulum.datetime(2024, 1, day, hour, minute, tz="UTC")
+
+
+def get_timer_delay(scheduler: RecordingSchedulerService) -> float:
+    assert scheduler._timer is not None
+    return scheduler._timer.when() - scheduler._loop.time()
+
+
+def test_due_window_is_started_once():
+    async def run():
+        clock = FakeTimeProvider(utc(1, 9, 59))
+        scheduler = SchedulerService(clock)
+        scheduler.add_recording_schedule(create_schedule("show", Time(10, 0), 60))
+        scheduler.start_plan()
+
+        scheduler._on_timer()
+        assert scheduler.started == []
+        # Set to the start of the recording
+        assert 59 < get_timer_delay(scheduler) <= 60
+
+        # The timer fires again during the window (at most every minute)
+        for minute in (0, 1, 30):
+            clock.now = utc(1, 10, minute)
+            scheduler._on_timer()
+        assert [window.start for window in scheduler.started] == [utc(1, 10)]
+
+        # Ended windows are forgotten, and the next day's window is started
+        clock.now = utc(1, 11)
+        scheduler._on_timer()
+        assert scheduler._started_windows == {}
+        clock.now = utc(2, 10)
+        scheduler._on_timer()
+        assert [window.start for window in scheduler.started] == [
+            utc(1, 10),
+            utc(2, 10),
+        ]
+        assert scheduler._timer is not None
+        scheduler._timer.cancel()
+
+    asyncio.run(run())
+
+
+def test_window_in_progress_is_started_late():
+    async def run():
+        # E.g. restarted during the recording period
+        clock = FakeTimeProvider(utc(1, 10, 30))
+        scheduler = SchedulerService(clock)
+        scheduler.add_recording_schedule(create_schedule("show", Time(10, 0), 60))
+        scheduler.start_plan()
+
+        scheduler._on_timer()
+
+        assert [window.start for window in scheduler.started] == [utc(1, 10)]
+        assert scheduler._timer is not None
+        scheduler._timer.cancel()
+
+    asyncio.run(run())
+
+
+def test_plan_is_extended_daily():
+    async def run():
+        clock = FakeTimeProvider(utc(1, 0))
+        scheduler = SchedulerService(clock, plan_days=1)
+        scheduler.add_recording_schedule(create_schedule("show", Time(10, 0), 60))
+        scheduler.start_plan()
+        assert scheduler._plan is not None
+        assert scheduler._plan.end == utc(2, 0)
+
+        # Beyond the first plan
+        clock.now = utc(2, 10)
+        scheduler._on_timer()
+
+        assert scheduler._plan.end == utc(3, 10)
+        assert [window.start for window in scheduler.started] == [utc(2, 10)]
+        assert scheduler._timer is not None
+        scheduler._timer.cancel()
+
+    asyncio.run(run())
+
+
+def test_overlapping_period_of_same_podcast_is_skipped():
+    async def run():
+        clock = FakeTimeProvider(utc(1, 10))
+        scheduler = SchedulerService(clock)
+        recorder = scheduler._recorder
+        assert isinstance(recorder, FakeRecorder)
+        schedule = create_schedule("show", Time(10, 0), 60)
+        # E.g. the schedule was changed during its recording
+        changed_schedule = create_schedule("show", Time(10, 30), 60)
+        other_schedule = create_schedule("other", Time(10, 30), 60)
+
+        recording = asyncio.create_task(
+            scheduler._execute_recording_task(
+                schedule, TimePeriod(utc(1, 10), utc(1, 11))
+            )
+        )
+        await asyncio.sleep(0)
+        await scheduler._execute_recording_task(
+            changed_schedule, TimePeriod(utc(1, 10, 30), utc(1, 11, 30))
+        )
+        other_recording = asyncio.create_task(
+            scheduler._execute_recording_task(
+                other_schedule, TimePeriod(utc(1, 10, 30), utc(1, 11, 30))
+            )
+        )
+        await asyncio.sleep(0)
+
+        assert [task.title for task in recorder.tasks] == ["show", "other"]
+        recorder.release.set()
+        await asyncio.wait_for(asyncio.gather(recording, other_recording), 5)
+        assert scheduler._active_tasks == {}
+
+    asyncio.run(run())
+
+
+def test_diff_matches_schedules_by_output_dir():
+    kept = create_schedule("kept", Time(10, 0), 60)
+    changed = create_schedule("changed", Time(10, 0), 60)
+    removed = create_schedule("removed", Time(10, 0), 60)
+    new_kept = create_schedule("kept", Time(10, 0), 60)
+    new_changed = create_schedule("changed", Time(11, 0), 60)
+    added = create_schedule("added", Time(10, 0), 60)
+
+    diff = diff_schedules([kept, changed, removed], [added, new_changed, new_kept])
+
+    # Unchanged schedules keep their ids, i.e. their planned recordings
+    assert [s.id for s in diff.unchanged] == [kept.id]
+    assert [(old.id, new.id) for old, new in diff.modified] == [
+        (changed.id, new_changed.id)
+    ]
+    assert diff.added == [added]
+    assert diff.removed == [removed]
+    assert diff.has_changes
+
+
+def test_diff_matches_equal_schedule_of_same_output_dir_first():
+    # A show on two times of the day, listed in another order
+    morning = create_schedule("show", Time(8, 0), 60)
+    evening = create_schedule("show", Time(18, 0), 60)
+    new_evening = create_schedule("show", Time(19, 0), 60)
+    new_morning = create_schedule("show", Time(8, 0), 60)
+
+    diff = diff_schedules([morning, evening], [new_evening, new_morning])
+
+    assert [s.id for s in diff.unchanged] == [morning.id]
+    assert [(old.id, new.id) for old, new in diff.modified] == [
+        (evening.id, new_evening.id)
+    ]
+    assert diff.added == [] and diff.removed == []
+
+
+def test_diff_of_equal_schedules_has_no_changes():
+    schedules = [create_schedule("show", Time(hour, 0), 60) for hour in (8, 18)]
+    new_schedules = [create_schedule("show", Time(hour, 0), 60) for hour in (18, 8)]
+
+    diff = diff_schedules(schedules, new_schedules)
+
+    assert not diff.has_changes
+    assert sorted(s.start_timeofday.hour for s in diff.unchanged) == [8, 18]
+
+
+def test_failed_update_leaves_schedules_and_plan_unchanged():
+    async def run():
+        scheduler = SchedulerService(FakeTimeProvider(utc(1, 0)))
+        schedule = create_schedule("show", Time(10, 0), 60)
+        scheduler.add_recording_schedule(schedule)
+        scheduler.start_plan()
+        assert scheduler._plan is not None
+        windows = list(scheduler._plan.windows)
+
+        invalid = create_schedule("show", Time(11, 0), 60, frequency="invalid")
+        with pytest.raises(SchedulerError):
+            scheduler.update_recording_schedules([invalid])
+
+        assert scheduler._schedules == [schedule]
+        assert scheduler._plan.windows == windows
+
+    asyncio.run(run())